@@ -0,0 +1,272 @@
+"""
+EXPLAIN-first admission control for analytics SQL.
+
+Overview
+  The executor used to run EXPLAIN after the data query, so the plan never
+  decided whether to run at all: an LLM-generated cross join only failed on
+  `statement_timeout`. Admission runs ``EXPLAIN (FORMAT JSON)`` first, reads
+  the planner's total cost, estimated rows and sequential scans, and decides
+  before any data is read:
+
+  - ``admit``: run as planned;
+  - ``limit``: the result would exceed the executor row cap anyway, so the
+    SQL gets ``LIMIT <cap>`` (the same rows the client-side cap keeps, but
+    PostgreSQL can plan a top-N instead of a full sort/scan);
+  - ``heavy``: cost above `heavy_cost`, or a sequential scan of more than
+    `seq_scan_rows` rows on one of `large_tables`; run in the heavy lane
+    (few concurrent slots, longer timeout);
+  - ``reject``: cost above `max_total_cost`.
+
+Design
+  - `summarize_explain` walks the JSON plan tree once into a `PlanEstimate`.
+  - `ExplainCache` keeps estimates (and the raw plan for `meta.explain`) per
+    SQL + params for `ttl_seconds`, so repeated SQL pays the EXPLAIN round
+    trip once; TTL/size bounds as in `app.infra.cache`.
+  - `decide` is pure; the executor owns the database round trips, the lane
+    and the resulting warnings/errors. When EXPLAIN itself fails the query is
+    admitted unchanged and fails (or not) exactly as before.
+  - `apply_limit` appends or tightens a trailing top-level ``LIMIT``.
+
+Integration
+  - `AnalyticsExecutor.execute` (non dry-run) calls admission when
+    `analytics.executor.admission_enabled`; the decision is returned in
+    ``meta["admission"]``; rejections raise ``RuntimeError("admission_rejected: ...")``.
+  - Settings: `analytics.executor.admission_*`.
+  - Metrics: `analytics_admission_total{action}`,
+    `analytics_explain_cache_total{outcome}`, `analytics_plan_cost`.
+
+Usage
+  >>> from app.agents.analytics.admission import AdmissionBudget, decide, summarize_explain
+  >>> plan = [{"Plan": {"Node Type": "Seq Scan", "Relation Name": "orders", "Total Cost": 2400.0,
+  ...                   "Plan Rows": 99441}}]
+  >>> est = summarize_explain(plan)
+  >>> est.total_cost, est.plan_rows, est.seq_scans
+  (2400.0, 99441, (('orders', 99441),))
+  >>> d = decide("SELECT order_id FROM analytics.orders", est, AdmissionBudget(), row_cap=2000)
+  >>> d.action, d.sql
+  ('limit', 'SELECT order_id FROM analytics.orders\\nLIMIT 2000')
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any
+
+__all__ = [
+    "AdmissionBudget",
+    "AdmissionDecision",
+    "ExplainCache",
+    "PlanEstimate",
+    "apply_limit",
+    "budget_from_config",
+    "decide",
+    "summarize_explain",
+]
+
+_TRAILING_LIMIT_RE = re.compile(r"\blimit\s+(\d+)(\s+offset\s+\d+)?\s*$", re.IGNORECASE)
+
+
+@dataclass(frozen=True, slots=True)
+class PlanEstimate:
+    """What admission needs from an EXPLAIN plan.
+
+    Attributes
+    ----------
+    total_cost: Root node total cost (planner units).
+    plan_rows: Root node estimated rows.
+    root: Root node type (e.g. ``Limit``, ``Aggregate``, ``Sort``).
+    seq_scans: ``(relation, estimated rows)`` per sequential scan.
+    """
+
+    total_cost: float
+    plan_rows: int
+    root: str
+    seq_scans: tuple[tuple[str, int], ...]
+
+
+@dataclass(frozen=True, slots=True)
+class AdmissionBudget:
+    """Cost budgets (see `analytics.executor.admission_*` settings)."""
+
+    max_total_cost: float = 5_000_000.0
+    heavy_cost: float = 250_000.0
+    seq_scan_rows: int = 500_000
+    large_tables: frozenset[str] = frozenset(
+        {"orders", "order_items", "order_payments", "order_reviews", "customers", "geolocation"}
+    )
+
+
+@dataclass(slots=True)
+class AdmissionDecision:
+    """Admission outcome for one statement."""
+
+    action: str  # admit | limit | heavy | reject
+    sql: str
+    reason: str
+    estimate: PlanEstimate | None = None
+    cached: bool = False
+    lane: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.lane = "heavy" if self.action == "heavy" else "light"
+
+    def to_meta(self) -> dict[str, Any]:
+        est = self.estimate
+        return {
+            "action": self.action,
+            "lane": self.lane,
+            "reason": self.reason,
+            "explain_cached": self.cached,
+            "total_cost": est.total_cost if est else None,
+            "plan_rows": est.plan_rows if est else None,
+            "seq_scans": [list(s) for s in est.seq_scans] if est else [],
+        }
+
+
+def _plan_root(explain: Any) -> Mapping[str, Any] | None:
+    payload = explain
+    if isinstance(payload, (bytes, bytearray)):
+        payload = payload.decode("utf-8")
+    if isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return None
+    if isinstance(payload, list):
+        payload = payload[0] if payload else None
+    if isinstance(payload, Mapping):
+        plan = payload.get("Plan", payload)
+        if isinstance(plan, Mapping) and "Node Type" in plan:
+            return plan
+    return None
+
+
+def summarize_explain(explain: Any) -> PlanEstimate | None:
+    """Reduce ``EXPLAIN (FORMAT JSON)`` output to a `PlanEstimate`.
+
+    Returns None for anything that is not a plan (e.g. an error payload).
+    """
+    root = _plan_root(explain)
+    if root is None:
+        return None
+    seq_scans: list[tuple[str, int]] = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.append((str(node.get("Relation Name") or "?"), int(node.get("Plan Rows") or 0)))
+        stack.extend(p for p in node.get("Plans") or () if isinstance(p, Mapping))
+    return PlanEstimate(
+        total_cost=float(root.get("Total Cost") or 0.0),
+        plan_rows=int(root.get("Plan Rows") or 0),
+        root=str(root.get("Node Type") or ""),
+        seq_scans=tuple(seq_scans),
+    )
+
+
+def apply_limit(sql: str, limit: int) -> str:
+    """Return `sql` with a top-level ``LIMIT`` of at most `limit`.
+
+    >>> apply_limit("SELECT a FROM t ORDER BY a LIMIT 50000", 2000)
+    'SELECT a FROM t ORDER BY a LIMIT 2000'
+    >>> apply_limit("SELECT a FROM t LIMIT 10;", 2000)
+    'SELECT a FROM t LIMIT 10'
+    """
+    body = sql.strip().rstrip(";").rstrip()
+    m = _TRAILING_LIMIT_RE.search(body)
+    if m is None:
+        return f"{body}\nLIMIT {int(limit)}"
+    if int(m.group(1)) <= limit:
+        return body
+    return f"{body[: m.start(1)]}{int(limit)}{body[m.end(1):]}"
+
+
+def decide(sql: str, estimate: PlanEstimate | None, budget: AdmissionBudget, *, row_cap: int) -> AdmissionDecision:
+    """Pick the admission action for `sql` from its plan estimate."""
+    if estimate is None:
+        return AdmissionDecision("admit", sql, "no_plan")
+    if estimate.total_cost > budget.max_total_cost:
+        return AdmissionDecision(
+            "reject", sql, f"estimated cost {estimate.total_cost:.0f} exceeds {budget.max_total_cost:.0f}", estimate
+        )
+    heavy_scans = [
+        (rel, rows) for rel, rows in estimate.seq_scans if rel in budget.large_tables and rows > budget.seq_scan_rows
+    ]
+    if estimate.total_cost > budget.heavy_cost or heavy_scans:
+        reason = (
+            f"estimated cost {estimate.total_cost:.0f} exceeds {budget.heavy_cost:.0f}"
+            if estimate.total_cost > budget.heavy_cost
+            else f"seq scan of {heavy_scans[0][0]} (~{heavy_scans[0][1]} rows)"
+        )
+        return AdmissionDecision("heavy", sql, reason, estimate)
+    if estimate.plan_rows > row_cap and estimate.root != "Limit":
+        limited = apply_limit(sql, row_cap)
+        if limited != sql.strip().rstrip(";").rstrip():
+            return AdmissionDecision("limit", limited, f"~{estimate.plan_rows} rows over row cap {row_cap}", estimate)
+    return AdmissionDecision("admit", sql, "within_budget", estimate)
+
+
+class ExplainCache:
+    """TTL/size-bounded cache of EXPLAIN results per SQL and params.
+
+    Parameters
+    ----------
+    ttl_seconds:
+        Time-to-live of a cached plan (statistics drift, so keep it short).
+    max_size:
+        Maximum number of plans; the oldest is evicted when full.
+    """
+
+    def __init__(self, ttl_seconds: float = 600.0, max_size: int = 512) -> None:
+        self.ttl = float(ttl_seconds)
+        self.max_size = max(int(max_size), 1)
+        self._entries: dict[str, tuple[Any, PlanEstimate | None, float]] = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def key_for(sql: str, params: Mapping[str, Any] | None = None) -> str:
+        raw = json.dumps([" ".join(sql.split()), dict(params or {})], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+    def get(self, key: str) -> tuple[Any, PlanEstimate | None] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[2] >= self.ttl:
+                del self._entries[key]
+                return None
+            return entry[0], entry[1]
+
+    def set(self, key: str, explain: Any, estimate: PlanEstimate | None) -> None:
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_size:
+                oldest = min(self._entries, key=lambda k: self._entries[k][2])
+                del self._entries[oldest]
+            self._entries[key] = (explain, estimate, time.monotonic())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def budget_from_config(cfg: Any) -> AdmissionBudget:
+    """Build an `AdmissionBudget` from `analytics.executor` settings."""
+    default = AdmissionBudget()
+    tables: Iterable[str] = getattr(cfg, "admission_large_tables", None) or default.large_tables
+    return AdmissionBudget(
+        max_total_cost=float(getattr(cfg, "admission_max_total_cost", default.max_total_cost)),
+        heavy_cost=float(getattr(cfg, "admission_heavy_cost", default.heavy_cost)),
+        seq_scan_rows=int(getattr(cfg, "admission_seq_scan_rows", default.seq_scan_rows)),
+        large_tables=frozenset(str(t).rsplit(".", 1)[-1] for t in tables),
+    )
@@ -0,0 +1,384 @@
+"""
+Circuit breaker for analytics SQL, per statement, optionally cluster-wide.
+
+Overview
+  A statement that keeps failing (typically `statement_timeout` on a
+  pathological plan) should stop reaching the database. The breaker counts
+  failures per SQL key; after `threshold` failures the circuit opens for
+  `reset_after_s`, then lets exactly one half-open probe through: success
+  closes it, failure re-opens it.
+
+Design
+  - Stores share one small interface (`get`, `record_failure`, `claim_probe`,
+    `record_success`) and use wall-clock epoch seconds so state means the same
+    in every process.
+  - `MemoryBreakerStore`: bounded LRU (`max_keys`) per process; distinct
+    failing SQL no longer grows a dict forever.
+  - `PostgresBreakerStore`: one row per failing key in a shared table
+    (created lazily, once per process, like the state blob table); failure
+    counting and probe claims are single atomic statements, so a query trips
+    once per cluster and only one worker probes it. Reads run in a read-only
+    transaction. Rows are deleted on success and pruned when stale.
+  - `CircuitBreaker` never lets a store problem fail a query: store errors
+    are logged, counted and served from an in-process fallback store. If the
+    table cannot be created at all (`BreakerStoreUnavailable`), the breaker
+    switches to the fallback for good instead of retrying DDL per call.
+
+Integration
+  - `AnalyticsExecutor.execute` calls `before` (raises `CircuitOpen`, a
+    ``RuntimeError("circuit_open: ...")``), then `success` / `failure`.
+  - Settings: `analytics.executor.breaker_*` (backend ``memory`` or
+    ``postgres``). There is no shared cache service in this deployment, so
+    the Postgres table is the cross-process option.
+  - Metrics: `analytics_breaker_total{event}` (opened/probe/closed/
+    short_circuit/store_error).
+
+Usage
+  >>> from app.agents.analytics.breaker import CircuitBreaker, CircuitOpen, MemoryBreakerStore
+  >>> cb = CircuitBreaker(MemoryBreakerStore(), threshold=2, reset_after_s=60)
+  >>> cb.failure("k").failures, cb.failure("k").failures
+  (1, 2)
+  >>> try:
+  ...     cb.before("k")
+  ... except CircuitOpen as exc:
+  ...     str(exc).startswith("circuit_open")
+  True
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+_log = logging.getLogger(__name__)
+
+__all__ = [
+    "BreakerEntry",
+    "BreakerStoreUnavailable",
+    "CircuitBreaker",
+    "CircuitOpen",
+    "MemoryBreakerStore",
+    "PostgresBreakerStore",
+    "get_breaker",
+]
+
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+class CircuitOpen(RuntimeError):
+    """Raised when a statement's circuit is open (or another worker probes it)."""
+
+
+class BreakerStoreUnavailable(RuntimeError):
+    """The shared store cannot be used in this process (table setup failed)."""
+
+
+@dataclass(slots=True)
+class BreakerEntry:
+    """Breaker state for one key (times are epoch seconds)."""
+
+    failures: int = 0
+    open_until: float | None = None
+    probe_until: float | None = None
+
+
+class BreakerStore(Protocol):
+    def get(self, key: str) -> BreakerEntry | None: ...
+
+    def record_failure(self, key: str, *, threshold: int, reset_after_s: float, now: float) -> BreakerEntry: ...
+
+    def claim_probe(self, key: str, *, lease_s: float, now: float) -> bool: ...
+
+    def record_success(self, key: str) -> None: ...
+
+
+class MemoryBreakerStore:
+    """In-process breaker state, LRU-bounded to `max_keys` keys."""
+
+    def __init__(self, max_keys: int = 1024) -> None:
+        self.max_keys = max(1, int(max_keys))
+        self._entries: OrderedDict[str, BreakerEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> BreakerEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return BreakerEntry(entry.failures, entry.open_until, entry.probe_until)
+
+    def record_failure(self, key: str, *, threshold: int, reset_after_s: float, now: float) -> BreakerEntry:
+        with self._lock:
+            entry = self._entries.get(key) or BreakerEntry()
+            entry.failures += 1
+            entry.probe_until = None
+            if entry.failures >= threshold:
+                entry.open_until = now + reset_after_s
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_keys:
+                self._entries.popitem(last=False)
+            return BreakerEntry(entry.failures, entry.open_until, entry.probe_until)
+
+    def claim_probe(self, key: str, *, lease_s: float, now: float) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return True
+            if entry.probe_until is not None and entry.probe_until > now:
+                return False
+            entry.probe_until = now + lease_s
+            return True
+
+    def record_success(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class PostgresBreakerStore:
+    """Breaker state shared through a Postgres table.
+
+    Parameters
+    ----------
+    engine:
+        SQLAlchemy engine (read-write).
+    table:
+        Table name (optionally schema-qualified).
+    max_age_s:
+        Rows not updated for this long are pruned (checked at most every
+        `prune_every_s` per process).
+    """
+
+    def __init__(
+        self,
+        engine: Any,
+        table: str = "analytics_circuit_breaker",
+        *,
+        max_age_s: float = 86400.0,
+        prune_every_s: float = 600.0,
+    ) -> None:
+        if not _IDENT_RE.match(table):
+            raise ValueError(f"invalid breaker table name: {table!r}")
+        self.engine = engine
+        self.table = table
+        self.max_age_s = float(max_age_s)
+        self.prune_every_s = float(prune_every_s)
+        self._ready = False
+        self._setup_error: str | None = None
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _ensure_table(self) -> None:
+        """Create the table once per process; a failure is remembered, not retried."""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            if self._setup_error is not None:
+                raise BreakerStoreUnavailable(self._setup_error)
+            try:
+                with self.engine.begin() as conn:
+                    conn.exec_driver_sql(
+                        f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                        " key TEXT PRIMARY KEY,"
+                        " failures INTEGER NOT NULL,"
+                        " open_until DOUBLE PRECISION,"
+                        " probe_until DOUBLE PRECISION,"
+                        " updated_at DOUBLE PRECISION NOT NULL)"
+                    )
+            except Exception as exc:
+                self._setup_error = f"{self.table}: {type(exc).__name__}"
+                raise BreakerStoreUnavailable(self._setup_error) from exc
+            self._ready = True
+
+    def get(self, key: str) -> BreakerEntry | None:
+        import sqlalchemy as sa
+
+        self._ensure_table()
+        with self.engine.connect() as conn:  # rolled back on exit; nothing to commit
+            conn.exec_driver_sql("SET TRANSACTION READ ONLY")
+            row = conn.execute(
+                sa.text(f"SELECT failures, open_until, probe_until FROM {self.table} WHERE key = :k"), {"k": key}
+            ).first()
+        return BreakerEntry(int(row[0]), row[1], row[2]) if row is not None else None
+
+    def record_failure(self, key: str, *, threshold: int, reset_after_s: float, now: float) -> BreakerEntry:
+        import sqlalchemy as sa
+
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                sa.text(
+                    f"INSERT INTO {self.table} AS b (key, failures, open_until, probe_until, updated_at)"
+                    " VALUES (:k, 1, CASE WHEN 1 >= :t THEN CAST(:until AS DOUBLE PRECISION) END, NULL, :now)"
+                    " ON CONFLICT (key) DO UPDATE SET failures = b.failures + 1,"
+                    " open_until = CASE WHEN b.failures + 1 >= :t THEN CAST(:until AS DOUBLE PRECISION) ELSE b.open_until END,"
+                    " probe_until = NULL, updated_at = :now"
+                    " RETURNING failures, open_until, probe_until"
+                ),
+                {"k": key, "t": int(threshold), "until": now + reset_after_s, "now": now},
+            ).first()
+            if now - self._last_prune >= self.prune_every_s:
+                self._last_prune = now
+                conn.execute(
+                    sa.text(f"DELETE FROM {self.table} WHERE updated_at < :cutoff"),
+                    {"cutoff": now - self.max_age_s},
+                )
+        return BreakerEntry(int(row[0]), row[1], row[2])
+
+    def claim_probe(self, key: str, *, lease_s: float, now: float) -> bool:
+        import sqlalchemy as sa
+
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                sa.text(
+                    f"UPDATE {self.table} SET probe_until = :lease, updated_at = :now"
+                    " WHERE key = :k AND (probe_until IS NULL OR probe_until <= :now) RETURNING key"
+                ),
+                {"k": key, "lease": now + lease_s, "now": now},
+            ).first()
+        return row is not None
+
+    def record_success(self, key: str) -> None:
+        import sqlalchemy as sa
+
+        self._ensure_table()
+        with self.engine.begin() as conn:
+            conn.execute(sa.text(f"DELETE FROM {self.table} WHERE key = :k"), {"k": key})
+
+
+class CircuitBreaker:
+    """Closed → open → half-open breaker over a `BreakerStore`.
+
+    Parameters
+    ----------
+    store:
+        Where state lives (`MemoryBreakerStore` or `PostgresBreakerStore`).
+    threshold:
+        Consecutive failures that open the circuit.
+    reset_after_s:
+        How long the circuit stays open before a half-open probe.
+    max_keys:
+        Size of the in-process fallback store used when `store` errors.
+    """
+
+    def __init__(
+        self, store: Any, *, threshold: int = 3, reset_after_s: float = 60.0, max_keys: int = 1024
+    ) -> None:
+        self.store = store
+        self.threshold = max(1, int(threshold))
+        self.reset_after_s = float(reset_after_s)
+        self._fallback = store if isinstance(store, MemoryBreakerStore) else MemoryBreakerStore(max_keys)
+
+    def _call(self, op: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return getattr(self.store, op)(*args, **kwargs)
+        except Exception as exc:
+            if self.store is self._fallback:
+                raise
+            _inc_counter("analytics_breaker_total", {"event": "store_error"})
+            if isinstance(exc, BreakerStoreUnavailable):
+                _log.warning("breaker store unavailable (%s); using in-process state from now on", exc)
+                self.store = self._fallback
+                return getattr(self._fallback, op)(*args, **kwargs)
+            _log.warning("breaker store %s failed; using in-process state", op, extra={"error": type(exc).__name__})
+            return getattr(self._fallback, op)(*args, **kwargs)
+
+    def before(self, key: str, *, lease_s: float = 60.0) -> str:
+        """Gate a call and return the state it runs in.
+
+        ``closed`` (no failures recorded), ``counting`` (failures below the
+        threshold) or ``probe`` (the half-open trial); pass it to `success`.
+
+        Raises
+        ------
+        CircuitOpen
+            When the circuit is open, or half-open with another probe running.
+        """
+        entry = self._call("get", key)
+        if entry is None:
+            return "closed"
+        if entry.open_until is None:
+            return "counting"
+        now = time.time()
+        if now < entry.open_until:
+            _inc_counter("analytics_breaker_total", {"event": "short_circuit"})
+            raise CircuitOpen("circuit_open: skipping execution due to repeated failures")
+        if not self._call("claim_probe", key, lease_s=max(1.0, float(lease_s)), now=now):
+            if self._call("get", key) is None:  # closed by a concurrent success
+                return "closed"
+            _inc_counter("analytics_breaker_total", {"event": "short_circuit"})
+            raise CircuitOpen("circuit_open: half-open probe already running")
+        _inc_counter("analytics_breaker_total", {"event": "probe"})
+        return "probe"
+
+    def success(self, key: str, state: str = "counting") -> None:
+        """Close the circuit for `key`; `state` comes from `before`.
+
+        Keys that had no failures (``closed``) need no store write.
+        """
+        if state == "closed":
+            return
+        if state == "probe":
+            _inc_counter("analytics_breaker_total", {"event": "closed"})
+        self._call("record_success", key)
+
+    def failure(self, key: str) -> BreakerEntry:
+        """Count a failure; opens (or re-opens after a probe) at the threshold."""
+        entry = self._call(
+            "record_failure", key, threshold=self.threshold, reset_after_s=self.reset_after_s, now=time.time()
+        )
+        if entry.failures >= self.threshold:
+            _inc_counter("analytics_breaker_total", {"event": "opened"})
+        return entry
+
+
+_BREAKER: CircuitBreaker | None = None
+_BREAKER_LOCK = threading.Lock()
+
+
+def get_breaker(cfg: Any | None = None) -> CircuitBreaker:
+    """Return the process-wide breaker built from `analytics.executor` settings."""
+    global _BREAKER
+    with _BREAKER_LOCK:
+        if _BREAKER is None:
+            _BREAKER = _build_breaker(cfg)
+        return _BREAKER
+
+
+def _build_breaker(cfg: Any | None) -> CircuitBreaker:
+    max_keys = int(getattr(cfg, "breaker_max_keys", 1024))
+    store: Any = MemoryBreakerStore(max_keys)
+    if str(getattr(cfg, "breaker_backend", "memory")).lower() == "postgres":
+        try:
+            from app.infra.db import get_engine
+
+            table = str(getattr(cfg, "breaker_table", "analytics_circuit_breaker"))
+            store = PostgresBreakerStore(get_engine(), table=table)
+        except Exception as exc:
+            _log.info("breaker: using in-process state", extra={"reason": type(exc).__name__})
+    return CircuitBreaker(
+        store,
+        threshold=int(getattr(cfg, "breaker_failure_threshold", 3)),
+        reset_after_s=float(getattr(cfg, "breaker_reset_after_seconds", 60.0)),
+        max_keys=max_keys,
+    )
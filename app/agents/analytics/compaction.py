@@ -0,0 +1,164 @@
+"""
+Token-budgeted result compaction for the analytics normalizer prompt.
+
+Overview
+  When the normalizer shows complete data it used to serialize every result
+  row into the LLM prompt. Large GROUP BY results (the executor raises the
+  row cap to `max_row_cap` for them) then produce huge prompts, slow
+  completions and truncated answers. `compact_rows` estimates tokens per row
+  and, when the rows do not fit the prompt budget, sends a statistical digest
+  of all rows plus as many head rows and a few tail rows as fit instead.
+
+Design
+  - Token estimates use the same characters-per-token heuristic as the LLM
+    rate limiter (`app.infra.rate_limit`), applied to the JSON of a
+    row. The full-result size is extrapolated from an evenly spaced sample,
+    so deciding costs O(sample), not a full serialization.
+  - Under budget, every row is sent (unchanged behaviour). Over budget, the
+    digest (`DatasetProfile.digest`, with SQL `Decimal` treated as numbers)
+    is charged first; head rows are then packed in result order (rankings
+    and time series lead with the rows that matter) and up to `tail_rows`
+    rows from the end fill at most a quarter of the remaining budget.
+  - `to_jsonable` is the normalizer's value conversion (Decimal -> float,
+    dates -> ISO strings) so estimates and prompts see the same payload.
+
+Integration
+  - `AnalyticsNormalizer._normalize_uncached` compacts complete-data prompts
+    and adds `rows_digest` / `rows_omitted` to the LLM input.
+  - Settings: `analytics.normalizer.prompt_rows_token_budget` (0 disables),
+    `analytics.normalizer.prompt_tail_rows`.
+  - Metrics: `normalizer_prompt_tokens{mode}`, `normalizer_llm_ms{mode}`.
+  - Measurement: `python -m scripts.bench_normalizer_prompt`.
+
+Usage
+  >>> from app.agents.analytics.compaction import compact_rows
+  >>> rows = [{"state": f"S{i:03d}", "orders": i} for i in range(500)]
+  >>> out = compact_rows(rows, token_budget=400, tail_rows=2)
+  >>> out.compacted, out.rows[0], out.rows[-1]["state"], out.omitted + len(out.rows)
+  (True, {'state': 'S000', 'orders': 0}, 'S499', 500)
+  >>> compact_rows(rows[:3], token_budget=400).compacted
+  False
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any
+
+from app.agents.analytics.profile import profile_rows
+
+__all__ = [
+    "CompactedRows",
+    "compact_rows",
+    "estimate_json_tokens",
+    "to_jsonable",
+]
+
+# Mirrors `app.infra.rate_limit._CHARS_PER_TOKEN`
+_CHARS_PER_TOKEN = 4
+_SAMPLE_ROWS = 32
+_TAIL_SHARE = 0.25
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Convert SQL result values into JSON-serializable Python values."""
+    if isinstance(obj, dict):
+        return {k: to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [to_jsonable(item) for item in obj]
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, timedelta):
+        return str(obj)
+    return obj
+
+
+def estimate_json_tokens(obj: Any) -> int:
+    """Estimated prompt tokens of `obj` serialized as in the prompt."""
+    text = json.dumps(obj, ensure_ascii=False, default=str)
+    return len(text) // _CHARS_PER_TOKEN + 1
+
+
+@dataclass(slots=True)
+class CompactedRows:
+    """Rows to put in the prompt, plus the digest of what was left out."""
+
+    rows: list[Any]
+    digest: dict[str, Any] | None
+    omitted: int
+    tokens: int  # estimated tokens of `rows` (+ digest)
+    full_tokens: int  # estimated tokens of all rows
+
+    @property
+    def compacted(self) -> bool:
+        return self.digest is not None
+
+
+def _sample_tokens(rows: Sequence[Mapping[str, Any]]) -> float:
+    n = len(rows)
+    step = max(1, n // _SAMPLE_ROWS)
+    sample = [to_jsonable(dict(rows[i])) for i in range(0, n, step)][:_SAMPLE_ROWS]
+    return sum(estimate_json_tokens(r) for r in sample) / max(1, len(sample))
+
+
+def compact_rows(
+    rows: Sequence[Mapping[str, Any]],
+    *,
+    token_budget: int,
+    tail_rows: int = 5,
+) -> CompactedRows:
+    """Fit result rows into `token_budget` prompt tokens.
+
+    Parameters
+    ----------
+    rows:
+        Raw result rows (values converted with `to_jsonable`).
+    token_budget:
+        Prompt tokens available for rows; ``<= 0`` sends every row.
+    tail_rows:
+        Maximum rows kept from the end of the result when compacting.
+    """
+    n = len(rows)
+    per_row = _sample_tokens(rows) if n else 0.0
+    full_tokens = int(per_row * n)
+    if token_budget <= 0 or full_tokens <= token_budget:
+        return CompactedRows([to_jsonable(dict(r)) for r in rows], None, 0, full_tokens, full_tokens)
+
+    digest = to_jsonable(profile_rows(rows, decimals=True).digest())
+    used = estimate_json_tokens(digest)
+    available = max(0, token_budget - used)
+
+    tail: list[Any] = []
+    tail_budget = int(available * _TAIL_SHARE)
+    for i in range(n - 1, max(-1, n - 1 - max(0, tail_rows)), -1):
+        row = to_jsonable(dict(rows[i]))
+        cost = estimate_json_tokens(row)
+        if cost > tail_budget:
+            break
+        tail_budget -= cost
+        available -= cost
+        used += cost
+        tail.append(row)
+    tail.reverse()
+
+    head: list[Any] = []
+    stop = n - len(tail)
+    for i in range(stop):
+        row = to_jsonable(dict(rows[i]))
+        cost = estimate_json_tokens(row)
+        if cost > available:
+            break
+        available -= cost
+        used += cost
+        head.append(row)
+
+    kept = head + tail
+    if len(kept) == n:  # the sample overestimated: everything fits
+        return CompactedRows(kept, None, 0, used - estimate_json_tokens(digest), full_tokens)
+    return CompactedRows(kept, digest, n - len(kept), used, full_tokens)
@@ -11,17 +11,34 @@ Design
 ------
 - **Read-only**: `SET LOCAL default_transaction_read_only = on` within a
   transaction. No DDL/DML allowed.
-- **Timeout**: `SET LOCAL statement_timeout` (milliseconds).
+- **Timeout**: `SET LOCAL statement_timeout` (milliseconds), clamped to the
+  remaining request budget (`app.infra.deadline`) when one is active.
 - **Row cap**: stream rows and stop at `max_rows`, regardless of SQL LIMIT.
-- **Explain (optional)**: `EXPLAIN (FORMAT JSON)`; can upgrade to ANALYZE only
-  if explicitly enabled via env flag.
+- **Guardrails**: statement type, functions and catalog access are checked
+  on the shared `sql_guard` parse (memoized per SQL text).
+- **Admission**: before the data query, `EXPLAIN (FORMAT JSON)` (cached per
+  SQL + params) is checked against cost budgets (`admission.py`): the query
+  is admitted, gets `LIMIT <row cap>`, runs in the heavy lane (longer
+  timeout) or is rejected with `admission_rejected`.
+- **Circuit breaker**: per SQL key (`breaker.py`), LRU-bounded in process or
+  shared through a Postgres table; after repeated failures the statement is
+  short-circuited, then retried by a single half-open probe. It is checked
+  after admission and scheduling, so a rejection or queue timeout never
+  strands a probe lease.
+- **Scheduling**: data queries take a slot from the process-wide
+  `scheduler.QueryScheduler` (bounded concurrency, light/heavy lanes,
+  queue-time deadlines) before touching the pool.
+- **Explain (optional)**: the pre-flight plan is reused for `meta.explain`;
+  ANALYZE runs after the data query only if explicitly enabled via env flag.
 - **Zero hard deps**: the module imports `app.infra.db.get_engine()` lazily.
   If infra is absent at import time, it degrades gracefully.
 
 Integration
 -----------
 - Consumes a plan compatible with `PlannerPlan` (fields: `sql`, `params`,
-  `limit_applied`, `reason`).
+  `limit_applied`, `reason`; optional `lane`, `rollup`).
+- Data-query latency is recorded per target (`analytics_query_ms{target}`:
+  materialized rollup vs base tables).
 - Returns an `ExecutorResult` with timing and diagnostics.
 - Logging and tracing are optional but supported if infra is available.
 
@@ -41,10 +58,22 @@ import os
 from collections.abc import Mapping
 from dataclasses import dataclass
 from time import monotonic
-from typing import Any, Final
+from typing import Any
 
 import sqlalchemy as sa
 
+from app.agents.analytics.admission import (
+    AdmissionDecision,
+    ExplainCache,
+    budget_from_config,
+    decide,
+    summarize_explain,
+)
+from app.agents.analytics.breaker import CircuitBreaker, get_breaker
+from app.agents.analytics.scheduler import QueryScheduler, classify_lane, get_scheduler
+from app.agents.analytics.sql_guard import EXECUTOR_POLICY, check_sql
+from app.infra.deadline import bounded_timeout
+
 try:  # Optional logging
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -59,6 +88,16 @@ except Exception:  # pragma: no cover - optional
     def get_config():
         return None
 
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+    def _observe_hist(_name: str, _value: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
 
 # Tracing (optional; use a single alias to avoid mypy signature clashes)
 start_span: Any
@@ -115,13 +154,6 @@ class ExecutorResult:
 # ---------------------------------------------------------------------------
 # Executor
 # ---------------------------------------------------------------------------
-# Simple in-process circuit breaker (per-sql-hash)
-_BREAKER_FAILURES: dict[str, int] = {}
-_BREAKER_OPEN_UNTIL: dict[str, float] = {}
-_BREAKER_MAX_FAILURES: Final[int] = 3
-_BREAKER_RESET_AFTER_S: Final[float] = 60.0
-
-
 def _sql_key(sql: str) -> str:
     """Return a short, stable key for a SQL string.
 
@@ -160,6 +192,27 @@ class AnalyticsExecutor:
             self.default_row_cap = 2000
             self.max_row_cap = 10000
 
+        # Admission control (EXPLAIN-first budgets, plan cache) and scheduling
+        try:
+            executor_cfg = getattr(getattr(self._config, "analytics"), "executor")  # type: ignore[attr-defined]
+            self.admission_enabled = bool(getattr(executor_cfg, "admission_enabled", True))
+            self.admission_budget = budget_from_config(executor_cfg)
+            self.admission_explain_timeout_ms = int(getattr(executor_cfg, "admission_explain_timeout_ms", 2000))
+            cache_ttl = float(getattr(executor_cfg, "admission_explain_cache_ttl_seconds", 600))
+            cache_size = int(getattr(executor_cfg, "admission_explain_cache_size", 512))
+            self.heavy_lane_timeout_s = int(getattr(executor_cfg, "heavy_lane_timeout_seconds", 300))
+            scheduler_enabled = bool(getattr(executor_cfg, "scheduler_enabled", True))
+        except Exception:
+            self.admission_enabled = True
+            self.admission_budget = budget_from_config(None)
+            self.admission_explain_timeout_ms = 2000
+            cache_ttl, cache_size = 600.0, 512
+            self.heavy_lane_timeout_s = 300
+            executor_cfg, scheduler_enabled = None, True
+        self._explain_cache = ExplainCache(ttl_seconds=cache_ttl, max_size=cache_size)
+        self._scheduler: QueryScheduler | None = get_scheduler(executor_cfg) if scheduler_enabled else None
+        self._breaker: CircuitBreaker = get_breaker(executor_cfg)
+
     def execute(
         self,
         plan: Mapping[str, Any] | Any,
@@ -190,17 +243,11 @@ class AnalyticsExecutor:
             raise ValueError("empty SQL in plan")
         params = _get_attr(plan, "params", default={}) or {}
         limit_applied = bool(_get_attr(plan, "limit_applied", default=False))
+        rollup = _get_attr(plan, "rollup", default=None)
 
         # Safety gate: must be a pure SELECT, without DDL/DML verbs
         _assert_safe_select(sql)
 
-        # Circuit breaker: short-circuit when open
-        key = _sql_key(sql)
-        now = monotonic()
-        open_until = _BREAKER_OPEN_UNTIL.get(key)
-        if open_until and now < open_until:
-            raise RuntimeError("circuit_open: skipping execution due to repeated failures")
-
         # Reinstate a configurable row cap to avoid unbounded memory usage.
         # Defaults come from settings; callers can override via `max_rows`.
         cap = int(max_rows or self.default_row_cap)
@@ -212,7 +259,13 @@ class AnalyticsExecutor:
         sql_lower = sql.lower()
         if " group by " in sql_lower and cap < self.max_row_cap:
             cap = self.max_row_cap
-        timeout = int(timeout_s or self.default_timeout_s)
+        # Clamped to the remaining request budget when one is active
+        timeout = float(timeout_s or self.default_timeout_s)
+        bounded = bounded_timeout(timeout)
+        if bounded is not None:
+            timeout = bounded
+
+        key = _sql_key(sql)
 
         # Get engine lazily (avoid hard import on module import)
         engine = _get_engine()
@@ -221,6 +274,41 @@ class AnalyticsExecutor:
         warnings: list[str] = []
         explain_json: Any | None = None
 
+        # Admission: EXPLAIN first, then admit / limit / heavy lane / reject
+        admission: AdmissionDecision | None = None
+        preflight_explain: Any | None = None
+        if self.admission_enabled and not dry_run:
+            admission, preflight_explain = self._admit(engine, sql, params, cap)
+            if admission.action == "reject":
+                raise RuntimeError(f"admission_rejected: {admission.reason}")
+            if admission.action == "limit":
+                sql = admission.sql
+                warnings.append("admission_limit")
+            elif admission.action == "heavy":
+                warnings.append("admission_heavy")
+                timeout = float(max(timeout, self.heavy_lane_timeout_s))
+                bounded = bounded_timeout(timeout)
+                if bounded is not None:
+                    timeout = bounded
+
+        # Scheduling: wait for a slot in the query's lane (raises QueueTimeout)
+        lane = classify_lane(_get_attr(plan, "lane", default=None), admission)
+        scheduler = self._scheduler if not dry_run else None
+        queue_ms = scheduler.acquire(lane) if scheduler is not None else 0.0
+        if queue_ms:
+            bounded = bounded_timeout(timeout)  # queueing spent part of the budget
+            if bounded is not None:
+                timeout = bounded
+
+        # Circuit breaker, gated last: a half-open probe lease is only claimed
+        # once nothing but the statement itself can fail before success/failure
+        try:
+            breaker_state = self._breaker.before(key, lease_s=timeout)
+        except BaseException:
+            if scheduler is not None:
+                scheduler.release(lane)
+            raise
+
         with start_span("agent.analytics.execute", {"row_cap": "unlimited", "timeout_s": timeout}):
             t0 = monotonic()
             try:
@@ -228,7 +316,7 @@ class AnalyticsExecutor:
                     if readonly:
                         conn.exec_driver_sql("SET LOCAL default_transaction_read_only = on")
                     # timeout in milliseconds
-                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {timeout * 1000}")
+                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}")
 
                     if dry_run:
                         # EXPLAIN only; no data retrieval
@@ -244,11 +332,13 @@ class AnalyticsExecutor:
                                 break
 
                         if include_explain:
-                            explain_json = _explain_json(conn, sql, params)
+                            if preflight_explain is not None and not _explain_analyze():
+                                explain_json = preflight_explain
+                            else:
+                                explain_json = _explain_json(conn, sql, params)
 
                 # reset breaker counter on success
-                _BREAKER_FAILURES.pop(key, None)
-                _BREAKER_OPEN_UNTIL.pop(key, None)
+                self._breaker.success(key, breaker_state)
 
             except Exception as exc:  # capture and continue with diagnostics
                 # Check if it's a timeout error
@@ -260,13 +350,14 @@ class AnalyticsExecutor:
                     warnings.append(f"execution_error: {type(exc).__name__}")
                 
                 # increment breaker failures and open if threshold crossed
-                fail = _BREAKER_FAILURES.get(key, 0) + 1
-                _BREAKER_FAILURES[key] = fail
-                if fail >= _BREAKER_MAX_FAILURES:
-                    _BREAKER_OPEN_UNTIL[key] = now + _BREAKER_RESET_AFTER_S
+                self._breaker.failure(key)
                 raise
             finally:
                 exec_ms = (monotonic() - t0) * 1000.0
+                if scheduler is not None:
+                    scheduler.release(lane)
+                if not dry_run:
+                    _observe_hist("analytics_query_ms", exec_ms, {"target": "rollup" if rollup else "base"})
 
         # Sanitize SQL in meta based on environment flag (default: show full SQL).
         sanitize = os.getenv("EXECUTOR_SANITIZE_SQL", "false").strip().lower() in {"1", "true", "yes"}
@@ -277,8 +368,13 @@ class AnalyticsExecutor:
             "row_cap": cap,
             "timeout_s": timeout,
             "explain": explain_json,
-            "circuit_failures": _BREAKER_FAILURES.get(key, 0),
-            "circuit_open_until": _BREAKER_OPEN_UNTIL.get(key),
+            "circuit_state": breaker_state,
+            "circuit_failures": 0,
+            "circuit_open_until": None,
+            "admission": admission.to_meta() if admission is not None else None,
+            "lane": lane,
+            "queue_ms": round(queue_ms, 1),
+            "rollup": rollup,
         }
 
         return ExecutorResult(
@@ -290,6 +386,44 @@ class AnalyticsExecutor:
             meta=meta,
         )
 
+    def _admit(
+        self, engine: Any, sql: str, params: Mapping[str, Any], cap: int
+    ) -> tuple[AdmissionDecision, Any | None]:
+        """Run (or reuse) a pre-flight EXPLAIN and decide admission for `sql`.
+
+        Returns the decision and the plan JSON (None when EXPLAIN failed; the
+        query is then admitted unchanged and fails or succeeds as before).
+        """
+        cache_key = ExplainCache.key_for(sql, params)
+        cached = self._explain_cache.get(cache_key)
+        if cached is not None:
+            explain, estimate = cached
+            _inc_counter("analytics_explain_cache_total", {"outcome": "hit"})
+        else:
+            _inc_counter("analytics_explain_cache_total", {"outcome": "miss"})
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql("SET LOCAL default_transaction_read_only = on")
+                    conn.exec_driver_sql(
+                        f"SET LOCAL statement_timeout = {max(1, self.admission_explain_timeout_ms)}"
+                    )
+                    explain = _explain_json(conn, sql, params, analyze=False)
+            except Exception as exc:
+                self.log.warning("admission explain failed", extra={"error": type(exc).__name__})
+                explain = None
+            estimate = summarize_explain(explain)
+            if estimate is None:
+                explain = None
+            else:
+                self._explain_cache.set(cache_key, explain, estimate)
+
+        decision = decide(sql, estimate, self.admission_budget, row_cap=cap)
+        decision.cached = cached is not None
+        _inc_counter("analytics_admission_total", {"action": decision.action})
+        if estimate is not None:
+            _observe_hist("analytics_plan_cost", estimate.total_cost, {"action": decision.action})
+        return decision, explain
+
     async def execute_async(
         self,
         plan: Mapping[str, Any] | Any,
@@ -351,62 +485,22 @@ def _get_attr(obj: Mapping[str, Any] | Any, name: str, *, default: Any) -> Any:
 def _assert_safe_select(sql: str) -> None:
     """Validate that a SQL string is a safe, read-only SELECT/CTE.
 
-    Enforces the following:
+    Delegates to `sql_guard.check_sql` with `EXECUTOR_POLICY`:
     - No stacked statements (``;``)
     - Statement starts with ``SELECT`` or ``WITH``
     - No DDL/DML tokens
     - Function calls restricted to a conservative allowlist
     - No access to ``pg_catalog`` or ``information_schema``
 
+    The parse is memoized by SQL text, so SQL already validated by the
+    planner is not re-scanned.
+
     Raises
     ------
     ValueError
-        If any safety constraint is violated.
+        If any safety constraint is violated (`SQLGuardError`).
     """
-    sql_l = sql.lstrip().lower()
-    # Disallow multiple statements via semicolons (stacked statements)
-    if ";" in sql_l:
-        raise ValueError("multiple statements are not allowed")
-    # Allow SELECT and WITH (CTEs) statements
-    if not (sql_l.startswith("select") or sql_l.startswith("with")):
-        raise ValueError("only SELECT and WITH statements are allowed")
-
-    blocked = {"insert", "update", "delete", "alter", "drop", "create", "grant", "revoke"}
-    tokens = {t for t in sql_l.replace("\n", " ").split(" ") if t}
-    if any(b in tokens for b in blocked):
-        raise ValueError("DDL/DML tokens are not allowed in executor SQL")
-
-    # Optional function allowlist (best-effort): reject unknown function calls
-    _ALLOWED_FUNCS = {
-        "count", "sum", "avg", "min", "max", "coalesce", "nullif", "date_trunc", "extract",
-        "upper", "lower", "substring", "round", "floor", "ceil", "greatest", "least",
-        "case", "when", "then", "else", "end", "cast", "distinct", "concat", "length",
-        "trim", "ltrim", "rtrim", "replace", "position", "char_length", "octet_length",
-        "abs", "sign", "mod", "power", "sqrt", "exp", "ln", "log", "sin", "cos", "tan",
-        "asin", "acos", "atan", "atan2", "degrees", "radians", "pi", "random",
-        "current_date", "current_time", "current_timestamp", "now", "localtime",
-        "localtimestamp", "timezone", "age", "interval", "to_char", "to_date", "to_number",
-        # Window functions for analytics
-        "lag", "lead", "row_number", "rank", "dense_rank", "ntile", "first_value", 
-        "last_value", "nth_value", "percent_rank", "cume_dist", "over", "partition",
-        "order", "rows", "range", "unbounded", "preceding", "following", "current"
-    }
-    # SQL keywords that are not functions but might be caught by the regex
-    _SQL_KEYWORDS = {
-        "select", "with", "as", "from", "where", "group", "order", "having", "limit", "offset",
-        "join", "inner", "left", "right", "outer", "on", "union", "intersect", "except",
-        "all", "distinct", "and", "or", "not", "in", "exists", "between", "like", "ilike",
-        "is", "null", "true", "false", "asc", "desc", "nulls", "first", "last", "filter"
-    }
-    import re as _re
-    for m in _re.finditer(r"\b([a-z_][a-z0-9_]*)\s*\(", sql_l):
-        fname = m.group(1)
-        if fname not in _ALLOWED_FUNCS and fname not in _SQL_KEYWORDS:
-            raise ValueError(f"function not allowed: {fname}")
-
-    # Block access to pg_catalog or information_schema explicitly
-    if "pg_catalog" in sql_l or "information_schema" in sql_l:
-        raise ValueError("system catalogs are not allowed")
+    check_sql(sql, EXECUTOR_POLICY)
 
 
 def _get_engine():
@@ -417,14 +511,20 @@ def _get_engine():
     return get_engine()
 
 
-def _explain_json(conn: Any, sql: str, params: Mapping[str, Any]) -> Any | None:
+def _explain_analyze() -> bool:
+    return os.getenv("APP_EXPLAIN_ANALYZE", "false").strip().lower() in {"1", "true", "yes"}
+
+
+def _explain_json(conn: Any, sql: str, params: Mapping[str, Any], *, analyze: bool | None = None) -> Any | None:
     """Return EXPLAIN output as JSON (no ANALYZE by default).
 
     Uses `EXPLAIN (FORMAT JSON)`. To enable ANALYZE, set env var
-    `APP_EXPLAIN_ANALYZE=true` (runs the query inside EXPLAIN).
+    `APP_EXPLAIN_ANALYZE=true` (runs the query inside EXPLAIN); `analyze=False`
+    forces a plan-only EXPLAIN (admission pre-flight).
     """
 
-    analyze = os.getenv("APP_EXPLAIN_ANALYZE", "false").strip().lower() in {"1", "true", "yes"}
+    if analyze is None:
+        analyze = _explain_analyze()
     clause = "EXPLAIN (FORMAT JSON) " if not analyze else "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) "
     try:
         res = conn.execute(sa.text(clause + sql), params)
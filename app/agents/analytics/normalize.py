@@ -13,6 +13,12 @@ Convert the raw rows produced by the analytics executor into a user-facing
 Design
 ------
 - Pure Python (no third‑party deps), type‑annotated and lint‑friendly.
+- Common shapes (scalar, ranking, state distribution, time series) are
+  rendered by deterministic templates (`app.agents.analytics.templates`)
+  before the LLM is considered.
+- Insight detectors share one `DatasetProfile` per row list
+  (`app.agents.analytics.profile`, NumPy-backed when available) instead of
+  re-scanning the rows per detector.
 - Shape inference by inspecting output columns (e.g., `period`, `qty`).
 - Conservative formatting: locale‑like number formatting for PT‑BR and
   ISO‑like dates for data payload stability.
@@ -42,12 +48,19 @@ from __future__ import annotations
 
 import re
 import json
+import time
 from collections.abc import Mapping
 from dataclasses import dataclass
 from datetime import date, datetime
 from typing import Any, Final, cast
 from pathlib import Path
 
+from app.agents.analytics.compaction import CompactedRows, compact_rows
+from app.agents.analytics.profile import DatasetProfile, profile_rows
+from app.agents.analytics.templates import render_template
+from app.infra.deadline import allow_optional
+from app.infra.rate_limit import estimate_tokens
+
 try:  # Optional logger
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -86,8 +99,26 @@ try:
 except Exception:  # pragma: no cover - optional
     ANSWER_CLS = None
 
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+    def _observe_hist(_name: str, value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
 __all__ = ["AnalyticsNormalizer"]
 
+# Prompt budget for result rows when settings are unavailable
+_DEFAULT_ROW_TOKEN_BUDGET: Final[int] = 6000
+_DEFAULT_TAIL_ROWS: Final[int] = 5
+# Template fast path: largest ranking rendered locally, LLM latency prior (ms)
+_DEFAULT_TEMPLATE_MAX_ROWS: Final[int] = 30
+_DEFAULT_LLM_MS: Final[float] = 2500.0
+_LLM_MS_EWMA_ALPHA: Final[float] = 0.2
+
 
 # ---------------------------------------------------------------------------
 # Public API
@@ -113,6 +144,22 @@ class AnalyticsNormalizer:
         self.log = get_logger("agent.analytics.normalize")
         self._system_prompt = self._load_system_prompt()
         self._examples = self._load_examples()
+        # Template fast-path counters; llm_ms_avg starts from a prior and
+        # follows observed LLM latency (EWMA)
+        self._fast_path: dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "saved_ms": 0.0,
+            "llm_ms_avg": _DEFAULT_LLM_MS,
+        }
+        # Concurrent cache misses for the same question/SQL share one LLM call
+        self._flight: Any = None
+        try:
+            from app.infra.cache import SingleFlight
+
+            self._flight = SingleFlight("analytics_normalizer")
+        except Exception:
+            self._flight = None
     
 
     def _load_system_prompt(self) -> str:
@@ -179,7 +226,14 @@ class AnalyticsNormalizer:
         result_view = _as_result(result)
         user_query = question or "Consulta de dados"
         
-        # Always try LLM first for human-like responses
+        # Common result shapes are rendered locally; only the rest needs the LLM
+        fast = self._render_fast_path(user_query, plan_view, result_view)
+        if fast is not None:
+            return _coerce_answer(fast)
+        
+        # Try the LLM first for human-like responses unless the request budget is short
+        if not allow_optional("normalizer_llm"):
+            return self._fallback_normalize(user_query, plan_view, result_view)
         try:
             llm_result = self._normalize_with_llm(user_query, plan_view, result_view)
             if llm_result:
@@ -193,6 +247,81 @@ class AnalyticsNormalizer:
             return self._fallback_normalize(user_query, plan_view, result_view)
     
     
+    def _render_fast_path(
+        self, user_query: str, plan: _PlanView, result: _ResultView
+    ) -> dict[str, Any] | None:
+        """Render common result shapes with deterministic templates.
+        
+        Hits skip the LLM call; the estimated latency saved is the running
+        average of normalizer LLM calls minus the render time. Hit ratio and
+        savings are exported as metrics and via `fast_path_stats()`.
+        
+        Returns:
+            Answer payload for a recognized shape, or None to use the LLM.
+        """
+        config = get_settings()
+        cfg = getattr(getattr(config, "analytics", None), "normalizer", None)
+        if cfg is not None and not getattr(cfg, "template_fast_path", True):
+            return None
+        max_rows = int(getattr(cfg, "template_max_rows", _DEFAULT_TEMPLATE_MAX_ROWS))
+        
+        t0 = time.perf_counter()
+        try:
+            rendered = render_template(
+                user_query,
+                result.rows,
+                sql=plan.sql,
+                limit_applied=result.limit_applied,
+                max_rows=max_rows,
+            )
+        except Exception as exc:  # a template bug must never fail the answer
+            self.log.warning(f"Template rendering failed: {exc}")
+            rendered = None
+        render_ms = (time.perf_counter() - t0) * 1000.0
+        
+        stats = self._fast_path
+        if rendered is None:
+            stats["misses"] += 1
+            _inc_counter("normalizer_fast_path_total", {"outcome": "miss", "shape": "none"})
+            return None
+        saved_ms = max(0.0, stats["llm_ms_avg"] - render_ms)
+        stats["hits"] += 1
+        stats["saved_ms"] += saved_ms
+        _inc_counter("normalizer_fast_path_total", {"outcome": "hit", "shape": rendered.shape})
+        _observe_hist("normalizer_fast_path_saved_ms", saved_ms, {"shape": rendered.shape})
+        self.log.info(
+            "Analytics answer rendered by template",
+            extra={"shape": rendered.shape, "render_ms": round(render_ms, 3), "saved_ms": round(saved_ms, 1)},
+        )
+        return {
+            "text": rendered.text,
+            "meta": {
+                "sql": plan.sql,
+                "row_count": result.row_count,
+                "limit_applied": result.limit_applied,
+                "exec_ms": result.exec_ms,
+                "renderer": "template",
+                "template_shape": rendered.shape,
+            },
+        }
+    
+    def fast_path_stats(self) -> dict[str, float]:
+        """Template fast-path counters for this normalizer instance.
+        
+        Returns:
+            Mapping with `hits`, `misses`, `hit_ratio`, `saved_ms` (estimated
+            total) and `llm_ms_avg` (running LLM latency estimate).
+        """
+        stats = self._fast_path
+        total = stats["hits"] + stats["misses"]
+        return {
+            "hits": stats["hits"],
+            "misses": stats["misses"],
+            "hit_ratio": round(stats["hits"] / total, 4) if total else 0.0,
+            "saved_ms": round(stats["saved_ms"], 1),
+            "llm_ms_avg": round(stats["llm_ms_avg"], 1),
+        }
+    
     def _fallback_system_prompt(self) -> str:
         """Fallback system prompt if file loading fails."""
         return """You are an Analytics Result Normalizer. Transform raw SQL results into business-friendly responses in Brazilian Portuguese and return JSON only.
@@ -247,9 +376,24 @@ Rules:
             if cached is not None:
                 self.log.debug("Using cached analytics response")
                 return cached
+
+            flight = self._flight
+            key = cache.key_for(user_query, "analytics", cache_key_context)
         except Exception:
-            pass
-        
+            flight = None
+
+        if flight is not None:
+            shared = flight.do(key, lambda: self._normalize_uncached(user_query, plan, result))
+            return dict(shared) if isinstance(shared, dict) else shared
+        return self._normalize_uncached(user_query, plan, result)
+
+    def _normalize_uncached(
+        self,
+        user_query: str,
+        plan: _PlanView,
+        result: _ResultView,
+    ) -> dict[str, Any] | None:
+        """Call the LLM normalizer and cache the parsed response."""
         # Use centralized LLM client (with retries/timeouts handled there)
         try:
             from app.infra.llm_client import get_llm_client
@@ -269,56 +413,25 @@ Rules:
             max_tokens = 800
             temperature = 0.1
             max_examples = 1
+            row_token_budget = _DEFAULT_ROW_TOKEN_BUDGET
+            tail_rows = _DEFAULT_TAIL_ROWS
         else:
             # Honor model tier switches
             model = config.models.analytics_normalizer.name
             max_tokens = config.models.analytics_normalizer.max_tokens
             temperature = config.models.analytics_normalizer.temperature
             max_examples = config.analytics.normalizer.max_examples_in_prompt
+            row_token_budget = int(
+                getattr(config.analytics.normalizer, "prompt_rows_token_budget", _DEFAULT_ROW_TOKEN_BUDGET)
+            )
+            tail_rows = int(getattr(config.analytics.normalizer, "prompt_tail_rows", _DEFAULT_TAIL_ROWS))
             if getattr(config.models, "enable_normalizer_llm", True) is False:
                 return None
         
-        # Prepare compact input for LLM (convert non-serializable types)
-        def convert_for_json(obj):
-            from decimal import Decimal
-            from datetime import datetime, date, timedelta
-            if isinstance(obj, dict):
-                return {k: convert_for_json(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_for_json(item) for item in obj]
-            elif isinstance(obj, Decimal):
-                return float(obj)
-            elif isinstance(obj, (datetime, date)):
-                return obj.isoformat()
-            elif isinstance(obj, timedelta):
-                return str(obj)  # Convert to string representation
-            else:
-                return obj
-        
-        # Check if we should show complete data - if so, pass all rows to LLM for natural formatting
-        should_show_complete = self._should_show_complete_data(user_query, result)
-        
-        # For queries that need complete data, pass all rows to LLM for natural formatting
-        # Otherwise, use a sample for efficiency
-        if should_show_complete and result.rows:
-            # Pass all rows to LLM - it will format them naturally
-            rows_for_llm = convert_for_json(result.rows)
-            has_more_data = False
-        else:
-            # Use sample for efficiency when complete data not needed
-            sample_size = min(50, len(result.rows)) if result.rows else 0
-            rows_for_llm = convert_for_json(result.rows[:sample_size]) if result.rows else []
-            has_more_data = len(result.rows) > sample_size if result.rows else False
-        
-        input_data = {
-            "user_query": user_query,
-            "sql": plan.sql,
-            "rows": rows_for_llm,
-            "row_count": result.row_count,
-            "limit_applied": result.limit_applied,
-            "has_more_data": has_more_data,
-            "show_complete_data": should_show_complete  # Hint for LLM
-        }
+        # Prepare compact input for LLM (rows fitted into the prompt token budget)
+        input_data, packed = self._build_llm_input(
+            user_query, plan, result, token_budget=row_token_budget, tail_rows=tail_rows
+        )
         
         # Build compact messages
         messages = [
@@ -344,7 +457,21 @@ Rules:
             "content": json.dumps(input_data, ensure_ascii=False)
         })
         
+        mode = "compacted" if packed.compacted else "full"
+        _observe_hist("normalizer_prompt_tokens", float(estimate_tokens(messages)), {"mode": mode})
+        if packed.compacted:
+            self.log.info(
+                "Normalizer prompt rows compacted",
+                extra={
+                    "rows_sent": len(packed.rows),
+                    "rows_omitted": packed.omitted,
+                    "row_tokens": packed.tokens,
+                    "row_tokens_full": packed.full_tokens,
+                },
+            )
+        
         # Call LLM with configured parameters
+        t0 = time.perf_counter()
         try:
             resp = client.chat_completion(
                 messages=messages,
@@ -359,6 +486,9 @@ Rules:
         except Exception as e:
             self.log.warning(f"LLM API call failed: {e}")
             return None
+        llm_ms = (time.perf_counter() - t0) * 1000.0
+        _observe_hist("normalizer_llm_ms", llm_ms, {"mode": mode})
+        self._fast_path["llm_ms_avg"] += _LLM_MS_EWMA_ALPHA * (llm_ms - self._fast_path["llm_ms_avg"])
         
         # Parse response
         # Prefer centralized JSON extraction helper
@@ -397,6 +527,52 @@ Rules:
         
         return response_data
     
+    def _build_llm_input(
+        self,
+        user_query: str,
+        plan: _PlanView,
+        result: _ResultView,
+        *,
+        token_budget: int,
+        tail_rows: int,
+    ) -> tuple[dict[str, Any], CompactedRows]:
+        """Build the normalizer LLM input payload.
+        
+        Complete-data answers send every row that fits `token_budget`; beyond
+        it the payload carries head/tail rows plus `rows_digest` (statistics
+        of all rows) and `rows_omitted`. Other answers send a 50-row sample.
+        
+        Returns:
+            The input payload and the compaction outcome for its rows.
+        """
+        # Check if we should show complete data - if so, pass all rows to LLM for natural formatting
+        should_show_complete = self._should_show_complete_data(user_query, result)
+        
+        # For queries that need complete data, pass all rows to LLM for natural formatting
+        # Otherwise, use a sample for efficiency
+        if should_show_complete and result.rows:
+            packed = compact_rows(result.rows, token_budget=token_budget, tail_rows=tail_rows)
+            has_more_data = packed.compacted
+        else:
+            # Use sample for efficiency when complete data not needed
+            sample_size = min(50, len(result.rows)) if result.rows else 0
+            packed = compact_rows(result.rows[:sample_size], token_budget=0)
+            has_more_data = len(result.rows) > sample_size if result.rows else False
+        
+        input_data = {
+            "user_query": user_query,
+            "sql": plan.sql,
+            "rows": packed.rows,
+            "row_count": result.row_count,
+            "limit_applied": result.limit_applied,
+            "has_more_data": has_more_data,
+            "show_complete_data": should_show_complete  # Hint for LLM
+        }
+        if packed.compacted:
+            input_data["rows_digest"] = packed.digest
+            input_data["rows_omitted"] = packed.omitted
+        return input_data, packed
+    
     def _format_all_data(self, rows: list[Mapping[str, Any]], user_query: str) -> str:
         """Format all data for large datasets with intelligent summarization."""
         if not rows:
@@ -441,11 +617,12 @@ Rules:
         if not rows:
             return ""
         
-        # Get top performers and key insights
-        insights = self._get_key_insights(rows)
+        # Get top performers and key insights (one profile for all detectors)
+        profile = profile_rows(rows)
+        insights = self._get_key_insights(rows, profile)
         
         # Detect patterns and add intelligent insights
-        pattern_insights = self._detect_patterns_and_insights(rows, user_query)
+        pattern_insights = self._detect_patterns_and_insights(rows, user_query, profile)
         
         # Show sample of data (top 25 items for better coverage)
         sample_size = min(25, len(rows))
@@ -763,48 +940,34 @@ Rules:
         
         return "\n".join(text_parts)
     
-    def _get_key_insights(self, rows: list[Mapping[str, Any]]) -> str:
+    def _get_key_insights(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Extract key insights from medium datasets."""
         if not rows:
             return ""
         
-        # Find the main metric column
-        main_metric = None
-        main_values = []
-        
-        if rows:
-            first_row = rows[0]
-            for k, v in first_row.items():
-                if isinstance(v, (int, float)) and v > 0:
-                    main_metric = k
-                    break
-        
-        if main_metric:
-            main_values = [row.get(main_metric, 0) for row in rows if isinstance(row.get(main_metric), (int, float))]
-        
-        if not main_values:
+        profile = profile or profile_rows(rows)
+        col = profile.column(profile.positive_metric)
+        if col is None or col.count == 0:
             return f"\n\nAnálise de {len(rows)} registros"
         
-        # Calculate key statistics
-        total = sum(main_values)
-        avg = total / len(main_values)
-        max_val = max(main_values)
-        min_val = min(main_values)
-        
         text_parts = [f"\n\nPrincipais insights ({len(rows)} registros):"]
-        text_parts.append(f"  Total: {total:,.0f}")
-        text_parts.append(f"  Média: {avg:,.2f}")
-        text_parts.append(f"  Máximo: {max_val:,.0f}")
-        text_parts.append(f"  Mínimo: {min_val:,.0f}")
+        text_parts.append(f"  Total: {col.total:,.0f}")
+        text_parts.append(f"  Média: {col.mean:,.2f}")
+        text_parts.append(f"  Máximo: {col.maximum:,.0f}")
+        text_parts.append(f"  Mínimo: {col.minimum:,.0f}")
         
         return "\n".join(text_parts)
     
-    def _detect_patterns_and_insights(self, rows: list[Mapping[str, Any]], user_query: str) -> str:
+    def _detect_patterns_and_insights(
+        self, rows: list[Mapping[str, Any]], user_query: str, profile: DatasetProfile | None = None
+    ) -> str:
         """Detect patterns and provide intelligent insights.
         
         Args:
             rows: List of data rows to analyze for patterns.
             user_query: Original user query for context.
+            profile: Precomputed profile of `rows` (built once here otherwise
+                and shared by every detector).
             
         Returns:
             String containing detected insights with emojis and formatting,
@@ -813,39 +976,40 @@ Rules:
         if not rows:
             return ""
         
+        profile = profile or profile_rows(rows)
         insights = []
         
         # Pattern 1: 1:1 ratio detection (clientes = compras)
-        if self._detect_one_to_one_ratio(rows):
+        if self._detect_one_to_one_ratio(rows, profile):
             insights.append("Insight: Cada cliente fez exatamente uma compra (relação 1:1 entre clientes e compras)")
         
         # Pattern 2: Dominance detection (one state/category dominates)
-        dominance_insight = self._detect_dominance_pattern(rows)
+        dominance_insight = self._detect_dominance_pattern(rows, profile)
         if dominance_insight:
             insights.append(f"Insight: {dominance_insight}")
         
         # Pattern 3: Geographic concentration
-        geo_insight = self._detect_geographic_concentration(rows)
+        geo_insight = self._detect_geographic_concentration(rows, profile)
         if geo_insight:
             insights.append(f"Insight: {geo_insight}")
         
         # Pattern 4: Temporal patterns
-        temporal_insight = self._detect_temporal_patterns(rows)
+        temporal_insight = self._detect_temporal_patterns(rows, profile)
         if temporal_insight:
             insights.append(f"Insight: {temporal_insight}")
         
         # Pattern 5: Category concentration
-        category_insight = self._detect_category_concentration(rows)
+        category_insight = self._detect_category_concentration(rows, profile)
         if category_insight:
             insights.append(f"Insight: {category_insight}")
 
         # Pattern 6: Anomaly detection
-        anomaly_insight = self._detect_anomalies(rows)
+        anomaly_insight = self._detect_anomalies(rows, profile)
         if anomaly_insight:
             insights.append(f"Insight: {anomaly_insight}")
 
         # Pattern 7: Statistical patterns
-        statistical_insight = self._detect_statistical_patterns(rows)
+        statistical_insight = self._detect_statistical_patterns(rows, profile)
         if statistical_insight:
             insights.append(f"Insight: {statistical_insight}")
 
@@ -854,7 +1018,7 @@ Rules:
 
         return ""
     
-    def _detect_one_to_one_ratio(self, rows: list[Mapping[str, Any]]) -> bool:
+    def _detect_one_to_one_ratio(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> bool:
         """Detect if there's a 1:1 ratio between two metrics.
         
         Analyzes numeric columns in the dataset to identify if any two columns
@@ -862,6 +1026,7 @@ Rules:
         
         Args:
             rows: List of data rows to analyze for 1:1 ratio patterns.
+            profile: Shared profile of `rows` (built when omitted).
             
         Returns:
             True if a 1:1 ratio is detected between any two numeric columns,
@@ -870,31 +1035,10 @@ Rules:
         if len(rows) < 2:
             return False
         
-        # Look for two numeric columns that might be in 1:1 ratio
-        numeric_columns = []
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k not in ['period', 'month', 'year']:
-                numeric_columns.append(k)
-        
-        if len(numeric_columns) < 2:
-            return False
-        
-        # Check if any two columns have 1:1 ratio
-        for i, col1 in enumerate(numeric_columns):
-            for col2 in numeric_columns[i+1:]:
-                ratios = []
-                for row in rows:
-                    val1 = row.get(col1, 0)
-                    val2 = row.get(col2, 0)
-                    if val1 > 0 and val2 > 0:
-                        ratios.append(val1 / val2)
-                
-                if ratios and all(abs(r - 1.0) < 0.01 for r in ratios):  # Within 1% tolerance
-                    return True
-        
-        return False
+        profile = profile or profile_rows(rows)
+        return profile.has_one_to_one(tolerance=0.01)  # Within 1% tolerance
     
-    def _detect_dominance_pattern(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_dominance_pattern(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect if one item dominates the dataset.
         
         Analyzes the dataset to identify if any single item (state, category, etc.)
@@ -902,6 +1046,7 @@ Rules:
         
         Args:
             rows: List of data rows to analyze for dominance patterns.
+            profile: Shared profile of `rows` (built when omitted).
             
         Returns:
             String describing the dominant item and its percentage,
@@ -910,40 +1055,23 @@ Rules:
         if len(rows) < 3:
             return ""
         
-        # Find the main metric column
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k not in ['period', 'month', 'year']:
-                main_metric = k
-                break
-        
-        if not main_metric:
-            return ""
-        
-        # Calculate total and find dominance
-        total = sum(row.get(main_metric, 0) for row in rows)
-        if total == 0:
+        profile = profile or profile_rows(rows)
+        col = profile.column(profile.metric)
+        if col is None or col.total == 0:
             return ""
         
-        # Find the top item
-        top_item = max(rows, key=lambda x: x.get(main_metric, 0))
-        top_value = top_item.get(main_metric, 0)
-        top_percentage = (top_value / total) * 100
-        
-        # Get the key identifier (state, category, etc.)
-        identifier_col = None
-        for k, v in top_item.items():
-            if k != main_metric and not isinstance(v, (int, float)):
-                identifier_col = k
-                break
+        # Top item and the key identifier (state, category, etc.)
+        top_idx = col.top[0]
+        identifier_col = profile.identifier_column(top_idx, exclude=col.name)
+        top_percentage = col.top_share
         
         if identifier_col and top_percentage > 40:  # Dominance threshold
-            identifier = top_item.get(identifier_col, 'Unknown')
+            identifier = rows[top_idx].get(identifier_col, 'Unknown')
             return f"{identifier} domina com {top_percentage:.1f}% do total"
         
         return ""
     
-    def _detect_geographic_concentration(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_geographic_concentration(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect geographic concentration patterns.
         
         Analyzes the dataset to identify if there's high geographic concentration
@@ -951,6 +1079,7 @@ Rules:
         
         Args:
             rows: List of data rows to analyze for geographic concentration.
+            profile: Shared profile of `rows` (built when omitted).
             
         Returns:
             String describing the geographic concentration pattern,
@@ -959,43 +1088,22 @@ Rules:
         if len(rows) < 3:
             return ""
         
-        # Look for state column
-        state_col = None
-        for k, v in rows[0].items():
-            if 'state' in k.lower() and not isinstance(v, (int, float)):
-                state_col = k
-                break
-        
-        if not state_col:
-            return ""
-        
-        # Find the main metric
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k not in ['period', 'month', 'year']:
-                main_metric = k
-                break
-        
-        if not main_metric:
-            return ""
-        
-        # Calculate concentration in top 3 states
-        total = sum(row.get(main_metric, 0) for row in rows)
-        if total == 0:
+        profile = profile or profile_rows(rows)
+        state_col = profile.state_column
+        col = profile.column(profile.metric)
+        if not state_col or col is None or col.total == 0:
             return ""
         
-        # Sort by metric value
-        sorted_rows = sorted(rows, key=lambda x: x.get(main_metric, 0), reverse=True)
-        top3_total = sum(row.get(main_metric, 0) for row in sorted_rows[:3])
-        top3_percentage = (top3_total / total) * 100
+        # Concentration in top 3 states
+        top3_percentage = col.top_k_share(3)
         
         if top3_percentage > 70:  # High concentration threshold
-            top3_states = [row.get(state_col, 'Unknown') for row in sorted_rows[:3]]
+            top3_states = [rows[i].get(state_col, 'Unknown') for i in col.top[:3]]
             return f"Alta concentração geográfica: {', '.join(top3_states)} representam {top3_percentage:.1f}% do total"
         
         return ""
     
-    def _detect_temporal_patterns(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_temporal_patterns(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect temporal patterns in the data.
         
         Analyzes the dataset to identify temporal trends such as growth or decline
@@ -1003,6 +1111,7 @@ Rules:
         
         Args:
             rows: List of data rows to analyze for temporal patterns.
+            profile: Shared profile of `rows` (built when omitted).
             
         Returns:
             String describing the temporal trend detected,
@@ -1011,43 +1120,20 @@ Rules:
         if len(rows) < 3:
             return ""
         
-        # Look for temporal columns
-        temporal_col = None
-        for k, v in rows[0].items():
-            if any(temporal in k.lower() for temporal in ['period', 'month', 'year', 'date']):
-                temporal_col = k
-                break
-        
-        if not temporal_col:
-            return ""
-        
-        # Find the main metric
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k != temporal_col:
-                main_metric = k
-                break
-        
-        if not main_metric:
+        profile = profile or profile_rows(rows)
+        temporal = profile.temporal
+        if temporal is None:
             return ""
         
-        # Check for growth/decline pattern
-        sorted_rows = sorted(rows, key=lambda x: str(x.get(temporal_col, '')))
-        values = [row.get(main_metric, 0) for row in sorted_rows]
-        
-        if len(values) >= 3:
-            # Simple trend detection
-            first_half = sum(values[:len(values)//2])
-            second_half = sum(values[len(values)//2:])
-            
-            if second_half > first_half * 1.2:  # 20% growth
-                return "Tendência de crescimento ao longo do período analisado"
-            elif first_half > second_half * 1.2:  # 20% decline
-                return "Tendência de declínio ao longo do período analisado"
+        # Simple trend detection over the period-ordered halves
+        if temporal.second_half > temporal.first_half * 1.2:  # 20% growth
+            return "Tendência de crescimento ao longo do período analisado"
+        elif temporal.first_half > temporal.second_half * 1.2:  # 20% decline
+            return "Tendência de declínio ao longo do período analisado"
         
         return ""
     
-    def _detect_category_concentration(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_category_concentration(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect category concentration patterns.
         
         Analyzes the dataset to identify if there's high concentration in a single
@@ -1055,6 +1141,7 @@ Rules:
         
         Args:
             rows: List of data rows to analyze for category concentration.
+            profile: Shared profile of `rows` (built when omitted).
             
         Returns:
             String describing the category concentration pattern,
@@ -1063,42 +1150,24 @@ Rules:
         if len(rows) < 3:
             return ""
         
-        # Look for category column
-        category_col = None
-        for k, v in rows[0].items():
-            if 'category' in k.lower() and not isinstance(v, (int, float)):
-                category_col = k
-                break
-        
+        profile = profile or profile_rows(rows)
+        category_col = profile.category_column
         if not category_col:
             return ""
         
-        # Find the main metric
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k != category_col:
-                main_metric = k
-                break
-        
-        if not main_metric:
-            return ""
-        
-        # Calculate concentration in top category
-        total = sum(row.get(main_metric, 0) for row in rows)
-        if total == 0:
+        col = profile.column(profile.first_numeric(exclude=category_col))
+        if col is None or col.total == 0:
             return ""
         
-        top_category = max(rows, key=lambda x: x.get(main_metric, 0))
-        top_value = top_category.get(main_metric, 0)
-        top_percentage = (top_value / total) * 100
+        top_percentage = col.top_share
         
         if top_percentage > 50:  # High category concentration
-            category_name = top_category.get(category_col, 'Unknown')
+            category_name = rows[col.top[0]].get(category_col, 'Unknown')
             return f"Alta concentração em {category_name} ({top_percentage:.1f}% do total)"
 
         return ""
 
-    def _detect_anomalies(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_anomalies(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect statistical anomalies and outliers in the dataset.
 
         Uses interquartile range (IQR) method to identify outliers that are
@@ -1106,6 +1175,7 @@ Rules:
 
         Args:
             rows: List of data rows to analyze for anomalies.
+            profile: Shared profile of `rows` (built when omitted).
 
         Returns:
             String describing detected anomalies, or empty string if none found.
@@ -1113,53 +1183,17 @@ Rules:
         if len(rows) < 5:
             return ""
 
-        # Find the main metric column
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k not in ['period', 'month', 'year']:
-                main_metric = k
-                break
-
-        if not main_metric:
-            return ""
-
-        # Extract values
-        values = [row.get(main_metric, 0) for row in rows if isinstance(row.get(main_metric), (int, float))]
-        if len(values) < 5:
-            return ""
-
-        # Calculate quartiles
-        sorted_values = sorted(values)
-        q1_idx = len(sorted_values) // 4
-        q3_idx = (3 * len(sorted_values)) // 4
-        q1 = sorted_values[q1_idx]
-        q3 = sorted_values[q3_idx]
-        iqr = q3 - q1
-
-        if iqr == 0:
-            return ""
-
-        # Detect outliers (values beyond 1.5 * IQR from quartiles)
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-
-        outliers = [v for v in values if v < lower_bound or v > upper_bound]
-        if not outliers:
+        profile = profile or profile_rows(rows)
+        col = profile.column(profile.metric)
+        if col is None or col.count < 5:
             return ""
 
-        # Find which items are outliers
+        # Outliers: values beyond 1.5 * IQR from the quartiles
         outlier_items = []
-        for row in rows:
-            val = row.get(main_metric, 0)
-            if val in outliers:
-                # Try to find identifier column
-                identifier = None
-                for k, v in row.items():
-                    if k != main_metric and not isinstance(v, (int, float)):
-                        identifier = v
-                        break
-                if identifier:
-                    outlier_items.append((identifier, val))
+        for idx in col.outliers(1.5):
+            identifier = profile.identifier(idx, exclude=col.name)
+            if identifier:
+                outlier_items.append((identifier, rows[idx].get(col.name, 0)))
 
         if outlier_items:
             outlier_desc = ", ".join([f"{item[0]} ({item[1]:,.0f})" for item in outlier_items[:3]])
@@ -1169,7 +1203,7 @@ Rules:
 
         return ""
 
-    def _detect_statistical_patterns(self, rows: list[Mapping[str, Any]]) -> str:
+    def _detect_statistical_patterns(self, rows: list[Mapping[str, Any]], profile: DatasetProfile | None = None) -> str:
         """Detect statistical patterns in the dataset.
 
         Analyzes variance, distribution shape, and statistical properties
@@ -1177,6 +1211,7 @@ Rules:
 
         Args:
             rows: List of data rows to analyze for statistical patterns.
+            profile: Shared profile of `rows` (built when omitted).
 
         Returns:
             String describing detected statistical patterns, or empty string if none found.
@@ -1184,38 +1219,20 @@ Rules:
         if len(rows) < 5:
             return ""
 
-        # Find the main metric column
-        main_metric = None
-        for k, v in rows[0].items():
-            if isinstance(v, (int, float)) and k not in ['period', 'month', 'year']:
-                main_metric = k
-                break
-
-        if not main_metric:
-            return ""
-
-        # Extract values
-        values = [row.get(main_metric, 0) for row in rows if isinstance(row.get(main_metric), (int, float))]
-        if len(values) < 5:
-            return ""
-
-        # Calculate statistics
-        mean = sum(values) / len(values)
-        variance = sum((v - mean) ** 2 for v in values) / len(values)
-        std_dev = variance ** 0.5
-
-        if mean == 0:
+        profile = profile or profile_rows(rows)
+        col = profile.column(profile.metric)
+        if col is None or col.count < 5 or col.mean == 0:
             return ""
 
         # Coefficient of variation (CV) - measures relative variability
-        cv = (std_dev / mean) * 100 if mean != 0 else 0
+        cv = col.cv
 
         # Detect high variability
         if cv > 50:
             return f"Alta variabilidade nos dados (coeficiente de variação: {cv:.1f}%)"
 
         # Detect low variability (very consistent data)
-        if cv < 10 and len(values) >= 10:
+        if cv < 10 and col.count >= 10:
             return f"Dados muito consistentes (baixa variabilidade: {cv:.1f}%)"
 
         return ""
@@ -0,0 +1,370 @@
+"""
+Plan cache for the analytics planner.
+
+Overview
+  `AnalyticsPlanner.plan` spends one LLM call (plus the alias/window-function
+  fix-ups) on every question, even repeated ones. `PlanCache` keeps validated
+  `PlannerPlan`s keyed by the normalized question and a fingerprint of the
+  allowlist, so repeated questions skip the LLM entirely.
+
+Design
+  - Keys: question text lowercased, whitespace-collapsed and stripped of
+    trailing punctuation, combined with the allowlist fingerprint (sorted
+    tables/columns, as in `RoutingCache`) and the per-call default limit.
+  - Parameterization (optional): years (``2017``) and upper-case state codes
+    (``SP``) in the question are extracted into a template (``pedidos em
+    {year}``). When every extracted literal appears in the plan's SQL (years
+    bare or inside date literals, states as ``'SP'``; year ± 1 boundaries are
+    tracked as offsets) the SQL and reason are stored as a template and a
+    later question with the same shape gets the same plan with its own
+    literals bound. Plans whose literals cannot be mapped unambiguously (a
+    literal missing from the SQL, other year or state literals left over,
+    colliding offsets) are only cached for the exact question.
+  - Bound values are validated literals (4-digit years, known UF codes), so
+    rendering them into the SQL cannot change its structure; the executor,
+    guardrails and EXPLAIN keep seeing plain SQL.
+  - Invalidation: entries are stored with their allowlist fingerprint; the
+    first lookup with a different fingerprint drops every entry built for
+    the previous allowlist. TTL and size bounds as in `app.infra.cache`.
+  - Thread-safe; hits return copies so callers may mutate plans.
+
+Integration
+  - `AnalyticsPlanner.plan` consults the cache before `_plan_with_llm` and
+    stores LLM plans after validation (heuristic fallbacks are not cached).
+  - Settings: `analytics.planner.plan_cache_enabled`, `plan_cache_ttl_seconds`,
+    `plan_cache_max_size`, `plan_cache_parameterize`.
+  - Metrics: `planner_plan_cache_total{outcome}` (`hit`, `template_hit`,
+    `miss`, `invalidated`).
+
+Usage
+  >>> from app.agents.analytics.plan_cache import PlanCache
+  >>> from app.agents.analytics.planner import PlannerPlan
+  >>> cache = PlanCache()
+  >>> allow = {"orders": ["order_id", "order_purchase_timestamp"]}
+  >>> sql = ("SELECT COUNT(1) AS qty FROM analytics.orders WHERE order_purchase_timestamp >= '2017-01-01' "
+  ...        "AND order_purchase_timestamp < '2018-01-01'")
+  >>> cache.put("Pedidos em 2017?", allow, PlannerPlan(sql, {}, "orders in 2017", False, []))
+  >>> hit = cache.get("pedidos em 2018", allow)
+  >>> "'2018-01-01'" in hit.sql and "'2019-01-01'" in hit.sql, hit.reason
+  (True, 'orders in 2018')
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+import unicodedata
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from threading import Lock
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from app.agents.analytics.planner import PlannerPlan
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+
+__all__ = ["PlanCache", "QuestionTemplate", "allowlist_fingerprint", "parameterize_question"]
+
+_UF_CODES = frozenset(
+    "AC AL AM AP BA CE DF ES GO MA MG MS MT PA PB PE PI PR RJ RN RO RR RS SC SE SP TO".split()
+)
+_YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+_UF_RE = re.compile(r"\b(" + "|".join(sorted(_UF_CODES)) + r")\b")
+_SQL_UF_RE = re.compile(r"'(" + "|".join(sorted(_UF_CODES)) + r")'")
+_SLOT_RE = re.compile(r"\{(year|state)(\d+)([+-]1)?\}")
+_TRAILING_PUNCT = "?!.;: "
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionTemplate:
+    """A normalized question with its literals pulled out.
+
+    Attributes
+    ----------
+    text: Normalized question with ``{year0}``/``{state0}`` slots.
+    years: Extracted years, in order of appearance.
+    states: Extracted state codes (upper-case), in order of appearance.
+    """
+
+    text: str
+    years: tuple[int, ...]
+    states: tuple[str, ...]
+
+    @property
+    def has_literals(self) -> bool:
+        return bool(self.years or self.states)
+
+
+def _normalize_text(text: str) -> str:
+    text = unicodedata.normalize("NFKC", text or "")
+    return " ".join(text.split()).strip(_TRAILING_PUNCT)
+
+
+def parameterize_question(question: str) -> QuestionTemplate:
+    """Extract year and state literals from `question`.
+
+    State codes only count when written in upper case (``SP``), since several
+    UF codes are also Portuguese words (``se``, ``to``, ``es``).
+
+    >>> parameterize_question("Pedidos em SP em 2017?")
+    QuestionTemplate(text='pedidos em {state0} em {year0}', years=(2017,), states=('SP',))
+    """
+    text = _normalize_text(question)
+    years: list[int] = []
+    states: list[str] = []
+
+    def _year(m: re.Match[str]) -> str:
+        years.append(int(m.group(0)))
+        return f"{{year{len(years) - 1}}}"
+
+    def _state(m: re.Match[str]) -> str:
+        states.append(m.group(1))
+        return f"{{state{len(states) - 1}}}"
+
+    text = _UF_RE.sub(_state, _YEAR_RE.sub(_year, text))
+    return QuestionTemplate(text.lower(), tuple(years), tuple(states))
+
+
+def allowlist_fingerprint(allowlist: Mapping[str, Iterable[str]] | None) -> str:
+    """Deterministic hash of an allowlist (table order and duplicates ignored)."""
+    normalized: dict[str, list[str]] = {}
+    for table, cols in (allowlist or {}).items():
+        key = str(table).strip()
+        if key:
+            normalized[key] = sorted({str(c).strip() for c in cols if str(c).strip()})
+    payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def _templatize(text: str, tpl: QuestionTemplate, *, quoted: bool = True) -> str | None:
+    """Replace the question's literals in `text` with slots; None if ambiguous.
+
+    States are matched as SQL string literals (``'SP'``) unless `quoted` is
+    False (plan reasons).
+    """
+    if len(set(tpl.years)) != len(tpl.years) or len(set(tpl.states)) != len(tpl.states):
+        return None  # repeated literals cannot be told apart
+    # Exact years take precedence over another year's ±1 boundary; a value
+    # that is the boundary of two different years is ambiguous (None slot).
+    year_slots: dict[int, str | None] = {y: f"{{year{i}}}" for i, y in enumerate(tpl.years)}
+    for i, y in enumerate(tpl.years):
+        for offset, suffix in ((1, "+1"), (-1, "-1")):
+            value = y + offset
+            if value in tpl.years:
+                continue
+            year_slots[value] = None if value in year_slots else f"{{year{i}{suffix}}}"
+    state_slots = {s: f"{{state{i}}}" for i, s in enumerate(tpl.states)}
+    ambiguous = False
+
+    def _year(m: re.Match[str]) -> str:
+        nonlocal ambiguous
+        value = int(m.group(0))
+        if value not in year_slots:
+            return m.group(0)
+        slot = year_slots[value]
+        if slot is None:
+            ambiguous = True
+            return m.group(0)
+        return slot
+
+    def _state(m: re.Match[str]) -> str:
+        slot = state_slots.get(m.group(1))
+        if slot is None:
+            return m.group(0)
+        return f"'{slot}'" if quoted else slot
+
+    state_re = _SQL_UF_RE if quoted else _UF_RE
+    out = state_re.sub(_state, _YEAR_RE.sub(_year, text))
+    if ambiguous or _YEAR_RE.search(out) or state_re.search(out):
+        return None  # leftover literals would not follow the new bindings
+    return out
+
+
+def _render(template: str, tpl: QuestionTemplate) -> str:
+    def _slot(m: re.Match[str]) -> str:
+        idx = int(m.group(2))
+        if m.group(1) == "state":
+            return tpl.states[idx]
+        return str(tpl.years[idx] + int(m.group(3) or 0))
+
+    return _SLOT_RE.sub(_slot, template)
+
+
+@dataclass(slots=True)
+class _Entry:
+    sql: str
+    reason: str
+    params: dict[str, Any]
+    limit_applied: bool
+    warnings: list[str]
+    parameterized: bool
+    fingerprint: str
+    stored_at: float
+
+
+class PlanCache:
+    """TTL/size-bounded cache of validated planner plans.
+
+    Parameters
+    ----------
+    ttl_seconds:
+        Time-to-live of an entry. Defaults to 3600 (1 hour).
+    max_size:
+        Maximum number of entries; the oldest entry is evicted when full.
+    parameterize:
+        Share plans across questions that differ only in years/state codes.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_size: int = 500, *, parameterize: bool = True) -> None:
+        self.ttl = float(ttl_seconds)
+        self.max_size = max(int(max_size), 1)
+        self.parameterize = bool(parameterize)
+        self._entries: dict[str, _Entry] = {}
+        self._fingerprint: str | None = None
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    # Keys ---------------------------------------------------------------
+    @staticmethod
+    def _key(kind: str, text: str, fingerprint: str, default_limit: int | None) -> str:
+        raw = f"{kind}:{text}:{fingerprint}:{default_limit or ''}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+    def _check_fingerprint(self, fingerprint: str) -> None:
+        """Drop entries built for a previous allowlist (caller holds the lock)."""
+        if self._fingerprint == fingerprint:
+            return
+        if self._fingerprint is not None:
+            stale = [k for k, e in self._entries.items() if e.fingerprint != fingerprint]
+            for k in stale:
+                del self._entries[k]
+            if stale:
+                _inc_counter("planner_plan_cache_total", {"outcome": "invalidated"}, float(len(stale)))
+        self._fingerprint = fingerprint
+
+    # Public API ---------------------------------------------------------
+    def get(
+        self,
+        question: str,
+        allowlist: Mapping[str, Iterable[str]],
+        *,
+        default_limit: int | None = None,
+    ) -> PlannerPlan | None:
+        """Return a copy of the cached plan for `question`, or None."""
+        from app.agents.analytics.planner import PlannerPlan
+
+        tpl = parameterize_question(question)
+        if not tpl.text:
+            return None
+        fingerprint = allowlist_fingerprint(allowlist)
+        exact_key = self._key("exact", _normalize_text(question).lower(), fingerprint, default_limit)
+        tpl_key = self._key("template", tpl.text, fingerprint, default_limit)
+        now = time.time()
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            outcome = "hit"
+            entry = self._live(exact_key, now)
+            if entry is None and self.parameterize and tpl.has_literals:
+                entry = self._live(tpl_key, now)
+                outcome = "template_hit"
+            if entry is None:
+                self._misses += 1
+                _inc_counter("planner_plan_cache_total", {"outcome": "miss"})
+                return None
+            self._hits += 1
+        _inc_counter("planner_plan_cache_total", {"outcome": outcome})
+        sql, reason = entry.sql, entry.reason
+        if entry.parameterized:
+            sql, reason = _render(sql, tpl), _render(reason, tpl)
+        return PlannerPlan(
+            sql=sql,
+            params=dict(entry.params),
+            reason=reason,
+            limit_applied=entry.limit_applied,
+            warnings=list(entry.warnings),
+        )
+
+    def put(
+        self,
+        question: str,
+        allowlist: Mapping[str, Iterable[str]],
+        plan: PlannerPlan,
+        *,
+        default_limit: int | None = None,
+    ) -> None:
+        """Store a validated plan, as a template when its literals map cleanly."""
+        tpl = parameterize_question(question)
+        if not tpl.text or not plan.sql:
+            return
+        fingerprint = allowlist_fingerprint(allowlist)
+        sql_tpl = reason_tpl = None
+        if self.parameterize and tpl.has_literals:
+            sql_tpl = _templatize(plan.sql, tpl)
+            reason_tpl = _templatize(plan.reason, tpl, quoted=False) if sql_tpl is not None else None
+            slots = {f"{{year{i}}}" for i in range(len(tpl.years))} | {f"{{state{i}}}" for i in range(len(tpl.states))}
+            if (
+                sql_tpl is None
+                or reason_tpl is None
+                or not all(s in sql_tpl for s in slots)
+                or _render(sql_tpl, tpl) != plan.sql
+            ):
+                sql_tpl = reason_tpl = None
+        if sql_tpl is not None and reason_tpl is not None:
+            key = self._key("template", tpl.text, fingerprint, default_limit)
+            sql, reason, parameterized = sql_tpl, reason_tpl, True
+        else:
+            key = self._key("exact", _normalize_text(question).lower(), fingerprint, default_limit)
+            sql, reason, parameterized = plan.sql, plan.reason, False
+        entry = _Entry(
+            sql=sql,
+            reason=reason,
+            params=dict(plan.params),
+            limit_applied=bool(plan.limit_applied),
+            warnings=list(plan.warnings),
+            parameterized=parameterized,
+            fingerprint=fingerprint,
+            stored_at=time.time(),
+        )
+        with self._lock:
+            self._check_fingerprint(fingerprint)
+            if key not in self._entries and len(self._entries) >= self.max_size:
+                oldest = min(self._entries, key=lambda k: self._entries[k].stored_at)
+                del self._entries[oldest]
+            self._entries[key] = entry
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        """Return size, hit/miss counts and how many entries are templates."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "templates": sum(1 for e in self._entries.values() if e.parameterized),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": (self._hits / total) if total else 0.0,
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+            }
+
+    def _live(self, key: str, now: float) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now - entry.stored_at >= self.ttl:
+            del self._entries[key]
+            return None
+        return entry
@@ -14,9 +14,15 @@ Design
 - Stateless planner with a deterministic fallback (no network), plus optional LLM
   backend (wired later) via prompts in `app/prompts/analytics/`.
 - Guardrails first: identifiers are validated against an explicit allowlist
-  (table → columns). Aggregations prefer `COUNT(1)` instead of `COUNT(*)`.
+  (table → columns) on the parse-once `sql_guard` tree, which the executor
+  reuses. Aggregations prefer `COUNT(1)` instead of `COUNT(*)`.
 - Heuristics cover common intents: preview with cap, counts, top‑N, and time
   series using `date_trunc` when a timestamp column is available.
+- Validated LLM plans are cached per normalized question and allowlist
+  fingerprint (`plan_cache.PlanCache`); questions differing only in years or
+  state codes share a parameterized plan.
+- Returned plans that match a materialized rollup exactly are rewritten onto
+  it (`rollups.py`); the cache keeps the base-table plan.
 
 Integration
 -----------
@@ -46,6 +52,10 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Final, Protocol, runtime_checkable
 
+from app.agents.analytics.plan_cache import PlanCache
+from app.agents.analytics.rollups import RollupCatalog, rewrite_plan
+from app.agents.analytics.sql_guard import GuardPolicy, check_sql
+
 start_span: Any
 
 try:  # Logging & tracing are optional at import time
@@ -92,6 +102,10 @@ class PlannerPlan:
     reason: Short English rationale for traceability.
     limit_applied: Whether a LIMIT was injected due to non‑aggregate query.
     warnings: Non‑fatal observations (e.g., heuristic assumptions).
+    lane: Scheduling hint for the executor (``light``/``heavy``); None lets
+        the executor classify from the EXPLAIN cost.
+    rollup: Materialized rollup the SQL was rewritten onto (see `rollups.py`),
+        None when it runs on the base tables.
     """
 
     sql: str
@@ -99,6 +113,8 @@ class PlannerPlan:
     reason: str
     limit_applied: bool
     warnings: list[str]
+    lane: str | None = None
+    rollup: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
         """Return a plain dict representation."""
@@ -109,6 +125,8 @@ class PlannerPlan:
             "reason": self.reason,
             "limit_applied": bool(self.limit_applied),
             "warnings": list(self.warnings),
+            "lane": self.lane,
+            "rollup": self.rollup,
         }
 
 
@@ -296,6 +314,28 @@ class AnalyticsPlanner:
             self.max_safe_limit = 5000
             self.examples_count = 3
             self.max_examples = 5
+
+        # Cache of validated LLM plans (see `plan_cache.py`)
+        self._plan_cache: PlanCache | None = None
+        try:
+            planner_cfg = getattr(self._config, "analytics").planner  # type: ignore[attr-defined]
+            if bool(getattr(planner_cfg, "plan_cache_enabled", True)):
+                self._plan_cache = PlanCache(
+                    ttl_seconds=float(getattr(planner_cfg, "plan_cache_ttl_seconds", 3600)),
+                    max_size=int(getattr(planner_cfg, "plan_cache_max_size", 500)),
+                    parameterize=bool(getattr(planner_cfg, "plan_cache_parameterize", True)),
+                )
+        except Exception:
+            self._plan_cache = PlanCache()
+
+        # Materialized rollups for hot aggregate shapes (see `rollups.py`)
+        self._rollups: RollupCatalog | None = None
+        try:
+            planner_cfg = getattr(self._config, "analytics").planner  # type: ignore[attr-defined]
+            if bool(getattr(planner_cfg, "rollups_enabled", True)):
+                self._rollups = RollupCatalog(ttl_seconds=float(getattr(planner_cfg, "rollups_check_ttl_seconds", 300)))
+        except Exception:
+            self._rollups = RollupCatalog()
         
         # Try to initialize LLM backend using settings.models.analytics_planner
         self._llm_backend = None
@@ -343,10 +383,19 @@ class AnalyticsPlanner:
 
             # Try LLM first if available
             if self._llm_backend:
+                cache = self._plan_cache
+                if cache is not None:
+                    cached = cache.get(query, allowlist, default_limit=default_limit)
+                    if cached is not None:
+                        logger.info("Plan cache hit", sql=cached.sql[:100])
+                        return self._with_rollup(cached, allowlist)
                 try:
                     plan = self._plan_with_llm(query, allowlist, logger, default_limit)
                     # CRITICAL: Fix alias issues before returning
-                    return self._fix_alias_issues(plan, logger)
+                    plan = self._fix_alias_issues(plan, logger)
+                    if cache is not None:
+                        cache.put(query, allowlist, plan, default_limit=default_limit)
+                    return self._with_rollup(plan, allowlist)
                 except Exception as exc:
                     logger.warning("LLM planning failed; falling back to heuristics", exc_info=exc)
 
@@ -439,9 +488,21 @@ class AnalyticsPlanner:
             _validate_identifiers(sql, validation_allowlist)  # raises on violation
 
             logger.info("Planned SQL", sql=sql, reason=reason)
-            return PlannerPlan(
-                sql=sql, params={}, reason=reason, limit_applied=limit_applied, warnings=warnings
+            # Heuristic plans are single-table counts, series or capped previews
+            plan = PlannerPlan(
+                sql=sql, params={}, reason=reason, limit_applied=limit_applied, warnings=warnings, lane="light"
             )
+            return self._with_rollup(plan, validation_allowlist)
+
+    def _with_rollup(self, plan: PlannerPlan, allowlist: Mapping[str, Iterable[str]]) -> PlannerPlan:
+        """Move `plan` onto a materialized rollup when exactly equivalent.
+
+        Cached plans stay on the base tables, so a rollup that is dropped or
+        not yet built only changes what is returned, never what is cached.
+        """
+        if self._rollups is None:
+            return plan
+        return rewrite_plan(plan, allowlist, self._rollups)
 
     def _plan_with_llm(
         self,
@@ -503,7 +564,7 @@ class AnalyticsPlanner:
         # Validate and normalize response
         plan = self._validate_llm_plan(response, allowlist, logger)
         
-        logger.info("LLM SQL plan generated", sql=plan.sql[:100], reason=plan.reason)
+        logger.info("LLM SQL plan generated", sql=plan.sql, reason=plan.reason)
         return plan
 
     def _load_system_prompt(self, allowlist: Mapping[str, Iterable[str]]) -> str:
@@ -538,8 +599,10 @@ Rules:
 - Add LIMIT ONLY when explicitly requested by the user (e.g. \"top 5\", \"limit 10\").
 - Do NOT add implicit time filters; use all data unless the user specifies a period."""
         
-        # Inject allowlist
-        allowlist_json = json.dumps(dict(allowlist), indent=2)
+        # Inject allowlist (sorted so the system prompt is byte-identical across
+        # requests and stays eligible for provider prompt caching)
+        ordered = {str(t): sorted(str(c) for c in cols) for t, cols in allowlist.items()}
+        allowlist_json = json.dumps(ordered, indent=2, sort_keys=True)
         return template.replace("<<<ALLOWLIST_JSON>>>", allowlist_json)
     
     def _load_examples(self) -> list[dict[str, Any]]:
@@ -604,16 +667,11 @@ Rules:
         sql = plan_tmp.sql
         warnings = plan_tmp.warnings
         
-        # Basic SQL safety checks
+        # Guardrails on the shared parse (the executor reuses it): read-only
+        # statement, allowed functions, allowlisted tables/columns
+        check_sql(sql, GuardPolicy.for_allowlist(allowlist))
         sql_lower = sql.lower()
         
-        # Check for forbidden operations
-        forbidden = ["insert", "update", "delete", "drop", "create", "alter", "truncate"]
-        for op in forbidden:
-            if f" {op} " in sql_lower or sql_lower.startswith(f"{op} "):
-                warnings.append(f"forbidden_operation:{op}")
-                raise ValueError(f"Forbidden SQL operation: {op}")
-        
         # Check for SELECT * (should be avoided)
         if "select *" in sql_lower:
             warnings.append("select_star_detected")
@@ -881,9 +939,6 @@ _YEAR_KEYS = ("por ano", "anual", "year", "yearly")
 
 _TIME_HINTS = ("timestamp", "date", "data", "dt")
 
-_IDENTIFIER_RE = re.compile(r"\b[a-zA-Z_][a-zA-Z0-9_]*\b")
-
-
 def _normalize_allowlist(allowlist: Mapping[str, Iterable[str]]) -> dict[str, list[str]]:
     """Return a normalized allowlist mapping.
 
@@ -1002,58 +1057,22 @@ def _choose_preview_columns(columns: list[str], *, max_cols: int = 6) -> list[st
 
 
 def _validate_identifiers(sql: str, allowlist: Mapping[str, Iterable[str]]) -> None:
-    """Best-effort validation of identifiers in a generated SQL string.
+    """Validate a generated SQL string against the allowlist.
 
-    Ensures all ``table.column`` pairs appear in the provided allowlist,
-    all tables in FROM/JOIN clauses are allowlisted, and blocks DDL/DML.
+    Ensures the statement is a read-only SELECT/WITH without DDL/DML or
+    system catalogs, every FROM/JOIN table is allowlisted (optionally under
+    ``analytics.``) and qualified column references (``table.column`` or
+    ``alias.column``) name allowlisted columns of that table. Uses the shared
+    `sql_guard` parse.
     """
-    # Extract bare tokens and ensure all table.column references are allowed.
-    tokens = set(_IDENTIFIER_RE.findall(sql))
-    # Quick reject for DDL/DML verbs
-    blocked = {"insert", "update", "delete", "alter", "drop", "create", "grant", "revoke"}
-    if any(b in (t.lower()) for t in tokens for b in blocked):
-        raise ValueError("DDL/DML tokens are not allowed in planner SQL")
-
-    # Allow functions and keywords implicitly; enforce on identifiers
-    tables = set(allowlist)
-    columns = set()
-    for cols in allowlist.values():
-        columns.update({str(c) for c in cols})
-
-    # Validate column names that appear after a dot (table.column)
-    # Only match patterns that have at least one dot before the column name
-    for m in re.finditer(r"([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)+)\.([a-zA-Z_][a-zA-Z0-9_]*)", sql):
-        t, c = m.group(1), m.group(2)
-        # Check both with and without schema prefix
-        table_without_schema = t.replace("analytics.", "") if t.startswith("analytics.") else t
-        # Check if table exists in allowlist (with or without schema prefix)
-        table_found = t in tables or table_without_schema in tables
-        if not table_found or c not in columns:
-            raise ValueError(f"identifier not allowed: {t}.{c}")
-
-    # Validate FROM clause tables
-    for m in re.finditer(r"\bFROM\s+([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)*)\b", sql, flags=re.IGNORECASE):
-        t = m.group(1)
-        # Check both with and without schema prefix
-        table_without_schema = t.replace("analytics.", "") if t.startswith("analytics.") else t
-        table_found = t in tables or table_without_schema in tables
-        if not table_found:
-            raise ValueError(f"table not allowed: {t}")
-
-    _validate_joins(sql, allowlist)
-
-    # Disallow semicolons and system schemas
-    if ";" in sql:
-        raise ValueError("multiple statements are not allowed in planner SQL")
-    if "pg_catalog" in sql.lower() or "information_schema" in sql.lower():
-        raise ValueError("system catalogs are not allowed in planner SQL")
+    check_sql(sql, GuardPolicy.for_allowlist(allowlist, functions=None))
 
 
 def _validate_joins(sql: str, allowlist: Mapping[str, Iterable[str]]) -> None:
-    """Best-effort validation for JOINs against the allowlist.
+    """Validate FROM/JOIN tables against the allowlist.
 
-    Ensures only allowlisted tables (optionally schema-qualified under
-    analytics.) appear in JOIN clauses. Cross-schema joins are rejected.
+    Only allowlisted tables (optionally schema-qualified under ``analytics.``)
+    may appear; cross-schema joins are rejected.
 
     Parameters
     ----------
@@ -1062,13 +1081,4 @@ def _validate_joins(sql: str, allowlist: Mapping[str, Iterable[str]]) -> None:
     allowlist: Mapping[str, Iterable[str]]
         Allowed tables and columns.
     """
-
-    join_re = re.compile(r"\bJOIN\s+([a-zA-Z_][a-zA-Z0-9_]*(?:\.[a-zA-Z_][a-zA-Z0-9_]*)*)\b", flags=re.IGNORECASE)
-    allowed_tables = set(allowlist)
-    for jm in join_re.finditer(sql):
-        jt = jm.group(1)
-        if "." in jt and not jt.lower().startswith("analytics."):
-            raise ValueError(f"cross-schema join not allowed: {jt}")
-        base = jt.replace("analytics.", "")
-        if (jt not in allowed_tables) and (base not in allowed_tables):
-            raise ValueError(f"join table not allowed: {jt}")
+    check_sql(sql, GuardPolicy.for_allowlist(allowlist, functions=None, check_columns=False))
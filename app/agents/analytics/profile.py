@@ -0,0 +1,321 @@
+"""
+Single-pass dataset profile for analytics result rows.
+
+Overview
+  The normalizer's insight detectors (dominance, geographic/category
+  concentration, temporal trend, anomalies, variability, 1:1 ratios and the
+  key-insight summary) all need the same facts about a result set: which
+  column is the main metric, its total, extremes, quartiles, coefficient of
+  variation, top-k rows and shares. `profile_rows` converts the rows to typed
+  columns once and computes those statistics together, so each detector is a
+  few attribute reads instead of another scan of the rows.
+
+Design
+  - Column kinds come from the first row, exactly as the detectors always
+    inferred them: a column is numeric when its first value is an `int` or
+    `float` (bools included; `Decimal` only with ``decimals=True``).
+    Non-numeric cells of a numeric column count as 0.0 for totals/ordering
+    and are excluded from the distribution statistics (mean, CV, quartiles,
+    extremes).
+  - Optional NumPy (not a declared runtime dependency): numeric columns become
+    float64 arrays, quartiles use `partition` and outliers are a boolean mask.
+    The pure-Python path produces the same values (quartiles by index on the
+    sorted values, population variance, stable top-k).
+  - Orderings are stable (ties keep row order) so "top" rows match
+    ``max(rows, key=...)`` / ``sorted(..., reverse=True)``.
+  - The profile keeps a reference to the rows; identifiers for reported rows
+    (the first non-numeric value of that row) are read on demand.
+
+Integration
+  - `app.agents.analytics.normalize.AnalyticsNormalizer`: one profile per
+    row list, shared by `_get_key_insights` and the `_detect_*` family.
+  - `app.agents.analytics.compaction`: `DatasetProfile.digest()` summarizes
+    the rows left out of an over-budget normalizer prompt.
+  - Micro-benchmark: `python -m scripts.bench_normalize_profile`.
+
+Usage
+  >>> from app.agents.analytics.profile import profile_rows
+  >>> rows = [{"state": s, "qty": q} for s, q in [("SP", 50), ("RJ", 30), ("MG", 20)]]
+  >>> p = profile_rows(rows)
+  >>> p.metric, p.column("qty").total, p.column("qty").top_share
+  ('qty', 100.0, 50.0)
+  >>> [rows[i]["state"] for i in p.column("qty").top]
+  ['SP', 'RJ', 'MG']
+"""
+
+from __future__ import annotations
+
+import heapq
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any
+
+try:  # Optional: vectorized path
+    import numpy as _np
+except Exception:  # pragma: no cover - optional
+    _np = None
+
+__all__ = [
+    "ColumnProfile",
+    "DatasetProfile",
+    "TemporalProfile",
+    "profile_rows",
+]
+
+# Columns that are never the main metric even when numeric
+_NON_METRIC: frozenset[str] = frozenset({"period", "month", "year"})
+_TEMPORAL_MARKERS: tuple[str, ...] = ("period", "month", "year", "date")
+TOP_K = 3
+# Below this many rows the NumPy conversion overhead outweighs the gain
+_NUMPY_MIN_ROWS = 64
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float))
+
+
+def _is_decimal_number(v: Any) -> bool:
+    return isinstance(v, (int, float, Decimal))
+
+
+@dataclass(slots=True)
+class ColumnProfile:
+    """Typed values and statistics of one numeric column.
+
+    `values` holds one float per row (0.0 for non-numeric cells); the
+    distribution statistics cover the `count` numeric cells only.
+    """
+
+    name: str
+    values: Any  # ndarray | list[float]
+    count: int = 0
+    total: float = 0.0
+    mean: float = 0.0
+    std: float = 0.0
+    minimum: float = 0.0
+    maximum: float = 0.0
+    q1: float = 0.0
+    q3: float = 0.0
+    top: tuple[int, ...] = ()  # row indices by value, descending (stable)
+    _numeric: Any = None  # ndarray bool mask | list[bool]
+
+    @property
+    def cv(self) -> float:
+        """Coefficient of variation in percent (0.0 when the mean is 0)."""
+        return (self.std / self.mean) * 100 if self.mean != 0 else 0.0
+
+    @property
+    def iqr(self) -> float:
+        return self.q3 - self.q1
+
+    @property
+    def top_share(self) -> float:
+        """Share (%) of the total held by the largest row (0.0 without total)."""
+        if not self.top or self.total == 0:
+            return 0.0
+        return float(self.values[self.top[0]]) / self.total * 100
+
+    def top_k_share(self, k: int = TOP_K) -> float:
+        """Share (%) of the total held by the `k` largest rows."""
+        if self.total == 0:
+            return 0.0
+        return sum(float(self.values[i]) for i in self.top[:k]) / self.total * 100
+
+    def outliers(self, factor: float = 1.5) -> list[int]:
+        """Row indices outside ``[q1 - factor*iqr, q3 + factor*iqr]``, in row order."""
+        iqr = self.iqr
+        if self.count == 0 or iqr == 0:
+            return []
+        lower, upper = self.q1 - factor * iqr, self.q3 + factor * iqr
+        if _np is not None and not isinstance(self.values, list):
+            v = self.values
+            return [int(i) for i in _np.flatnonzero(self._numeric & ((v < lower) | (v > upper)))]
+        return [i for i, (v, ok) in enumerate(zip(self.values, self._numeric)) if ok and (v < lower or v > upper)]
+
+
+@dataclass(slots=True)
+class TemporalProfile:
+    """Metric totals over the first and second half of the rows in period order."""
+
+    column: str
+    metric: str
+    first_half: float
+    second_half: float
+
+    @property
+    def change_pct(self) -> float:
+        """Second-half change relative to the first half (0.0 when undefined)."""
+        if self.first_half == 0:
+            return 0.0
+        return (self.second_half - self.first_half) / self.first_half * 100
+
+
+@dataclass(slots=True)
+class DatasetProfile:
+    """Column kinds, metric choices and per-column statistics of a row list."""
+
+    rows: Sequence[Mapping[str, Any]]
+    columns: tuple[str, ...] = ()
+    numeric_columns: tuple[str, ...] = ()
+    metric: str | None = None  # first numeric column except period/month/year
+    positive_metric: str | None = None  # first column with a positive number
+    state_column: str | None = None
+    category_column: str | None = None
+    temporal: TemporalProfile | None = None
+    _stats: dict[str, ColumnProfile] = field(default_factory=dict)
+    _is_num: Any = _is_number
+
+    @property
+    def row_count(self) -> int:
+        return len(self.rows)
+
+    def column(self, name: str | None) -> ColumnProfile | None:
+        """Statistics of numeric column `name` (None for unknown/non-numeric)."""
+        if name is None:
+            return None
+        return self._stats.get(name)
+
+    def first_numeric(self, *, exclude: str | None = None) -> str | None:
+        """First numeric column other than `exclude`."""
+        return next((c for c in self.numeric_columns if c != exclude), None)
+
+    def identifier(self, index: int, *, exclude: str | None = None) -> Any:
+        """First non-numeric value of row `index` (skipping column `exclude`)."""
+        for k, v in self.rows[index].items():
+            if k != exclude and not self._is_num(v):
+                return v
+        return None
+
+    def identifier_column(self, index: int, *, exclude: str | None = None) -> str | None:
+        """Name of the first non-numeric column of row `index`."""
+        for k, v in self.rows[index].items():
+            if k != exclude and not self._is_num(v):
+                return k
+        return None
+
+    def has_one_to_one(self, tolerance: float = 0.01) -> bool:
+        """True when two metric columns agree within `tolerance` wherever both are positive."""
+        cols = [c for c in self.numeric_columns if c not in _NON_METRIC]
+        for i, a in enumerate(cols):
+            va = self._stats[a].values
+            for b in cols[i + 1 :]:
+                vb = self._stats[b].values
+                if _np is not None and not isinstance(va, list):
+                    both = (va > 0) & (vb > 0)
+                    if both.any() and bool((_np.abs(va[both] / vb[both] - 1.0) < tolerance).all()):
+                        return True
+                    continue
+                ratios = [x / y for x, y in zip(va, vb) if x > 0 and y > 0]
+                if ratios and all(abs(r - 1.0) < tolerance for r in ratios):
+                    return True
+        return False
+
+    def digest(self, *, top_values: int = 3, ndigits: int = 2) -> dict[str, Any]:
+        """JSON-ready summary of every column (for prompts that omit rows).
+
+        Numeric columns report count, sum, mean, min, quartiles and max; other
+        columns report the number of distinct values and the most frequent ones.
+        """
+        columns: dict[str, Any] = {}
+        for name in self.columns:
+            col = self._stats.get(name)
+            if col is not None:
+                columns[name] = {
+                    "type": "number",
+                    "count": col.count,
+                    "sum": round(col.total, ndigits),
+                    "mean": round(col.mean, ndigits),
+                    "min": round(col.minimum, ndigits),
+                    "q1": round(col.q1, ndigits),
+                    "q3": round(col.q3, ndigits),
+                    "max": round(col.maximum, ndigits),
+                }
+                continue
+            counts = Counter(str(row.get(name)) for row in self.rows)
+            columns[name] = {
+                "type": "text",
+                "distinct": len(counts),
+                "top": [[value, n] for value, n in counts.most_common(top_values)],
+            }
+        return {"row_count": self.row_count, "columns": columns}
+
+
+def _column_stats(name: str, raw: list[Any], use_numpy: bool, is_num: Any = _is_number) -> ColumnProfile:
+    mask = [is_num(v) for v in raw]
+    values = [float(v) if ok else 0.0 for v, ok in zip(raw, mask)]
+    count = sum(mask)
+    n = len(values)
+    if use_numpy:
+        arr = _np.asarray(values, dtype=_np.float64)
+        numeric = _np.asarray(mask, dtype=bool)
+        col = ColumnProfile(name, arr, count=count, total=float(arr.sum()), _numeric=numeric)
+        if count:
+            nums = arr if count == n else arr[numeric]
+            lo, hi = count // 4, (3 * count) // 4
+            part = _np.partition(nums, (lo, hi))
+            col.q1, col.q3 = float(part[lo]), float(part[hi])
+            col.mean = float(nums.sum()) / count
+            col.std = float(_np.sqrt(((nums - col.mean) ** 2).sum() / count))
+            col.minimum, col.maximum = float(nums.min()), float(nums.max())
+        # Stable descending order: ties keep row order
+        col.top = tuple(int(i) for i in _np.argsort(-arr, kind="stable")[:TOP_K])
+        return col
+
+    col = ColumnProfile(name, values, count=count, total=sum(values), _numeric=mask)
+    if count:
+        nums = values if count == n else [v for v, ok in zip(values, mask) if ok]
+        ordered = sorted(nums)
+        col.q1, col.q3 = ordered[count // 4], ordered[(3 * count) // 4]
+        col.minimum, col.maximum = ordered[0], ordered[-1]
+        col.mean = sum(nums) / count
+        col.std = (sum((v - col.mean) ** 2 for v in nums) / count) ** 0.5
+    col.top = tuple(heapq.nlargest(TOP_K, range(n), key=values.__getitem__))
+    return col
+
+
+def profile_rows(rows: Sequence[Mapping[str, Any]], *, decimals: bool = False) -> DatasetProfile:
+    """Build the profile of `rows` (column kinds from the first row).
+
+    Parameters
+    ----------
+    rows:
+        Result rows (mappings sharing the first row's columns).
+    decimals:
+        Treat `Decimal` values (SQL NUMERIC) as numbers. Off by default so
+        the insight detectors keep their historical column choices.
+    """
+    is_num = _is_decimal_number if decimals else _is_number
+    profile = DatasetProfile(rows=rows, _is_num=is_num)
+    if not rows:
+        return profile
+
+    first = rows[0]
+    profile.columns = tuple(first.keys())
+    profile.numeric_columns = tuple(k for k, v in first.items() if is_num(v))
+    profile.metric = next((c for c in profile.numeric_columns if c not in _NON_METRIC), None)
+    profile.positive_metric = next((k for k, v in first.items() if is_num(v) and v > 0), None)
+    profile.state_column = next((k for k, v in first.items() if "state" in k.lower() and not is_num(v)), None)
+    profile.category_column = next(
+        (k for k, v in first.items() if "category" in k.lower() and not is_num(v)), None
+    )
+
+    use_numpy = _np is not None and len(rows) >= _NUMPY_MIN_ROWS
+    for name in profile.numeric_columns:
+        profile._stats[name] = _column_stats(name, [row.get(name, 0) for row in rows], use_numpy, is_num)
+
+    temporal_col = next((k for k in profile.columns if any(t in k.lower() for t in _TEMPORAL_MARKERS)), None)
+    temporal_metric = profile.first_numeric(exclude=temporal_col) if temporal_col else None
+    if temporal_col and temporal_metric:
+        values = profile._stats[temporal_metric].values
+        keys = [str(row.get(temporal_col, "")) for row in rows]
+        order = sorted(range(len(rows)), key=keys.__getitem__)
+        half = len(order) // 2
+        profile.temporal = TemporalProfile(
+            column=temporal_col,
+            metric=temporal_metric,
+            first_half=float(sum(values[i] for i in order[:half])),
+            second_half=float(sum(values[i] for i in order[half:])),
+        )
+    return profile
@@ -0,0 +1,569 @@
+"""
+Materialized rollups for the hot analytics shapes, and the plan rewrite onto them.
+
+Overview
+  Most questions are orders, revenue, payments or review scores sliced by
+  month, state, category, status or payment type, and each one re-joins
+  `orders`, `order_items`, `customers` and `products` at query time. Four
+  materialized views pre-aggregate those joins per month and dimension
+  (built and refreshed by `scripts/ingest_analytics.py`). `rewrite_sql`
+  moves a planned query onto a rollup when that is exactly equivalent and
+  leaves it on the base tables otherwise.
+
+Design
+  - Each `Rollup` has a grain table (whose rows it counts), the tables it
+    joins along foreign keys (so joining them never drops or duplicates grain
+    rows), dimension columns, and additive measures.
+  - The rewrite is conservative. A query qualifies only when all of these hold:
+    * it is a single SELECT without CTEs or subqueries;
+    * its FROM is the grain table plus inner FK joins on the canonical keys;
+    * every aggregate is a known additive measure (``COUNT(*)``,
+      ``SUM(oi.price + oi.freight_value)``, ``AVG(r.review_score)``, ...);
+    * every other column reference is a rollup dimension. The purchase
+      timestamp counts only as ``date_trunc('month'|'quarter'|'year', ...)``,
+      ``EXTRACT(YEAR|QUARTER|MONTH FROM ...)``, or compared with ``>=`` / ``<``
+      to a month-aligned literal.
+    Anything else keeps the original SQL, so a missed match costs nothing
+    but the base-table query.
+  - Measures are re-aggregated from stored sums and counts:
+    ``COUNT(*)`` -> ``SUM(n)``, ``AVG(x)`` -> ``SUM(x_sum) / SUM(x_n)``.
+  - The rewritten SQL is validated with `sql_guard` against `ROLLUP_ALLOWLIST`.
+  - `RollupCatalog` caches which views exist and are populated
+    (`pg_matviews`). With no database, or views not built yet, nothing is
+    rewritten.
+
+Integration
+  - `AnalyticsPlanner.plan` calls `rewrite_plan` on every plan it returns
+    (LLM, plan cache and heuristic); rewritten plans carry
+    `PlannerPlan.rollup` and a ``rollup:<name>`` warning.
+  - The executor records `analytics_query_ms{target=rollup|base}`; the
+    planner records `planner_rollup_total{outcome,rollup}`.
+  - Settings: `analytics.planner.rollups_enabled`,
+    `rollups_check_ttl_seconds`.
+
+Usage
+  >>> from app.agents.analytics.rollups import rewrite_sql
+  >>> sql = ("SELECT date_trunc('month', o.order_purchase_timestamp) AS period, COUNT(*) AS orders "
+  ...        "FROM analytics.orders o WHERE o.order_purchase_timestamp >= '2017-01-01' "
+  ...        "AND o.order_purchase_timestamp < '2018-01-01' GROUP BY period ORDER BY period")
+  >>> name, new_sql = rewrite_sql(sql)
+  >>> name
+  'mv_orders_monthly'
+  >>> new_sql
+  "SELECT purchase_month AS period, COALESCE(SUM(n), 0)::bigint AS orders FROM analytics.mv_orders_monthly WHERE purchase_month >= '2017-01-01' AND purchase_month < '2018-01-01' GROUP BY period ORDER BY period"
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from app.agents.analytics.sql_guard import EXECUTOR_POLICY, GuardPolicy, check_sql, parse_sql
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+__all__ = [
+    "ROLLUPS",
+    "ROLLUP_ALLOWLIST",
+    "Rollup",
+    "RollupCatalog",
+    "rewrite_plan",
+    "rewrite_sql",
+]
+
+_SCHEMA = "analytics"
+_N = "COALESCE(SUM(n), 0)::bigint"
+
+
+@dataclass(frozen=True, slots=True)
+class Rollup:
+    """One materialized rollup.
+
+    Attributes
+    ----------
+    name: View name (in the ``analytics`` schema).
+    grain: Base table whose rows the rollup counts (``n``).
+    tables: Base tables joined along FKs into the view.
+    dimensions: ``table.column`` -> rollup column.
+    measures: Canonical aggregate (lowercase, ``table.column``) -> rollup expression.
+    definition: SELECT that builds the view.
+    """
+
+    name: str
+    grain: str
+    tables: frozenset[str]
+    dimensions: Mapping[str, str]
+    measures: Mapping[str, str]
+    definition: str
+
+    @property
+    def qualified_name(self) -> str:
+        return f"{_SCHEMA}.{self.name}"
+
+    @property
+    def columns(self) -> frozenset[str]:
+        cols = set(self.dimensions.values()) | {"purchase_month", "n"}
+        for expr in self.measures.values():
+            cols.update(re.findall(r"SUM\((\w+)\)", expr))
+        return frozenset(cols)
+
+    def ddl(self) -> list[str]:
+        """Statements that create the view and the unique index used by
+        ``REFRESH MATERIALIZED VIEW CONCURRENTLY``."""
+        keys = ", ".join(["purchase_month", *sorted(set(self.dimensions.values()))])
+        return [
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {self.qualified_name} AS {self.definition} WITH NO DATA",
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {self.name}_key ON {self.qualified_name} ({keys})",
+        ]
+
+
+def _count_measures(*columns: str) -> dict[str, str]:
+    out = {"count(*)": _N, "count(1)": _N}
+    for col in columns:
+        out[f"count({col})"] = _N
+    return out
+
+
+_MONTH = "date_trunc('month', o.order_purchase_timestamp) AS purchase_month"
+_COMMON_DIMS = {"orders.order_status": "order_status", "customers.customer_state": "customer_state"}
+
+ROLLUPS: tuple[Rollup, ...] = (
+    Rollup(
+        name="mv_orders_monthly",
+        grain="orders",
+        tables=frozenset({"orders", "customers"}),
+        dimensions=dict(_COMMON_DIMS),
+        measures={
+            **_count_measures("orders.order_id", "orders.customer_id"),
+            "count(distinct orders.order_id)": _N,
+        },
+        definition=(
+            f"SELECT {_MONTH}, c.customer_state, o.order_status, COUNT(*) AS n"
+            " FROM analytics.orders o JOIN analytics.customers c ON c.customer_id = o.customer_id"
+            " GROUP BY 1, 2, 3"
+        ),
+    ),
+    Rollup(
+        name="mv_sales_monthly",
+        grain="order_items",
+        tables=frozenset({"order_items", "orders", "customers", "products"}),
+        dimensions={**_COMMON_DIMS, "products.product_category_name": "product_category_name"},
+        measures={
+            **_count_measures("order_items.order_id", "order_items.product_id", "order_items.order_item_id"),
+            "sum(order_items.price + order_items.freight_value)": "SUM(revenue)",
+            "sum(order_items.freight_value + order_items.price)": "SUM(revenue)",
+            "sum(order_items.price)": "SUM(price)",
+            "sum(order_items.freight_value)": "SUM(freight)",
+            "avg(order_items.price + order_items.freight_value)": "SUM(revenue) / NULLIF(SUM(revenue_n), 0)",
+            "avg(order_items.freight_value + order_items.price)": "SUM(revenue) / NULLIF(SUM(revenue_n), 0)",
+            "avg(order_items.price)": "SUM(price) / NULLIF(SUM(price_n), 0)",
+            "avg(order_items.freight_value)": "SUM(freight) / NULLIF(SUM(freight_n), 0)",
+        },
+        definition=(
+            f"SELECT {_MONTH}, c.customer_state, o.order_status, p.product_category_name, COUNT(*) AS n,"
+            " SUM(oi.price + oi.freight_value) AS revenue, COUNT(oi.price + oi.freight_value) AS revenue_n,"
+            " SUM(oi.price) AS price, COUNT(oi.price) AS price_n,"
+            " SUM(oi.freight_value) AS freight, COUNT(oi.freight_value) AS freight_n"
+            " FROM analytics.order_items oi JOIN analytics.orders o ON o.order_id = oi.order_id"
+            " JOIN analytics.customers c ON c.customer_id = o.customer_id"
+            " JOIN analytics.products p ON p.product_id = oi.product_id"
+            " GROUP BY 1, 2, 3, 4"
+        ),
+    ),
+    Rollup(
+        name="mv_payments_monthly",
+        grain="order_payments",
+        tables=frozenset({"order_payments", "orders", "customers"}),
+        dimensions={**_COMMON_DIMS, "order_payments.payment_type": "payment_type"},
+        measures={
+            **_count_measures("order_payments.order_id", "order_payments.payment_type"),
+            "sum(order_payments.payment_value)": "SUM(payment_value)",
+            "avg(order_payments.payment_value)": "SUM(payment_value) / NULLIF(SUM(n), 0)",
+            "sum(order_payments.payment_installments)": "SUM(installments)::bigint",
+            "avg(order_payments.payment_installments)": "SUM(installments)::numeric / NULLIF(SUM(n), 0)",
+        },
+        definition=(
+            f"SELECT {_MONTH}, c.customer_state, o.order_status, op.payment_type, COUNT(*) AS n,"
+            " SUM(op.payment_value) AS payment_value, SUM(op.payment_installments) AS installments"
+            " FROM analytics.order_payments op JOIN analytics.orders o ON o.order_id = op.order_id"
+            " JOIN analytics.customers c ON c.customer_id = o.customer_id"
+            " GROUP BY 1, 2, 3, 4"
+        ),
+    ),
+    Rollup(
+        name="mv_reviews_monthly",
+        grain="order_reviews",
+        tables=frozenset({"order_reviews", "orders", "customers"}),
+        dimensions={**_COMMON_DIMS, "order_reviews.review_score": "review_score"},
+        measures={
+            **_count_measures("order_reviews.review_id", "order_reviews.order_id", "order_reviews.review_score"),
+            "avg(order_reviews.review_score)": "SUM(score_sum)::numeric / NULLIF(SUM(n), 0)",
+            "sum(order_reviews.review_score)": "SUM(score_sum)::bigint",
+        },
+        definition=(
+            f"SELECT {_MONTH}, c.customer_state, o.order_status, r.review_score, COUNT(*) AS n,"
+            " SUM(r.review_score) AS score_sum"
+            " FROM analytics.order_reviews r JOIN analytics.orders o ON o.order_id = r.order_id"
+            " JOIN analytics.customers c ON c.customer_id = o.customer_id"
+            " GROUP BY 1, 2, 3, 4"
+        ),
+    ),
+)
+
+ROLLUP_ALLOWLIST: dict[str, list[str]] = {r.qualified_name: sorted(r.columns) for r in ROLLUPS}
+_ROLLUP_POLICY = GuardPolicy.for_allowlist(ROLLUP_ALLOWLIST)
+
+# Inner joins that never drop or duplicate rows of the left-hand (child) side
+_FK_JOINS = frozenset(
+    frozenset(pair)
+    for pair in (
+        ("order_items.order_id", "orders.order_id"),
+        ("order_items.product_id", "products.product_id"),
+        ("orders.customer_id", "customers.customer_id"),
+        ("order_payments.order_id", "orders.order_id"),
+        ("order_reviews.order_id", "orders.order_id"),
+    )
+)
+
+_AGGREGATES = frozenset(
+    {"count", "sum", "avg", "stddev", "stddev_pop", "stddev_samp", "variance", "var_pop", "var_samp",
+     "array_agg", "string_agg", "json_agg", "jsonb_agg", "bool_and", "bool_or", "every", "mode",
+     "percentile_cont", "percentile_disc"}
+)
+_CLAUSE_RE = re.compile(
+    r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|[()]"
+    r"|\b(from|where|group\s+by|having|order\s+by|limit|offset|window|union|intersect|except|fetch)\b",
+    re.IGNORECASE,
+)
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'")
+_TABLE_REF = r"((?:\w+\.)?\w+)(?:\s+(?:as\s+)?(?!(?:inner|join|on|left|right|full|cross)\b)(\w+))?"
+_FROM_HEAD_RE = re.compile(rf"^\s*{_TABLE_REF}", re.IGNORECASE)
+_JOIN_RE = re.compile(rf"\s*(?:inner\s+)?join\s+{_TABLE_REF}\s+on\s+([\w.]+)\s*=\s*([\w.]+)", re.IGNORECASE)
+_REF_RE = re.compile(r"(?<![\w.])([a-z_]\w*(?:\.[a-z_]\w*){1,2})(?![\w(])", re.IGNORECASE)
+_WORD_RE = re.compile(r"(?<![\w.])([a-z_]\w*)(?![\w.(])", re.IGNORECASE)
+_TS = "orders.order_purchase_timestamp"
+
+
+def _split_clauses(sql: str) -> dict[str, str] | None:
+    """Split a flat SELECT into its top-level clauses (None when unsupported)."""
+    body = sql.strip().rstrip(";").strip()
+    if not re.match(r"(?is)^select\s", body):
+        return None
+    depth = 0
+    bounds: list[tuple[str, int, int]] = [("select", 6, 6)]  # (clause, body start, keyword start)
+    for m in _CLAUSE_RE.finditer(body):
+        tok = m.group(0)
+        if tok == "(":
+            depth += 1
+        elif tok == ")":
+            depth -= 1
+        elif m.group(1) and depth == 0:
+            word = " ".join(m.group(1).lower().split())
+            if word in ("union", "intersect", "except", "window", "fetch"):
+                return None
+            bounds.append((word, m.end(), m.start()))
+    clauses: dict[str, str] = {}
+    for i, (name, start, _kw) in enumerate(bounds):
+        end = bounds[i + 1][2] if i + 1 < len(bounds) else len(body)
+        if name in clauses:
+            return None
+        clauses[name] = body[start:end].strip()
+    return clauses if "from" in clauses else None
+
+
+def _parse_from(text: str) -> tuple[dict[str, str], list[tuple[str, str]]] | None:
+    """Return (qualifier -> table, join conditions) for ``T [a] [JOIN T [b] ON x = y]*``."""
+    head = _FROM_HEAD_RE.match(text)
+    if head is None:
+        return None
+    refs = [(head.group(1), head.group(2))]
+    conds: list[tuple[str, str]] = []
+    pos = head.end()
+    while text[pos:].strip():
+        m = _JOIN_RE.match(text, pos)
+        if m is None:
+            return None
+        refs.append((m.group(1), m.group(2)))
+        conds.append((m.group(3), m.group(4)))
+        pos = m.end()
+    aliases = _aliases(refs)
+    return (aliases, conds) if aliases else None
+
+
+def _aliases(refs: list[tuple[str, str | None]]) -> dict[str, str]:
+    """Qualifier -> base table; empty on foreign schemas or self-joins."""
+    out: dict[str, str] = {}
+    seen: set[str] = set()
+    for name, alias in refs:
+        schema, _, table = name.lower().rpartition(".")
+        if schema not in ("", _SCHEMA) or table in seen:
+            return {}
+        seen.add(table)
+        out[table] = table
+        out[f"{_SCHEMA}.{table}"] = table
+        if alias:
+            out[alias.lower()] = table
+    return out
+
+
+def _qualify(text: str, aliases: Mapping[str, str], columns: Mapping[str, frozenset[str]]) -> str | None:
+    """Rewrite column references to canonical ``table.column`` (None on unknown qualifiers)."""
+    unknown = False
+
+    def _ref(m: re.Match[str]) -> str:
+        nonlocal unknown
+        parts = m.group(1).lower().split(".")
+        qualifier, col = ".".join(parts[:-1]), parts[-1]
+        table = aliases.get(qualifier)
+        if table is None:
+            unknown = True
+            return m.group(0)
+        return f"{table}.{col}"
+
+    out = _REF_RE.sub(_ref, text)
+    if unknown:
+        return None
+
+    def _word(m: re.Match[str]) -> str:
+        word = m.group(1).lower()
+        owners = [t for t, cols in columns.items() if word in cols]
+        if len(owners) == 1 and not re.search(r"(?i)\bas\s*$", out[: m.start()]):
+            return f"{owners[0]}.{word}"
+        return m.group(0)
+
+    return _WORD_RE.sub(_word, out)
+
+
+def _pick(tables: set[str], conds: list[tuple[str, str]], aliases: Mapping[str, str]) -> Rollup | None:
+    for cond in conds:
+        pair = []
+        for side in cond:
+            *qual, col = side.lower().split(".")
+            table = aliases.get(".".join(qual))
+            if table is None:
+                return None
+            pair.append(f"{table}.{col}")
+        if frozenset(pair) not in _FK_JOINS:
+            return None
+    if len(conds) != len(tables) - 1:
+        return None
+    for rollup in ROLLUPS:
+        if rollup.grain in tables and tables <= rollup.tables:
+            return rollup
+    return None
+
+
+def _pattern(canonical: str) -> re.Pattern[str]:
+    """Match `canonical` with any whitespace between tokens, case-insensitively."""
+    tokens = re.findall(r"\w+|[^\w\s]", canonical)
+    out = re.escape(tokens[0])
+    for prev, tok in zip(tokens, tokens[1:]):
+        sep = r"\s+" if prev[-1].isalnum() and tok[0].isalnum() else r"\s*"
+        out += sep + re.escape(tok)
+    return re.compile(rf"(?<![\w.]){out}", re.IGNORECASE)
+
+
+def rewrite_sql(sql: str, allowlist: Mapping[str, Iterable[str]] | None = None) -> tuple[str, str] | None:
+    """Return ``(rollup name, rewritten SQL)`` when `sql` can run on a rollup.
+
+    Parameters
+    ----------
+    sql:
+        Planned SQL (already validated against the base allowlist).
+    allowlist:
+        Base table -> columns, used to resolve unqualified column names.
+    """
+    try:
+        parsed = parse_sql(sql)
+    except ValueError:
+        return None
+    if parsed.derived or parsed.statements != 1 or parsed.statement != "select":
+        return None
+    clauses = _split_clauses(sql)
+    if clauses is None:
+        return None
+    from_parts = _parse_from(clauses["from"])
+    if from_parts is None:
+        return None
+    aliases, conds = from_parts
+    tables = set(aliases.values())
+    rollup = _pick(tables, conds, aliases)
+    if rollup is None:
+        return None
+
+    columns: dict[str, frozenset[str]] = {}
+    for table, cols in (allowlist or {}).items():
+        name = str(table).lower().rpartition(".")[2]
+        if name in tables:
+            columns[name] = frozenset(str(c).lower() for c in cols)
+
+    # date_trunc units are literals; lift them out before literals are masked
+    rest = {k: v for k, v in clauses.items() if k != "from"}
+    literals: list[str] = []
+
+    def _mask(m: re.Match[str]) -> str:
+        literals.append(m.group(0))
+        return f"__lit{len(literals) - 1}__"
+
+    out: dict[str, str] = {}
+    for name, text in rest.items():
+        text = re.sub(r"(?i)\bdate_trunc\s*\(\s*'(month|quarter|year)'\s*,", lambda m: f"date_trunc_{m.group(1).lower()}(", text)
+        text = _LITERAL_RE.sub(_mask, text)
+        qualified = _qualify(text, aliases, columns)
+        if qualified is None:
+            return None
+        out[name] = qualified
+
+    # GROUP BY/WHERE resolve bare names to input columns first; an output alias
+    # that shares a name with a rollup column would silently change meaning
+    internal = rollup.columns - set(rollup.dimensions.values())
+    for name in ("where", "group by", "having"):
+        if name in out and {w.lower() for w in _WORD_RE.findall(out[name])} & internal:
+            return None
+
+    # Measures first (so dimensions inside unknown aggregates are caught below)
+    measures: list[str] = []
+
+    def _measure(expr: str) -> Callable[[re.Match[str]], str]:
+        def _sub(_m: re.Match[str]) -> str:
+            measures.append(expr)
+            return f"__m{len(measures) - 1}__"
+
+        return _sub
+
+    for canonical, expr in rollup.measures.items():
+        pat = _pattern(canonical)
+        for name in out:
+            out[name] = pat.sub(_measure(expr), out[name])
+
+    for _, text in out.items():
+        probe = re.sub(r"(?i)\b(?:sum|avg|min|max)\(\s*__m\d+__\s*\)\s*over\b", "", text)
+        calls = {f.lower() for f in re.findall(r"(?i)\b([a-z_]\w*)\s*\(", probe)}
+        if calls & _AGGREGATES:
+            return None
+
+    # Dimensions
+    def _ts_compare(m: re.Match[str]) -> str:
+        literal = literals[int(m.group(2))]
+        if not re.fullmatch(r"'\d{4}-\d{2}-01(?: 00:00(?::00)?)?'", literal):
+            return m.group(0)
+        return f"purchase_month {m.group(1)} __lit{m.group(2)}__"
+
+    ts = re.escape(_TS)
+    for name, text in out.items():
+        text = re.sub(rf"(?i)date_trunc_month\(\s*{ts}\s*\)", "purchase_month", text)
+        text = re.sub(rf"(?i)date_trunc_(quarter|year)\(\s*{ts}\s*\)", r"date_trunc_\1(purchase_month)", text)
+        text = re.sub(rf"(?i)\bextract\(\s*(year|quarter|month)\s+from\s+{ts}\s*\)", r"EXTRACT(\1 FROM purchase_month)", text)
+        text = re.sub(rf"(?i){ts}\s*(>=|<)\s*__lit(\d+)__(?!::)", _ts_compare, text)
+        for base, col in rollup.dimensions.items():
+            text = re.sub(rf"(?i)(?<![\w.]){re.escape(base)}(?![\w.])", col, text)
+        out[name] = text
+
+    # Nothing from the base tables may remain
+    base_cols = {_TS.rpartition(".")[2], *(c for cols in columns.values() for c in cols)}
+    for text in out.values():
+        if re.search(r"(?i)(?<![\w.])[a-z_]\w*\.[a-z_]\w*", text):
+            return None
+        words = {w.lower() for w in _WORD_RE.findall(text)}
+        if words & (base_cols - rollup.columns):
+            return None
+    if re.search(r"(?:^|,)\s*\*\s*(?:,|$)", out["select"]):
+        return None
+    if "group by" not in out and not measures:
+        return None
+
+    def _restore(text: str) -> str:
+        text = re.sub(r"__m(\d+)__", lambda m: measures[int(m.group(1))], text)
+        text = re.sub(r"date_trunc_(month|quarter|year)\(", r"date_trunc('\1', ", text)
+        return re.sub(r"__lit(\d+)__", lambda m: literals[int(m.group(1))], text)
+
+    parts = [f"SELECT {_restore(out['select'])}", f"FROM {rollup.qualified_name}"]
+    for clause in ("where", "group by", "having", "order by", "limit", "offset"):
+        if clause in out:
+            parts.append(f"{clause.upper()} {_restore(out[clause])}")
+    rewritten = " ".join(parts)
+    try:
+        check_sql(rewritten, _ROLLUP_POLICY)
+        check_sql(rewritten, EXECUTOR_POLICY)
+    except ValueError:
+        return None
+    return rollup.name, rewritten
+
+
+class RollupCatalog:
+    """Which rollups exist and are populated, cached for `ttl_seconds`.
+
+    Parameters
+    ----------
+    engine_factory:
+        Returns a SQLAlchemy engine (default: `app.infra.db.get_engine`); any
+        failure means "no rollups" until the next check.
+    ttl_seconds:
+        How long an answer is reused (a rebuild shows up after this).
+    """
+
+    def __init__(self, engine_factory: Callable[[], Any] | None = None, ttl_seconds: float = 300.0) -> None:
+        self._engine_factory = engine_factory or _default_engine
+        self.ttl = float(ttl_seconds)
+        self._names: frozenset[str] = frozenset()
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    def available(self) -> frozenset[str]:
+        with self._lock:
+            if self._checked_at is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._names
+            self._checked_at = time.monotonic()
+            try:
+                import sqlalchemy as sa
+
+                with self._engine_factory().connect() as conn:
+                    rows = conn.execute(
+                        sa.text("SELECT matviewname FROM pg_matviews WHERE schemaname = :s AND ispopulated"),
+                        {"s": _SCHEMA},
+                    ).all()
+                self._names = frozenset(str(r[0]) for r in rows) & {r.name for r in ROLLUPS}
+            except Exception:
+                self._names = frozenset()
+            return self._names
+
+
+def _default_engine() -> Any:
+    from app.infra.db import get_engine  # local import to keep it optional
+
+    return get_engine()
+
+
+def rewrite_plan(plan: Any, allowlist: Mapping[str, Iterable[str]], catalog: RollupCatalog | None) -> Any:
+    """Return `plan` moved onto a rollup when possible, else `plan` unchanged.
+
+    `plan` is a `PlannerPlan`; the rewritten copy keeps its params and limit
+    flag, appends ``rollup:<name>`` to warnings and sets `rollup`. The catalog
+    is only consulted for plans that match a rollup.
+    """
+    hit = rewrite_sql(plan.sql, allowlist)
+    if hit is None:
+        _inc_counter("planner_rollup_total", {"outcome": "miss", "rollup": "none"})
+        return plan
+    name, sql = hit
+    if catalog is not None and name not in catalog.available():
+        _inc_counter("planner_rollup_total", {"outcome": "unavailable", "rollup": name})
+        return plan
+    _inc_counter("planner_rollup_total", {"outcome": "hit", "rollup": name})
+    return type(plan)(
+        sql=sql,
+        params=dict(plan.params),
+        reason=f"{plan.reason} (rollup {name})",
+        limit_applied=plan.limit_applied,
+        warnings=[*plan.warnings, f"rollup:{name}"],
+        lane="light",
+        rollup=name,
+    )
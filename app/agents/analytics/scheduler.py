@@ -0,0 +1,205 @@
+"""
+Concurrency-limited scheduler for analytics statements.
+
+Overview
+  Analytics SQL shares the PostgreSQL pool with the knowledge retriever and
+  the checkpointer. Without a bound, a burst of heavy GROUP BY queries holds
+  every connection and cheap ``COUNT(1)`` questions queue behind them. The
+  scheduler bounds the number of analytics statements running at once and
+  splits them into two lanes:
+
+  - ``light``: may use any free slot and has priority over waiting heavy work;
+  - ``heavy``: at most `heavy_slots` at a time, always leaving at least one
+    slot for light queries.
+
+Design
+  - One `threading.Condition` guards running/waiting counters per lane; the
+    executor runs in worker threads (`asyncio.to_thread`), so a thread
+    condition is the right primitive.
+  - Queue-time deadlines: a query waits at most its lane's queue timeout,
+    clamped to the remaining request budget (`app.infra.deadline`); on expiry
+    `QueueTimeout` (a `RuntimeError` starting with ``queue_timeout:``) is
+    raised and nothing reaches the database.
+  - `classify_lane` picks the lane from the EXPLAIN estimate (admission) when
+    there is one, else from the planner hint (`PlannerPlan.lane`), else light.
+
+Integration
+  - `AnalyticsExecutor.execute` acquires a slot around the data query; the
+    lane and wait time are reported in ``meta["lane"]`` / ``meta["queue_ms"]``.
+  - Settings: `analytics.executor.scheduler_enabled`, `max_concurrent_queries`,
+    `heavy_lane_concurrency`, `light_queue_timeout_seconds`,
+    `heavy_lane_wait_seconds`.
+  - Metrics: `analytics_queue_depth{lane}`, `analytics_queue_running{lane}`,
+    `analytics_queue_wait_ms{lane}`, `analytics_queue_total{lane,outcome}`.
+
+Usage
+  >>> from app.agents.analytics.scheduler import QueryScheduler
+  >>> sched = QueryScheduler(max_concurrency=2, heavy_slots=1)
+  >>> waited_ms = sched.acquire("heavy")
+  >>> sched.stats()["running"]
+  {'light': 0, 'heavy': 1}
+  >>> sched.release("heavy")
+"""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping
+from time import monotonic
+from typing import Any
+
+from app.infra.deadline import bounded_timeout
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+    from app.infra.metrics import observe_histogram as _observe_hist
+    from app.infra.metrics import set_gauge as _set_gauge
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+    def _observe_hist(_name: str, _value: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+    def _set_gauge(_name: str, _value: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+__all__ = ["LANES", "QueryScheduler", "QueueTimeout", "classify_lane", "get_scheduler"]
+
+LANES = ("light", "heavy")
+
+
+class QueueTimeout(RuntimeError):
+    """Raised when a query did not get a slot before its queue deadline."""
+
+
+def classify_lane(hint: Any, admission: Any | None = None) -> str:
+    """Return the lane for a query.
+
+    The EXPLAIN estimate wins when admission produced one; otherwise the
+    planner hint is used when valid; otherwise ``light``.
+
+    >>> classify_lane(None), classify_lane("heavy"), classify_lane("bogus")
+    ('light', 'heavy', 'light')
+    """
+    if admission is not None and getattr(admission, "estimate", None) is not None:
+        return str(admission.lane)
+    if isinstance(hint, str) and hint.lower() in LANES:
+        return hint.lower()
+    return "light"
+
+
+class QueryScheduler:
+    """Bounded, two-lane admission of analytics statements.
+
+    Parameters
+    ----------
+    max_concurrency:
+        Analytics statements running at once across both lanes.
+    heavy_slots:
+        Heavy statements running at once (capped at ``max_concurrency - 1``
+        so light queries always have a slot).
+    light_timeout_s / heavy_timeout_s:
+        Maximum queue wait per lane.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 6,
+        heavy_slots: int = 2,
+        *,
+        light_timeout_s: float = 10.0,
+        heavy_timeout_s: float = 30.0,
+    ) -> None:
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.heavy_slots = max(1, min(int(heavy_slots), max(1, self.max_concurrency - 1)))
+        self._timeouts = {"light": float(light_timeout_s), "heavy": float(heavy_timeout_s)}
+        self._cond = threading.Condition()
+        self._running = dict.fromkeys(LANES, 0)
+        self._waiting = dict.fromkeys(LANES, 0)
+        self._timed_out = dict.fromkeys(LANES, 0)
+
+    def _free(self, lane: str) -> bool:
+        if sum(self._running.values()) >= self.max_concurrency:
+            return False
+        if lane == "heavy":
+            return self._running["heavy"] < self.heavy_slots and self._waiting["light"] == 0
+        return True
+
+    def _publish(self, lane: str) -> None:
+        _set_gauge("analytics_queue_depth", self._waiting[lane], {"lane": lane})
+        _set_gauge("analytics_queue_running", self._running[lane], {"lane": lane})
+
+    def acquire(self, lane: str, *, timeout: float | None = None) -> float:
+        """Wait for a slot in `lane`; return the queue wait in milliseconds.
+
+        Raises
+        ------
+        QueueTimeout
+            When no slot frees up before the lane's queue timeout (or the
+            remaining request budget, whichever is shorter).
+        """
+        if lane not in LANES:
+            raise ValueError(f"unknown lane: {lane}")
+        wait_s = self._timeouts[lane] if timeout is None else float(timeout)
+        bounded = bounded_timeout(wait_s)
+        if bounded is not None:
+            wait_s = bounded
+        t0 = monotonic()
+        deadline = t0 + max(0.0, wait_s)
+        with self._cond:
+            self._waiting[lane] += 1
+            self._publish(lane)
+            try:
+                while not self._free(lane):
+                    remaining = deadline - monotonic()
+                    if remaining <= 0:
+                        self._timed_out[lane] += 1
+                        _inc_counter("analytics_queue_total", {"lane": lane, "outcome": "timeout"})
+                        raise QueueTimeout(f"queue_timeout: no {lane} slot within {wait_s:.1f}s")
+                    self._cond.wait(remaining)
+                self._running[lane] += 1
+            finally:
+                self._waiting[lane] -= 1
+                self._publish(lane)
+                if lane == "light" and self._waiting["light"] == 0:
+                    self._cond.notify_all()  # heavy waiters may proceed now
+        waited_ms = (monotonic() - t0) * 1000.0
+        _inc_counter("analytics_queue_total", {"lane": lane, "outcome": "admitted"})
+        _observe_hist("analytics_queue_wait_ms", waited_ms, {"lane": lane})
+        return waited_ms
+
+    def release(self, lane: str) -> None:
+        """Return a slot taken by `acquire`."""
+        with self._cond:
+            self._running[lane] = max(0, self._running[lane] - 1)
+            self._publish(lane)
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "heavy_slots": self.heavy_slots,
+                "running": dict(self._running),
+                "waiting": dict(self._waiting),
+                "timed_out": dict(self._timed_out),
+            }
+
+
+_SCHEDULER: QueryScheduler | None = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler(cfg: Any | None = None) -> QueryScheduler:
+    """Return the process-wide scheduler, built from `analytics.executor` settings."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = QueryScheduler(
+                int(getattr(cfg, "max_concurrent_queries", 6)),
+                int(getattr(cfg, "heavy_lane_concurrency", 2)),
+                light_timeout_s=float(getattr(cfg, "light_queue_timeout_seconds", 10.0)),
+                heavy_timeout_s=float(getattr(cfg, "heavy_lane_wait_seconds", 30.0)),
+            )
+        return _SCHEDULER
@@ -0,0 +1,447 @@
+"""
+Deterministic pt-BR templates for common analytics result shapes.
+
+Overview
+  Most analytics answers do not need an LLM: a single count or sum, a
+  category/value ranking, a period time series or a per-state distribution
+  read the same way every time. `render_template` recognizes those shapes
+  and writes the answer locally in the style of the normalizer's few-shot
+  examples ("Receita por estado:\\n  SP: R$ 1.234,56 ...\\n\\nTotal: ...").
+  Anything else returns None and goes to the LLM normalizer.
+
+Design
+  - Conservative: a template is used only when every column is understood.
+    Metric columns must map to a known label (money, count noun, percentage),
+    dimensions to a known entity (estado, categoria, produto, ...). Unknown
+    columns, NULL metrics, truncated results (`limit_applied` outside top-N
+    questions), results above `max_rows` and questions asking for analysis
+    ("por que", "padrões", "compare", "tendência", ...) are left to the LLM.
+  - Shapes: ``scalar`` (1 row x 1 metric), ``state_distribution`` (state +
+    metric), ``ranking`` (other dimension + metric, numbered for top-N
+    questions) and ``time_series`` (period + metric, yearly/quarterly/
+    monthly/weekly/daily). The period unit comes from the SQL's
+    ``date_trunc`` argument or the column name; when neither says it, the
+    series is left to the LLM rather than guessed from the dates.
+  - Totals are only printed for additive metrics (sums and counts, not
+    averages or percentages). Averages are named in the title ("Preço
+    médio"), not repeated after every value.
+  - Pure functions over rows; no settings, I/O or metrics here.
+
+Integration
+  - `AnalyticsNormalizer.normalize` tries the templates first when
+    `analytics.normalizer.template_fast_path` is on and records the hit
+    ratio and latency saved (`normalizer_fast_path_total`,
+    `normalizer_fast_path_saved_ms`).
+
+Usage
+  >>> from app.agents.analytics.templates import render_template
+  >>> render_template("Quantos pedidos temos?", [{"total_orders": 99441}]).text
+  'Existem 99.441 pedidos.'
+  >>> out = render_template("Receita por estado", [{"customer_state": "SP", "revenue": 1234.5}, {"customer_state": "RJ", "revenue": 10}])
+  >>> print(out.text)
+  Receita por estado:
+    SP: R$ 1.234,50
+    RJ: R$ 10,00
+  <BLANKLINE>
+  Total: R$ 1.244,50
+  >>> render_template("Por que a receita caiu?", [{"revenue": 1.0}]) is None
+  True
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+
+__all__ = [
+    "TEMPLATE_SHAPES",
+    "RenderedAnswer",
+    "render_template",
+]
+
+TEMPLATE_SHAPES: tuple[str, ...] = ("scalar", "ranking", "state_distribution", "time_series")
+
+_ANALYSIS_RE = re.compile(
+    r"por\s*qu[eê]|porque|padr[õo]|tend[êe]nc|insight|an[áa]lis|explique|explica|compar|correla|"
+    r"sazonal|recomend|varia[çc]|crescimento|previs|impacto|diferen[çc]a",
+    re.IGNORECASE,
+)
+_TOP_RE = re.compile(r"\btop\b|\bmaiores\b|\bmenores\b|\bprincipais\b|\branking\b|\bmelhores\b|\bpiores\b", re.IGNORECASE)
+_UF_RE = re.compile(r"^[A-Z]{2}$")
+
+# Column tokens -> (label, feminine) for money metrics
+_MONEY: dict[str, tuple[str, bool]] = {
+    "revenue": ("Receita", True),
+    "receita": ("Receita", True),
+    "gmv": ("GMV", False),
+    "sales": ("Vendas", True),
+    "price": ("Preço", False),
+    "preco": ("Preço", False),
+    "freight": ("Frete", False),
+    "frete": ("Frete", False),
+    "payment": ("Valor pago", False),
+    "ticket": ("Ticket", False),
+    "margin": ("Margem", True),
+    "amount": ("Valor", False),
+    "valor": ("Valor", False),
+    "value": ("Valor", False),
+}
+# Column tokens -> (singular, plural) for counted entities
+_NOUNS: dict[str, tuple[str, str]] = {
+    "order": ("pedido", "pedidos"),
+    "orders": ("pedido", "pedidos"),
+    "pedidos": ("pedido", "pedidos"),
+    "customer": ("cliente", "clientes"),
+    "customers": ("cliente", "clientes"),
+    "clientes": ("cliente", "clientes"),
+    "seller": ("vendedor", "vendedores"),
+    "sellers": ("vendedor", "vendedores"),
+    "vendedores": ("vendedor", "vendedores"),
+    "product": ("produto", "produtos"),
+    "products": ("produto", "produtos"),
+    "produtos": ("produto", "produtos"),
+    "item": ("item", "itens"),
+    "items": ("item", "itens"),
+    "itens": ("item", "itens"),
+    "review": ("avaliação", "avaliações"),
+    "reviews": ("avaliação", "avaliações"),
+}
+_COUNT_TOKENS = frozenset({"count", "qty", "quantity", "total", "n", "num", "number", "cnt", "qtd", "quantidade"})
+_AVG_TOKENS = frozenset({"avg", "average", "mean", "media", "medio"})
+_PCT_TOKENS = frozenset({"pct", "percent", "percentage", "percentual", "share"})
+_RATE_TOKENS = frozenset({"rate", "taxa"})
+_RATE_SUBJECTS: tuple[tuple[str, str], ...] = (
+    ("cancel", "de cancelamento"),
+    ("late", "de atraso"),
+    ("delay", "de atraso"),
+    ("atras", "de atraso"),
+    ("deliver", "de entrega"),
+    ("entreg", "de entrega"),
+    ("conver", "de conversão"),
+)
+
+# Dimension tokens -> (singular, plural)
+_DIMENSIONS: tuple[tuple[frozenset[str], tuple[str, str]], ...] = (
+    (frozenset({"state", "uf", "estado"}), ("estado", "estados")),
+    (frozenset({"category", "categoria"}), ("categoria", "categorias")),
+    (frozenset({"payment_type", "payment_method"}), ("método de pagamento", "métodos de pagamento")),
+    (frozenset({"city", "cidade"}), ("cidade", "cidades")),
+    (frozenset({"seller", "vendedor"}), ("vendedor", "vendedores")),
+    (frozenset({"product", "produto"}), ("produto", "produtos")),
+    (frozenset({"status"}), ("status", "status")),
+)
+_TEMPORAL_TOKENS = frozenset(
+    {"period", "month", "mes", "date", "day", "dia", "year", "ano", "week", "semana", "quarter", "trimestre"}
+)
+# Period unit by column token; "period" and "date" say nothing about the unit
+_UNIT_TOKENS = {
+    "year": "year", "ano": "year",
+    "quarter": "quarter", "trimestre": "quarter",
+    "month": "month", "mes": "month",
+    "week": "week", "semana": "week",
+    "day": "day", "dia": "day",
+}
+_DATE_TRUNC_RE = re.compile(r"\bdate_trunc\s*\(\s*'(\w+)'", re.IGNORECASE)
+# unit -> (adjective, plural noun, "analisados"/"analisadas")
+_UNIT_WORDS = {
+    "year": ("anual", "anos", "analisados"),
+    "quarter": ("trimestral", "trimestres", "analisados"),
+    "month": ("mensal", "meses", "analisados"),
+    "week": ("semanal", "semanas", "analisadas"),
+    "day": ("diária", "dias", "analisados"),
+}
+_MONTHS = (
+    "Janeiro", "Fevereiro", "Março", "Abril", "Maio", "Junho",
+    "Julho", "Agosto", "Setembro", "Outubro", "Novembro", "Dezembro",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class RenderedAnswer:
+    """Text produced by a template and the shape it matched."""
+
+    shape: str
+    text: str
+
+
+@dataclass(frozen=True, slots=True)
+class _Metric:
+    column: str
+    kind: str  # money | count | pct
+    label: str
+    feminine: bool = False
+    noun: tuple[str, str] | None = None
+    average: bool = False
+
+    @property
+    def additive(self) -> bool:
+        return self.kind in ("money", "count") and not self.average
+
+    def title(self) -> str:
+        if self.average:
+            return f"{self.label} {'média' if self.feminine else 'médio'}"
+        return self.label
+
+    def fmt(self, value: float) -> str:
+        if self.kind == "money":
+            text = "R$ " + _ptbr(value, 2)
+        elif self.kind == "pct":
+            text = _ptbr(value, 2) + "%"
+        elif self.average or not float(value).is_integer():
+            text = _ptbr(value, 2)
+        else:
+            text = _ptbr(value, 0)
+        return text
+
+
+def _ptbr(value: float, decimals: int) -> str:
+    return f"{value:,.{decimals}f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def _tokens(column: str) -> list[str]:
+    return [t for t in re.split(r"[_\W]+", column.lower()) if t]
+
+
+def _number(v: Any) -> float | None:
+    if isinstance(v, bool) or v is None:
+        return None
+    if isinstance(v, (int, float, Decimal)):
+        return float(v)
+    return None
+
+
+def _metric(column: str, sql: str) -> _Metric | None:
+    tokens = _tokens(column)
+    tset = set(tokens)
+    average = bool(tset & _AVG_TOKENS)
+    for t in tokens:
+        if t in _MONEY:
+            label, feminine = _MONEY[t]
+            return _Metric(column, "money", label, feminine, average=average)
+    if tset & _PCT_TOKENS:
+        label = "Participação" if "share" in tset else "Percentual"
+        return _Metric(column, "pct", label, label != "Percentual", average=False)
+    if tset & _RATE_TOKENS:
+        # Rates are only rendered when the SQL already scales them to percent
+        if "100" not in sql:
+            return None
+        subject = next((label for prefix, label in _RATE_SUBJECTS if any(t.startswith(prefix) for t in tokens)), "")
+        return _Metric(column, "pct", f"Taxa {subject}".strip(), True, average=False)
+    noun = next((_NOUNS[t] for t in tokens if t in _NOUNS), None)
+    if noun is not None and (tset & _COUNT_TOKENS or len(tokens) == 1 or average):
+        return _Metric(column, "count", noun[1].capitalize(), False, noun=noun, average=average)
+    return None
+
+
+def _dimension(column: str) -> tuple[str, str] | None:
+    lowered = column.lower()
+    tset = set(_tokens(column))
+    for keys, names in _DIMENSIONS:
+        if tset & keys or any("_" in k and k in lowered for k in keys):
+            return names
+    return None
+
+
+def _is_temporal(column: str, values: Sequence[Any]) -> bool:
+    if set(_tokens(column)) & _TEMPORAL_TOKENS:
+        return True
+    return all(isinstance(v, (date, datetime)) for v in values)
+
+
+def _period_unit(column: str, sql: str) -> str | None:
+    units = {u.lower() for u in _DATE_TRUNC_RE.findall(sql or "")}
+    if len(units) == 1:
+        unit = units.pop()
+        return unit if unit in _UNIT_WORDS else None
+    named = {_UNIT_TOKENS[t] for t in _tokens(column) if t in _UNIT_TOKENS}
+    return named.pop() if len(named) == 1 else None
+
+
+def _as_date(v: Any) -> date | int | None:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    if isinstance(v, int) and 1900 <= v <= 2100:
+        return v
+    if isinstance(v, str):
+        m = re.match(r"^(\d{4})-(\d{2})(?:-(\d{2}))?", v.strip())
+        if m:
+            return date(int(m.group(1)), int(m.group(2)), int(m.group(3) or 1))
+        if re.fullmatch(r"\d{4}", v.strip()):
+            return int(v)
+    return None
+
+
+def render_template(
+    question: str,
+    rows: Sequence[Mapping[str, Any]],
+    *,
+    sql: str = "",
+    limit_applied: bool = False,
+    max_rows: int = 30,
+    max_periods: int = 36,
+) -> RenderedAnswer | None:
+    """Render a pt-BR answer for a common result shape, or None.
+
+    Parameters
+    ----------
+    question:
+        The user's question (analysis questions are left to the LLM).
+    rows:
+        Result rows; every row must have the first row's columns.
+    sql:
+        Executed SQL (used to tell percent-scaled rates apart).
+    limit_applied:
+        Truncated results are left to the LLM (except for top-N questions,
+        where the LIMIT is the question).
+    max_rows:
+        Largest ranking/state distribution rendered locally.
+    max_periods:
+        Largest time series rendered locally.
+    """
+    question = question or ""
+    if not rows or _ANALYSIS_RE.search(question):
+        return None
+    if limit_applied and not _TOP_RE.search(question):
+        # A LIMIT is expected for top-N questions; elsewhere it truncated the answer
+        return None
+    columns = list(rows[0].keys())
+    if any(list(r.keys()) != columns for r in rows):
+        return None
+
+    if len(columns) == 1 and len(rows) == 1:
+        return _scalar(columns[0], rows[0][columns[0]], sql)
+    if len(columns) != 2 or len(rows) < 2:
+        return None
+
+    # One dimension column and one metric column
+    numeric = [c for c in columns if all(_number(r[c]) is not None for r in rows)]
+    others = [c for c in columns if c not in numeric]
+    if len(numeric) == 2 and any(_is_temporal(c, [r[c] for r in rows]) for c in columns):
+        # Integer years look numeric
+        others = [c for c in columns if _is_temporal(c, [r[c] for r in rows])][:1]
+        numeric = [c for c in columns if c not in others]
+    if len(numeric) != 1 or len(others) != 1:
+        return None
+    metric = _metric(numeric[0], sql)
+    if metric is None:
+        return None
+    dim_col = others[0]
+    dim_values = [r[dim_col] for r in rows]
+    values = [float(_number(r[metric.column]) or 0.0) for r in rows]
+
+    if _is_temporal(dim_col, dim_values):
+        if len(rows) > max_periods:
+            return None
+        return _time_series(metric, _period_unit(dim_col, sql), dim_values, values)
+    if len(rows) > max_rows:
+        return None
+    dim = _dimension(dim_col)
+    if dim is None:
+        return None
+    labels = ["(não informado)" if v is None else str(v) for v in dim_values]
+    if dim[0] == "estado" and all(_UF_RE.match(s) for s in labels):
+        return _state_distribution(question, metric, labels, values)
+    return _ranking(question, metric, dim, labels, values)
+
+
+def _scalar(column: str, raw: Any, sql: str) -> RenderedAnswer | None:
+    value = _number(raw)
+    metric = _metric(column, sql)
+    if value is None or metric is None:
+        return None
+    if metric.kind == "count" and not metric.average and metric.noun is not None:
+        singular, plural = metric.noun
+        if value == 0:
+            return RenderedAnswer("scalar", f"Não há {plural} para esse critério.")
+        if value == 1:
+            return RenderedAnswer("scalar", f"Existe 1 {singular}.")
+        return RenderedAnswer("scalar", f"Existem {metric.fmt(value)} {plural}.")
+    if metric.kind == "money" and not metric.average:
+        return RenderedAnswer("scalar", f"{metric.label} total: {metric.fmt(value)}.")
+    return RenderedAnswer("scalar", f"{metric.title()}: {metric.fmt(value)}.")
+
+
+def _total_line(metric: _Metric, values: Sequence[float], suffix: str = "") -> str:
+    if not metric.additive:
+        return ""
+    total = sum(values)
+    if metric.kind == "count" and metric.noun is not None:
+        return f"\n\nTotal: {metric.fmt(total)} {metric.noun[1]}{suffix}."
+    return f"\n\nTotal: {metric.fmt(total)}{suffix}"
+
+
+def _state_distribution(question: str, metric: _Metric, labels: list[str], values: list[float]) -> RenderedAnswer:
+    if metric.kind == "count" and not metric.average and "distribui" in question.lower() and metric.noun:
+        title = f"Distribuição de {metric.noun[1]} por estado:"
+    else:
+        title = f"{metric.title()} por estado:"
+    lines = [title] + [f"  {s}: {metric.fmt(v)}" for s, v in zip(labels, values, strict=True)]
+    suffix = f" em {len(labels)} estados" if metric.kind == "count" else ""
+    return RenderedAnswer("state_distribution", "\n".join(lines) + _total_line(metric, values, suffix))
+
+
+def _ranking(
+    question: str, metric: _Metric, dim: tuple[str, str], labels: list[str], values: list[float]
+) -> RenderedAnswer:
+    if _TOP_RE.search(question):
+        title = f"Top {len(labels)} {dim[1]} por {metric.title().lower()}:"
+        lines = [title] + [f"  {i}. {k}: {metric.fmt(v)}" for i, (k, v) in enumerate(zip(labels, values, strict=True), 1)]
+        return RenderedAnswer("ranking", "\n".join(lines))
+    lines = [f"{metric.title()} por {dim[0]}:"] + [f"  {k}: {metric.fmt(v)}" for k, v in zip(labels, values, strict=True)]
+    return RenderedAnswer("ranking", "\n".join(lines) + _total_line(metric, values))
+
+
+def _time_series(
+    metric: _Metric, unit: str | None, raw_periods: Sequence[Any], values: list[float]
+) -> RenderedAnswer | None:
+    periods = [_as_date(p) for p in raw_periods]
+    if unit is None or any(p is None for p in periods):
+        return None
+    years = {p if isinstance(p, int) else p.year for p in periods}  # type: ignore[union-attr]
+    if unit == "year":
+        if not all(isinstance(p, int) or (p.month, p.day) == (1, 1) for p in periods):  # type: ignore[union-attr]
+            return None
+        labels = [str(y) for y in (p if isinstance(p, int) else p.year for p in periods)]  # type: ignore[union-attr]
+    elif any(isinstance(p, int) for p in periods):
+        return None
+    elif unit == "quarter":
+        if not all(p.day == 1 and p.month % 3 == 1 for p in periods):  # type: ignore[union-attr]
+            return None
+        labels = [
+            f"{(p.month - 1) // 3 + 1}º trimestre" + ("" if len(years) == 1 else f"/{p.year}")  # type: ignore[union-attr]
+            for p in periods
+        ]
+    elif unit == "month":
+        if not all(p.day == 1 for p in periods):  # type: ignore[union-attr]
+            return None
+        labels = [
+            _MONTHS[p.month - 1] if len(years) == 1 else f"{_MONTHS[p.month - 1]}/{p.year}"  # type: ignore[union-attr]
+            for p in periods
+        ]
+    elif unit == "week":
+        labels = [f"Semana de {p.strftime('%d/%m/%Y')}" for p in periods]  # type: ignore[union-attr]
+    else:
+        labels = [p.strftime("%d/%m/%Y") for p in periods]  # type: ignore[union-attr]
+    granularity, unit_plural, analyzed = _UNIT_WORDS[unit]
+
+    if metric.kind == "count" and metric.noun is not None:
+        subject = metric.noun[1] if not metric.average else f"{metric.noun[1]} (média)"
+        title = f"Evolução {granularity} de {subject}:"
+        unit_noun = "" if metric.average else f" {metric.noun[1]}"
+    else:
+        article = "da" if metric.feminine else "do"
+        title = f"Evolução {granularity} {article} {metric.title().lower()}:"
+        unit_noun = ""
+    lines = [title] + [f"  {k}: {metric.fmt(v)}{unit_noun}" for k, v in zip(labels, values, strict=True)]
+    text = "\n".join(lines)
+    if metric.additive:
+        total = metric.fmt(sum(values))
+        noun = f" {metric.noun[1]}" if metric.kind == "count" and metric.noun else ""
+        text += f"\n\nTotal: {total}{noun} em {len(labels)} {unit_plural} {analyzed}."
+    return RenderedAnswer("time_series", text)
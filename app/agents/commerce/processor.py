@@ -14,6 +14,8 @@ Design
 - Output: extracted text, metadata, and processing method used
 - Multi-format support: PDF (pypdf + OCR), DOCX (python-docx), TXT (direct), images (OCR)
 - OCR fallback: when text extraction fails or produces poor results
+- OCR calls are bounded by the remaining request budget (`app.infra.deadline`);
+  multi-page PDFs stop early with a warning once it is spent
 - Dependency-light: optional imports with graceful degradation
 
 Integration
@@ -44,6 +46,8 @@ import tempfile
 from pathlib import Path
 from typing import Any, Final
 
+from app.infra.deadline import bounded_timeout, remaining_s
+
 try:  # Optional logger
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -115,6 +119,11 @@ except Exception:
 __all__ = ["DocumentProcessor"]
 
 
+def _ocr_timeout() -> float:
+    """Per-call tesseract timeout from the request budget (0 = unbounded)."""
+    return float(bounded_timeout(None) or 0.0)
+
+
 # ---------------------------------------------------------------------------
 # Document Processor
 # ---------------------------------------------------------------------------
@@ -310,10 +319,14 @@ class DocumentProcessor:
                     texts = []
                     
                     for i, image in enumerate(images):
+                        left = remaining_s()
+                        if left is not None and left <= 0.0:
+                            warnings.append(f"OCR stopped at page {i+1}/{len(images)}: request time budget exhausted")
+                            break
                         try:
                             self.log.debug(f"Processing page {i+1}/{len(images)} with OCR...", extra={"file_name": filename, "page": i+1})
                             # OCR each page
-                            page_text = pytesseract.image_to_string(image, lang='eng+por')
+                            page_text = pytesseract.image_to_string(image, lang='eng+por', timeout=_ocr_timeout())
                             if page_text.strip():
                                 texts.append(page_text.strip())
                                 self.log.debug(f"Page {i+1} OCR completed, extracted {len(page_text)} characters", extra={"file_name": filename, "page": i+1})
@@ -540,12 +553,14 @@ class DocumentProcessor:
 
                 # OCR with both English and Portuguese (configurable via env)
                 lang = os.getenv("OCR_LANG", "eng+por")
-                text = pytesseract.image_to_string(image, lang=lang)
+                text = pytesseract.image_to_string(image, lang=lang, timeout=_ocr_timeout())
                 
                 # Get confidence data if available
                 confidence = None
                 try:
-                    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT, lang=lang)
+                    data = pytesseract.image_to_data(
+                        image, output_type=pytesseract.Output.DICT, lang=lang, timeout=_ocr_timeout()
+                    )
                     confidences = [int(conf) for conf in data['conf'] if int(conf) > 0]
                     if confidences:
                         confidence = sum(confidences) / len(confidences)
@@ -83,6 +83,15 @@ except Exception:  # pragma: no cover - optional
     import logging as _logging
     log = _logging.getLogger("agent.knowledge.answerer")
 
+# Concurrent cache misses for the same question + hits share one LLM call;
+# created once at import so every caller coalesces on the same instance
+try:
+    from app.infra.cache import SingleFlight as _SingleFlight
+
+    _ANSWER_FLIGHT: Any = _SingleFlight("knowledge_answer")
+except Exception:  # pragma: no cover - optional
+    _ANSWER_FLIGHT = None
+
 
 # ---------------------------------------------------------------------------
 # Types
@@ -265,9 +274,19 @@ def _compose_summary_ptbr(query: str, hits: Sequence[_HitView], cap_chars: int)
         cached = cache.get(query, "knowledge", context=context)
         if cached is not None and isinstance(cached, dict) and "text" in cached:
             return cached["text"]
+
+        flight = _ANSWER_FLIGHT
+        key = cache.key_for(query, "knowledge", context)
     except Exception:
-        pass
-    
+        flight = None
+
+    if flight is not None:
+        return flight.do(key, lambda: _compose_summary_ptbr_uncached(query, hits, cap_chars))
+    return _compose_summary_ptbr_uncached(query, hits, cap_chars)
+
+
+def _compose_summary_ptbr_uncached(query: str, hits: Sequence[_HitView], cap_chars: int) -> str:
+    """Compose the answer (LLM with extractive fallback) and cache it."""
     # Prepare compact, relevant context from hits (salience-based, capped)
     # 1) Take up to 3 hits
     selected = list(hits[:3])
@@ -40,6 +40,8 @@ from collections.abc import Mapping, Sequence
 from dataclasses import dataclass
 from typing import Any, Final, Protocol, runtime_checkable
 
+from app.infra.deadline import allow_optional
+
 try:  # Optional logger
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -176,7 +178,7 @@ class KnowledgeRanker:
                 except Exception:
                     pass
 
-            if use_llm_reranker and hits:
+            if use_llm_reranker and hits and allow_optional("llm_reranker"):
                 try:
                     from app.infra.llm_client import get_llm_client
                     client = get_llm_client()
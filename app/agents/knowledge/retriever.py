@@ -19,6 +19,10 @@ Design
 - Filtering: lightweight SQL WHERE clauses for common fields (doc_id, source,
   title, mime, tag); for generic key/value, uses JSON containment on metadata.
 - Deduplication: keep the best chunk per `doc_id` by score.
+- Probe reuse: a result keeps its query embedding and the deduplicated
+  candidate pool (before `min_score`/`top_k`). `to_probe()` packs both for
+  graph state so `retrieve(..., probe=...)` can answer the same query from the
+  pool, or at least skip the embedding call, instead of querying twice.
 - Safety: no DML/DDL; parameterized SQL; no untrusted string interpolation.
 
 Integration
@@ -43,15 +47,17 @@ import asyncio
 import json
 import os
 import re
-import hashlib
 from collections.abc import Mapping, Sequence
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass, field
 from time import monotonic
 from typing import Any, Final
 
 import sqlalchemy as sa
 from sqlalchemy.engine import Engine
 
+from app.infra.deadline import bounded_timeout
+from app.utils.vectors import hash_embedding
+
 try:  # Optional logger
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -81,6 +87,12 @@ except Exception:  # pragma: no cover - optional
 
     start_span = _fallback_start_span
 
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
 __all__ = ["RetrievalHit", "RetrievalResult", "KnowledgeRetriever"]
 
 
@@ -102,21 +114,52 @@ class RetrievalHit:
 
 @dataclass(slots=True)
 class RetrievalResult:
-    """Retrieval outcome with diagnostics."""
+    """Retrieval outcome with diagnostics.
+
+    `candidates` is the deduplicated pool fetched from the store (sorted by
+    score, before `min_score`/`top_k`); `candidate_limit` is the SQL LIMIT used
+    to fetch it and `exhaustive` tells whether the store had fewer rows.
+    """
 
     hits: list[RetrievalHit]
     elapsed_ms: float
     used_filters: dict[str, Any]
     no_context: bool
+    query_vector: list[float] | None = None
+    candidates: list[RetrievalHit] = field(default_factory=list)
+    candidate_limit: int = 0
+    exhaustive: bool = False
+    model: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
         return {
-            "hits": [hit.__dict__ for hit in self.hits],
+            "hits": [asdict(hit) for hit in self.hits],
             "elapsed_ms": self.elapsed_ms,
             "used_filters": dict(self.used_filters),
             "no_context": self.no_context,
         }
 
+    def select(self, *, top_k: int, min_score: float) -> list[RetrievalHit]:
+        """Return the best `top_k` candidates scoring at least `min_score`."""
+        return [h for h in self.candidates if h.score >= min_score][: max(1, int(top_k))]
+
+    def to_probe(self, query: str) -> dict[str, Any]:
+        """Pack the result for graph state (reused by `retrieve(probe=...)`).
+
+        The embedding is stored as base64 float32 to keep checkpoints small.
+        """
+        from app.utils.conversation_search import encode_embedding
+
+        return {
+            "query": query,
+            "model": self.model,
+            "filters": dict(self.used_filters),
+            "query_vector": encode_embedding(self.query_vector) if self.query_vector else None,
+            "candidates": [asdict(h) for h in self.candidates],
+            "candidate_limit": self.candidate_limit,
+            "exhaustive": self.exhaustive,
+        }
+
 
 # ---------------------------------------------------------------------------
 # Retriever
@@ -170,10 +213,21 @@ class KnowledgeRetriever:
         top_k: int | None = None,
         min_score: float | None = None,
         filters: Mapping[str, Any] | None = None,
+        probe: Mapping[str, Any] | None = None,
+        timeout_s: float | None = None,
     ) -> RetrievalResult:
         """Return top‑K hits above `min_score` with light deduplication.
 
         If there are zero hits ≥ `min_score`, `no_context` will be True.
+
+        `probe` is a payload from :meth:`RetrievalResult.to_probe` (the route
+        probe). When it was computed for the same query, model and filters,
+        its candidate pool answers the call without a database round trip if
+        it is large enough; otherwise its embedding is reused for the query.
+
+        `timeout_s` bounds the vector query (Postgres `statement_timeout`), so
+        an abandoned caller does not keep a connection busy; it is further
+        clamped to the remaining request budget when one is active.
         """
         
         # Get configuration values with fallbacks
@@ -191,12 +245,27 @@ class KnowledgeRetriever:
         if not (query or "").strip():
             return RetrievalResult(hits=[], elapsed_ms=0.0, used_filters={}, no_context=True)
 
+        limit = max(1, top_k_i * self.candidate_factor)
+        reuse = self._match_probe(probe, query, filters)
+
         with start_span("agent.knowledge.retrieve", {"top_k": top_k_i, "min_score": min_score_f}):
             t0 = monotonic()
-            qvec = _embed_query(query, model=self.model)
+            if reuse is not None and (reuse.exhaustive or reuse.candidate_limit >= limit):
+                _inc_counter("retrieval_probe_reuse_total", {"outcome": "candidates"})
+                hits2 = reuse.select(top_k=top_k_i, min_score=min_score_f)
+                reuse.hits = hits2
+                reuse.no_context = len(hits2) == 0
+                reuse.elapsed_ms = (monotonic() - t0) * 1000.0
+                return reuse
+            if reuse is not None and reuse.query_vector:
+                _inc_counter("retrieval_probe_reuse_total", {"outcome": "embedding"})
+                qvec = reuse.query_vector
+            else:
+                if probe is not None:
+                    _inc_counter("retrieval_probe_reuse_total", {"outcome": "miss"})
+                qvec = list(_embed_query(query, model=self.model))
             engine = _get_engine()
 
-            limit = max(1, top_k_i * self.candidate_factor)
             where_sql, where_params = _build_where(filters or {})
 
             if self.distance != "cosine":
@@ -212,7 +281,7 @@ class KnowledgeRetriever:
             )
 
             params: dict[str, Any] = {"qvec": qvec, "limit": limit, **where_params}
-            rows = _execute(engine, sql, params)
+            rows = _execute(engine, sql, params, timeout_s=bounded_timeout(timeout_s))
 
             hits = [
                 RetrievalHit(
@@ -233,8 +302,8 @@ class KnowledgeRetriever:
                 if h.doc_id not in dedup or h.score > dedup[h.doc_id].score:
                     dedup[h.doc_id] = h
 
-            hits2 = sorted(dedup.values(), key=lambda h: h.score, reverse=True)
-            hits2 = [h for h in hits2 if h.score >= min_score_f]
+            candidates = sorted(dedup.values(), key=lambda h: h.score, reverse=True)
+            hits2 = [h for h in candidates if h.score >= min_score_f]
             hits2 = hits2[: top_k_i]
 
             elapsed = (monotonic() - t0) * 1000.0
@@ -243,6 +312,11 @@ class KnowledgeRetriever:
                 elapsed_ms=elapsed,
                 used_filters=dict(filters or {}),
                 no_context=(len(hits2) == 0),
+                query_vector=qvec,
+                candidates=candidates,
+                candidate_limit=limit,
+                exhaustive=len(rows) < limit,
+                model=self.model,
             )
 
     async def retrieve_async(
@@ -252,6 +326,8 @@ class KnowledgeRetriever:
         top_k: int | None = None,
         min_score: float | None = None,
         filters: Mapping[str, Any] | None = None,
+        probe: Mapping[str, Any] | None = None,
+        timeout_s: float | None = None,
     ) -> RetrievalResult:
         """Asynchronous wrapper for :meth:`retrieve`.
 
@@ -266,8 +342,43 @@ class KnowledgeRetriever:
             top_k=top_k,
             min_score=min_score,
             filters=filters,
+            probe=probe,
+            timeout_s=timeout_s,
         )
 
+    def _match_probe(
+        self,
+        probe: Mapping[str, Any] | None,
+        query: str,
+        filters: Mapping[str, Any] | None,
+    ) -> RetrievalResult | None:
+        """Rebuild a probe payload as a result when it applies to this call."""
+        if not probe or str(probe.get("query") or "").strip() != query.strip():
+            return None
+        if probe.get("model") != self.model or dict(probe.get("filters") or {}) != dict(filters or {}):
+            return None
+        try:
+            qvec: list[float] | None = None
+            if probe.get("query_vector"):
+                from app.utils.conversation_search import decode_embedding
+
+                arr = decode_embedding(str(probe["query_vector"]))
+                qvec = list(arr) if arr is not None else None
+            candidates = [RetrievalHit(**dict(h)) for h in (probe.get("candidates") or [])]
+            return RetrievalResult(
+                hits=[],
+                elapsed_ms=0.0,
+                used_filters=dict(filters or {}),
+                no_context=True,
+                query_vector=qvec,
+                candidates=candidates,
+                candidate_limit=int(probe.get("candidate_limit") or 0),
+                exhaustive=bool(probe.get("exhaustive")),
+                model=self.model,
+            )
+        except Exception:
+            return None
+
 
 # ---------------------------------------------------------------------------
 # DB / Embeddings / Filters helpers
@@ -294,8 +405,20 @@ def _get_engine() -> Engine:
     return get_engine()
 
 
-def _execute(engine: Engine, sql: str, params: Mapping[str, Any]) -> list[dict[str, Any]]:
+def _execute(
+    engine: Engine,
+    sql: str,
+    params: Mapping[str, Any],
+    *,
+    timeout_s: float | None = None,
+) -> list[dict[str, Any]]:
     with engine.connect() as conn:
+        if timeout_s is not None and engine.dialect.name == "postgresql":
+            # Transaction-local; the implicit transaction ends with the connection
+            conn.execute(
+                sa.text("SELECT set_config('statement_timeout', :ms, true)"),
+                {"ms": str(max(1, int(timeout_s * 1000)))},
+            )
         result = conn.execute(sa.text(sql), params)
         return [dict(r) for r in result.mappings()]
 
@@ -303,39 +426,41 @@ def _execute(engine: Engine, sql: str, params: Mapping[str, Any]) -> list[dict[s
 def _embed_query(text: str, *, model: str) -> Sequence[float]:
     # Check embedding cache first
     try:
-        from app.infra.cache import EmbeddingCache
+        from app.infra.cache import SingleFlight
+        from app.infra.embeddings import get_embedder
         
-        # Use singleton embedding cache instance
+        # Share the process-wide embedding cache with the micro-batcher
         if not hasattr(_embed_query, "_embedding_cache"):
-            _embed_query._embedding_cache = EmbeddingCache(ttl_seconds=86400, max_size=5000)  # type: ignore[attr-defined]
+            _embed_query._embedding_cache = get_embedder().cache  # type: ignore[attr-defined]
+            _embed_query._flight = SingleFlight("retriever_embed")  # type: ignore[attr-defined]
         
         cache = _embed_query._embedding_cache  # type: ignore[attr-defined]
         cached = cache.get(text, model)
         if cached is not None:
             return cached
+        # Concurrent misses for the same text share one provider call
+        flight = _embed_query._flight  # type: ignore[attr-defined]
+        key = cache.key_for(text, model)
     except Exception:
-        pass
+        flight = None
     
-    # Prefer centralized client if available; fallback to local hashing
+    if flight is not None:
+        return flight.do(key, lambda: _embed_query_uncached(text, model=model))
+    return _embed_query_uncached(text, model=model)
+
+
+def _embed_query_uncached(text: str, *, model: str) -> Sequence[float]:
+    # Micro-batched provider call (batches concurrent queries, caches per item);
+    # fallback to local hashing
     vec: list[float] | None = None
     try:
-        from app.infra.llm_client import get_llm_client
-        client = get_llm_client()
-        vec_result = client.get_embeddings(text=text, model=model) if client else None
-        # client.get_embeddings returns list[float]
-        if vec_result and isinstance(vec_result, list):
-            vec = vec_result[0] if (len(vec_result) > 0 and isinstance(vec_result[0], list)) else vec_result  # type: ignore[assignment]
+        from app.infra.embeddings import get_embedder
+
+        vec = get_embedder().embed(text, model=model)
     except Exception:
         pass
     
-    # Cache and return embedding if available
     if vec is not None:
-        try:
-            if hasattr(_embed_query, "_embedding_cache"):
-                cache = _embed_query._embedding_cache  # type: ignore[attr-defined]
-                cache.set(text, model, vec)
-        except Exception:
-            pass
         return vec
     
     # Deterministic local fallback (bag-of-words hash)
@@ -343,13 +468,7 @@ def _embed_query(text: str, *, model: str) -> Sequence[float]:
 
 
 def _hash_embed(text: str, *, dim: int = 1536) -> list[float]:
-    vec = [0.0] * dim
-    for tok in re.findall(r"[\w\-]+", text.lower()):
-        d = hashlib.sha256(tok.encode("utf-8")).digest()
-        idx = int.from_bytes(d[:4], "big") % dim
-        vec[idx] += 1.0
-    norm2 = (sum(v * v for v in vec) ** 0.5) or 1.0
-    return [v / norm2 for v in vec]
+    return hash_embedding(re.findall(r"[\w\-]+", text.lower()), dim=dim, digest="sha256")
 
 
 def _build_where(filters: Mapping[str, Any]) -> tuple[str, dict[str, Any]]:
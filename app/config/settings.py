@@ -81,6 +81,24 @@ class OpenAIConfig(BaseModel):
         Maximum retries
     api_base : Optional[str]
         OpenAI API base URL
+    max_connections : int
+        Size of the shared keep-alive HTTP connection pool
+    max_keepalive_connections : int
+        Idle connections kept open in the shared pool
+    default_model_concurrency : int
+        In-flight request cap per model when not listed in `model_concurrency`
+    model_concurrency : Dict[str, int]
+        Per-model in-flight request caps (model name -> limit)
+    retry_base_delay_ms : int
+        Base delay for exponential retry backoff (full jitter)
+    retry_max_delay_ms : int
+        Upper bound for a single retry delay
+    default_rpm : int
+        Requests/minute for models not listed in `rate_limits` (0 = unlimited)
+    default_tpm : int
+        Tokens/minute for models not listed in `rate_limits` (0 = unlimited)
+    rate_limits : Dict[str, Dict[str, int]]
+        Per-model limits (model name -> {"rpm": int, "tpm": int})
     router_model : str
         Router model name
     analytics_planner_model : str
@@ -104,6 +122,15 @@ class OpenAIConfig(BaseModel):
     request_timeout_ms: int = Field(default=90000, description="Request timeout in milliseconds")
     max_retries: int = Field(default=3, description="Maximum retries")
     api_base: Optional[str] = Field(default=None, description="OpenAI API base URL")
+    max_connections: int = Field(default=100, ge=1, description="Shared HTTP pool size")
+    max_keepalive_connections: int = Field(default=20, ge=0, description="Idle keep-alive connections")
+    default_model_concurrency: int = Field(default=32, ge=1, description="Default per-model in-flight cap")
+    model_concurrency: Dict[str, int] = Field(default_factory=dict, description="Per-model in-flight caps")
+    retry_base_delay_ms: int = Field(default=500, ge=0, description="Retry backoff base delay (ms)")
+    retry_max_delay_ms: int = Field(default=20000, ge=0, description="Retry backoff max delay (ms)")
+    default_rpm: int = Field(default=0, ge=0, description="Default requests/minute (0 = unlimited)")
+    default_tpm: int = Field(default=0, ge=0, description="Default tokens/minute (0 = unlimited)")
+    rate_limits: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="Per-model RPM/TPM limits")
     
     # Model names for backward compatibility
     router_model: str = Field(default="gpt-4o-mini", description="Router model name")
@@ -162,7 +189,8 @@ class EmbeddingsConfig(BaseModel):
     timeout_seconds : int
         Timeout in seconds
     parameters : Dict[str, Any]
-        Embeddings parameters including dimensions and batch size
+        Embeddings parameters including dimensions, batch size and
+        micro-batching window (`micro_batch_wait_ms`, 0 = disabled)
     """
     
     provider: str = Field(default="openai", description="Model provider")
@@ -171,7 +199,7 @@ class EmbeddingsConfig(BaseModel):
     max_tokens: int = Field(default=0, ge=0, description="Maximum tokens (not used for embeddings)")
     timeout_seconds: int = Field(default=90, ge=1, description="Timeout in seconds")
     parameters: Dict[str, Any] = Field(
-        default_factory=lambda: {"dimensions": 1536, "batch_size": 256},
+        default_factory=lambda: {"dimensions": 1536, "batch_size": 256, "micro_batch_wait_ms": 0},
         description="Embeddings parameters"
     )
 
@@ -234,6 +262,18 @@ class AnalyticsPlannerConfig(BaseModel):
         Number of examples to use
     max_examples : int
         Maximum number of examples
+    plan_cache_enabled : bool
+        Cache validated LLM plans per question and allowlist
+    plan_cache_ttl_seconds : int
+        Plan cache entry time-to-live
+    plan_cache_max_size : int
+        Maximum cached plans
+    plan_cache_parameterize : bool
+        Share cached plans across questions differing only in years/states
+    rollups_enabled : bool
+        Rewrite matching aggregate plans onto materialized rollups
+    rollups_check_ttl_seconds : int
+        How long the list of populated rollups is reused
     """
     
     default_limit: int = Field(default=200, ge=1, description="Default query limit")
@@ -242,6 +282,12 @@ class AnalyticsPlannerConfig(BaseModel):
     require_limit_on_non_aggregate: bool = Field(default=True, description="Require LIMIT on non-aggregate queries")
     examples_count: int = Field(default=3, ge=0, description="Number of examples to use")
     max_examples: int = Field(default=5, ge=1, description="Maximum examples")
+    plan_cache_enabled: bool = Field(default=True, description="Cache validated LLM plans")
+    plan_cache_ttl_seconds: int = Field(default=3600, ge=1, description="Plan cache TTL")
+    plan_cache_max_size: int = Field(default=500, ge=1, description="Maximum cached plans")
+    plan_cache_parameterize: bool = Field(default=True, description="Parameterize years/states in cached plans")
+    rollups_enabled: bool = Field(default=True, description="Rewrite matching plans onto materialized rollups")
+    rollups_check_ttl_seconds: int = Field(default=300, ge=1, description="Rollup availability check TTL")
 
 
 class AnalyticsSQLConfig(BaseModel):
@@ -278,12 +324,75 @@ class AnalyticsExecutorConfig(BaseModel):
         Default row cap
     max_row_cap : int
         Maximum row cap
+    admission_enabled : bool
+        Run EXPLAIN before the data query and apply the cost budgets below
+    admission_max_total_cost : float
+        Reject plans whose estimated total cost exceeds this
+    admission_heavy_cost : float
+        Route plans above this estimated cost to the heavy lane
+    admission_seq_scan_rows : int
+        Route plans with a sequential scan of more rows than this on one of
+        `admission_large_tables` to the heavy lane
+    admission_large_tables : list[str]
+        Tables whose sequential scans count against `admission_seq_scan_rows`
+    admission_explain_timeout_ms : int
+        `statement_timeout` of the pre-flight EXPLAIN
+    admission_explain_cache_ttl_seconds : int
+        How long EXPLAIN plans are reused for the same SQL and params
+    admission_explain_cache_size : int
+        Maximum number of cached EXPLAIN plans
+    scheduler_enabled : bool
+        Run data queries through the concurrency-limited lane scheduler
+    max_concurrent_queries : int
+        Analytics statements running at once per process (both lanes)
+    heavy_lane_concurrency : int
+        Concurrent heavy-lane queries per process (at most
+        `max_concurrent_queries - 1`)
+    heavy_lane_timeout_seconds : int
+        Statement timeout for heavy-lane queries (still bounded by the request budget)
+    light_queue_timeout_seconds : float
+        Maximum queue wait for a light-lane slot
+    heavy_lane_wait_seconds : float
+        Maximum queue wait for a heavy-lane slot
+    breaker_backend : str
+        Circuit breaker state: ``memory`` (per process) or ``postgres``
+        (shared table, one trip per cluster)
+    breaker_failure_threshold : int
+        Failures of the same SQL that open its circuit
+    breaker_reset_after_seconds : float
+        How long an open circuit short-circuits before a half-open probe
+    breaker_max_keys : int
+        In-process breaker keys kept (LRU)
+    breaker_table : str
+        Shared breaker table name (postgres backend)
     """
     
     explain_analyze: bool = Field(default=False, description="Enable EXPLAIN ANALYZE")
     default_timeout_seconds: int = Field(default=90, ge=1, description="Default timeout")
     default_row_cap: int = Field(default=2000, ge=1, description="Default row cap")
     max_row_cap: int = Field(default=10000, ge=1, description="Maximum row cap")
+    admission_enabled: bool = Field(default=True, description="EXPLAIN-first admission control")
+    admission_max_total_cost: float = Field(default=5_000_000.0, gt=0, description="Reject above this plan cost")
+    admission_heavy_cost: float = Field(default=250_000.0, gt=0, description="Heavy lane above this plan cost")
+    admission_seq_scan_rows: int = Field(default=500_000, ge=1, description="Heavy lane above this seq scan size")
+    admission_large_tables: list[str] = Field(
+        default_factory=lambda: ["orders", "order_items", "order_payments", "order_reviews", "customers", "geolocation"],
+        description="Tables whose sequential scans are budgeted",
+    )
+    admission_explain_timeout_ms: int = Field(default=2000, ge=100, description="Pre-flight EXPLAIN timeout")
+    admission_explain_cache_ttl_seconds: int = Field(default=600, ge=0, description="EXPLAIN plan cache TTL")
+    admission_explain_cache_size: int = Field(default=512, ge=1, description="EXPLAIN plan cache size")
+    scheduler_enabled: bool = Field(default=True, description="Concurrency-limited lane scheduler")
+    max_concurrent_queries: int = Field(default=6, ge=1, description="Concurrent analytics statements")
+    heavy_lane_concurrency: int = Field(default=2, ge=1, description="Concurrent heavy-lane queries")
+    heavy_lane_timeout_seconds: int = Field(default=300, ge=1, description="Heavy-lane statement timeout")
+    light_queue_timeout_seconds: float = Field(default=10.0, ge=0, description="Light-lane queue wait")
+    heavy_lane_wait_seconds: float = Field(default=30.0, ge=0, description="Heavy-lane queue wait")
+    breaker_backend: str = Field(default="memory", description="Breaker state backend (memory|postgres)")
+    breaker_failure_threshold: int = Field(default=3, ge=1, description="Failures that open a circuit")
+    breaker_reset_after_seconds: float = Field(default=60.0, gt=0, description="Open circuit duration")
+    breaker_max_keys: int = Field(default=1024, ge=1, description="In-process breaker keys (LRU)")
+    breaker_table: str = Field(default="analytics_circuit_breaker", description="Shared breaker table")
 
 
 class AnalyticsNormalizerConfig(BaseModel):
@@ -297,11 +406,24 @@ class AnalyticsNormalizerConfig(BaseModel):
         Maximum examples in prompt
     json_extraction_regex : bool
         Whether to enable JSON extraction regex
+    prompt_rows_token_budget : int
+        Prompt tokens for result rows; larger results send a digest plus
+        head/tail rows (0 disables)
+    prompt_tail_rows : int
+        Rows kept from the end of a compacted result
+    template_fast_path : bool
+        Render common result shapes locally instead of calling the LLM
+    template_max_rows : int
+        Largest ranking/distribution rendered by templates
     """
     
     fallback_enabled: bool = Field(default=True, description="Enable fallback")
     max_examples_in_prompt: int = Field(default=1, ge=0, description="Max examples in prompt")
     json_extraction_regex: bool = Field(default=True, description="Enable JSON extraction regex")
+    prompt_rows_token_budget: int = Field(default=6000, ge=0, description="Prompt token budget for result rows")
+    prompt_tail_rows: int = Field(default=5, ge=0, description="Tail rows kept when compacting")
+    template_fast_path: bool = Field(default=True, description="Render common result shapes without the LLM")
+    template_max_rows: int = Field(default=30, ge=1, description="Max rows rendered by templates")
 
 
 class AnalyticsConfig(BaseModel):
@@ -589,6 +711,38 @@ class QueryClientConfig(BaseModel):
     polling_interval_seconds: int = Field(default=1, ge=1, description="Polling interval in seconds")
 
 
+class RequestBudgetConfig(BaseModel):
+    """End-to-end request latency budget.
+    
+    Attributes
+    ----------
+    enabled : bool
+        Derive component timeouts from a per-request deadline
+    total_s : float
+        Default budget per turn in seconds (clients may send `budget_s`)
+    attachment_total_s : float
+        Default budget for turns with an attachment (OCR, extraction)
+    floor_s : float
+        Minimum timeout handed to a component once the budget is nearly spent
+    optional_min_remaining_s : Dict[str, float]
+        Remaining seconds required to run each optional step
+    """
+    
+    enabled: bool = Field(default=True, description="Enable request budgets")
+    total_s: float = Field(default=90.0, gt=0.0, description="Budget per turn (s)")
+    attachment_total_s: float = Field(default=240.0, gt=0.0, description="Budget with attachment (s)")
+    floor_s: float = Field(default=2.0, ge=0.0, description="Minimum derived timeout (s)")
+    optional_min_remaining_s: Dict[str, float] = Field(
+        default_factory=lambda: {
+            "followup_llm": 20.0,
+            "ensemble_vote": 30.0,
+            "llm_reranker": 20.0,
+            "normalizer_llm": 10.0,
+        },
+        description="Reserve required per optional step (s)",
+    )
+
+
 class RoutingConfig(BaseModel):
     """Routing configuration.
     
@@ -602,12 +756,48 @@ class RoutingConfig(BaseModel):
         RAG hits threshold
     rag_min_score_threshold : float
         RAG minimum score threshold
+    speculative_enabled : bool
+        Run the top two candidate pipelines concurrently on borderline decisions
+    speculative_margin : float
+        Decisions below confidence_min + margin count as borderline
+    speculative_deadline_s : float
+        Per-branch deadline in seconds
+    speculative_strong_evidence : float
+        Evidence score at which the first finished branch wins immediately
+    speculative_plan_evidence : float
+        Evidence of an analytics branch that stopped at the plan (SQL
+        approval pending); equal scores go to the primary candidate
+    stage_deadlines_s : Dict[str, float]
+        Per-stage deadlines (seconds) for the route stages run by `StageRunner`
+    stage_max_concurrency : Dict[str, int]
+        Max concurrent instances per stage across requests (0 = unbounded)
     """
     
     confidence_min: float = Field(default=0.55, ge=0.0, le=1.0, description="Minimum confidence")
     fallback_enabled: bool = Field(default=True, description="Enable fallback")
     rag_hits_threshold: int = Field(default=2, ge=1, description="RAG hits threshold")
     rag_min_score_threshold: float = Field(default=0.78, ge=0.0, le=1.0, description="RAG minimum score threshold")
+    speculative_enabled: bool = Field(default=False, description="Enable speculative fan-out")
+    speculative_margin: float = Field(default=0.1, ge=0.0, le=1.0, description="Borderline confidence margin")
+    speculative_deadline_s: float = Field(default=20.0, gt=0.0, le=120.0, description="Per-branch deadline (s)")
+    speculative_strong_evidence: float = Field(default=0.8, ge=0.0, le=1.0, description="Early-win evidence")
+    speculative_plan_evidence: float = Field(
+        default=0.6, ge=0.0, le=1.0, description="Evidence of an unexecuted analytics plan"
+    )
+    stage_deadlines_s: Dict[str, float] = Field(
+        default_factory=lambda: {
+            "rag_probe": 4.0,
+            "context_resolution": 8.0,
+            "context_search": 5.0,
+            "classify": 20.0,
+            "reclassify": 10.0,
+        },
+        description="Per-stage deadlines (s)",
+    )
+    stage_max_concurrency: Dict[str, int] = Field(
+        default_factory=lambda: {"rag_probe": 16, "context_search": 16, "classify": 32},
+        description="Per-stage concurrency caps",
+    )
 
 
 class InterruptsConfig(BaseModel):
@@ -665,12 +855,43 @@ class CheckpointerConfig(BaseModel):
         Checkpoints table name
     cleanup_interval_hours : int
         Cleanup interval in hours
+    history_token_budget : int
+        Token budget for persisted conversation history (newest messages kept;
+        counts every key a message carries, not only its text)
+    history_message_max_tokens : int
+        Per-message token cap; longer content is truncated and offloaded to a blob
+    history_max_messages : int
+        Hard upper bound on persisted messages (safety net for tiny messages)
+    blob_min_bytes : int
+        Payloads at least this large are moved to the blob table
+    blob_table : str
+        Content-addressed blob table name
+    durability : str
+        Checkpoint write mode: "per_node", "exit" or "write_behind"
+    write_queue_size : int
+        Bound of the write-behind queue (writers block when it is full)
+    retention_max_age_hours : int
+        Checkpoints, writes and state blobs older than this are deleted
+    retention_keep_last : int
+        Newest checkpoints kept per thread (0 disables trimming)
+    retention_batch_size : int
+        Rows per retention delete transaction
     """
     
     enabled: bool = Field(default=True, description="Enable checkpointer")
     backend: str = Field(default="postgres", description="Checkpointer backend")
     table: str = Field(default="checkpoints", description="Checkpoints table name")
     cleanup_interval_hours: int = Field(default=24, ge=1, description="Cleanup interval in hours")
+    history_token_budget: int = Field(default=3000, ge=100, description="History token budget")
+    history_message_max_tokens: int = Field(default=800, ge=50, description="Per-message token cap")
+    history_max_messages: int = Field(default=50, ge=2, description="Max persisted messages")
+    blob_min_bytes: int = Field(default=4096, ge=256, description="Blob offload threshold (bytes)")
+    blob_table: str = Field(default="state_blobs", description="Blob table name")
+    durability: str = Field(default="per_node", description="Checkpoint durability mode")
+    write_queue_size: int = Field(default=256, ge=1, le=10000, description="Write-behind queue bound")
+    retention_max_age_hours: int = Field(default=168, ge=1, description="Checkpoint max age (hours)")
+    retention_keep_last: int = Field(default=20, ge=0, description="Checkpoints kept per thread")
+    retention_batch_size: int = Field(default=5000, ge=100, le=100000, description="Retention delete batch size")
 
 
 class LoggingConfig(BaseModel):
@@ -779,6 +1000,8 @@ class Settings(BaseSettings):
         Batch processing configuration
     query_client : QueryClientConfig
         Query client configuration
+    request_budget : RequestBudgetConfig
+        Request latency budget configuration
     routing : RoutingConfig
         Routing configuration
     interruptions : InterruptsConfig
@@ -816,6 +1039,7 @@ class Settings(BaseSettings):
     document_processing: DocumentProcessingConfig = Field(default_factory=DocumentProcessingConfig)
     batch_processing: BatchProcessingConfig = Field(default_factory=BatchProcessingConfig)
     query_client: QueryClientConfig = Field(default_factory=QueryClientConfig)
+    request_budget: RequestBudgetConfig = Field(default_factory=RequestBudgetConfig)
     
     # System configurations
     routing: RoutingConfig = Field(default_factory=RoutingConfig)
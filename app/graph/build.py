@@ -27,8 +27,28 @@ Usage
 from __future__ import annotations
 
 import asyncio
+import functools
 from collections.abc import Mapping, Sequence
 from typing import Any, Annotated
+
+from app.graph.compaction import (
+    TRANSIENT_CHANNELS,
+    compact_answer,
+    compact_history,
+    release_channels,
+    state_bytes,
+)
+from app.graph.compaction import get_limits as get_compaction_limits
+from app.graph.speculation import (
+    PLAN_ONLY_EVIDENCE,
+    branch_evidence,
+    race_branches,
+    speculation_candidates,
+)
+from app.graph.stages import StageHandle, StageRunner, StageTimeout, current_stage
+from app.infra.blobs import get_blob_store
+from app.infra.deadline import bounded_timeout, budget_scope, new_deadline
+
 try:
     from typing_extensions import TypedDict
 except ImportError:
@@ -94,14 +114,24 @@ except Exception:  # pragma: no cover - optional
     def _observe_hist(_name: str, value_ms: float, labels: Mapping[str, str] | None = None) -> None:
         return
 
+try:  # Event-loop lag instrumentation
+    from app.infra.loop_monitor import ensure_loop_monitor
+except Exception:  # pragma: no cover - optional
+    def ensure_loop_monitor() -> bool:
+        return False
+
 get_checkpointer: Any
 try:
     from app.infra.checkpointer import get_checkpointer as _get_checkpointer
+    from app.infra.checkpointer import graph_durability
 
     get_checkpointer = _get_checkpointer
 except Exception:  # pragma: no cover - optional
     get_checkpointer = None
 
+    def graph_durability(mode: str | None = None) -> str:
+        return "async"
+
 # Human gates
 make_sql_gate: Any
 try:
@@ -280,13 +310,24 @@ class GraphState(TypedDict, total=False):
     attachment: Annotated[Mapping[str, Any] | None, _pick_last]
     allowlist: Annotated[Mapping[str, Sequence[str]] | None, _pick_last]
     router_decision: Annotated[Mapping[str, Any] | None, _pick_last]
+    routing_ctx: Annotated[Mapping[str, Any] | None, _pick_last]
+    # Route-time retrieval probe (candidate pool + query embedding) reused by
+    # knowledge.retrieve; see `RetrievalResult.to_probe`
+    rag_probe: Annotated[Mapping[str, Any] | None, _pick_last]
     agent: Annotated[str | None, _pick_last]
+    # Borderline decisions: (primary, secondary) pipelines run by `speculate`
+    speculative_agents: Annotated[list[str] | None, _pick_last]
     tables: Annotated[list[str], _pick_last]
     columns: Annotated[list[str], _pick_last]
     k: Annotated[int | None, _pick_last]
+    # Request latency budget: optional client input (seconds) and the deadline
+    # (epoch seconds) set by `route` for the current turn
+    budget_s: Annotated[float | None, _pick_last]
+    deadline_ts: Annotated[float | None, _pick_last]
 
     # Conversation memory
-    conversation_history: Annotated[list[dict[str, Any]], _concat_list]
+    # Full (compacted) history is rewritten by `update_history`: last writer wins
+    conversation_history: Annotated[list[dict[str, Any]], _pick_last]
     last_agent: Annotated[str | None, _pick_last]
     last_answer: Annotated[Mapping[str, Any] | None, _pick_last]
 
@@ -302,7 +343,8 @@ class GraphState(TypedDict, total=False):
     limit: Annotated[int | None, _pick_last]
 
     # Analytics
-    analytics_rows: Annotated[list[Mapping[str, Any]] | None, _pick_last]
+    # Replaced by a blob reference (`{"$blob": ...}`) once normalized
+    analytics_rows: Annotated[list[Mapping[str, Any]] | Mapping[str, Any] | None, _pick_last]
 
     # Knowledge
     hits: Annotated[list[Mapping[str, Any]] | None, _pick_last]
@@ -323,6 +365,54 @@ __all__ = ["build_graph"]
 # ---------------------------------------------------------------------------
 
 
+def _with_budget(node: Any, *, fresh: bool = False) -> Any:
+    """Run `node` under the request budget carried in state.
+
+    With `fresh` (the turn's entry node), a new deadline starts here and is
+    written back to `deadline_ts`. Optional steps
+    skipped for lack of time are appended to `signals` as ``budget_skip:<step>``.
+    """
+
+    @functools.wraps(node)
+    async def _node(state: GraphState) -> dict[str, Any]:
+        if fresh:
+            deadline_ts = new_deadline(state.get("budget_s"), has_attachment=bool(state.get("attachment")))
+        else:
+            deadline_ts = state.get("deadline_ts")
+        with budget_scope(deadline_ts) as budget:
+            out = await node(state)
+        if fresh:
+            out = {**(out or {}), "deadline_ts": deadline_ts}
+        if budget is not None and budget.skips:
+            out = dict(out or {})
+            out["signals"] = [*(out.get("signals") or []), *(f"budget_skip:{s}" for s in budget.skips)]
+        return out
+
+    return _node
+
+
+def _with_default_durability(compiled: Any, durability: str) -> Any:
+    """Return a copy of `compiled` whose runs default to `durability`.
+
+    LangGraph replaces (rather than merges) the ``configurable`` mapping with
+    the caller's, so the default cannot be set via `with_config`; `stream` and
+    `astream` (which back `invoke`/`ainvoke`) fill it in instead.
+    """
+    base = type(compiled)
+
+    class _DurabilityDefault(base):  # type: ignore[misc,valid-type]
+        def stream(self, *args: Any, durability: str | None = None, **kwargs: Any) -> Any:
+            return super().stream(*args, durability=durability or default, **kwargs)
+
+        def astream(self, *args: Any, durability: str | None = None, **kwargs: Any) -> Any:
+            return super().astream(*args, durability=durability or default, **kwargs)
+
+    default = durability
+    _DurabilityDefault.__name__ = base.__name__
+    _DurabilityDefault.__qualname__ = base.__qualname__
+    return _DurabilityDefault(**{k: v for k, v in compiled.__dict__.items() if k != "__orig_class__"})
+
+
 def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any] | None = None) -> Any:
     """Build and return a compiled LangGraph (or a descriptive stub).
 
@@ -380,6 +470,22 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
 
     triage = TriageHandler() if TriageHandler is not None else _StubTriageHandler()
 
+    # Speculative fan-out for borderline routing (opt-in)
+    spec_enabled, spec_margin, spec_deadline_s, spec_strong, confidence_min = False, 0.1, 20.0, 0.8, 0.55
+    spec_plan_evidence = PLAN_ONLY_EVIDENCE
+    try:
+        from app.config.settings import get_settings as _get_settings
+
+        _routing = _get_settings().routing
+        spec_enabled = bool(_routing.speculative_enabled)
+        spec_margin = float(_routing.speculative_margin)
+        spec_deadline_s = float(_routing.speculative_deadline_s)
+        spec_strong = float(_routing.speculative_strong_evidence)
+        spec_plan_evidence = float(_routing.speculative_plan_evidence)
+        confidence_min = float(_routing.confidence_min)
+    except Exception:
+        pass
+
     if StateGraph is None:  # Return a descriptive stub for environments without LangGraph
         return {
             "engine": "stub",
@@ -405,10 +511,20 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
 
         # -- Node definitions (return deltas only) ---------------------------
         async def node_route(state: GraphState) -> dict[str, Any]:
+            # Probe, context and classification stages run under per-stage
+            # deadlines; anything still running when the route returns is cancelled
+            stages = StageRunner.from_settings("route")
+            try:
+                return await _route(state, stages)
+            finally:
+                await stages.aclose()
+
+        async def _route(state: GraphState, stages: StageRunner) -> dict[str, Any]:
             import time as _t
             _t0 = _t.perf_counter()
             q = str(state.get("query", "")).strip()
             attachment = state.get("attachment")
+            ensure_loop_monitor()
             
             # Get conversation history and last answer for context
             # LangGraph automatically restores state from checkpointer when using thread_id
@@ -432,19 +548,62 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     has_last_answer=last_answer is not None,
                     query=q[:100])
             
-            # Resolve anaphora in query using conversation history and last_answer
+            # Start the RAG probe right away (worker thread) so it overlaps with
+            # context resolution and classification; the vector query is bounded
+            # by the probe's stage deadline so an abandoned probe frees its
+            # DB connection.
+            # The probe fetches the knowledge pipeline's candidate pool up front;
+            # routing only counts hits >= 0.65 and knowledge.retrieve reuses the
+            # pool (and the query embedding) when the query is unchanged.
+            rag_probe_result: dict[str, Any] = {"hits": 0, "min_score": None, "completed": False, "payload": None}
+            probe_top_k = max(5, int(state.get("k") or 6))
+
+            def _rag_probe_task(probe_query: str) -> None:
+                """Execute RAG probe in a worker thread."""
+                try:
+                    token = current_stage()
+                    if retriever is not None and not (token and token.cancelled):
+                        _res = retriever.retrieve(
+                            query=probe_query,
+                            top_k=probe_top_k,
+                            min_score=0.65,
+                            timeout_s=token.remaining_s() if token else None,
+                        )
+                        hits_list = _res.select(top_k=5, min_score=0.65) if _res is not None else []
+                        rag_probe_result["hits"] = len(hits_list)
+                        if hits_list:
+                            rag_probe_result["min_score"] = min(float(h.score) for h in hits_list)
+                        if _res is not None and _res.query_vector:
+                            rag_probe_result["payload"] = _res.to_probe(probe_query)
+                except Exception as e:
+                    log.debug("RAG probe failed", extra={"error": str(e)})
+                finally:
+                    rag_probe_result["completed"] = True
+
+            rag_task: StageHandle | None = None
+            if retriever is not None:
+                rag_task = stages.start("rag_probe", _rag_probe_task, q)
+
+            # Resolve anaphora, follow-up and topic shift in one async LLM call
             original_query = q
+            is_followup: bool | None = None
+            topic_shift: bool | None = None
             try:
-                from app.utils.anaphora import resolve_anaphora
-                # Pure-Python operation; safe to run inline in async context.
-                q = resolve_anaphora(q, conversation_history, last_answer)
+                from app.utils.context_resolution import resolve_context
+
+                resolution = await stages.run("context_resolution", resolve_context, q, conversation_history, last_answer)
+                q = resolution.resolved_query.strip() or q
+                is_followup = resolution.is_followup
+                topic_shift = resolution.topic_shift
                 if q != original_query:
                     log.info(
                         "Anaphora/follow-up resolved",
-                        extra={"original": original_query[:50], "resolved": q[:50]},
+                        extra={"original": original_query[:50], "resolved": q[:50], "source": resolution.source},
                     )
+            except StageTimeout:
+                log.info("Context resolution skipped (deadline)")
             except Exception as e:
-                log.debug("Anaphora resolution failed", extra={"error": str(e)})
+                log.debug("Context resolution failed", extra={"error": str(e)})
             
             # Get relevant context from conversation history
             relevant_context = None
@@ -452,13 +611,16 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                 from app.utils.conversation_search import ConversationHistorySearcher
 
                 history_searcher = ConversationHistorySearcher()
-                # Conversation search may call embeddings/LLM; execute in a worker
+                # Conversation search may call embeddings; execute in a worker
                 # thread to avoid blocking the event loop.
-                relevant_context = await asyncio.to_thread(
+                relevant_context = await stages.run(
+                    "context_search",
                     history_searcher.get_relevant_context,
                     current_query=q,
                     conversation_history=conversation_history,
                     last_answer=last_answer,
+                    is_followup=is_followup,
+                    topic_shift=topic_shift,
                 )
                 if relevant_context:
                     log.info(
@@ -467,6 +629,8 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                         reason=relevant_context.get("reason", ""),
                         has_summary=bool(relevant_context.get("context_summary")),
                     )
+            except StageTimeout:
+                log.info("Context search skipped (deadline)")
             except Exception as e:
                 log.warning("Context search failed", extra={"error": str(e)})
             
@@ -497,37 +661,8 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
             except Exception:
                 pass
 
-            # Async RAG probe: execute in parallel with LLM classification
-            # Use threading to run RAG probe concurrently with classifier
             rag_hits = 0
             rag_min_score = None
-            rag_probe_result = {"hits": 0, "min_score": None, "completed": False}
-            
-            def _rag_probe_task():
-                """Execute RAG probe in background thread."""
-                try:
-                    if retriever is not None:
-                        _res = retriever.retrieve(query=q, top_k=5, min_score=0.65)
-                        if _res and getattr(_res, "hits", None):
-                            hits_list = _res.hits if isinstance(_res.hits, list) else []
-                            rag_probe_result["hits"] = len(hits_list)
-                            if rag_probe_result["hits"] > 0:
-                                scores = [
-                                    float(h.get("score", 0.0) if isinstance(h, dict) else getattr(h, "score", 0.0))
-                                    for h in hits_list
-                                ]
-                                rag_probe_result["min_score"] = min(scores) if scores else None
-                except Exception as e:
-                    log.debug("RAG probe failed", extra={"error": str(e)})
-                finally:
-                    rag_probe_result["completed"] = True
-
-            # Start RAG probe in background thread
-            import threading
-            rag_thread = None
-            if retriever is not None:
-                rag_thread = threading.Thread(target=_rag_probe_task, daemon=True)
-                rag_thread.start()
 
             log.info("Route node debug",
                     original_query=q,
@@ -538,21 +673,33 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                 # Classify while RAG probe runs in parallel
                 # Pass conversation context to classifier
                 # Classification may invoke LLM; execute in worker thread.
-                dec = await asyncio.to_thread(
-                    classifier.classify,
-                    q,
-                    allowlist=allowlist,
-                    rag_hits=0,  # Will update after RAG probe completes
-                    rag_min_score=None,
-                    has_attachment=bool(attachment),
-                    conversation_history=conversation_history,
-                    last_answer=last_answer,
-                    relevant_context=relevant_context,
-                )
+                try:
+                    dec = await stages.run(
+                        "classify",
+                        classifier.classify,
+                        q,
+                        allowlist=allowlist,
+                        rag_hits=0,  # Will update after RAG probe completes
+                        rag_min_score=None,
+                        has_attachment=bool(attachment),
+                        conversation_history=conversation_history,
+                        last_answer=last_answer,
+                        relevant_context=relevant_context,
+                    )
+                except StageTimeout:
+                    log.warning("Classification missed its deadline; routing to triage")
+                    dec = {
+                        "agent": "triage",
+                        "confidence": 0.0,
+                        "reason": "classification deadline exceeded",
+                        "tables": [],
+                        "columns": [],
+                        "signals": ["classify_timeout"],
+                    }
                 
-                # Wait for RAG probe to complete (with timeout)
-                if rag_thread is not None:
-                    rag_thread.join(timeout=2.0)  # Max 2 seconds wait
+                # Wait for the RAG probe until its deadline (cancelled if late)
+                if rag_task is not None:
+                    await stages.result(rag_task, default=None)
                     if rag_probe_result["completed"]:
                         rag_hits = rag_probe_result["hits"]
                         rag_min_score = rag_probe_result["min_score"]
@@ -564,7 +711,8 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                                 dec_dict = dec if isinstance(dec, dict) else (dec.__dict__ if hasattr(dec, '__dict__') else {})
                                 if dec_dict.get("agent") == "triage" and rag_hits > 0:
                                     # Re-classify with RAG evidence to potentially route to knowledge
-                                    dec = await asyncio.to_thread(
+                                    dec = await stages.run(
+                                        "reclassify",
                                         classifier.classify,
                                         q,
                                         allowlist=allowlist,
@@ -576,7 +724,7 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                                         relevant_context=relevant_context,
                                     )
                             except Exception:
-                                pass  # Use original decision if re-classification fails
+                                pass  # Use original decision if re-classification fails or is late
                 # Convert RouterDecision to dict if it's a dataclass
                 if hasattr(dec, '__dict__'):
                     dec_dict = dec.__dict__
@@ -619,7 +767,9 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     "allowlist_tables": tuple(dec_dict.get("tables", []) or []),
                     "allowlist_columns": tuple(dec_dict.get("columns", []) or []),
                     "extra_signals": tuple(probe_signals),
+                    "stages": stages.breakdown(),
                 }
+                log.info("Route stage budget", extra={"stages": routing_ctx["stages"]})
 
                 out = {
                     "allowlist": allowlist or {},  # Include allowlist in state
@@ -628,6 +778,7 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     "columns": list(dec_dict.get("columns", [])),
                     "signals": merged_signals,
                     "routing_ctx": routing_ctx,
+                    "rag_probe": rag_probe_result["payload"] if rag_probe_result["completed"] else None,
                     # Clear previous answer at the start of a new run to avoid
                     # accidentally reusing stale answers when downstream nodes
                     # fail to produce a new one.
@@ -683,7 +834,17 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     dec2_dict = {"agent": "triage", "confidence": 0.0, "reason": "", "tables": [], "columns": [], "signals": []}
                 
                 agent = (dec2_dict.get("agent") or "triage").strip()
-                out = {"agent": agent, "router_decision": dec2_dict}
+                out = {"agent": agent, "router_decision": dec2_dict, "speculative_agents": None}
+                if spec_enabled:
+                    pair = speculation_candidates(
+                        dec if isinstance(dec, Mapping) else getattr(dec, "__dict__", {}),
+                        dec2_dict,
+                        confidence_min=confidence_min,
+                        margin=spec_margin,
+                    )
+                    if pair is not None:
+                        out["speculative_agents"] = list(pair)
+                        log.info("Borderline routing; speculating", extra={"candidates": list(pair)})
             _inc_counter("requests_total", {"agent": "routing", "node": "supervisor"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "supervisor"})
             return out
@@ -805,6 +966,8 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     question=str(state.get("query", "")),
                 )
                 out = {"answer": normalized}
+                # Rows are consumed: keep only a blob reference in state
+                out.update(await asyncio.to_thread(release_channels, state, ("analytics_rows",), get_blob_store()))
             _inc_counter("requests_total", {"agent": "analytics", "node": "normalize"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "analytics.normalize"})
             return out
@@ -818,8 +981,9 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     query=str(state.get("query", "")),
                     top_k=state.get("k", 6),
                     min_score=0.01,
+                    probe=state.get("rag_probe"),
                 )
-                out = {"hits": result.hits}
+                out = {"hits": result.hits, "rag_probe": None}  # probe consumed
             _inc_counter("requests_total", {"agent": "knowledge", "node": "retrieve"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "knowledge.retrieve"})
             return out
@@ -834,7 +998,7 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     query=str(state.get("query", "")),
                     hits=state.get("hits") or [],
                 )
-                out = {"ranked": result.hits}
+                out = {"ranked": result.hits, "hits": None}  # hits consumed
             _inc_counter("requests_total", {"agent": "knowledge", "node": "rank"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "knowledge.rank"})
             return out
@@ -850,7 +1014,7 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     ranked=state.get("ranked") or [],
                 )
                 cites = ans.get("citations") if isinstance(ans, dict) else None
-                out: dict[str, Any] = {"answer": ans}
+                out: dict[str, Any] = {"answer": ans, "ranked": None}  # ranked consumed
                 if cites:
                     out["citations"] = cites
                 _inc_counter("requests_total", {"agent": "knowledge", "node": "answer"})
@@ -959,6 +1123,9 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     ans["meta"]["processing_warnings"] = processed.get("warnings", [])
 
                 out = {"answer": ans}
+                out.update(
+                    await asyncio.to_thread(release_channels, state, ("processed_document",), get_blob_store())
+                )
             _inc_counter("requests_total", {"agent": "commerce", "node": "summarize"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "commerce.summarize"})
             return out
@@ -980,12 +1147,94 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
             return out
 
         # Conversation history update
+        # Speculative fan-out: run the two candidate pipelines concurrently
+        async def _spec_knowledge(state: GraphState) -> tuple[float, dict[str, Any]]:
+            work: dict[str, Any] = dict(state)
+            delta: dict[str, Any] = {}
+            for node in (node_kn_retrieve, node_kn_rank):
+                step = await node(work)  # type: ignore[arg-type]
+                work.update(step)
+                delta.update(step)
+            ranked = list(work.get("ranked") or [])
+            step = await node_kn_answer(work)  # type: ignore[arg-type]
+            work.update(step)
+            delta.update(step)
+            return branch_evidence("knowledge", {**work, "_ranked": ranked}), delta
+
+        async def _spec_analytics(state: GraphState) -> tuple[float, dict[str, Any]]:
+            work: dict[str, Any] = dict(state)
+            delta: dict[str, Any] = dict(await node_an_plan(work))  # type: ignore[arg-type]
+            work.update(delta)
+            info: dict[str, Any] = {}
+            # With SQL approval the branch stops at the plan; the gate still
+            # applies if analytics wins (continues at analytics.exec)
+            if not require_sql_approval:
+                step = await node_an_exec(work)  # type: ignore[arg-type]
+                rows = step.get("analytics_rows")
+                rows_dict = rows.to_dict() if hasattr(rows, "to_dict") else (rows or {})
+                meta = rows_dict.get("meta") if isinstance(rows_dict, Mapping) else None
+                info = {
+                    "_executed": True,
+                    "_row_count": rows_dict.get("row_count", 0) if isinstance(rows_dict, Mapping) else 0,
+                    "_error": (meta or {}).get("error") if isinstance(meta, Mapping) else None,
+                }
+                work.update(step)
+                delta.update(step)
+                step = await node_an_norm(work)  # type: ignore[arg-type]
+                work.update(step)
+                delta.update(step)
+            return branch_evidence("analytics", {**work, **info}, plan_only_evidence=spec_plan_evidence), delta
+
+        _spec_runners = {"knowledge": _spec_knowledge, "analytics": _spec_analytics}
+
+        async def node_speculate(state: GraphState) -> dict[str, Any]:
+            import time as _t
+            _t0 = _t.perf_counter()
+            candidates = [a for a in (state.get("speculative_agents") or []) if a in _spec_runners]
+            primary = candidates[0] if candidates else (state.get("agent") or "triage")
+            with start_span("node.speculate"):
+                result = await race_branches(
+                    {a: (lambda a=a: _spec_runners[a](state)) for a in candidates},
+                    primary=primary,
+                    deadline_s=bounded_timeout(spec_deadline_s) or spec_deadline_s,
+                    strong_evidence=spec_strong,
+                )
+                winner = result.winner or primary
+                out: dict[str, Any] = dict(result.delta)
+                out.update(
+                    {
+                        "agent": winner,
+                        "speculative_agents": None,
+                        "signals": [f"speculative_winner:{winner}", f"speculative_outcome:{result.outcome}"],
+                    }
+                )
+                log.info(
+                    "Speculative routing resolved",
+                    extra={
+                        "winner": winner,
+                        "outcome": result.outcome,
+                        "branches": {
+                            a: {"status": b.status, "evidence": round(b.evidence, 3), "ms": round(b.elapsed_ms, 1)}
+                            for a, b in result.branches.items()
+                        },
+                    },
+                )
+            _inc_counter("speculation_total", {"winner": winner, "outcome": result.outcome})
+            _inc_counter("requests_total", {"agent": "routing", "node": "speculate"})
+            _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "speculate"})
+            return out
+
         async def node_update_history(state: GraphState) -> dict[str, Any]:
             """Update conversation history with current query and answer.
             
             Adds the current user query and assistant answer to the conversation
-            history. Limits history to last 20 messages to prevent unbounded growth.
-            The history is automatically persisted by LangGraph checkpointer.
+            history. New messages are embedded once; the vector goes to the blob
+            store and the message keeps an ``embedding_ref``, so later turns never
+            re-embed history and checkpoints stay small. Before the state is persisted
+            by the LangGraph checkpointer it is compacted: history is capped by a
+            token budget, `last_answer` keeps only what follow-ups need, bulky
+            payloads move to the blob table and leftover transient channels are
+            released.
             """
             import time as _t
             _t0 = _t.perf_counter()
@@ -995,11 +1244,6 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                 agent = state.get("agent") or "unknown"
                 conversation_history = list(state.get("conversation_history") or [])
                 
-                # Limit history to last 20 messages to prevent unbounded growth
-                max_history = 20
-                if len(conversation_history) > max_history:
-                    conversation_history = conversation_history[-max_history:]
-                
                 # Check if query was already added (avoid duplicates)
                 last_user_msg = conversation_history[-1] if conversation_history else None
                 if not (last_user_msg and last_user_msg.get("role") == "user" and last_user_msg.get("content") == query):
@@ -1051,44 +1295,104 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
                     except Exception:
                         pass
 
+                # Embed new messages once (one batched call) and keep only blob
+                # refs to the float32 vectors in history; route-time relevance
+                # search then scores stored vectors instead of re-embedding.
+                try:
+                    from app.utils.conversation_search import embed_messages
+
+                    conversation_history = await asyncio.to_thread(embed_messages, conversation_history)
+                except Exception as e:
+                    log.debug("History embedding failed", extra={"error": str(e)})
+
+                # Compact what gets checkpointed (blob writes may hit the DB)
+                def _compact() -> dict[str, Any]:
+                    limits = get_compaction_limits()
+                    store = get_blob_store()
+                    updates = release_channels(state, TRANSIENT_CHANNELS, store)
+                    updates["conversation_history"] = compact_history(
+                        conversation_history,
+                        token_budget=limits.history_token_budget,
+                        message_max_tokens=limits.message_max_tokens,
+                        max_messages=limits.max_messages,
+                        store=store,
+                        blob_min_bytes=limits.blob_min_bytes,
+                    )
+                    updates["last_answer"] = compact_answer(
+                        last_answer_value,
+                        store=store,
+                        message_max_tokens=limits.message_max_tokens,
+                        blob_min_bytes=limits.blob_min_bytes,
+                    )
+                    return updates
+
+                compacted = await asyncio.to_thread(_compact)
+
                 # Update last_agent and last_answer
                 out = {
-                    "conversation_history": conversation_history,
+                    **compacted,
                     "last_agent": agent,
-                    "last_answer": last_answer_value,
                 }
+                _observe_hist(
+                    "state_checkpoint_bytes",
+                    float(state_bytes({**state, **out})),
+                    {"agent": str(agent)},
+                )
             _inc_counter("requests_total", {"agent": "system", "node": "update_history"})
             _observe_hist("node_latency_ms", (_t.perf_counter() - _t0) * 1000.0, {"node": "update_history"})
             return out
 
         # -- Graph wiring ----------------------------------------------------
-        sg.add_node("route", node_route)
-        sg.add_node("supervisor", node_supervisor)
+        sg.add_node("route", _with_budget(node_route, fresh=True))
+        sg.add_node("supervisor", _with_budget(node_supervisor))
 
-        sg.add_node("analytics.plan", node_an_plan)
-        sg.add_node("analytics.exec", node_an_exec)
-        sg.add_node("analytics.normalize", node_an_norm)
+        sg.add_node("analytics.plan", _with_budget(node_an_plan))
+        sg.add_node("analytics.exec", _with_budget(node_an_exec))
+        sg.add_node("analytics.normalize", _with_budget(node_an_norm))
 
-        sg.add_node("knowledge.retrieve", node_kn_retrieve)
-        sg.add_node("knowledge.rank", node_kn_rank)
-        sg.add_node("knowledge.answer", node_kn_answer)
+        sg.add_node("knowledge.retrieve", _with_budget(node_kn_retrieve))
+        sg.add_node("knowledge.rank", _with_budget(node_kn_rank))
+        sg.add_node("knowledge.answer", _with_budget(node_kn_answer))
 
-        sg.add_node("commerce.process_doc", node_co_process_doc)
-        sg.add_node("commerce.extract_llm", node_co_extract_llm)
-        sg.add_node("commerce.summarize", node_co_summarize)
+        sg.add_node("commerce.process_doc", _with_budget(node_co_process_doc))
+        sg.add_node("commerce.extract_llm", _with_budget(node_co_extract_llm))
+        sg.add_node("commerce.summarize", _with_budget(node_co_summarize))
 
-        sg.add_node("triage.handle", node_tr_handle)
+        sg.add_node("triage.handle", _with_budget(node_tr_handle))
         
-        sg.add_node("update_history", node_update_history)
+        sg.add_node("speculate", _with_budget(node_speculate))
+        sg.add_node("update_history", _with_budget(node_update_history))
 
         sg.set_entry_point("route")
         sg.add_edge("route", "supervisor")
 
-        # Conditional fan-out after supervisor
+        # Conditional fan-out after supervisor (borderline decisions speculate)
         sg.add_conditional_edges(
             "supervisor",
-            lambda s: (s.get("agent") or "triage").strip(),
+            lambda s: "speculate" if s.get("speculative_agents") else (s.get("agent") or "triage").strip(),
+            {
+                "analytics": "analytics.plan",
+                "knowledge": "knowledge.retrieve",
+                "commerce": "commerce.process_doc",
+                "triage": "triage.handle",
+                "speculate": "speculate",
+            },
+        )
+
+        def _after_speculate(s: GraphState) -> str:
+            if s.get("answer"):
+                return "update_history"
+            agent = (s.get("agent") or "triage").strip()
+            if agent == "analytics" and s.get("analytics_plan"):
+                return "analytics.exec"  # plan won under SQL approval
+            return agent
+
+        sg.add_conditional_edges(
+            "speculate",
+            _after_speculate,
             {
+                "update_history": "update_history",
+                "analytics.exec": "analytics.exec",
                 "analytics": "analytics.plan",
                 "knowledge": "knowledge.retrieve",
                 "commerce": "commerce.process_doc",
@@ -1120,6 +1424,13 @@ def build_graph(*, require_sql_approval: bool = True, allowlist: dict[str, Any]
             if get_checkpointer is not None
             else sg.compile()
         )
+        # Exit-only durability: persist at run end / interrupts unless the
+        # caller passes `durability=` explicitly
+        if get_checkpointer is not None and graph_durability() == "exit":
+            try:
+                compiled = _with_default_durability(compiled, "exit")
+            except Exception:
+                log.warning("Could not apply exit-only checkpoint durability")
 
         try:
             log.info(
@@ -0,0 +1,282 @@
+"""
+Graph-state compaction: bounded history, transient channels and blob offload.
+
+Overview
+  Keeps the state that LangGraph checkpoints at every node boundary small.
+  Three mechanisms:
+
+  - Transient channels (`analytics_rows`, `hits`, `ranked`,
+    `processed_document`) are released once consumed: cleared, or replaced by
+    a small reference when the payload is worth keeping (rows, documents).
+  - Conversation history is capped by a token budget (newest messages first)
+    instead of a message count; the budget covers every key a message
+    carries, not only its text. Oversized messages are truncated and their
+    full text is offloaded, as are inline embeddings and other bulky keys.
+  - Bulky payloads (answer tables, long texts) move to the content-addressed
+    blob store (`app.infra.blobs`); state keeps a ``blob:sha256:...`` ref.
+
+Design
+  - Pure functions over plain dicts; the blob store is injected so tests and
+    local runs use the in-memory backend.
+  - Token counts use the same cheap estimate as the LLM rate limiter
+    (~4 chars/token).
+  - References are dicts with a ``$blob`` key plus a few summary fields, so
+    downstream code can tell a released channel from real data.
+
+Integration
+  - `app.graph.build`: consumer nodes call `release_channels`;
+    `node_update_history` calls `compact_history`/`compact_answer` and reports
+    `state_bytes` as `state_checkpoint_bytes{agent}`.
+  - Limits come from `checkpointer.*` settings (`history_token_budget`,
+    `history_message_max_tokens`, `history_max_messages`, `blob_min_bytes`).
+
+Usage
+  >>> from app.graph.compaction import compact_history
+  >>> from app.infra.blobs import MemoryBlobStore
+  >>> hist = [{"role": "user", "content": "a" * 40}, {"role": "assistant", "content": "b" * 40}]
+  >>> len(compact_history(hist, token_budget=12, message_max_tokens=50, store=MemoryBlobStore()))
+  1
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from app.infra.blobs import encode_payload
+from app.infra.rate_limit import estimate_tokens
+
+__all__ = [
+    "TRANSIENT_CHANNELS",
+    "CompactionLimits",
+    "blob_ref",
+    "is_blob_ref",
+    "release_channels",
+    "compact_history",
+    "compact_answer",
+    "state_bytes",
+    "get_limits",
+]
+
+# Channels produced and consumed within a single turn
+TRANSIENT_CHANNELS: tuple[str, ...] = ("analytics_rows", "hits", "ranked", "processed_document", "rag_probe")
+# Channels whose payload is kept (as a blob) after release; others are cleared
+_KEEP_AS_BLOB = frozenset({"analytics_rows", "processed_document"})
+# Answer keys kept inline in `last_answer`; anything else bulky is offloaded
+_ANSWER_INLINE_KEYS = ("text", "meta", "citations", "followups", "no_context")
+_META_INLINE_LIMIT = 512
+_CITATIONS_INLINE = 5
+_TRUNCATION_MARK = " …"
+# History message keys never offloaded (the message envelope and existing refs)
+_MESSAGE_INLINE_KEYS = frozenset(
+    {"role", "content", "timestamp", "agent", "content_ref", "embedding_ref", "embedding_model", "extra_ref"}
+)
+
+
+@dataclass(frozen=True)
+class CompactionLimits:
+    """Compaction thresholds (see `checkpointer` settings)."""
+
+    history_token_budget: int = 3000
+    message_max_tokens: int = 800
+    max_messages: int = 50
+    blob_min_bytes: int = 4096
+
+
+def get_limits() -> CompactionLimits:
+    """Return limits from Settings (defaults when settings are unavailable)."""
+    try:
+        from app.config.settings import get_settings
+
+        cfg = get_settings().checkpointer
+        return CompactionLimits(
+            history_token_budget=cfg.history_token_budget,
+            message_max_tokens=cfg.history_message_max_tokens,
+            max_messages=cfg.history_max_messages,
+            blob_min_bytes=cfg.blob_min_bytes,
+        )
+    except Exception:
+        return CompactionLimits()
+
+
+def _to_plain(value: Any) -> Any:
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return dict(value.__dict__)
+    return value
+
+
+def blob_ref(payload: Any, store: Any, **summary: Any) -> dict[str, Any] | None:
+    """Store `payload` and return ``{"$blob": ref, "bytes": n, **summary}``.
+
+    Returns None when the store is unavailable or the write fails.
+    """
+    try:
+        plain = _to_plain(payload)
+        ref = store.put(plain)
+        return {"$blob": ref, "bytes": len(encode_payload(plain)), **summary}
+    except Exception:
+        return None
+
+
+def is_blob_ref(value: Any) -> bool:
+    """Whether `value` is a reference produced by `blob_ref`."""
+    return isinstance(value, Mapping) and "$blob" in value
+
+
+def release_channels(state: Mapping[str, Any], names: Sequence[str], store: Any) -> dict[str, Any]:
+    """Return state updates that release consumed transient channels.
+
+    `analytics_rows` and `processed_document` become blob references (with a
+    row count / success flag); other channels are cleared to None.
+    """
+    updates: dict[str, Any] = {}
+    for name in names:
+        value = state.get(name)
+        if value is None or is_blob_ref(value):
+            continue
+        if name in _KEEP_AS_BLOB:
+            plain = _to_plain(value)
+            summary: dict[str, Any] = {}
+            if isinstance(plain, Mapping):
+                if "row_count" in plain:
+                    summary["row_count"] = plain.get("row_count")
+                if "success" in plain:
+                    summary["success"] = plain.get("success")
+            updates[name] = blob_ref(plain, store, **summary)
+        else:
+            updates[name] = None
+    return updates
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(1, max_tokens * 4)
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars - len(_TRUNCATION_MARK)].rstrip() + _TRUNCATION_MARK
+
+
+def _offload_extras(m: dict[str, Any], store: Any, blob_min_bytes: int) -> None:
+    """Move a message's inline embedding and other bulky keys to `store` (in place)."""
+    data = m.pop("embedding", None)
+    if isinstance(data, str) and data and not m.get("embedding_ref"):
+        # Same payload `app.utils.conversation_search` writes, so the searcher
+        # can still resolve it; a vector that cannot be stored is dropped
+        # (it is re-embedded on demand) rather than checkpointed inline.
+        ref = blob_ref({"model": m.get("embedding_model"), "embedding": data}, store)
+        if ref is not None:
+            m["embedding_ref"] = ref["$blob"]
+    bulky = {k: v for k, v in m.items() if k not in _MESSAGE_INLINE_KEYS}
+    if bulky and len(encode_payload(bulky)) >= blob_min_bytes:
+        ref = blob_ref(bulky, store)
+        if ref is not None:
+            for k in bulky:
+                del m[k]
+            m["extra_ref"] = ref["$blob"]
+
+
+def compact_history(
+    history: Sequence[Mapping[str, Any]],
+    *,
+    token_budget: int,
+    message_max_tokens: int,
+    store: Any,
+    max_messages: int | None = None,
+    blob_min_bytes: int = CompactionLimits.blob_min_bytes,
+) -> list[dict[str, Any]]:
+    """Keep the newest messages that fit `token_budget`.
+
+    Messages longer than `message_max_tokens` are truncated; their full text is
+    offloaded to `store` and referenced via ``content_ref``. Inline embeddings
+    move to ``embedding_ref`` and other keys totalling `blob_min_bytes` or more
+    to one blob referenced by ``extra_ref`` (they stay inline, and counted,
+    when the store is unavailable). A message costs its text plus everything
+    else it still carries. The newest message is always kept (truncated if
+    needed).
+    """
+    kept: list[dict[str, Any]] = []
+    used = 0
+    for msg in reversed(list(history)):
+        if max_messages is not None and len(kept) >= max_messages:
+            break
+        m = dict(msg)
+        content = str(m.get("content", "") or "")
+        truncated = _truncate_to_tokens(content, message_max_tokens)
+        if truncated != content:
+            if "content_ref" not in m:
+                ref = blob_ref({"content": content}, store)
+                if ref is not None:
+                    m["content_ref"] = ref["$blob"]
+            m["content"] = truncated
+        _offload_extras(m, store, blob_min_bytes)
+        extras = {k: v for k, v in m.items() if k != "content"}
+        cost = estimate_tokens(truncated) + (estimate_tokens(encode_payload(extras).decode("utf-8")) if extras else 0)
+        if kept and used + cost > token_budget:
+            break
+        used += cost
+        kept.append(m)
+    kept.reverse()
+    return kept
+
+
+def compact_answer(
+    answer: Mapping[str, Any] | None,
+    *,
+    store: Any,
+    message_max_tokens: int,
+    blob_min_bytes: int,
+) -> dict[str, Any] | None:
+    """Reduce an answer to what later turns need (`last_answer`).
+
+    Keeps `text` (bounded), small scalar `meta` fields, the first citations
+    and follow-ups; bulky keys (`data`, `columns`, `chunks`, `artifacts`, ...)
+    move to one blob referenced by ``payload_ref``, or stay inline when the
+    blob store is unavailable (a larger checkpoint beats losing the data).
+    """
+    if answer is None:
+        return None
+    if not isinstance(answer, Mapping):
+        return {"text": _truncate_to_tokens(str(answer), message_max_tokens)}
+
+    out: dict[str, Any] = {}
+    text = str(answer.get("text", "") or "")
+    out["text"] = _truncate_to_tokens(text, message_max_tokens)
+    if out["text"] != text:
+        ref = blob_ref({"text": text}, store)
+        if ref is not None:
+            out["text_ref"] = ref["$blob"]
+
+    meta = answer.get("meta")
+    if isinstance(meta, Mapping):
+        out["meta"] = {
+            k: v
+            for k, v in meta.items()
+            if (isinstance(v, (int, float, bool)) or v is None)
+            or (isinstance(v, str) and len(v) <= _META_INLINE_LIMIT)
+        }
+    citations = answer.get("citations")
+    if isinstance(citations, list) and citations:
+        out["citations"] = citations[:_CITATIONS_INLINE]
+    for key in ("followups", "no_context"):
+        if answer.get(key) is not None:
+            out[key] = answer.get(key)
+
+    bulky = {k: v for k, v in answer.items() if k not in _ANSWER_INLINE_KEYS and v not in (None, [], {}, "")}
+    if bulky:
+        ref = blob_ref(bulky, store) if len(encode_payload(bulky)) >= blob_min_bytes else None
+        if ref is not None:
+            out["payload_ref"] = ref["$blob"]
+        else:
+            out.update(bulky)
+    return out
+
+
+def state_bytes(values: Mapping[str, Any]) -> int:
+    """Approximate serialized size of a state snapshot (compact JSON)."""
+    try:
+        return len(json.dumps(values, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8"))
+    except Exception:
+        return 0
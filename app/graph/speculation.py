@@ -0,0 +1,266 @@
+"""
+Speculative fan-out for borderline routing decisions.
+
+Overview
+  When the supervisor's decision is borderline (ensemble tie, a secondary
+  intent hint, a supervisor fallback between analytics and knowledge, or a
+  confidence just above the minimum), the graph can run the top two
+  candidate pipelines concurrently instead of committing to one. Each branch
+  has a deadline; the answer with the stronger evidence wins and the other
+  branch is cancelled as soon as the outcome is known.
+
+Design
+  - Opt-in (`routing.speculative_enabled`); only analytics and knowledge are
+    speculated, the two agents whose misroutes cost a full re-ask.
+  - `speculation_candidates` is a pure function over the router and
+    supervisor decisions; `branch_evidence` scores a branch result in
+    [0, 1] from cheap, already-computed signals (row counts, plan validity,
+    rank scores, `no_context`). A plan that was not executed (SQL approval
+    pending) scores `plan_only_evidence` (`PLAN_ONLY_EVIDENCE` by default,
+    `routing.speculative_plan_evidence`): at or below a knowledge branch's
+    top rank score it loses or ties, and ties go to the primary.
+  - `race_branches` awaits branches with `FIRST_COMPLETED`: a first result at
+    or above `strong_evidence` wins immediately and the other task is
+    cancelled; otherwise the remaining branch gets the rest of its deadline
+    and evidence decides (ties go to the primary candidate).
+  - Cancellation stops the branch coroutine; work already handed to a worker
+    thread finishes in the background and its result is discarded.
+
+Integration
+  - `app.graph.build`: `supervisor` stores the candidates in
+    `speculative_agents`; the `speculate` node composes the pipeline nodes
+    per branch and merges the winner's state delta.
+  - Settings: `routing.speculative_*` (margin, deadline, strong and
+    plan-only evidence).
+  - Metric: `speculation_total{winner,outcome}`.
+
+Usage
+  >>> from app.graph.speculation import speculation_candidates
+  >>> speculation_candidates(
+  ...     {"agent": "analytics", "confidence": 0.9, "signals": []},
+  ...     {"agent": "analytics", "confidence": 0.9, "signals": ["secondary:knowledge"]},
+  ...     confidence_min=0.55, margin=0.1,
+  ... )
+  ('analytics', 'knowledge')
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass, field
+from typing import Any
+
+__all__ = [
+    "PLAN_ONLY_EVIDENCE",
+    "SPECULATIVE_AGENTS",
+    "BranchResult",
+    "SpeculationOutcome",
+    "branch_evidence",
+    "race_branches",
+    "speculation_candidates",
+]
+
+SPECULATIVE_AGENTS: tuple[str, ...] = ("analytics", "knowledge")
+# Evidence of an allowlisted analytics plan that was not executed: above an
+# empty result (0.3), below rows (0.9) and below a well-ranked document
+PLAN_ONLY_EVIDENCE = 0.6
+_SECONDARY_PREFIX = "secondary:"
+
+
+def _signals(decision: Mapping[str, Any] | None) -> set[str]:
+    return {str(s) for s in ((decision or {}).get("signals") or [])}
+
+
+def speculation_candidates(
+    router_decision: Mapping[str, Any] | None,
+    final_decision: Mapping[str, Any] | None,
+    *,
+    confidence_min: float,
+    margin: float,
+) -> tuple[str, str] | None:
+    """Return ``(primary, secondary)`` agents to speculate on, or None.
+
+    Parameters
+    ----------
+    router_decision:
+        Classifier decision before supervision.
+    final_decision:
+        Supervisor decision (its agent is the primary candidate when it is one
+        of `SPECULATIVE_AGENTS`).
+    confidence_min:
+        Routing confidence floor (`routing.confidence_min`).
+    margin:
+        Decisions below ``confidence_min + margin`` count as borderline.
+    """
+    router_decision = router_decision or {}
+    final_decision = final_decision or {}
+    signals = _signals(router_decision) | _signals(final_decision)
+    if "commerce_doc" in signals:
+        return None
+
+    final_agent = str(final_decision.get("agent") or "")
+    router_agent = str(router_decision.get("agent") or "")
+    hinted = [s[len(_SECONDARY_PREFIX):] for s in sorted(signals) if s.startswith(_SECONDARY_PREFIX)]
+
+    ordered: list[str] = []
+    for agent in (final_agent, router_agent, *hinted):
+        if agent in SPECULATIVE_AGENTS and agent not in ordered:
+            ordered.append(agent)
+    if len(ordered) < 2:
+        return None
+
+    try:
+        confidence = float(final_decision.get("confidence", 0.0) or 0.0)
+    except (TypeError, ValueError):
+        confidence = 0.0
+    borderline = (
+        "ensemble_tie" in signals
+        or bool(hinted)
+        or (router_agent != final_agent)
+        or confidence < confidence_min + margin
+    )
+    return (ordered[0], ordered[1]) if borderline else None
+
+
+def _get(obj: Any, key: str, default: Any = None) -> Any:
+    if isinstance(obj, Mapping):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+def _score(hit: Any) -> float:
+    try:
+        return float(_get(hit, "score", 0.0) or 0.0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def branch_evidence(
+    agent: str, result: Mapping[str, Any], *, plan_only_evidence: float = PLAN_ONLY_EVIDENCE
+) -> float:
+    """Score a branch result in [0, 1] (higher means stronger evidence).
+
+    `result` is the branch's working state: the merged node deltas plus the
+    keys the branch runner records (`_ranked`, `_executed`, `_row_count`,
+    `_error`). `plan_only_evidence` scores an analytics plan that was not
+    executed.
+    """
+    if agent == "knowledge":
+        answer = result.get("answer") or {}
+        if not answer or _get(answer, "no_context"):
+            return 0.0
+        scores = [_score(h) for h in (result.get("_ranked") or [])]
+        if scores:
+            return max(0.0, min(1.0, max(scores)))
+        return 0.6 if _get(answer, "citations") else 0.3
+    if agent == "analytics":
+        plan = result.get("analytics_plan")
+        if not plan or not str(_get(plan, "sql", "") or "").strip():
+            return 0.0
+        if not result.get("_executed"):
+            # Plan only (SQL approval pending): a valid allowlisted plan
+            return max(0.0, min(1.0, float(plan_only_evidence)))
+        if result.get("_error"):
+            return 0.0
+        return 0.9 if int(result.get("_row_count") or 0) > 0 else 0.3
+    return 0.0
+
+
+@dataclass
+class BranchResult:
+    """Outcome of one speculative branch."""
+
+    agent: str
+    evidence: float = 0.0
+    delta: dict[str, Any] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+    status: str = "ok"  # ok | timeout | error | cancelled
+
+
+@dataclass
+class SpeculationOutcome:
+    """Winner selection across branches."""
+
+    winner: str | None
+    outcome: str  # strong_first | evidence | primary_default | weak | no_result
+    branches: dict[str, BranchResult] = field(default_factory=dict)
+
+    @property
+    def delta(self) -> dict[str, Any]:
+        if self.winner is None:
+            return {}
+        return self.branches[self.winner].delta
+
+
+async def _timed(agent: str, fn: Callable[[], Awaitable[tuple[float, dict[str, Any]]]], deadline_s: float) -> BranchResult:
+    t0 = time.perf_counter()
+    try:
+        evidence, delta = await asyncio.wait_for(fn(), timeout=deadline_s)
+        return BranchResult(agent, float(evidence), dict(delta), (time.perf_counter() - t0) * 1000.0)
+    except TimeoutError:
+        return BranchResult(agent, 0.0, {}, (time.perf_counter() - t0) * 1000.0, status="timeout")
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        return BranchResult(agent, 0.0, {}, (time.perf_counter() - t0) * 1000.0, status="error")
+
+
+async def race_branches(
+    branches: Mapping[str, Callable[[], Awaitable[tuple[float, dict[str, Any]]]]],
+    *,
+    primary: str,
+    deadline_s: float,
+    strong_evidence: float,
+) -> SpeculationOutcome:
+    """Run branches concurrently and pick the one with the strongest evidence.
+
+    Parameters
+    ----------
+    branches:
+        Agent -> zero-arg coroutine factory returning ``(evidence, delta)``.
+    primary:
+        Agent that wins ties and is preferred when evidence is equal.
+    deadline_s:
+        Per-branch deadline (seconds).
+    strong_evidence:
+        A branch finishing first at or above this score wins immediately and
+        the remaining branches are cancelled.
+    """
+    tasks = {
+        asyncio.create_task(_timed(agent, fn, deadline_s), name=f"speculate:{agent}"): agent
+        for agent, fn in branches.items()
+    }
+    results: dict[str, BranchResult] = {}
+    outcome = "evidence"
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                res = task.result()
+                results[res.agent] = res
+            first_strong = [r for r in results.values() if r.status == "ok" and r.evidence >= strong_evidence]
+            if first_strong and pending:
+                outcome = "strong_first"
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+            results.setdefault(tasks[task], BranchResult(tasks[task], status="cancelled"))
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    finished = [r for r in results.values() if r.status == "ok"]
+    if not finished:
+        return SpeculationOutcome(None, "no_result", results)
+    ok = [r for r in finished if r.evidence > 0.0]
+    if not ok:
+        # Both answered without evidence (e.g., no_context): keep the primary's
+        weak = next((r for r in finished if r.agent == primary), finished[0])
+        return SpeculationOutcome(weak.agent, "weak", results)
+    best = max(ok, key=lambda r: (r.evidence, r.agent == primary))
+    if outcome == "evidence" and len(ok) > 1 and len({r.evidence for r in ok}) == 1:
+        outcome = "primary_default"
+    return SpeculationOutcome(best.agent, outcome, results)
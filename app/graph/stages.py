@@ -0,0 +1,324 @@
+"""
+Structured async stage runner: deadlines, cancellation and concurrency caps.
+
+Overview
+  A request runs a few independent stages (the RAG probe, context
+  resolution, conversation search, classification). `StageRunner` runs each
+  one under its own deadline, caps how many instances of a stage run at once
+  across requests, cancels work that is abandoned, and records a per-request
+  latency breakdown (elapsed, queued and budget per stage).
+
+Design
+  - Stages are coroutine functions (awaited in a task) or plain callables
+    (run in the default executor). A stage that misses its deadline returns
+    the caller's `default` (or raises `StageTimeout`); its task is cancelled
+    and its `StageToken` is marked cancelled.
+  - Worker threads cannot be interrupted, so sync stages see their token via
+    `current_stage()` (the context is copied into the thread) and should bound
+    blocking I/O with `token.remaining_s()` (e.g. a SQL `statement_timeout`)
+    or check `token.cancelled` between steps.
+  - Concurrency caps are per stage name and per event loop. A sync stage
+    keeps its slot until its thread actually returns, so abandoned threads
+    still count against the cap.
+  - Deadlines run from the moment a stage is started, so background stages
+    (`start` + `result`) overlap with the rest of the request. They are
+    clamped to the request budget (`app.infra.deadline`) when one is active.
+
+Integration
+  - `app.graph.build`: `node_route` runs probe/context/classification through
+    a runner built by `StageRunner.from_settings("route")` and stores
+    `breakdown()` in `routing_ctx["stages"]`.
+  - Deadlines/caps: `routing.stage_deadlines_s` / `routing.stage_max_concurrency`.
+  - Metric: `stage_latency_ms{scope,stage,status}`.
+
+Usage
+  >>> import asyncio
+  >>> from app.graph.stages import StageRunner
+  >>> async def main():
+  ...     runner = StageRunner("demo", deadlines={"slow": 0.01})
+  ...     out = await runner.run("slow", asyncio.sleep, 1, default="skipped")
+  ...     return out, runner.breakdown()["slow"]["status"]
+  >>> asyncio.run(main())
+  ('skipped', 'timeout')
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import inspect
+import threading
+import time
+import weakref
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from app.infra.deadline import bounded_timeout
+
+try:  # Optional metrics
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _observe_hist(_name: str, value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+__all__ = [
+    "StageHandle",
+    "StageRunner",
+    "StageTimeout",
+    "StageToken",
+    "current_stage",
+]
+
+_DEFAULT_DEADLINE_S = 30.0
+_RAISE: Any = object()
+
+
+class StageTimeout(asyncio.TimeoutError):
+    """Raised when a stage without a `default` misses its deadline."""
+
+
+class StageToken:
+    """Deadline and cancellation flag visible to the running stage."""
+
+    __slots__ = ("name", "deadline", "_cancelled")
+
+    def __init__(self, name: str, deadline: float) -> None:
+        self.name = name
+        self.deadline = deadline
+        self._cancelled = threading.Event()
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set() or self.remaining_s() <= 0.0
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+
+_CURRENT: contextvars.ContextVar[StageToken | None] = contextvars.ContextVar("graph_stage", default=None)
+
+
+def current_stage() -> StageToken | None:
+    """Return the token of the stage running in this context (or None)."""
+    return _CURRENT.get()
+
+
+# Per-loop semaphores: asyncio primitives must not be shared across loops
+_SEMAPHORES: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]] = (
+    weakref.WeakKeyDictionary()
+)
+_SEM_LOCK = threading.Lock()
+
+
+def _semaphore(name: str, cap: int | None) -> asyncio.Semaphore | None:
+    if not cap or cap <= 0:
+        return None
+    loop = asyncio.get_running_loop()
+    with _SEM_LOCK:
+        per_loop = _SEMAPHORES.setdefault(loop, {})
+        sem = per_loop.get(name)
+        if sem is None:
+            sem = per_loop[name] = asyncio.Semaphore(int(cap))
+        return sem
+
+
+@dataclass
+class _Record:
+    budget_ms: float
+    started: float
+    queued_ms: float = 0.0
+    elapsed_ms: float = 0.0
+    status: str = "running"  # running | ok | timeout | error | cancelled
+
+
+@dataclass
+class StageHandle:
+    """A started stage; pass it to `StageRunner.result`."""
+
+    name: str
+    task: asyncio.Task[Any]
+    token: StageToken
+
+
+class StageRunner:
+    """Run request stages under deadlines and concurrency caps.
+
+    Parameters
+    ----------
+    scope:
+        Label for metrics and logs (e.g. ``"route"``).
+    deadlines:
+        Stage name -> deadline in seconds.
+    caps:
+        Stage name -> max concurrent instances (per event loop).
+    default_deadline_s:
+        Deadline for stages missing from `deadlines`.
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        *,
+        deadlines: Mapping[str, float] | None = None,
+        caps: Mapping[str, int] | None = None,
+        default_deadline_s: float = _DEFAULT_DEADLINE_S,
+    ) -> None:
+        self.scope = scope
+        self.deadlines = dict(deadlines or {})
+        self.caps = dict(caps or {})
+        self.default_deadline_s = float(default_deadline_s)
+        self._records: dict[str, _Record] = {}
+        self._handles: list[StageHandle] = []
+        self._t0 = time.monotonic()
+
+    @classmethod
+    def from_settings(cls, scope: str) -> "StageRunner":
+        """Build a runner with `routing.stage_*` deadlines and caps."""
+        try:
+            from app.config.settings import get_settings
+
+            routing = get_settings().routing
+            return cls(
+                scope,
+                deadlines=dict(routing.stage_deadlines_s),
+                caps=dict(routing.stage_max_concurrency),
+            )
+        except Exception:
+            return cls(scope)
+
+    # Execution ---------------------------------------------------------------
+    def start(self, name: str, fn: Callable[..., Any], /, *args: Any, deadline_s: float | None = None, **kwargs: Any) -> StageHandle:
+        """Start a stage in the background and return its handle."""
+        budget = float(deadline_s if deadline_s is not None else self.deadlines.get(name, self.default_deadline_s))
+        budget = float(bounded_timeout(budget) or 0.0)  # never past the request deadline
+        now = time.monotonic()
+        token = StageToken(name, now + budget)
+        record = self._records[name] = _Record(budget_ms=budget * 1000.0, started=now)
+        sem = _semaphore(name, self.caps.get(name))
+
+        async def _body() -> Any:
+            _CURRENT.set(token)
+            if sem is not None:
+                await sem.acquire()
+            record.queued_ms = (time.monotonic() - now) * 1000.0
+            if inspect.iscoroutinefunction(fn):
+                try:
+                    return await fn(*args, **kwargs)
+                finally:
+                    if sem is not None:
+                        sem.release()
+            return await self._in_thread(fn, args, kwargs, sem)
+
+        task = asyncio.create_task(_body(), name=f"{self.scope}:{name}")
+        handle = StageHandle(name, task, token)
+        self._handles.append(handle)
+        return handle
+
+    async def result(self, handle: StageHandle, *, default: Any = _RAISE) -> Any:
+        """Wait for a started stage until its deadline.
+
+        On timeout the stage is cancelled and `default` is returned (or
+        `StageTimeout` raised). Errors propagate unless a `default` is given.
+        """
+        record = self._records[handle.name]
+        done, _ = await asyncio.wait({handle.task}, timeout=handle.token.remaining_s())
+        if not done:
+            self._cancel(handle)
+            self._finish(handle.name, record, "timeout")
+            if default is _RAISE:
+                raise StageTimeout(f"stage {handle.name!r} exceeded {record.budget_ms:.0f} ms")
+            return default
+        try:
+            value = handle.task.result()
+        except asyncio.CancelledError:
+            self._finish(handle.name, record, "cancelled")
+            if default is _RAISE:
+                raise
+            return default
+        except Exception:
+            self._finish(handle.name, record, "error")
+            if default is _RAISE:
+                raise
+            return default
+        self._finish(handle.name, record, "ok")
+        return value
+
+    async def run(
+        self,
+        name: str,
+        fn: Callable[..., Any],
+        /,
+        *args: Any,
+        default: Any = _RAISE,
+        deadline_s: float | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Start a stage and wait for it (see `result`)."""
+        handle = self.start(name, fn, *args, deadline_s=deadline_s, **kwargs)
+        return await self.result(handle, default=default)
+
+    async def aclose(self) -> None:
+        """Cancel stages whose result was never collected."""
+        for handle in self._handles:
+            if not handle.task.done():
+                self._cancel(handle)
+                record = self._records.get(handle.name)
+                if record is not None and record.status == "running":
+                    self._finish(handle.name, record, "cancelled")
+
+    # Reporting ---------------------------------------------------------------
+    def breakdown(self) -> dict[str, Any]:
+        """Per-stage latency budget breakdown for this request."""
+        out: dict[str, Any] = {
+            name: {
+                "ms": round(r.elapsed_ms, 1),
+                "queued_ms": round(r.queued_ms, 1),
+                "budget_ms": round(r.budget_ms, 1),
+                "status": r.status,
+            }
+            for name, r in self._records.items()
+        }
+        out["total_ms"] = round((time.monotonic() - self._t0) * 1000.0, 1)
+        return out
+
+    # Internals ---------------------------------------------------------------
+    @staticmethod
+    async def _in_thread(
+        fn: Callable[..., Any],
+        args: tuple[Any, ...],
+        kwargs: Mapping[str, Any],
+        sem: asyncio.Semaphore | None,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        ctx = contextvars.copy_context()
+
+        def _call() -> Any:
+            try:
+                return ctx.run(fn, *args, **kwargs)
+            finally:
+                if sem is not None:
+                    # The slot is held until the thread returns, even if abandoned
+                    try:
+                        loop.call_soon_threadsafe(sem.release)
+                    except RuntimeError:  # loop already closed
+                        pass
+
+        return await loop.run_in_executor(None, _call)
+
+    @staticmethod
+    def _cancel(handle: StageHandle) -> None:
+        handle.token.cancel()
+        handle.task.cancel()
+
+    def _finish(self, name: str, record: _Record, status: str) -> None:
+        record.status = status
+        record.elapsed_ms = (time.monotonic() - record.started) * 1000.0
+        _observe_hist(
+            "stage_latency_ms",
+            record.elapsed_ms,
+            {"scope": self.scope, "stage": name, "status": status},
+        )
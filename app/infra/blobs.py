@@ -0,0 +1,209 @@
+"""
+Content-addressed blob store for bulky graph-state payloads.
+
+Overview
+  Keeps large payloads (result rows, processed documents, long answers) out
+  of checkpointed graph state. Payloads are stored once under their SHA-256
+  digest; state keeps only a small reference (``blob:sha256:<hex>``) that can
+  be resolved later for exports, audits or debugging.
+
+Design
+  - Canonical JSON (sorted keys) -> SHA-256 -> reference; identical payloads
+    (e.g., the same rows re-served from cache) are written once.
+  - Postgres backend: one ``state_blobs`` table (digest primary key, zlib
+    compressed JSON, size, created_at); re-writing an existing digest only
+    refreshes `created_at` when it is over an hour old, so blobs still
+    referenced by recent checkpoints survive retention. The table is created
+    lazily.
+  - In-memory LRU backend when no database is configured (tests, local runs,
+    disabled checkpointer) so callers never need to branch.
+  - Blob operations never raise into the request path; failures are logged
+    and reported as a missing reference by the caller.
+
+Integration
+  - `get_blob_store()` picks the backend from `checkpointer` settings and
+    `DATABASE_URL`; used by `app.graph.compaction`.
+  - Old rows are removed by the checkpoint retention job
+    (`app.infra.checkpoint_retention`) once past the checkpoint max age.
+
+Usage
+  >>> from app.infra.blobs import MemoryBlobStore
+  >>> store = MemoryBlobStore()
+  >>> ref = store.put({"rows": [1, 2, 3]})
+  >>> ref.startswith("blob:sha256:"), store.get(ref)
+  (True, {'rows': [1, 2, 3]})
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any
+
+_log = logging.getLogger(__name__)
+
+__all__ = [
+    "BLOB_PREFIX",
+    "MemoryBlobStore",
+    "PostgresBlobStore",
+    "blob_digest",
+    "encode_payload",
+    "get_blob_store",
+]
+
+BLOB_PREFIX = "blob:sha256:"
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+
+def encode_payload(payload: Any) -> bytes:
+    """Canonical JSON encoding used for hashing and storage."""
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str).encode(
+        "utf-8"
+    )
+
+
+def blob_digest(data: bytes) -> str:
+    """Return the reference for already-encoded payload bytes."""
+    return BLOB_PREFIX + hashlib.sha256(data).hexdigest()
+
+
+def _digest_of(ref: str) -> str | None:
+    if not isinstance(ref, str) or not ref.startswith(BLOB_PREFIX):
+        return None
+    return ref[len(BLOB_PREFIX):]
+
+
+class MemoryBlobStore:
+    """Bounded in-process blob store (LRU).
+
+    Parameters
+    ----------
+    max_items:
+        Maximum number of blobs kept; least recently used are evicted.
+    """
+
+    def __init__(self, max_items: int = 1000) -> None:
+        self.max_items = max(1, int(max_items))
+        self._data: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, payload: Any) -> str:
+        data = encode_payload(payload)
+        ref = blob_digest(data)
+        with self._lock:
+            self._data[ref] = data
+            self._data.move_to_end(ref)
+            while len(self._data) > self.max_items:
+                self._data.popitem(last=False)
+        return ref
+
+    def get(self, ref: str) -> Any | None:
+        with self._lock:
+            data = self._data.get(ref)
+            if data is not None:
+                self._data.move_to_end(ref)
+        return json.loads(data) if data is not None else None
+
+
+class PostgresBlobStore:
+    """Blob store backed by a Postgres table.
+
+    Parameters
+    ----------
+    engine:
+        SQLAlchemy engine (read-write).
+    table:
+        Table name (optionally schema-qualified).
+    """
+
+    def __init__(self, engine: Any, table: str = "state_blobs") -> None:
+        if not _IDENT_RE.match(table):
+            raise ValueError(f"invalid blob table name: {table!r}")
+        self.engine = engine
+        self.table = table
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure_table(self, conn: Any) -> None:
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " digest TEXT PRIMARY KEY,"
+                " data BYTEA NOT NULL,"
+                " size_bytes INTEGER NOT NULL,"
+                " created_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+            )
+            conn.exec_driver_sql(
+                f"CREATE INDEX IF NOT EXISTS {self.table.split('.')[-1]}_created_at_idx"
+                f" ON {self.table} (created_at)"
+            )
+            self._ready = True
+
+    def put(self, payload: Any) -> str:
+        import sqlalchemy as sa
+
+        data = encode_payload(payload)
+        ref = blob_digest(data)
+        with self.engine.begin() as conn:
+            self._ensure_table(conn)
+            conn.execute(
+                sa.text(
+                    f"INSERT INTO {self.table} AS b (digest, data, size_bytes) VALUES (:d, :b, :n)"
+                    " ON CONFLICT (digest) DO UPDATE SET created_at = now()"
+                    " WHERE b.created_at < now() - interval '1 hour'"
+                ),
+                {"d": _digest_of(ref), "b": zlib.compress(data, 6), "n": len(data)},
+            )
+        return ref
+
+    def get(self, ref: str) -> Any | None:
+        import sqlalchemy as sa
+
+        digest = _digest_of(ref)
+        if digest is None:
+            return None
+        with self.engine.begin() as conn:
+            self._ensure_table(conn)
+            row = conn.execute(
+                sa.text(f"SELECT data FROM {self.table} WHERE digest = :d"), {"d": digest}
+            ).first()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(bytes(row[0])))
+
+
+_STORE: Any | None = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_blob_store() -> Any:
+    """Return the process-wide blob store (Postgres when configured, else memory)."""
+    global _STORE
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = _build_store()
+    return _STORE
+
+
+def _build_store() -> Any:
+    try:
+        from app.config.settings import get_settings
+
+        cfg = get_settings().checkpointer
+        if cfg.enabled and str(cfg.backend).lower() == "postgres":
+            from app.infra.db import get_engine
+
+            return PostgresBlobStore(get_engine(), table=cfg.blob_table)
+    except Exception as exc:
+        _log.info("blob store: using in-memory backend", extra={"reason": type(exc).__name__})
+    return MemoryBlobStore()
@@ -12,17 +12,24 @@ Design
   - Thread-safe operations for concurrent access
   - Graceful degradation when cache is unavailable
   - Separate cache classes for different use cases (routing, embeddings, responses)
+  - `SingleFlight` coalesces concurrent misses for the same cache key into one
+    in-flight computation, so a burst of identical requests costs one call
 
 Integration
   - RoutingCache: Used by LLMClassifier to cache routing decisions
   - EmbeddingCache: Used by knowledge retriever to cache embeddings
   - ResponseCache: Used by agents to cache responses for similar queries
+  - SingleFlight: Wraps the miss path of the above (keys from `key_for`);
+    followers are counted in `singleflight_coalesced_total{component}`
 
 Usage
   >>> from app.infra.cache import RoutingCache, EmbeddingCache, ResponseCache
   >>> routing_cache = RoutingCache(ttl_seconds=3600)
   >>> embedding_cache = EmbeddingCache(ttl_seconds=86400)
   >>> response_cache = ResponseCache(ttl_seconds=3600)
+  >>> flight = SingleFlight("embeddings")
+  >>> flight.do(embedding_cache.key_for("oi", "m"), lambda: [0.1, 0.2])
+  [0.1, 0.2]
 """
 
 from __future__ import annotations
@@ -31,8 +38,8 @@ import hashlib
 import json
 import time
 from collections.abc import Iterable, Mapping, Sequence
-from threading import Lock
-from typing import Any
+from threading import Event, Lock
+from typing import Any, Callable, TypeVar
 
 try:
     from app.infra.logging import get_logger
@@ -43,7 +50,16 @@ except Exception:
         return _logging.getLogger(component)
 
 
-__all__ = ["RoutingCache", "EmbeddingCache", "ResponseCache"]
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+
+__all__ = ["RoutingCache", "EmbeddingCache", "ResponseCache", "SingleFlight"]
+
+T = TypeVar("T")
 
 
 class RoutingCache:
@@ -117,6 +133,10 @@ class RoutingCache:
         json_str = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
         return hashlib.md5(json_str.encode("utf-8")).hexdigest()
 
+    def key_for(self, query: str, allowlist: Mapping[str, Iterable[str]] | None = None) -> str:
+        """Return the cache key used by `get`/`set` (e.g., for `SingleFlight`)."""
+        return self._query_key(query, self._allowlist_hash(allowlist or {}))
+
     def get(
         self, query: str, allowlist: Mapping[str, Iterable[str]] | None = None
     ) -> dict[str, Any] | None:
@@ -137,9 +157,7 @@ class RoutingCache:
         if not query or not query.strip():
             return None
 
-        allowlist = allowlist or {}
-        allowlist_hash = self._allowlist_hash(allowlist)
-        key = self._query_key(query, allowlist_hash)
+        key = self.key_for(query, allowlist)
 
         with self._lock:
             if key in self._cache:
@@ -172,9 +190,7 @@ class RoutingCache:
         if not query or not query.strip():
             return
 
-        allowlist = allowlist or {}
-        allowlist_hash = self._allowlist_hash(allowlist)
-        key = self._query_key(query, allowlist_hash)
+        key = self.key_for(query, allowlist)
 
         with self._lock:
             if len(self._cache) >= self.max_size:
@@ -263,6 +279,10 @@ class EmbeddingCache:
         combined = f"{normalized}:{model}"
         return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
 
+    def key_for(self, text: str, model: str) -> str:
+        """Return the cache key used by `get`/`set` (e.g., for `SingleFlight`)."""
+        return self._text_key(text, model)
+
     def get(self, text: str, model: str) -> list[float] | None:
         """Retrieve cached embedding if available and not expired.
 
@@ -399,6 +419,24 @@ class ResponseCache:
             combined = f"{combined}:{context_hash}"
         return hashlib.sha256(combined.encode("utf-8")).hexdigest()[:16]
 
+    @staticmethod
+    def _context_hash(context: Mapping[str, Any] | None) -> str | None:
+        """Return a deterministic hash of the optional context mapping."""
+        if not context:
+            return None
+        normalized_ctx: dict[str, Any] = {}
+        for k, v in context.items():
+            if isinstance(v, (list, tuple)):
+                normalized_ctx[k] = sorted(str(x) for x in v)
+            else:
+                normalized_ctx[k] = str(v)
+        json_str = json.dumps(normalized_ctx, sort_keys=True, ensure_ascii=False)
+        return hashlib.md5(json_str.encode("utf-8")).hexdigest()
+
+    def key_for(self, query: str, agent: str, context: Mapping[str, Any] | None = None) -> str:
+        """Return the cache key used by `get`/`set` (e.g., for `SingleFlight`)."""
+        return self._query_key(query, agent, self._context_hash(context))
+
     def get(
         self,
         query: str,
@@ -424,18 +462,7 @@ class ResponseCache:
         if not query or not query.strip():
             return None
 
-        context_hash = None
-        if context:
-            normalized_ctx: dict[str, Any] = {}
-            for k, v in context.items():
-                if isinstance(v, (list, tuple)):
-                    normalized_ctx[k] = sorted(str(x) for x in v)
-                else:
-                    normalized_ctx[k] = str(v)
-            json_str = json.dumps(normalized_ctx, sort_keys=True, ensure_ascii=False)
-            context_hash = hashlib.md5(json_str.encode("utf-8")).hexdigest()
-
-        key = self._query_key(query, agent, context_hash)
+        key = self.key_for(query, agent, context)
 
         with self._lock:
             if key in self._cache:
@@ -471,18 +498,7 @@ class ResponseCache:
         if not query or not query.strip():
             return
 
-        context_hash = None
-        if context:
-            normalized_ctx: dict[str, Any] = {}
-            for k, v in context.items():
-                if isinstance(v, (list, tuple)):
-                    normalized_ctx[k] = sorted(str(x) for x in v)
-                else:
-                    normalized_ctx[k] = str(v)
-            json_str = json.dumps(normalized_ctx, sort_keys=True, ensure_ascii=False)
-            context_hash = hashlib.md5(json_str.encode("utf-8")).hexdigest()
-
-        key = self._query_key(query, agent, context_hash)
+        key = self.key_for(query, agent, context)
 
         with self._lock:
             if len(self._cache) >= self.max_size:
@@ -522,3 +538,73 @@ class ResponseCache:
                 "ttl_seconds": self.ttl,
             }
 
+
+class _Flight:
+    """One in-flight computation shared by a leader and its followers."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self) -> None:
+        self.done = Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight block until it finishes and receive the same
+    result (or exception). Nothing is retained afterwards; pair it with one of
+    the caches above so later callers hit the cache instead.
+
+    Parameters
+    ----------
+    component:
+        Label for `singleflight_coalesced_total{component}`.
+    timeout_seconds:
+        Maximum time a follower waits for the leader; on timeout the follower
+        runs the function itself. None waits indefinitely.
+    """
+
+    def __init__(self, component: str, timeout_seconds: float | None = 120.0) -> None:
+        self.component = component
+        self.timeout = timeout_seconds
+        self._flights: dict[str, _Flight] = {}
+        self._lock = Lock()
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        """Run `fn` once per concurrent `key` and share its outcome.
+
+        Results are shared by reference; callers that mutate them should copy.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+
+        if not leader:
+            _inc_counter("singleflight_coalesced_total", {"component": self.component})
+            if not flight.done.wait(self.timeout):
+                return fn()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+            return flight.result
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def inflight(self) -> int:
+        """Return the number of keys currently in flight."""
+        with self._lock:
+            return len(self._flights)
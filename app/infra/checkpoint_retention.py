@@ -0,0 +1,454 @@
+"""
+Checkpoint retention: batched pruning of LangGraph checkpoint tables.
+
+Overview
+  Keeps the Postgres checkpointer tables bounded. One run:
+
+  1. deletes checkpoints and pending writes older than `max_age_hours`;
+  2. trims every thread to its newest `keep_last` checkpoints (and their
+     writes);
+  3. removes channel blobs no longer referenced by any remaining checkpoint
+     (idle threads only): first for the threads touched above, then for
+     every other thread that has blobs, so orphans left by earlier runs or
+     by the saver itself are collected too;
+  4. deletes `state_blobs` rows (see `app.infra.blobs`) past the same age.
+
+Design
+  - Age predicates use `checkpoint_id`: LangGraph ids are UUIDv6, whose
+    string form sorts by creation time, so ``checkpoint_id < :cutoff`` is a
+    timestamp predicate served by a plain btree index (`ensure_indexes`).
+  - Every delete is bounded: ``DELETE ... WHERE ctid = ANY(ARRAY(SELECT ctid
+    ... LIMIT :batch FOR UPDATE SKIP LOCKED))``, one short transaction per
+    batch with ``SET LOCAL lock_timeout/statement_timeout`` and a pause
+    between batches, so rows being written are skipped and hot tables are
+    never locked for long. The whole-table ``GROUP BY`` that finds threads
+    over `keep_last` runs under the same timeouts.
+  - Channel blobs are only swept for threads idle for `blob_grace_minutes`:
+    the saver writes blobs just before the checkpoint row that references
+    them. The full pass pages through blob threads by key (`batch_size`
+    threads per query) and skips threads with no checkpoint at all, which
+    cannot be told apart from a thread being created; those are only swept
+    by the run that deleted their checkpoints.
+  - Failures stop the current step and are reported; the next run resumes.
+
+Integration
+  - CLI and scheduler: ``python -m scripts.prune_checkpoints`` (`--loop`
+    runs `retention_loop` every `checkpointer.cleanup_interval_hours`).
+  - Limits come from `checkpointer.retention_*` settings.
+  - `get_retention_engine` connects to the database the checkpointer writes
+    to (`app.infra.checkpointer.checkpointer_url`).
+  - Metrics: `checkpoint_retention_deleted_total{table,reason}` and
+    `checkpoint_retention_duration_ms{step}`.
+
+Usage
+  >>> from datetime import datetime, timezone
+  >>> from app.infra.checkpoint_retention import checkpoint_id_at
+  >>> checkpoint_id_at(datetime(2024, 1, 1, tzinfo=timezone.utc)) < checkpoint_id_at(datetime(2024, 1, 2, tzinfo=timezone.utc))
+  True
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+import uuid
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+try:
+    from app.infra.logging import get_logger
+except Exception:  # pragma: no cover - optional
+    import logging as _logging
+
+    def get_logger(component: str, **initial_values: Any) -> Any:
+        return _logging.getLogger(component)
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+    def _observe_hist(_name: str, _value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+
+__all__ = [
+    "RetentionPolicy",
+    "RetentionReport",
+    "checkpoint_id_at",
+    "ensure_indexes",
+    "get_policy",
+    "get_retention_engine",
+    "retention_loop",
+    "run_retention",
+]
+
+_log = get_logger("infra.checkpoint_retention")
+
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+# 100-ns intervals between the Gregorian epoch (UUID v1/v6) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """Retention limits and table names (see `checkpointer` settings)."""
+
+    max_age_hours: int = 168
+    keep_last: int = 20
+    batch_size: int = 5000
+    pause_s: float = 0.05
+    lock_timeout_ms: int = 2000
+    statement_timeout_ms: int = 30000
+    blob_grace_minutes: int = 15
+    checkpoints_table: str = "checkpoints"
+    writes_table: str = "checkpoint_writes"
+    blobs_table: str = "checkpoint_blobs"
+    state_blobs_table: str = "state_blobs"
+
+    def __post_init__(self) -> None:
+        for name in (self.checkpoints_table, self.writes_table, self.blobs_table, self.state_blobs_table):
+            if not _IDENT_RE.match(name):
+                raise ValueError(f"invalid table name: {name!r}")
+
+
+@dataclass
+class RetentionReport:
+    """Outcome of one retention run."""
+
+    deleted: dict[str, int] = field(default_factory=dict)
+    threads_trimmed: int = 0
+    threads_swept: int = 0
+    duration_ms: float = 0.0
+    errors: list[str] = field(default_factory=list)
+
+    def add(self, table: str, reason: str, n: int) -> None:
+        key = f"{table}:{reason}"
+        self.deleted[key] = self.deleted.get(key, 0) + n
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "deleted": dict(self.deleted),
+            "total_deleted": sum(self.deleted.values()),
+            "threads_trimmed": self.threads_trimmed,
+            "threads_swept": self.threads_swept,
+            "duration_ms": round(self.duration_ms, 1),
+            "errors": list(self.errors),
+        }
+
+
+def get_policy() -> RetentionPolicy:
+    """Return the policy from Settings (defaults when settings are unavailable)."""
+    try:
+        from app.config.settings import get_settings
+
+        cfg = get_settings().checkpointer
+        return RetentionPolicy(
+            max_age_hours=cfg.retention_max_age_hours,
+            keep_last=cfg.retention_keep_last,
+            batch_size=cfg.retention_batch_size,
+            state_blobs_table=cfg.blob_table,
+        )
+    except Exception:
+        return RetentionPolicy()
+
+
+def get_retention_engine() -> Any:
+    """Return an engine on the checkpointer's database.
+
+    Raises
+    ------
+    ValueError
+        When no database URL is configured.
+    """
+    from app.infra.checkpointer import checkpointer_url
+    from app.infra.db import get_engine
+
+    url = checkpointer_url()
+    if not url:
+        raise ValueError("checkpointer database url is not configured (APLLOS_DATABASE_URL/DATABASE_URL)")
+    return get_engine(url=url)
+
+
+def checkpoint_id_at(ts: datetime) -> str:
+    """Smallest UUIDv6 checkpoint id generated at `ts` (an age cutoff).
+
+    Every LangGraph checkpoint created before `ts` has a smaller id in string
+    order, so ``checkpoint_id < checkpoint_id_at(ts)`` selects older rows.
+    """
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    delta = ts - datetime(1970, 1, 1, tzinfo=timezone.utc)
+    ticks = (delta.days * 86_400 + delta.seconds) * 10_000_000 + delta.microseconds * 10 + _UUID_EPOCH_OFFSET
+    value = ((ticks >> 12) & 0xFFFFFFFFFFFF) << 80
+    value |= 0x6 << 76  # version
+    value |= (ticks & 0x0FFF) << 64
+    value |= 0x8 << 60  # RFC 4122 variant, zero clock_seq/node
+    return str(uuid.UUID(int=value))
+
+
+def _index_name(table: str, column: str) -> str:
+    return f"{table.split('.')[-1]}_{column}_idx"
+
+
+def ensure_indexes(engine: Any, policy: RetentionPolicy) -> None:
+    """Create the indexes backing the age predicates (``CONCURRENTLY``, idempotent)."""
+    stmts = [
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_index_name(t, 'checkpoint_id')} ON {t} (checkpoint_id)"
+        for t in (policy.checkpoints_table, policy.writes_table)
+    ]
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        for stmt in stmts:
+            conn.exec_driver_sql(stmt)
+
+
+def _table_exists(engine: Any, table: str) -> bool:
+    import sqlalchemy as sa
+
+    with engine.connect() as conn:
+        return conn.execute(sa.text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar() is True
+
+
+def _set_timeouts(conn: Any, policy: RetentionPolicy) -> None:
+    conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{int(policy.lock_timeout_ms)}ms'")
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = '{int(policy.statement_timeout_ms)}ms'")
+
+
+def _delete_in_batches(
+    engine: Any,
+    sql: str,
+    params: Mapping[str, Any],
+    policy: RetentionPolicy,
+    report: RetentionReport,
+    *,
+    table: str,
+    reason: str,
+    returning: bool = False,
+) -> set[tuple[str, str]]:
+    """Run a bounded ``DELETE`` until a batch comes back short.
+
+    With `returning`, the statement returns ``(thread_id, checkpoint_ns)``
+    and the distinct keys are collected.
+    """
+    import sqlalchemy as sa
+
+    keys: set[tuple[str, str]] = set()
+    stmt = sa.text(sql)
+    while True:
+        with engine.begin() as conn:
+            _set_timeouts(conn, policy)
+            res = conn.execute(stmt, {**params, "batch": policy.batch_size})
+            if returning:
+                rows = res.fetchall()
+                n = len(rows)
+                keys.update((str(r[0]), str(r[1])) for r in rows)
+            else:
+                n = max(0, int(res.rowcount or 0))
+        if n:
+            report.add(table, reason, n)
+            _inc_counter("checkpoint_retention_deleted_total", labels={"table": table, "reason": reason}, amount=n)
+        if n < policy.batch_size:
+            return keys
+        if policy.pause_s > 0:
+            time.sleep(policy.pause_s)
+
+
+def _bounded_delete(table: str, where: str, *, returning: bool = False) -> str:
+    sql = (
+        f"DELETE FROM {table} WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {table} WHERE {where} LIMIT :batch FOR UPDATE SKIP LOCKED))"
+    )
+    return sql + (" RETURNING thread_id, checkpoint_ns" if returning else "")
+
+
+def _step(name: str, report: RetentionReport, fn: Any, *args: Any) -> Any:
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    except Exception as exc:
+        report.errors.append(f"{name}: {type(exc).__name__}")
+        _log.warning("checkpoint retention step failed", extra={"step": name, "error": str(exc)[:200]})
+        return None
+    finally:
+        _observe_hist("checkpoint_retention_duration_ms", (time.perf_counter() - t0) * 1000.0, labels={"step": name})
+
+
+def _expire(engine: Any, policy: RetentionPolicy, report: RetentionReport, cutoff: str) -> set[tuple[str, str]]:
+    touched = _delete_in_batches(
+        engine,
+        _bounded_delete(policy.checkpoints_table, "checkpoint_id < :cutoff", returning=True),
+        {"cutoff": cutoff},
+        policy,
+        report,
+        table=policy.checkpoints_table,
+        reason="expired",
+        returning=True,
+    )
+    _delete_in_batches(
+        engine,
+        _bounded_delete(policy.writes_table, "checkpoint_id < :cutoff"),
+        {"cutoff": cutoff},
+        policy,
+        report,
+        table=policy.writes_table,
+        reason="expired",
+    )
+    return touched
+
+
+def _trim_threads(engine: Any, policy: RetentionPolicy, report: RetentionReport) -> set[tuple[str, str]]:
+    import sqlalchemy as sa
+
+    with engine.begin() as conn:
+        _set_timeouts(conn, policy)
+        over = conn.execute(
+            sa.text(
+                f"SELECT thread_id, checkpoint_ns FROM {policy.checkpoints_table}"
+                " GROUP BY thread_id, checkpoint_ns HAVING count(*) > :keep"
+            ),
+            {"keep": policy.keep_last},
+        ).fetchall()
+    touched: set[tuple[str, str]] = set()
+    boundary_sql = sa.text(
+        f"SELECT checkpoint_id FROM {policy.checkpoints_table}"
+        " WHERE thread_id = :t AND checkpoint_ns = :ns ORDER BY checkpoint_id DESC OFFSET :keep LIMIT 1"
+    )
+    where = "thread_id = :t AND checkpoint_ns = :ns AND checkpoint_id <= :boundary"
+    for thread_id, ns in over:
+        with engine.connect() as conn:
+            boundary = conn.execute(boundary_sql, {"t": thread_id, "ns": ns, "keep": policy.keep_last}).scalar()
+        if boundary is None:
+            continue
+        params = {"t": thread_id, "ns": ns, "boundary": boundary}
+        for table in (policy.checkpoints_table, policy.writes_table):
+            _delete_in_batches(
+                engine, _bounded_delete(table, where), params, policy, report, table=table, reason="keep_last"
+            )
+        touched.add((str(thread_id), str(ns)))
+        report.threads_trimmed += 1
+    return touched
+
+
+def _sweep_blobs(
+    engine: Any, policy: RetentionPolicy, report: RetentionReport, touched: set[tuple[str, str]], idle_before: str
+) -> None:
+    import sqlalchemy as sa
+
+    cp, blobs = policy.checkpoints_table, policy.blobs_table
+    latest_sql = sa.text(f"SELECT max(checkpoint_id) FROM {cp} WHERE thread_id = :t AND checkpoint_ns = :ns")
+    page_sql = sa.text(
+        f"SELECT DISTINCT thread_id, checkpoint_ns FROM {blobs}"
+        " WHERE :first OR (thread_id, checkpoint_ns) > (:t, :ns)"
+        " ORDER BY thread_id, checkpoint_ns LIMIT :page"
+    )
+    sweep_sql = (
+        f"DELETE FROM {blobs} WHERE ctid = ANY(ARRAY("
+        f"SELECT b.ctid FROM {blobs} b WHERE b.thread_id = :t AND b.checkpoint_ns = :ns"
+        f" AND NOT EXISTS (SELECT 1 FROM {cp} c WHERE c.thread_id = b.thread_id"
+        " AND c.checkpoint_ns = b.checkpoint_ns"
+        " AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version)"
+        " LIMIT :batch FOR UPDATE OF b SKIP LOCKED))"
+    )
+
+    def sweep(thread_id: str, ns: str, *, emptied: bool) -> None:
+        with engine.connect() as conn:
+            latest = conn.execute(latest_sql, {"t": thread_id, "ns": ns}).scalar()
+        if latest is None and not emptied:
+            return  # no checkpoint yet: possibly a thread being created
+        if latest is not None and str(latest) >= idle_before:
+            return  # active thread: a blob may precede its checkpoint row
+        _delete_in_batches(
+            engine, sweep_sql, {"t": thread_id, "ns": ns}, policy, report, table=blobs, reason="orphaned"
+        )
+        report.threads_swept += 1
+
+    for thread_id, ns in sorted(touched):
+        sweep(thread_id, ns, emptied=True)
+    params: dict[str, Any] = {"first": True, "t": "", "ns": "", "page": policy.batch_size}
+    while True:
+        with engine.begin() as conn:
+            _set_timeouts(conn, policy)
+            page = [(str(r[0]), str(r[1])) for r in conn.execute(page_sql, params).fetchall()]
+        for key in page:
+            if key not in touched:
+                sweep(*key, emptied=False)
+        if len(page) < policy.batch_size:
+            return
+        params = {"first": False, "t": page[-1][0], "ns": page[-1][1], "page": policy.batch_size}
+
+
+def _expire_state_blobs(engine: Any, policy: RetentionPolicy, report: RetentionReport, cutoff: datetime) -> None:
+    if not _table_exists(engine, policy.state_blobs_table):
+        return
+    _delete_in_batches(
+        engine,
+        f"DELETE FROM {policy.state_blobs_table} WHERE ctid = ANY(ARRAY("
+        f"SELECT ctid FROM {policy.state_blobs_table} WHERE created_at < :cutoff"
+        " LIMIT :batch FOR UPDATE SKIP LOCKED))",
+        {"cutoff": cutoff},
+        policy,
+        report,
+        table=policy.state_blobs_table,
+        reason="expired",
+    )
+
+
+def run_retention(engine: Any, policy: RetentionPolicy | None = None, *, now: datetime | None = None) -> RetentionReport:
+    """Run one retention pass.
+
+    Parameters
+    ----------
+    engine:
+        SQLAlchemy engine with write access to the checkpoint tables.
+    policy:
+        Limits and table names; defaults to `get_policy()`.
+    now:
+        Reference time (tests); defaults to the current UTC time.
+
+    Returns
+    -------
+    RetentionReport
+        Rows deleted per ``table:reason``, trimmed/swept thread counts, errors.
+    """
+    policy = policy or get_policy()
+    now = now or datetime.now(timezone.utc)
+    report = RetentionReport()
+    t0 = time.perf_counter()
+
+    cutoff_ts = now - timedelta(hours=policy.max_age_hours)
+    touched: set[tuple[str, str]] = set()
+    touched |= _step("expire", report, _expire, engine, policy, report, checkpoint_id_at(cutoff_ts)) or set()
+    if policy.keep_last > 0:
+        touched |= _step("keep_last", report, _trim_threads, engine, policy, report) or set()
+    idle_before = checkpoint_id_at(now - timedelta(minutes=policy.blob_grace_minutes))
+    _step("blobs", report, _sweep_blobs, engine, policy, report, touched, idle_before)
+    # Blob rows are refreshed when re-referenced (see `PostgresBlobStore.put`)
+    _step("state_blobs", report, _expire_state_blobs, engine, policy, report, cutoff_ts - timedelta(hours=2))
+
+    report.duration_ms = (time.perf_counter() - t0) * 1000.0
+    _observe_hist("checkpoint_retention_duration_ms", report.duration_ms, labels={"step": "total"})
+    _log.info("checkpoint retention finished", extra=report.to_dict())
+    return report
+
+
+async def retention_loop(
+    engine: Any,
+    policy: RetentionPolicy | None = None,
+    *,
+    interval_s: float,
+    stop: asyncio.Event | None = None,
+) -> None:
+    """Run `run_retention` every `interval_s` (off the event loop) until `stop` is set."""
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        await asyncio.to_thread(run_retention, engine, policy)
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval_s)
+        except TimeoutError:
+            continue
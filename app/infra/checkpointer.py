@@ -13,12 +13,32 @@ Design
 - Native LangGraph PostgresSaver with `functools.lru_cache` for deterministic initialization.
 - No global mutable state; Settings-based configuration.
 - Fallback to no-op saver when backend is unavailable or disabled.
+- Durability modes (`checkpointer.durability`) trade write amplification for
+  crash safety:
+
+  * ``per_node`` (default): one checkpoint per graph step (LangGraph default).
+  * ``exit``: persist only when the run ends or pauses at an interrupt (e.g.,
+    the SQL approval gate); intermediate steps are not written.
+  * ``write_behind``: per-node checkpoints handed to a bounded queue drained
+    by a background worker; a read first waits for its own thread's pending
+    writes (read-your-writes, without waiting on other conversations), and a
+    full queue blocks the writer (backpressure). Failed background writes are
+    counted (`checkpoint_write_failures_total{op}`) and kept per thread; the
+    first one is raised by the next `flush(thread_id)` for that thread.
+
+- Real savers are wrapped by `InstrumentedSaver`, which records
+  `checkpoint_write_ms{op,mode}` and `checkpoint_write_bytes{op,mode}`.
+  Bytes are tallied from the backend's own serializer calls (its `serde` is
+  wrapped), so measuring never serializes a value a second time.
 
 Integration
 -----------
 - Configured via Pydantic Settings (`app.config.settings.CheckpointerConfig`).
 - Returns a saver compatible with LangGraph runtime.
 - When not configured or disabled, returns a `_NoopSaver`.
+- `graph_durability()` maps the configured mode to LangGraph's run-level
+  ``durability`` value; `app.graph.build` applies it as the compiled graph's
+  default.
 
 Usage
 -----
@@ -37,9 +57,16 @@ Usage
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
 import functools
 import logging
 import os
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterator, Mapping, Sequence
+from contextlib import contextmanager
 from typing import Any
 
 _log = logging.getLogger(__name__)
@@ -52,12 +79,37 @@ except Exception:  # pragma: no cover - keep optional
     _imported_PostgresSaver = None
 _PostgresSaver = _imported_PostgresSaver
 
+_BaseSaver: Any
+try:  # pragma: no cover - langgraph is a runtime dependency, keep import-safe
+    from langgraph.checkpoint.base import BaseCheckpointSaver as _BaseSaver
+except Exception:  # pragma: no cover - optional
+    _BaseSaver = object
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+    def _observe_hist(_name: str, _value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
 __all__ = [
+    "DURABILITY_MODES",
+    "InstrumentedSaver",
     "get_checkpointer",
+    "graph_durability",
     "is_noop",
     "_cleanup_old_checkpoints",
+    "checkpointer_url",
 ]
 
+DURABILITY_MODES: tuple[str, ...] = ("per_node", "exit", "write_behind")
+# Checkpointer durability mode -> LangGraph run-level `durability`
+_GRAPH_DURABILITY = {"per_node": "async", "exit": "exit", "write_behind": "async"}
+_DEFAULT_QUEUE_SIZE = 256
+
 
 class _NoopSaver:
     """Minimal Saver-like object used when checkpointer is disabled or unavailable."""
@@ -89,6 +141,10 @@ class _NoopSaver:
 def _cleanup_old_checkpoints(saver: Any, *, max_age_hours: int = 168) -> tuple[bool, str]:
     """Best-effort cleanup routine for old checkpoints.
 
+    Delegates to the batched retention job (`app.infra.checkpoint_retention`)
+    using the application engine; prefer ``python -m scripts.prune_checkpoints``
+    for scheduled runs.
+
     Parameters
     ----------
     saver: Any
@@ -102,44 +158,416 @@ def _cleanup_old_checkpoints(saver: Any, *, max_age_hours: int = 168) -> tuple[b
         (success flag, message) describing the outcome.
     """
 
+    if is_noop(saver):
+        return (False, "noop: unsupported saver type")
     try:
-        # Only available for PostgresSaver; guard access
-        if _PostgresSaver is None or not isinstance(saver, _PostgresSaver):  # type: ignore[arg-type]
-            return (False, "noop: unsupported saver type")
-
-        # The langgraph PostgresSaver exposes ._engine in some versions; use best-effort
-        engine = getattr(saver, "_engine", None)
-        if engine is None:
-            return (False, "noop: engine not accessible")
-
-        import sqlalchemy as _sa
-        from datetime import datetime, timedelta, timezone
-
-        cutoff = datetime.now(timezone.utc) - timedelta(hours=max_age_hours)
-        with engine.begin() as conn:  # type: ignore[call-arg]
-            # Table name is stored in saver; fallback to default
-            table_name = getattr(saver, "table_name", "checkpoints")
-            stmt = _sa.text(
-                f"DELETE FROM {table_name} WHERE created_at < :cutoff"
-            )
-            conn.execute(stmt, {"cutoff": cutoff.isoformat()})
-        return (True, "cleanup completed")
+        from dataclasses import replace
+
+        from app.infra.checkpoint_retention import get_policy, run_retention
+        from app.infra.db import get_engine
+
+        report = run_retention(get_engine(), replace(get_policy(), max_age_hours=max_age_hours))
+        if report.errors:
+            return (False, "cleanup failed: " + "; ".join(report.errors))
+        return (True, f"cleanup completed: {sum(report.deleted.values())} rows deleted")
     except Exception as exc:  # pragma: no cover - defensive
         _log.info("checkpointer cleanup failed", extra={"error": str(exc)})
         return (False, f"cleanup failed: {type(exc).__name__}")
 
 
+def _normalize_mode(mode: str | None) -> str:
+    value = (mode or "per_node").strip().lower().replace("-", "_")
+    if value not in DURABILITY_MODES:
+        _log.warning("unknown checkpointer durability '%s'; using per_node", value)
+        return "per_node"
+    return value
+
+
+def _configured_durability() -> tuple[str, int]:
+    """Return ``(mode, queue_size)`` from env (`CHECKPOINTER_DURABILITY`) or Settings."""
+    mode: str | None = os.getenv("CHECKPOINTER_DURABILITY")
+    queue_size = _DEFAULT_QUEUE_SIZE
+    try:
+        from app.config.settings import get_settings
+
+        cfg = get_settings().checkpointer
+        mode = mode or cfg.durability
+        queue_size = cfg.write_queue_size
+    except Exception:
+        pass
+    return _normalize_mode(mode), queue_size
+
+
+def graph_durability(mode: str | None = None) -> str:
+    """Return LangGraph's run-level ``durability`` for a checkpointer mode.
+
+    Parameters
+    ----------
+    mode:
+        One of `DURABILITY_MODES`; defaults to the configured mode.
+
+    Returns
+    -------
+    str
+        ``"exit"`` for exit-only persistence, else ``"async"`` (per step).
+    """
+    return _GRAPH_DURABILITY[_normalize_mode(mode) if mode is not None else _configured_durability()[0]]
+
+
+# Bytes serialized by the backend during the current write (None: not measuring)
+_WRITE_BYTES: contextvars.ContextVar[list[int] | None] = contextvars.ContextVar("checkpoint_write_bytes", default=None)
+
+
+class _CountingSerde:
+    """Serializer proxy that adds each `dumps_typed` payload to `_WRITE_BYTES`."""
+
+    def __init__(self, inner: Any) -> None:
+        self.inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        out = self.inner.dumps_typed(obj)
+        acc = _WRITE_BYTES.get()
+        if acc is not None:
+            acc[0] += len(out[1])
+        return out
+
+
+@contextmanager
+def _measure_bytes() -> Iterator[list[int]]:
+    acc = [0]
+    token = _WRITE_BYTES.set(acc)
+    try:
+        yield acc
+    finally:
+        _WRITE_BYTES.reset(token)
+
+
+class _WriteBehindQueue:
+    """Bounded FIFO of pending saver calls drained by one daemon thread.
+
+    A single worker keeps writes in submission order (a checkpoint is always
+    stored before the writes that reference it). Pending writes and failures
+    are tracked per conversation thread, so a read waits only for its own
+    thread's writes and a failure is handed back (`take_error`) to the thread
+    that produced it.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self._q: queue.Queue[tuple[str, Callable[..., Any], tuple[Any, ...]]] = queue.Queue(
+            maxsize=max(1, int(maxsize))
+        )
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._done = threading.Condition(self._lock)
+        self._pending: dict[str, int] = {}
+        self._errors: dict[str, BaseException] = {}
+        self.failures = 0
+
+    def _ensure_worker(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="checkpoint-write-behind", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            key, fn, args = self._q.get()
+            try:
+                fn(*args)
+            except Exception as exc:
+                op = getattr(fn, "__name__", "put").removeprefix("_timed_")
+                _inc_counter("checkpoint_write_failures_total", {"op": op})
+                _log.warning("write-behind checkpoint write failed", extra={"error": type(exc).__name__, "op": op})
+                with self._lock:
+                    self.failures += 1
+                    self._errors.setdefault(key, exc)
+            finally:
+                self._release(key)
+                self._q.task_done()
+
+    def _claim(self, key: str) -> None:
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+
+    def _release(self, key: str) -> None:
+        with self._done:
+            left = self._pending.get(key, 1) - 1
+            if left > 0:
+                self._pending[key] = left
+            else:
+                self._pending.pop(key, None)
+                self._done.notify_all()
+
+    def submit(self, key: str, fn: Callable[..., Any], *args: Any) -> None:
+        """Enqueue a call for thread `key`; blocks while the queue is full."""
+        self._ensure_worker()
+        self._claim(key)
+        try:
+            self._q.put((key, fn, args))
+        except BaseException:
+            self._release(key)
+            raise
+
+    def try_submit(self, key: str, fn: Callable[..., Any], *args: Any) -> bool:
+        """Enqueue without blocking; False when the queue is full."""
+        self._ensure_worker()
+        self._claim(key)
+        try:
+            self._q.put_nowait((key, fn, args))
+            return True
+        except queue.Full:
+            self._release(key)
+            return False
+
+    def flush(self, key: str | None = None) -> None:
+        """Block until thread `key`'s queued writes (all writes when None) are applied."""
+        if self._thread is None:
+            return
+        if key is None:
+            self._q.join()
+            return
+        with self._done:
+            self._done.wait_for(lambda: key not in self._pending)
+
+    def take_error(self, key: str | None = None) -> BaseException | None:
+        """Return and clear the first failure of thread `key` (of any thread when None)."""
+        with self._lock:
+            if key is not None:
+                return self._errors.pop(key, None)
+            errors = list(self._errors.values())
+            self._errors.clear()
+        return errors[0] if errors else None
+
+    def pending(self, key: str | None = None) -> int:
+        """Writes still queued or in flight for thread `key` (all threads when None)."""
+        with self._lock:
+            return sum(self._pending.values()) if key is None else self._pending.get(key, 0)
+
+
+class InstrumentedSaver(_BaseSaver):  # type: ignore[misc,valid-type]
+    """Checkpointer wrapper adding write metrics and write-behind persistence.
+
+    Parameters
+    ----------
+    inner:
+        The LangGraph saver doing the actual storage (e.g., PostgresSaver).
+    mode:
+        One of `DURABILITY_MODES`. Only ``write_behind`` changes how writes are
+        issued; ``exit`` is applied at run level (see `graph_durability`).
+    queue_size:
+        Bound of the write-behind queue.
+    """
+
+    def __init__(self, inner: Any, *, mode: str = "per_node", queue_size: int = _DEFAULT_QUEUE_SIZE) -> None:
+        if _BaseSaver is object:
+            raise RuntimeError("langgraph checkpoint base is not available")
+        if not isinstance(inner.serde, _CountingSerde):
+            inner.serde = _CountingSerde(inner.serde)
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.mode = _normalize_mode(mode)
+        self._queue = _WriteBehindQueue(queue_size) if self.mode == "write_behind" else None
+
+    def __repr__(self) -> str:  # pragma: no cover - trivial
+        return f"<InstrumentedSaver mode={self.mode!r} inner={self.inner!r}>"
+
+    @property
+    def config_specs(self) -> list[Any]:
+        return self.inner.config_specs
+
+    def get_next_version(self, current: Any, channel: Any) -> Any:
+        return self.inner.get_next_version(current, channel)
+
+    # -- metrics ------------------------------------------------------------
+
+    def _record(self, op: str, started: float, nbytes: int) -> None:
+        labels = {"op": op, "mode": self.mode}
+        _observe_hist("checkpoint_write_ms", (time.perf_counter() - started) * 1000.0, labels=labels)
+        _observe_hist("checkpoint_write_bytes", float(nbytes), labels=labels)
+
+    def _timed_put(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+        started = time.perf_counter()
+        with _measure_bytes() as nbytes:
+            out = self.inner.put(config, checkpoint, metadata, new_versions)
+        self._record("put", started, nbytes[0])
+        return out
+
+    def _timed_put_writes(self, config: Any, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str) -> None:
+        started = time.perf_counter()
+        with _measure_bytes() as nbytes:
+            self.inner.put_writes(config, writes, task_id, task_path)
+        self._record("put_writes", started, nbytes[0])
+
+    @staticmethod
+    def _next_config(config: Any, checkpoint: Any) -> dict[str, Any]:
+        conf = config.get("configurable", {})
+        return {
+            "configurable": {
+                "thread_id": conf.get("thread_id"),
+                "checkpoint_ns": conf.get("checkpoint_ns", ""),
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    @staticmethod
+    def _thread_key(config: Any) -> str | None:
+        thread_id = ((config or {}).get("configurable") or {}).get("thread_id")
+        return None if thread_id is None else str(thread_id)
+
+    def _wait(self, config: Any) -> None:
+        assert self._queue is not None
+        self._queue.flush(self._thread_key(config))
+
+    def _must_wait(self, config: Any) -> bool:
+        return self._queue is not None and self._queue.pending(self._thread_key(config)) > 0
+
+    # -- reads (flush the thread's pending writes first) ---------------------
+
+    def get_tuple(self, config: Any) -> Any:
+        if self._queue is not None:
+            self._wait(config)
+        return self.inner.get_tuple(config)
+
+    def list(self, config: Any, **kwargs: Any) -> Any:
+        if self._queue is not None:
+            self._wait(config)
+        return self.inner.list(config, **kwargs)
+
+    async def aget_tuple(self, config: Any) -> Any:
+        if self._must_wait(config):
+            await asyncio.to_thread(self._wait, config)
+        return await self.inner.aget_tuple(config)
+
+    async def alist(self, config: Any, **kwargs: Any) -> Any:
+        if self._must_wait(config):
+            await asyncio.to_thread(self._wait, config)
+        async for item in self.inner.alist(config, **kwargs):
+            yield item
+
+    # -- writes -------------------------------------------------------------
+
+    def put(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+        if self._queue is None:
+            return self._timed_put(config, checkpoint, metadata, new_versions)
+        key = self._thread_key(config) or ""
+        self._queue.submit(key, self._timed_put, config, checkpoint, metadata, new_versions)
+        return self._next_config(config, checkpoint)
+
+    def put_writes(self, config: Any, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        if self._queue is None:
+            self._timed_put_writes(config, writes, task_id, task_path)
+            return
+        key = self._thread_key(config) or ""
+        self._queue.submit(key, self._timed_put_writes, config, writes, task_id, task_path)
+
+    async def aput(self, config: Any, checkpoint: Any, metadata: Any, new_versions: Any) -> Any:
+        if self._queue is None:
+            started = time.perf_counter()
+            with _measure_bytes() as nbytes:
+                out = await self.inner.aput(config, checkpoint, metadata, new_versions)
+            self._record("put", started, nbytes[0])
+            return out
+        key = self._thread_key(config) or ""
+        args = (config, checkpoint, metadata, new_versions)
+        if not self._queue.try_submit(key, self._timed_put, *args):
+            await asyncio.to_thread(self._queue.submit, key, self._timed_put, *args)
+        return self._next_config(config, checkpoint)
+
+    async def aput_writes(
+        self, config: Any, writes: Sequence[tuple[str, Any]], task_id: str, task_path: str = ""
+    ) -> None:
+        if self._queue is None:
+            started = time.perf_counter()
+            with _measure_bytes() as nbytes:
+                await self.inner.aput_writes(config, writes, task_id, task_path)
+            self._record("put_writes", started, nbytes[0])
+            return
+        key = self._thread_key(config) or ""
+        args = (config, writes, task_id, task_path)
+        if not self._queue.try_submit(key, self._timed_put_writes, *args):
+            await asyncio.to_thread(self._queue.submit, key, self._timed_put_writes, *args)
+
+    def delete_thread(self, thread_id: str) -> None:
+        if self._queue is not None:
+            self._queue.flush(str(thread_id))
+            self._queue.take_error(str(thread_id))  # the thread is going away with its failed writes
+        self.inner.delete_thread(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        if self._queue is not None:
+            if self._queue.pending(str(thread_id)):
+                await asyncio.to_thread(self._queue.flush, str(thread_id))
+            self._queue.take_error(str(thread_id))
+        await self.inner.adelete_thread(thread_id)
+
+    def flush(self, thread_id: str | None = None) -> None:
+        """Wait for queued write-behind writes (no-op in other modes).
+
+        Parameters
+        ----------
+        thread_id:
+            Only wait for, and report failures of, this conversation thread.
+            When None, wait for every thread.
+
+        Raises
+        ------
+        RuntimeError
+            When a background write of `thread_id` (of any thread when None)
+            failed since the previous `flush` (chained to the first failure).
+        """
+        if self._queue is None:
+            return
+        key = None if thread_id is None else str(thread_id)
+        self._queue.flush(key)
+        exc = self._queue.take_error(key)
+        if exc is not None:
+            raise RuntimeError(f"write-behind checkpoint write failed ({self._queue.failures} total)") from exc
+
+
+def _instrument(saver: Any, mode: str | None, queue_size: int | None) -> Any:
+    conf_mode, conf_size = _configured_durability()
+    try:
+        wrapped = InstrumentedSaver(
+            saver,
+            mode=_normalize_mode(mode) if mode is not None else conf_mode,
+            queue_size=queue_size if queue_size is not None else conf_size,
+        )
+    except Exception as exc:  # pragma: no cover - defensive around API drift
+        _log.info("checkpointer instrumentation unavailable", extra={"error": type(exc).__name__})
+        return saver
+    _log.info("checkpointer durability", extra={"mode": wrapped.mode})
+    return wrapped
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
 
+def checkpointer_url(url: str | None = None) -> str:
+    """Return the database URL the Postgres checkpointer connects to.
+
+    `url` wins; otherwise ``APLLOS_DATABASE_URL`` (Chainlit compatibility),
+    then ``DATABASE_URL``. Empty when none is set. Maintenance jobs on the
+    checkpoint tables (`app.infra.checkpoint_retention`) use the same lookup.
+    """
+    url = url or os.getenv("APLLOS_DATABASE_URL") or os.getenv("DATABASE_URL", "")
+    return url.strip() if url else ""
+
+
 @functools.lru_cache(maxsize=1)
 def get_checkpointer(
     enabled: bool | None = None,
     backend: str | None = None,
     url: str | None = None,
     table: str | None = None,
+    durability: str | None = None,
+    queue_size: int | None = None,
 ) -> Any:
     """Return a configured checkpointer using native LangGraph backends (cached).
 
@@ -161,11 +589,17 @@ def get_checkpointer(
     table:
         Table name for storing checkpoints. Defaults to environment variable
         CHECKPOINTER_TABLE or 'checkpoints'.
+    durability:
+        One of `DURABILITY_MODES`. Defaults to environment variable
+        CHECKPOINTER_DURABILITY or `checkpointer.durability`.
+    queue_size:
+        Write-behind queue bound. Defaults to `checkpointer.write_queue_size`.
 
     Returns
     -------
     Any
-        A LangGraph-compatible checkpointer (PostgresSaver) or a no-op saver.
+        A LangGraph-compatible checkpointer (PostgresSaver wrapped by
+        `InstrumentedSaver`) or a no-op saver.
     """
     # Load configuration from environment if not provided
     if enabled is None:
@@ -181,9 +615,7 @@ def get_checkpointer(
 
     backend = backend or os.getenv("CHECKPOINTER_BACKEND", "postgres").strip().lower()
     table = table or os.getenv("CHECKPOINTER_TABLE", "checkpoints").strip() or "checkpoints"
-    # Try APLLOS_DATABASE_URL first (for Chainlit compatibility), then DATABASE_URL
-    url = url or os.getenv("APLLOS_DATABASE_URL") or os.getenv("DATABASE_URL", "")
-    url = url.strip() if url else ""
+    url = checkpointer_url(url)
 
     if backend != "postgres":
         _log.warning("unknown checkpointer backend '%s'; using Noop", backend)
@@ -206,7 +638,7 @@ def get_checkpointer(
             # Fallback: direct construction
             saver = _PostgresSaver(url, table_name=table)
         _log.info("PostgresSaver initialized", extra={"table": table, "backend": "postgres"})
-        return saver
+        return _instrument(saver, durability, queue_size)
     except Exception as exc:  # pragma: no cover - defensive around API drift
         _log.exception("failed to initialize Postgres checkpointer; falling back to Noop")
         return _NoopSaver(f"init-error: {exc.__class__.__name__}")
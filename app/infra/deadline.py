@@ -0,0 +1,216 @@
+"""
+Request-scoped latency budget and graceful degradation.
+
+Overview
+  Each assistant turn gets one deadline. Components read the remaining time
+  from a context variable instead of applying their own fixed timeouts in
+  sequence (LLM 90 s, SQL 60 s, UI polling 300 s): LLM requests, SQL
+  `statement_timeout`, vector queries and OCR derive their timeouts from the
+  remaining budget, and optional steps (ensemble second vote, LLM reranker,
+  normalizer LLM, follow-up LLM) are skipped when the budget runs low.
+
+Design
+  - The deadline is a wall-clock timestamp (`deadline_ts`) so it survives
+    checkpoints and can be carried in `GraphState`; each graph node activates
+    it with `budget_scope` and the context variable follows into worker
+    threads (`asyncio.to_thread` copies the context).
+  - `bounded_timeout(default)` returns ``min(default, remaining)`` but never
+    less than `request_budget.floor_s`, so a late request still gets one
+    short attempt instead of failing immediately. Without an active budget it
+    returns `default` unchanged (scripts, tests, batch jobs).
+  - `allow_optional(step)` is False when the remaining time is below the
+    step's reserve (`request_budget.optional_min_remaining_s`); every skip
+    is recorded on the budget, logged and counted.
+
+Integration
+  - `app.graph.build`: `route` starts the budget (`new_deadline`), every node
+    runs under `budget_scope(state["deadline_ts"])` and skips are appended to
+    `signals` as ``budget_skip:<step>``.
+  - Consumers: `LLMClient`, `AnalyticsExecutor`, `KnowledgeRetriever`,
+    commerce OCR, router ensemble, ranker, normalizer, follow-up detection.
+  - Settings: `request_budget.*`; metric `budget_skips_total{step}`.
+
+Usage
+  >>> from app.infra.deadline import budget_scope, bounded_timeout
+  >>> import time
+  >>> with budget_scope(time.time() + 5.0):
+  ...     bounded_timeout(90.0, floor_s=1.0) <= 5.0
+  True
+  >>> bounded_timeout(90.0)
+  90.0
+"""
+
+from __future__ import annotations
+
+import contextvars
+import threading
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+try:  # Optional logger
+    from app.infra.logging import get_logger
+except Exception:  # pragma: no cover - optional
+    import logging as _logging
+
+    def get_logger(component: str, **initial_values: Any) -> Any:
+        return _logging.getLogger(component)
+
+try:  # Optional metrics
+    from app.infra.metrics import inc_counter as _inc_counter
+except Exception:  # pragma: no cover - optional
+    def _inc_counter(_name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
+        return
+
+__all__ = [
+    "BudgetLimits",
+    "RequestBudget",
+    "allow_optional",
+    "bounded_timeout",
+    "budget_scope",
+    "current_budget",
+    "get_limits",
+    "new_deadline",
+    "remaining_s",
+]
+
+_log = get_logger("infra.deadline")
+
+
+@dataclass(frozen=True)
+class BudgetLimits:
+    """Budget settings (mirrors `request_budget.*`)."""
+
+    enabled: bool = True
+    total_s: float = 90.0
+    attachment_total_s: float = 240.0
+    floor_s: float = 2.0
+    optional_min_remaining_s: Mapping[str, float] = field(
+        default_factory=lambda: {
+            "followup_llm": 20.0,
+            "ensemble_vote": 30.0,
+            "llm_reranker": 20.0,
+            "normalizer_llm": 10.0,
+        }
+    )
+
+
+def get_limits() -> BudgetLimits:
+    """Return budget limits from settings (defaults when unavailable)."""
+    try:
+        from app.config.settings import get_settings
+
+        cfg = get_settings().request_budget
+        return BudgetLimits(
+            enabled=bool(cfg.enabled),
+            total_s=float(cfg.total_s),
+            attachment_total_s=float(cfg.attachment_total_s),
+            floor_s=float(cfg.floor_s),
+            optional_min_remaining_s=dict(cfg.optional_min_remaining_s),
+        )
+    except Exception:
+        return BudgetLimits()
+
+
+class RequestBudget:
+    """Deadline of the current request plus the optional steps it skipped."""
+
+    __slots__ = ("deadline_ts", "skips", "_lock")
+
+    def __init__(self, deadline_ts: float) -> None:
+        self.deadline_ts = float(deadline_ts)
+        self.skips: list[str] = []
+        self._lock = threading.Lock()
+
+    def remaining_s(self) -> float:
+        return max(0.0, self.deadline_ts - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining_s() <= 0.0
+
+    def record_skip(self, step: str) -> None:
+        with self._lock:
+            self.skips.append(step)
+
+
+_CURRENT: contextvars.ContextVar[RequestBudget | None] = contextvars.ContextVar("request_budget", default=None)
+
+
+def new_deadline(budget_s: float | None = None, *, has_attachment: bool = False) -> float | None:
+    """Return a deadline timestamp `budget_s` from now (None when disabled).
+
+    Without an explicit `budget_s` the configured total is used
+    (`attachment_total_s` for turns with an attachment).
+    """
+    limits = get_limits()
+    if not limits.enabled:
+        return None
+    if budget_s is None or float(budget_s) <= 0:
+        budget_s = limits.attachment_total_s if has_attachment else limits.total_s
+    return time.time() + float(budget_s)
+
+
+@contextmanager
+def budget_scope(deadline_ts: float | None) -> Iterator[RequestBudget | None]:
+    """Activate the request budget for the enclosed code (no-op for None)."""
+    if deadline_ts is None:
+        yield None
+        return
+    budget = RequestBudget(float(deadline_ts))
+    token = _CURRENT.set(budget)
+    try:
+        yield budget
+    finally:
+        _CURRENT.reset(token)
+
+
+def current_budget() -> RequestBudget | None:
+    """Return the active request budget (None outside a request)."""
+    return _CURRENT.get()
+
+
+def remaining_s() -> float | None:
+    """Seconds left in the active request budget (None without one)."""
+    budget = _CURRENT.get()
+    return budget.remaining_s() if budget is not None else None
+
+
+def bounded_timeout(default_s: float | None, *, floor_s: float | None = None) -> float | None:
+    """Clamp a component timeout to the remaining request budget.
+
+    Parameters
+    ----------
+    default_s:
+        The component's own timeout (None means unbounded).
+    floor_s:
+        Minimum timeout to return under a budget (defaults to
+        `request_budget.floor_s`).
+    """
+    budget = _CURRENT.get()
+    if budget is None:
+        return default_s
+    floor = get_limits().floor_s if floor_s is None else float(floor_s)
+    left = max(floor, budget.remaining_s())
+    return left if default_s is None else min(float(default_s), left)
+
+
+def allow_optional(step: str) -> bool:
+    """Return whether optional `step` fits in the remaining budget.
+
+    A False answer is recorded as a skip (budget, log and
+    `budget_skips_total{step}`); callers take their non-LLM fallback.
+    """
+    budget = _CURRENT.get()
+    if budget is None:
+        return True
+    reserve = float(get_limits().optional_min_remaining_s.get(step, 0.0))
+    left = budget.remaining_s()
+    if left >= reserve and left > 0.0:
+        return True
+    budget.record_skip(step)
+    _inc_counter("budget_skips_total", {"step": step})
+    _log.info("Optional step skipped (latency budget)", extra={"step": step, "remaining_s": round(left, 2)})
+    return False
@@ -0,0 +1,234 @@
+"""
+Embedding micro-batching dispatcher with per-item caching.
+
+Overview
+  Collects embedding requests from concurrent callers for a few milliseconds
+  and sends them as a single `embeddings.create` call, then fans the vectors
+  back out to each caller. Every vector is cached individually, so later
+  requests for any of the texts are served from memory.
+
+Design
+  - `embed_many` checks the cache per text, de-duplicates misses and either
+    fetches them directly (window = 0) or hands them to the dispatcher.
+  - A daemon dispatcher thread drains a queue: it waits for a first request,
+    keeps collecting until the window (`micro_batch_wait_ms`) closes or
+    `max_batch` is reached, groups by model and submits each group to a small
+    worker pool, so a slow provider call does not stall the next batch.
+  - Failures resolve to None per text; callers keep their hashing fallbacks.
+
+Integration
+  - `get_embedder()` returns the process-wide dispatcher configured from
+    `models.embeddings.parameters` (`batch_size`, `micro_batch_wait_ms`).
+  - Used by the knowledge retriever (`_embed_query`) and
+    `ConversationHistorySearcher`; both share `get_embedder().cache`.
+  - Batch sizes are observed in `embedding_batch_size{model}`.
+
+Usage
+  >>> from app.infra.embeddings import get_embedder
+  >>> vecs = get_embedder().embed_many(["oi", "olá"], model="text-embedding-3-small")
+  >>> len(vecs)
+  2
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+try:
+    from app.infra.logging import get_logger
+except Exception:  # pragma: no cover - optional
+    import logging as _logging
+
+    def get_logger(component: str, **initial_values: Any) -> Any:
+        return _logging.getLogger(component)
+
+try:  # Optional metrics
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _observe_hist(_name: str, _value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+from app.infra.cache import EmbeddingCache
+
+__all__ = ["EmbeddingBatcher", "get_embedder"]
+
+_Pending = tuple[str, str, "Future[list[float] | None]"]
+
+
+class EmbeddingBatcher:
+    """Micro-batching embedding dispatcher.
+
+    Parameters
+    ----------
+    client:
+        Object exposing `get_embeddings_many(texts=..., model=...)` and
+        `is_available()`; defaults to the shared `LLMClient`.
+    max_wait_ms:
+        Batching window. 0 disables the dispatcher (misses of one
+        `embed_many` call are still sent together).
+    max_batch:
+        Maximum texts per dispatched batch.
+    cache:
+        Per-item embedding cache; a new `EmbeddingCache` when omitted.
+    result_timeout_s:
+        Maximum time a caller waits for its batch.
+    """
+
+    def __init__(
+        self,
+        client: Any | None = None,
+        *,
+        max_wait_ms: float = 5.0,
+        max_batch: int = 256,
+        cache: EmbeddingCache | None = None,
+        result_timeout_s: float = 60.0,
+        workers: int = 4,
+    ) -> None:
+        self.log = get_logger(__name__)
+        self._client = client
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.cache = cache if cache is not None else EmbeddingCache(ttl_seconds=86400, max_size=5000)
+        self.result_timeout = float(result_timeout_s)
+        self._workers = max(1, int(workers))
+        self._queue: queue.SimpleQueue[_Pending] = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    # Public API -------------------------------------------------------------
+    def embed(self, text: str, *, model: str) -> list[float] | None:
+        """Return the embedding for one text (None when unavailable)."""
+        return self.embed_many([text], model=model)[0]
+
+    def embed_many(self, texts: Sequence[str], *, model: str) -> list[list[float] | None]:
+        """Return embeddings for `texts` in order; None for blank/failed items."""
+        results: list[list[float] | None] = [None] * len(texts)
+        misses: dict[str, list[int]] = {}
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                continue
+            cached = self.cache.get(text, model)
+            if cached is not None:
+                results[i] = cached
+            else:
+                misses.setdefault(text, []).append(i)
+        if not misses:
+            return results
+
+        pending = list(misses)
+        if self.max_wait <= 0:
+            vectors = self._fetch(pending, model)
+        else:
+            futures = [self._submit(text, model) for text in pending]
+            vectors = []
+            for fut in futures:
+                try:
+                    vectors.append(fut.result(timeout=self.result_timeout))
+                except Exception:  # timeout or dispatcher failure
+                    vectors.append(None)
+
+        for text, vec in zip(pending, vectors):
+            if vec is None:
+                continue
+            self.cache.set(text, model, vec)
+            for i in misses[text]:
+                results[i] = list(vec)
+        return results
+
+    # Internals --------------------------------------------------------------
+    def _get_client(self) -> Any | None:
+        if self._client is None:
+            try:
+                from app.infra.llm_client import get_llm_client
+
+                self._client = get_llm_client()
+            except Exception:
+                return None
+        return self._client
+
+    def _fetch(self, texts: list[str], model: str) -> list[list[float] | None]:
+        client = self._get_client()
+        if client is None or not client.is_available():
+            return [None] * len(texts)
+        _observe_hist("embedding_batch_size", float(len(texts)), labels={"model": model})
+        vectors = client.get_embeddings_many(texts=texts, model=model)
+        if vectors is None or len(vectors) != len(texts):
+            return [None] * len(texts)
+        return list(vectors)
+
+    def _submit(self, text: str, model: str) -> Future[list[float] | None]:
+        fut: Future[list[float] | None] = Future()
+        self._queue.put((model, text, fut))
+        self._ensure_started()
+        return fut
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="embed-batch")
+                self._thread = threading.Thread(target=self._run, name="embed-dispatcher", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            groups: dict[str, dict[str, list[Future[list[float] | None]]]] = {}
+            for model, text, fut in batch:
+                groups.setdefault(model, {}).setdefault(text, []).append(fut)
+            for model, by_text in groups.items():
+                assert self._pool is not None
+                self._pool.submit(self._dispatch, model, by_text)
+
+    def _dispatch(self, model: str, by_text: dict[str, list[Future[list[float] | None]]]) -> None:
+        texts = list(by_text)
+        try:
+            vectors = self._fetch(texts, model)
+        except Exception as exc:
+            self.log.warning("Embedding batch failed", extra={"error": str(exc), "count": len(texts)})
+            vectors = [None] * len(texts)
+        for text, vec in zip(texts, vectors):
+            for fut in by_text[text]:
+                if not fut.done():
+                    fut.set_result(vec)
+
+
+_EMBEDDER: EmbeddingBatcher | None = None
+_EMBEDDER_LOCK = threading.Lock()
+
+
+def get_embedder() -> EmbeddingBatcher:
+    """Return the process-wide embedding dispatcher (configured from Settings)."""
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        with _EMBEDDER_LOCK:
+            if _EMBEDDER is None:
+                wait_ms, batch = 0.0, 256
+                try:
+                    from app.config.settings import get_settings
+
+                    params = dict(get_settings().models.embeddings.parameters or {})
+                    wait_ms = float(params.get("micro_batch_wait_ms", 0) or 0)
+                    batch = int(params.get("batch_size", 256) or 256)
+                except Exception:
+                    pass
+                _EMBEDDER = EmbeddingBatcher(max_wait_ms=wait_ms, max_batch=batch)
+    return _EMBEDDER
@@ -5,7 +5,8 @@ Overview
 --------
 Shared LLM client for all agents with standardized configuration, timeout handling,
 retry logic, and JSON response parsing. Uses native Python stdlib for retries
-and timeout management, with OpenAI as the primary backend.
+and timeout management, with OpenAI as the primary backend. Async callers get a
+native `AsyncOpenAI` path instead of a worker thread per in-flight request.
 
 Design
 ------
@@ -13,6 +14,14 @@ Design
 - Configurable timeout, retries, and model parameters via Settings.
 - Consistent JSON extraction with fallback parsing strategies.
 - Structured logging for debugging and monitoring.
+- One keep-alive HTTP pool per client (sync) and per event loop (async),
+  sized by `openai.max_connections`; per-model in-flight caps
+  (`openai.model_concurrency`) bound both paths.
+- Requests pass a process-wide per-model RPM/TPM limiter before sending;
+  retryable failures back off exponentially with jitter and honour
+  `Retry-After` (see `app.infra.rate_limit`).
+- Under a request budget (`app.infra.deadline`) chat requests use the
+  remaining time as their timeout and stop retrying once it is spent.
 
 Integration
 -----------
@@ -41,7 +50,11 @@ import json
 import logging
 import os
 import re
-from typing import Any, Mapping
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Iterator, Mapping, Sequence
 
 # Load .env early to ensure OPENAI_API_KEY is visible even if singleton initializes first
 try:  # pragma: no cover - optional dependency
@@ -57,6 +70,16 @@ try:  # pragma: no cover - optional
 except Exception:  # fallback to stdlib logger
     _log = logging.getLogger(__name__)
 
+from app.infra.deadline import bounded_timeout, remaining_s
+from app.infra.rate_limit import (
+    ModelRateLimiter,
+    backoff_delay,
+    estimate_tokens,
+    get_rate_limiter,
+    is_retryable,
+    retry_after_seconds,
+)
+
 # Optional OpenAI client
 _OpenAI: Any | None = None
 try:  # pragma: no cover - exercised only when openai is installed
@@ -65,12 +88,61 @@ except Exception:  # pragma: no cover - keep optional
     _imported_OpenAI = None
 _OpenAI = _imported_OpenAI
 
+# Optional async client and pooled HTTP transports (openai>=1.17)
+_AsyncOpenAI: Any | None = None
+_DefaultHttpxClient: Any | None = None
+_DefaultAsyncHttpxClient: Any | None = None
+try:  # pragma: no cover - exercised only when openai is installed
+    from openai import AsyncOpenAI as _imported_AsyncOpenAI
+except Exception:  # pragma: no cover - keep optional
+    _imported_AsyncOpenAI = None
+_AsyncOpenAI = _imported_AsyncOpenAI
+try:  # pragma: no cover - optional
+    import httpx as _httpx
+    from openai import DefaultAsyncHttpxClient as _DefaultAsyncHttpxClient
+    from openai import DefaultHttpxClient as _DefaultHttpxClient
+except Exception:  # pragma: no cover - fall back to SDK defaults
+    _DefaultHttpxClient = None
+    _DefaultAsyncHttpxClient = None
+    _httpx = None
+
 __all__ = [
     "get_llm_client",
     "LLMResponse",
     "LLMClient",
 ]
 
+# Cached prompt tokens are billed at a fraction of the regular input price
+_CACHED_INPUT_PRICE_RATIO = 0.5
+
+
+def _normalize_usage(raw_usage: Any) -> dict[str, int]:
+    """Normalize a provider usage object into a plain dict.
+
+    Accepts the OpenAI SDK usage object or a mapping and returns
+    ``prompt_tokens``, ``completion_tokens``, ``total_tokens`` and
+    ``cached_tokens`` (prompt tokens served from the provider prompt cache,
+    read from ``prompt_tokens_details.cached_tokens``).
+    """
+    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    if raw_usage is None:
+        return usage
+
+    def _field(obj: Any, name: str) -> Any:
+        if isinstance(obj, Mapping):
+            return obj.get(name)
+        return getattr(obj, name, None)
+
+    try:
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            usage[key] = int(_field(raw_usage, key) or 0)
+        details = _field(raw_usage, "prompt_tokens_details")
+        if details is not None:
+            usage["cached_tokens"] = int(_field(details, "cached_tokens") or 0)
+    except Exception:
+        pass
+    return usage
+
 
 class LLMResponse:
     """Structured response from LLM client."""
@@ -92,7 +164,8 @@ class LLMResponse:
         model:
             The model used for generation.
         usage:
-            Token usage information (prompt_tokens, completion_tokens, total_tokens).
+            Token usage information (prompt_tokens, completion_tokens, total_tokens,
+            cached_tokens).
         finish_reason:
             Reason for completion (stop, length, content_filter, etc.).
         raw_response:
@@ -108,6 +181,14 @@ class LLMResponse:
         return f"LLMResponse(text={self.text[:50]}..., model={self.model})"
 
 
+class _AsyncState:
+    """Per-event-loop async resources: the `AsyncOpenAI` client and model slots."""
+
+    def __init__(self, client: Any) -> None:
+        self.client = client
+        self.slots: dict[str, asyncio.Semaphore] = {}
+
+
 class LLMClient:
     """Centralized LLM client with timeout, retries, and JSON extraction."""
 
@@ -118,6 +199,15 @@ class LLMClient:
         timeout: float = 60.0,
         max_retries: int = 3,
         retry_delay: float = 1.0,
+        *,
+        api_base: str | None = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        model_concurrency: Mapping[str, int] | None = None,
+        default_model_concurrency: int = 32,
+        max_retry_delay: float = 20.0,
+        rate_limiter: ModelRateLimiter | None = None,
+        embedding_batch_size: int = 256,
     ) -> None:
         """Initialize LLM client.
 
@@ -132,14 +222,41 @@ class LLMClient:
         max_retries:
             Maximum number of retry attempts.
         retry_delay:
-            Delay between retries in seconds.
+            Base delay for exponential retry backoff in seconds.
+        api_base:
+            Optional provider base URL (e.g., a proxy or local stub server).
+        max_connections, max_keepalive_connections:
+            Limits of the shared keep-alive HTTP pool.
+        model_concurrency:
+            Per-model cap on in-flight requests; models not listed use
+            ``default_model_concurrency``.
+        max_retry_delay:
+            Upper bound for a single backoff delay in seconds.
+        rate_limiter:
+            Per-model RPM/TPM limiter; defaults to the process-wide one.
+        embedding_batch_size:
+            Maximum inputs per `embeddings.create` call in `get_embeddings_many`.
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         self.model = model
         self.timeout = timeout
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.embedding_batch_size = max(1, int(embedding_batch_size))
+        self.api_base = api_base or None
+        self.max_connections = max(1, int(max_connections))
+        self.max_keepalive_connections = max(0, int(max_keepalive_connections))
+        self.model_concurrency = {str(k): int(v) for k, v in (model_concurrency or {}).items()}
+        self.default_model_concurrency = max(1, int(default_model_concurrency))
         self.log = _log
+        self._limiter = rate_limiter if rate_limiter is not None else get_rate_limiter()
+
+        self._state_lock = threading.Lock()
+        self._sync_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._async_states: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _AsyncState] = (
+            weakref.WeakKeyDictionary()
+        )
 
         if not self.api_key:
             self.log.warning("No OpenAI API key provided; client will use no-op mode")
@@ -149,7 +266,17 @@ class LLMClient:
             self._client = None
         else:
             try:
-                self._client = _OpenAI(api_key=self.api_key, timeout=self.timeout)
+                http_client = None
+                if _DefaultHttpxClient is not None and _httpx is not None:
+                    http_client = _DefaultHttpxClient(limits=self._http_limits())
+                # The SDK's own retries would multiply our retry loop and bypass the limiter.
+                self._client = _OpenAI(
+                    api_key=self.api_key,
+                    timeout=self.timeout,
+                    base_url=self.api_base,
+                    http_client=http_client,
+                    max_retries=0,
+                )
                 self.log.info("LLM client initialized", extra={"model": model, "timeout": timeout})
             except Exception as exc:
                 self.log.error("Failed to initialize OpenAI client", extra={"error": str(exc)})
@@ -199,54 +326,17 @@ class LLMClient:
                     extra={"attempt": attempt + 1, "model": model, "messages_count": len(messages)},
                 )
 
-                response = self._client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    response_format=response_format,
-                )
-
-                # Extract response data
-                choice = response.choices[0]
-                text = choice.message.content or ""
-                # Normalize usage to a plain dict
-                if response.usage is None:
-                    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-                else:
-                    try:
-                        usage = {
-                            "prompt_tokens": int(getattr(response.usage, "prompt_tokens", 0) or 0),
-                            "completion_tokens": int(getattr(response.usage, "completion_tokens", 0) or 0),
-                            "total_tokens": int(getattr(response.usage, "total_tokens", 0) or 0),
-                        }
-                    except Exception:
-                        try:
-                            # If it's already a mapping
-                            u = dict(response.usage)
-                            usage = {
-                                "prompt_tokens": int(u.get("prompt_tokens", 0) or 0),
-                                "completion_tokens": int(u.get("completion_tokens", 0) or 0),
-                                "total_tokens": int(u.get("total_tokens", 0) or 0),
-                            }
-                        except Exception:
-                            usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-
-                self.log.debug(
-                    "LLM response received",
-                    extra={"model": model, "text_length": len(text), "usage": usage},
-                )
-
-                # Track cost
-                self._track_cost(model, usage)
-
-                return LLMResponse(
-                    text=text,
-                    model=model,
-                    usage=usage,
-                    finish_reason=choice.finish_reason,
-                    raw_response=response,
-                )
+                self._limiter.acquire(model, estimate_tokens(messages, max_tokens))
+                with self._sync_slot(model):
+                    response = self._client.chat.completions.create(
+                        model=model,
+                        **self._deadline_options(),
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        response_format=response_format,
+                    )
+                return self._chat_response(model, response)
 
             except Exception as exc:
                 self.log.warning(
@@ -254,8 +344,11 @@ class LLMClient:
                     extra={"attempt": attempt + 1, "error": str(exc), "error_type": type(exc).__name__},
                 )
 
-                if attempt >= retries:
+                delay = self._next_retry_delay(model, attempt, retries, exc)
+                if delay is None:
                     self.log.warning("All LLM retry attempts failed", extra={"error": str(exc)})
+                    break
+                time.sleep(delay)
 
         return None
 
@@ -316,64 +409,18 @@ class LLMClient:
                     extra={"attempt": attempt + 1, "model": model, "tools_count": len(tools)},
                 )
 
-                response = self._client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    tools=tools,
-                    tool_choice=tool_choice,
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                )
-
-                # Extract response data
-                choice = response.choices[0]
-                message = choice.message
-
-                # Extract tool call arguments as text
-                text = ""
-                if message.tool_calls and len(message.tool_calls) > 0:
-                    # Use first tool call arguments as response text
-                    tool_call = message.tool_calls[0]
-                    text = tool_call.function.arguments
-                elif message.content:
-                    text = message.content
-
-                # Normalize usage
-                if response.usage is None:
-                    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-                else:
-                    try:
-                        usage = {
-                            "prompt_tokens": int(getattr(response.usage, "prompt_tokens", 0) or 0),
-                            "completion_tokens": int(getattr(response.usage, "completion_tokens", 0) or 0),
-                            "total_tokens": int(getattr(response.usage, "total_tokens", 0) or 0),
-                        }
-                    except Exception:
-                        try:
-                            u = dict(response.usage)
-                            usage = {
-                                "prompt_tokens": int(u.get("prompt_tokens", 0) or 0),
-                                "completion_tokens": int(u.get("completion_tokens", 0) or 0),
-                                "total_tokens": int(u.get("total_tokens", 0) or 0),
-                            }
-                        except Exception:
-                            usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-
-                self.log.debug(
-                    "LLM tool calling response received",
-                    extra={"model": model, "text_length": len(text), "usage": usage},
-                )
-
-                # Track cost
-                self._track_cost(model, usage)
-
-                return LLMResponse(
-                    text=text,
-                    model=model,
-                    usage=usage,
-                    finish_reason=choice.finish_reason,
-                    raw_response=response,
-                )
+                self._limiter.acquire(model, self._estimate_tool_tokens(messages, tools, max_tokens))
+                with self._sync_slot(model):
+                    response = self._client.chat.completions.create(
+                        model=model,
+                        **self._deadline_options(),
+                        messages=messages,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                return self._tool_response(model, response)
 
             except Exception as exc:
                 self.log.warning(
@@ -381,8 +428,11 @@ class LLMClient:
                     extra={"attempt": attempt + 1, "error": str(exc), "error_type": type(exc).__name__},
                 )
 
-                if attempt >= retries:
+                delay = self._next_retry_delay(model, attempt, retries, exc)
+                if delay is None:
                     self.log.warning("All LLM tool calling retry attempts failed", extra={"error": str(exc)})
+                    break
+                time.sleep(delay)
 
         return None
 
@@ -395,24 +445,54 @@ class LLMClient:
             return None
         try:
             m = model or "text-embedding-3-small"
-            resp = self._client.embeddings.create(model=m, input=text)
+            self._limiter.acquire(m, estimate_tokens(text))
+            with self._sync_slot(m):
+                resp = self._client.embeddings.create(model=m, input=text)
             vec = resp.data[0].embedding
             
             # Track embedding cost
-            usage = {
-                "prompt_tokens": resp.usage.prompt_tokens if resp.usage else 0,
-                "completion_tokens": 0,
-                "total_tokens": resp.usage.total_tokens if resp.usage else 0,
-            }
-            self._track_cost(m, usage)
+            self._track_cost(m, _normalize_usage(resp.usage))
             
             return [float(x) for x in vec]
         except Exception as exc:
             self.log.warning("Embedding request failed", extra={"error": str(exc)})
             return None
 
+    def get_embeddings_many(
+        self, *, texts: Sequence[str], model: str | None = None
+    ) -> list[list[float]] | None:
+        """Return embeddings for several texts, in input order.
+
+        Sends one `embeddings.create` call per `embedding_batch_size` inputs
+        instead of one call per text. Inputs must be non-empty strings.
+
+        Returns
+        -------
+        list[list[float]] | None
+            One vector per input, or None when the provider is unavailable or
+            any batch fails (callers may fall back to deterministic hashing).
+        """
+        if self._client is None:
+            return None
+        if not texts:
+            return []
+        m = model or "text-embedding-3-small"
+        out: list[list[float]] = []
+        try:
+            for start in range(0, len(texts), self.embedding_batch_size):
+                chunk = list(texts[start : start + self.embedding_batch_size])
+                self._limiter.acquire(m, sum(estimate_tokens(t) for t in chunk))
+                with self._sync_slot(m):
+                    resp = self._client.embeddings.create(model=m, input=chunk)
+                out.extend(self._embedding_vectors(resp, len(chunk)))
+                self._track_cost(m, _normalize_usage(resp.usage))
+            return out
+        except Exception as exc:
+            self.log.warning("Batch embedding request failed", extra={"error": str(exc), "count": len(texts)})
+            return None
+
     # ------------------------------------------------------------------
-    # Async wrappers for non-blocking usage
+    # Async (native) variants
     # ------------------------------------------------------------------
 
     async def chat_completion_async(
@@ -425,12 +505,12 @@ class LLMClient:
         *,
         max_retries: int | None = None,
     ) -> LLMResponse | None:
-        """Async wrapper for `chat_completion` using a thread executor.
+        """Async counterpart of `chat_completion` on the shared `AsyncOpenAI` pool.
 
-        This method preserves the existing sync semantics of `chat_completion`
-        while allowing callers in async contexts to avoid blocking the event
-        loop. The underlying OpenAI client remains synchronous; calls are
-        executed in a worker thread via `asyncio.to_thread`.
+        Requests are awaited on the event loop (no worker thread per call) and
+        bounded by the per-model concurrency cap. When `AsyncOpenAI` is not
+        available, execution falls back to the sync client via
+        `asyncio.to_thread`.
 
         Parameters
         ----------
@@ -452,16 +532,52 @@ class LLMClient:
         LLMResponse | None
             Structured response or None if all retries failed.
         """
+        if self._client is None:
+            self.log.warning("LLM client not available; returning None")
+            return None
 
-        return await asyncio.to_thread(
-            self.chat_completion,
-            messages,
-            model,
-            temperature,
-            max_tokens,
-            response_format,
-            max_retries=max_retries,
-        )
+        state = self._get_async_state()
+        if state is None:
+            return await asyncio.to_thread(
+                self.chat_completion,
+                messages,
+                model,
+                temperature,
+                max_tokens,
+                response_format,
+                max_retries=max_retries,
+            )
+
+        model = model or self.model
+        retries = self.max_retries if max_retries is None else max(0, int(max_retries))
+
+        for attempt in range(retries + 1):
+            try:
+                await self._limiter.acquire_async(model, estimate_tokens(messages, max_tokens))
+                async with self._async_slot(state, model):
+                    response = await state.client.chat.completions.create(
+                        model=model,
+                        **self._deadline_options(),
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        response_format=response_format,
+                    )
+                return self._chat_response(model, response)
+
+            except Exception as exc:
+                self.log.warning(
+                    "LLM request failed",
+                    extra={"attempt": attempt + 1, "error": str(exc), "error_type": type(exc).__name__},
+                )
+
+                delay = self._next_retry_delay(model, attempt, retries, exc)
+                if delay is None:
+                    self.log.warning("All LLM retry attempts failed", extra={"error": str(exc)})
+                    break
+                await asyncio.sleep(delay)
+
+        return None
 
     async def chat_completion_with_tools_async(
         self,
@@ -474,25 +590,65 @@ class LLMClient:
         tool_choice: str | dict[str, Any] = "auto",
         max_retries: int | None = None,
     ) -> LLMResponse | None:
-        """Async wrapper for `chat_completion_with_tools` using a thread executor.
+        """Async counterpart of `chat_completion_with_tools`.
 
-        Parameters mirror the synchronous version; execution is delegated to a
-        worker thread so that async callers do not block the event loop.
+        Parameters mirror the synchronous version; see `chat_completion_async`
+        for pooling, concurrency caps and the thread fallback.
         """
+        if self._client is None:
+            self.log.warning("LLM client not available; returning None")
+            return None
 
-        return await asyncio.to_thread(
-            self.chat_completion_with_tools,
-            messages,
-            tools,
-            model=model,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            tool_choice=tool_choice,
-            max_retries=max_retries,
-        )
+        state = self._get_async_state()
+        if state is None:
+            return await asyncio.to_thread(
+                self.chat_completion_with_tools,
+                messages,
+                tools,
+                model=model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                tool_choice=tool_choice,
+                max_retries=max_retries,
+            )
+
+        model = model or self.model
+        retries = self.max_retries if max_retries is None else max(0, int(max_retries))
+
+        if tool_choice == "required" and tools:
+            tool_choice = {"type": "function", "function": {"name": tools[0]["function"]["name"]}}
+
+        for attempt in range(retries + 1):
+            try:
+                await self._limiter.acquire_async(model, self._estimate_tool_tokens(messages, tools, max_tokens))
+                async with self._async_slot(state, model):
+                    response = await state.client.chat.completions.create(
+                        model=model,
+                        **self._deadline_options(),
+                        messages=messages,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                    )
+                return self._tool_response(model, response)
+
+            except Exception as exc:
+                self.log.warning(
+                    "LLM tool calling request failed",
+                    extra={"attempt": attempt + 1, "error": str(exc), "error_type": type(exc).__name__},
+                )
+
+                delay = self._next_retry_delay(model, attempt, retries, exc)
+                if delay is None:
+                    self.log.warning("All LLM tool calling retry attempts failed", extra={"error": str(exc)})
+                    break
+                await asyncio.sleep(delay)
+
+        return None
 
     async def get_embeddings_async(self, *, text: str, model: str | None = None) -> list[float] | None:
-        """Async wrapper for `get_embeddings` using a thread executor.
+        """Async counterpart of `get_embeddings`.
 
         Parameters
         ----------
@@ -506,8 +662,235 @@ class LLMClient:
         list[float] | None
             Embedding vector or None if provider is unavailable.
         """
+        if self._client is None:
+            return None
+
+        state = self._get_async_state()
+        if state is None:
+            return await asyncio.to_thread(self.get_embeddings, text=text, model=model)
+
+        try:
+            m = model or "text-embedding-3-small"
+            await self._limiter.acquire_async(m, estimate_tokens(text))
+            async with self._async_slot(state, m):
+                resp = await state.client.embeddings.create(model=m, input=text)
+            vec = resp.data[0].embedding
+            self._track_cost(m, _normalize_usage(resp.usage))
+            return [float(x) for x in vec]
+        except Exception as exc:
+            self.log.warning("Embedding request failed", extra={"error": str(exc)})
+            return None
+
+    async def get_embeddings_many_async(
+        self, *, texts: Sequence[str], model: str | None = None
+    ) -> list[list[float]] | None:
+        """Async counterpart of `get_embeddings_many`."""
+        if self._client is None:
+            return None
+        if not texts:
+            return []
+
+        state = self._get_async_state()
+        if state is None:
+            return await asyncio.to_thread(self.get_embeddings_many, texts=texts, model=model)
+
+        m = model or "text-embedding-3-small"
+        out: list[list[float]] = []
+        try:
+            for start in range(0, len(texts), self.embedding_batch_size):
+                chunk = list(texts[start : start + self.embedding_batch_size])
+                await self._limiter.acquire_async(m, sum(estimate_tokens(t) for t in chunk))
+                async with self._async_slot(state, m):
+                    resp = await state.client.embeddings.create(model=m, input=chunk)
+                out.extend(self._embedding_vectors(resp, len(chunk)))
+                self._track_cost(m, _normalize_usage(resp.usage))
+            return out
+        except Exception as exc:
+            self.log.warning("Batch embedding request failed", extra={"error": str(exc), "count": len(texts)})
+            return None
+
+    async def aclose(self) -> None:
+        """Close the async client bound to the running event loop, if any."""
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            state = self._async_states.pop(loop, None)
+        if state is not None:
+            try:
+                await state.client.close()
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # Rate limiting and retry helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _estimate_tool_tokens(
+        messages: list[dict[str, str]], tools: list[dict[str, Any]], max_tokens: int | None
+    ) -> int:
+        """Estimate tokens for a tool-calling request (tool schemas count too)."""
+        try:
+            schema_chars = len(json.dumps(tools))
+        except Exception:
+            schema_chars = 0
+        return estimate_tokens(messages, max_tokens) + schema_chars // 4
 
-        return await asyncio.to_thread(self.get_embeddings, text=text, model=model)
+    def _next_retry_delay(self, model: str, attempt: int, retries: int, exc: BaseException) -> float | None:
+        """Return the backoff before the next attempt, or None to stop retrying.
+
+        A provider `Retry-After` also pauses the model in the shared limiter so
+        concurrent callers queue instead of piling onto the provider.
+        """
+        if attempt >= retries or not is_retryable(exc):
+            return None
+        retry_after = retry_after_seconds(exc)
+        delay = backoff_delay(attempt, self.retry_delay, self.max_retry_delay, retry_after)
+        left = remaining_s()
+        if left is not None and left <= delay:
+            # No time left in the request budget for another attempt
+            return None
+        if retry_after is not None:
+            self._limiter.pause(model, min(retry_after, self.max_retry_delay))
+        status = getattr(exc, "status_code", None)
+        reason = str(status) if status is not None else type(exc).__name__
+        try:
+            from app.infra.metrics import inc_counter
+
+            inc_counter("llm_retries_total", labels={"model": model, "reason": reason})
+        except Exception:
+            pass
+        return delay
+
+    def _deadline_options(self) -> dict[str, Any]:
+        """Per-request `timeout` clamped to the request budget (if active)."""
+        if remaining_s() is None:
+            return {}
+        return {"timeout": bounded_timeout(self.timeout)}
+
+    # ------------------------------------------------------------------
+    # Pooling and concurrency helpers
+    # ------------------------------------------------------------------
+
+    def _http_limits(self) -> Any:
+        """Return `httpx.Limits` for the shared keep-alive pool."""
+        return _httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+        )
+
+    def _model_limit(self, model: str) -> int:
+        """Return the in-flight cap for `model`."""
+        return max(1, int(self.model_concurrency.get(model, self.default_model_concurrency)))
+
+    @contextmanager
+    def _sync_slot(self, model: str) -> Iterator[None]:
+        """Hold one of the model's in-flight slots for a blocking request."""
+        with self._state_lock:
+            sem = self._sync_slots.get(model)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self._model_limit(model))
+                self._sync_slots[model] = sem
+        with sem:
+            yield
+
+    def _get_async_state(self) -> _AsyncState | None:
+        """Return async resources for the running loop, creating them lazily.
+
+        httpx async pools are bound to the event loop that created them, so a
+        client is kept per loop (weakly referenced; dropped with the loop).
+        Returns None when `AsyncOpenAI` is unavailable.
+        """
+        if _AsyncOpenAI is None or not self.api_key:
+            return None
+        loop = asyncio.get_running_loop()
+        with self._state_lock:
+            state = self._async_states.get(loop)
+            if state is None:
+                try:
+                    http_client = None
+                    if _DefaultAsyncHttpxClient is not None and _httpx is not None:
+                        http_client = _DefaultAsyncHttpxClient(limits=self._http_limits())
+                    client = _AsyncOpenAI(
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                        base_url=self.api_base,
+                        http_client=http_client,
+                        max_retries=0,
+                    )
+                except Exception as exc:
+                    self.log.warning("Failed to initialize async OpenAI client", extra={"error": str(exc)})
+                    return None
+                state = _AsyncState(client)
+                self._async_states[loop] = state
+        return state
+
+    @asynccontextmanager
+    async def _async_slot(self, state: _AsyncState, model: str) -> AsyncIterator[None]:
+        """Hold one of the model's in-flight slots on the running loop."""
+        sem = state.slots.get(model)
+        if sem is None:
+            sem = state.slots.setdefault(model, asyncio.Semaphore(self._model_limit(model)))
+        async with sem:
+            yield
+
+    # ------------------------------------------------------------------
+    # Response parsing (shared by sync and async paths)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _embedding_vectors(resp: Any, expected: int) -> list[list[float]]:
+        """Return embedding vectors ordered by input index."""
+        data = sorted(resp.data, key=lambda d: getattr(d, "index", 0))
+        if len(data) != expected:
+            raise RuntimeError(f"expected {expected} embeddings, got {len(data)}")
+        return [[float(x) for x in d.embedding] for d in data]
+
+    def _chat_response(self, model: str, response: Any) -> LLMResponse:
+        """Build an `LLMResponse` from a chat completion and track its cost."""
+        choice = response.choices[0]
+        text = choice.message.content or ""
+        usage = _normalize_usage(response.usage)
+
+        self.log.debug(
+            "LLM response received",
+            extra={"model": model, "text_length": len(text), "usage": usage},
+        )
+        self._track_cost(model, usage)
+
+        return LLMResponse(
+            text=text,
+            model=model,
+            usage=usage,
+            finish_reason=choice.finish_reason,
+            raw_response=response,
+        )
+
+    def _tool_response(self, model: str, response: Any) -> LLMResponse:
+        """Build an `LLMResponse` whose text is the first tool call's arguments."""
+        choice = response.choices[0]
+        message = choice.message
+
+        text = ""
+        if message.tool_calls and len(message.tool_calls) > 0:
+            text = message.tool_calls[0].function.arguments
+        elif message.content:
+            text = message.content
+
+        usage = _normalize_usage(response.usage)
+
+        self.log.debug(
+            "LLM tool calling response received",
+            extra={"model": model, "text_length": len(text), "usage": usage},
+        )
+        self._track_cost(model, usage)
+
+        return LLMResponse(
+            text=text,
+            model=model,
+            usage=usage,
+            finish_reason=choice.finish_reason,
+            raw_response=response,
+        )
 
     def extract_json(
         self,
@@ -632,14 +1015,18 @@ class LLMClient:
         """Track LLM API costs based on model and token usage.
 
         Calculates cost using OpenAI pricing (as of 2024) and records metrics.
-        Falls back gracefully if metrics are unavailable.
+        Prompt tokens served from the provider-side prompt cache are billed at
+        the discounted cached-input rate and reported separately, so the effect
+        of stable prompt prefixes can be measured. Falls back gracefully if
+        metrics are unavailable.
 
         Parameters
         ----------
         model:
             Model identifier (e.g., "gpt-4o-mini", "gpt-4o").
         usage:
-            Token usage dictionary with prompt_tokens, completion_tokens, total_tokens.
+            Token usage dictionary with prompt_tokens, completion_tokens,
+            total_tokens and (optionally) cached_tokens.
         """
         try:
             # OpenAI pricing per 1M tokens (as of 2024)
@@ -669,9 +1056,12 @@ class LLMClient:
 
             prompt_tokens = usage.get("prompt_tokens", 0)
             completion_tokens = usage.get("completion_tokens", 0)
+            cached_tokens = min(usage.get("cached_tokens", 0), prompt_tokens)
 
-            # Calculate cost in USD
-            input_cost = (prompt_tokens / 1_000_000.0) * input_price
+            # Calculate cost in USD (cached prompt tokens are billed at a discount)
+            uncached_tokens = prompt_tokens - cached_tokens
+            input_cost = (uncached_tokens / 1_000_000.0) * input_price
+            input_cost += (cached_tokens / 1_000_000.0) * input_price * _CACHED_INPUT_PRICE_RATIO
             output_cost = (completion_tokens / 1_000_000.0) * output_price
             total_cost = input_cost + output_cost
 
@@ -686,19 +1076,30 @@ class LLMClient:
                 )
                 observe_histogram(
                     "llm_tokens_total",
-                    value=float(usage.get("total_tokens", 0)),
+                    float(usage.get("total_tokens", 0)),
                     labels={"model": model, "type": "total"},
                 )
                 observe_histogram(
                     "llm_tokens_total",
-                    value=float(prompt_tokens),
+                    float(prompt_tokens),
                     labels={"model": model, "type": "prompt"},
                 )
                 observe_histogram(
                     "llm_tokens_total",
-                    value=float(completion_tokens),
+                    float(completion_tokens),
                     labels={"model": model, "type": "completion"},
                 )
+                observe_histogram(
+                    "llm_tokens_total",
+                    float(cached_tokens),
+                    labels={"model": model, "type": "cached"},
+                )
+                if cached_tokens:
+                    inc_counter(
+                        "llm_cached_tokens_total",
+                        labels={"model": model},
+                        amount=float(cached_tokens),
+                    )
             except Exception:
                 pass  # Metrics unavailable, continue silently
 
@@ -707,6 +1108,7 @@ class LLMClient:
                 extra={
                     "model": model,
                     "prompt_tokens": prompt_tokens,
+                    "cached_tokens": cached_tokens,
                     "completion_tokens": completion_tokens,
                     "cost_usd": total_cost,
                 },
@@ -763,12 +1165,34 @@ def get_llm_client() -> LLMClient:
         try:
             from app.config.settings import get_settings as _get_settings  # local import
             _cfg = _get_settings()
-            timeout = float(getattr(getattr(_cfg, "openai"), "request_timeout_ms", 90000) / 1000.0)
-            max_retries = int(getattr(getattr(_cfg, "openai"), "max_retries", 3))
+            _oa = getattr(_cfg, "openai")
+            timeout = float(getattr(_oa, "request_timeout_ms", 90000) / 1000.0)
+            max_retries = int(getattr(_oa, "max_retries", 3))
+            retry_delay = float(getattr(_oa, "retry_base_delay_ms", 500)) / 1000.0
+            pool_kwargs: dict[str, Any] = {
+                "api_base": getattr(_oa, "api_base", None) or None,
+                "max_connections": int(getattr(_oa, "max_connections", 100)),
+                "max_keepalive_connections": int(getattr(_oa, "max_keepalive_connections", 20)),
+                "model_concurrency": dict(getattr(_oa, "model_concurrency", {}) or {}),
+                "default_model_concurrency": int(getattr(_oa, "default_model_concurrency", 32)),
+                "max_retry_delay": float(getattr(_oa, "retry_max_delay_ms", 20000)) / 1000.0,
+                "embedding_batch_size": int(
+                    (getattr(_cfg.models.embeddings, "parameters", {}) or {}).get("batch_size", 256)
+                ),
+            }
         except Exception:
             timeout = 90.0
             max_retries = 3
+            retry_delay = 0.5
+            pool_kwargs = {}
 
-        _LLM_CLIENT = LLMClient(api_key=api_key, model=model, timeout=timeout, max_retries=max_retries)
+        _LLM_CLIENT = LLMClient(
+            api_key=api_key,
+            model=model,
+            timeout=timeout,
+            max_retries=max_retries,
+            retry_delay=retry_delay,
+            **pool_kwargs,
+        )
     
     return _LLM_CLIENT
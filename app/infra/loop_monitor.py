@@ -0,0 +1,108 @@
+"""
+Event-loop lag monitor.
+
+Overview
+  Detects blocking work on the asyncio event loop. A lightweight task sleeps
+  for a fixed interval and measures how late it wakes up; any delay beyond the
+  interval is time the loop spent running something that did not yield (a
+  sync HTTP call, heavy CPU work, `thread.join`, ...).
+
+Design
+  - One monitor task per running loop, started lazily and idempotently by
+    `ensure_loop_monitor()` (the LangGraph server owns the loop, so there is no
+    startup hook to attach to).
+  - Lag is observed in `event_loop_lag_ms{thread}`; samples above the warning
+    threshold are logged so regressions show up without a dashboard.
+  - The task holds no strong reference to the loop beyond its own lifetime and
+    stops when the loop is closed.
+
+Integration
+  - Called from graph nodes on the hot path (e.g., `node_route`).
+
+Usage
+  >>> import asyncio
+  >>> from app.infra.loop_monitor import ensure_loop_monitor
+  >>> async def main():
+  ...     return ensure_loop_monitor()
+  >>> asyncio.run(main())
+  True
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from collections.abc import Mapping
+from typing import Any
+
+try:
+    from app.infra.logging import get_logger
+except Exception:  # pragma: no cover - optional
+    import logging as _logging
+
+    def get_logger(component: str, **initial_values: Any) -> Any:
+        return _logging.getLogger(component)
+
+try:  # Optional metrics
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _observe_hist(_name: str, _value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+
+__all__ = ["ensure_loop_monitor", "measure_loop_lag"]
+
+_INTERVAL_S = 0.25
+_WARN_LAG_MS = 100.0
+
+_MONITORS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task[None]] = weakref.WeakKeyDictionary()
+_LOCK = threading.Lock()
+
+
+async def measure_loop_lag(
+    *,
+    interval_s: float = _INTERVAL_S,
+    warn_lag_ms: float = _WARN_LAG_MS,
+    samples: int | None = None,
+) -> float:
+    """Sample loop lag every `interval_s`; return the maximum lag seen (ms).
+
+    Runs forever when `samples` is None (the background monitor); a finite
+    number of samples is useful in tests and benchmarks.
+    """
+    log = get_logger(__name__)
+    thread = threading.current_thread().name
+    worst = 0.0
+    taken = 0
+    while samples is None or taken < samples:
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval_s)
+        lag_ms = max(0.0, (time.perf_counter() - t0 - interval_s) * 1000.0)
+        taken += 1
+        worst = max(worst, lag_ms)
+        _observe_hist("event_loop_lag_ms", lag_ms, labels={"thread": thread})
+        if lag_ms >= warn_lag_ms:
+            log.warning("Event loop blocked", extra={"lag_ms": round(lag_ms, 1), "loop_thread": thread})
+    return worst
+
+
+def ensure_loop_monitor() -> bool:
+    """Start the lag monitor on the running loop if not already running.
+
+    Returns
+    -------
+    bool
+        True when a monitor is active on the current loop; False when called
+        outside a running loop.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    with _LOCK:
+        task = _MONITORS.get(loop)
+        if task is None or task.done():
+            _MONITORS[loop] = loop.create_task(measure_loop_lag(), name="event-loop-lag-monitor")
+    return True
@@ -159,6 +159,299 @@ def configure_metrics(namespace: str = "apllos", subsystem: str | None = None) -
             registry=_REGISTRY,
         ),
     )
+    _COUNTERS.setdefault(
+        "llm_cached_tokens_total",
+        _PROM["Counter"](
+            _name("llm_cached_tokens_total"),
+            "Prompt tokens served from the provider prompt cache",
+            ["model"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "llm_ratelimit_wait_ms",
+        _PROM["Histogram"](
+            _name("llm_ratelimit_wait_ms"),
+            "Time spent waiting on the per-model RPM/TPM limiter",
+            ["model"],
+            buckets=(0, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "llm_retries_total",
+        _PROM["Counter"](
+            _name("llm_retries_total"),
+            "LLM request retries by model and reason",
+            ["model", "reason"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "singleflight_coalesced_total",
+        _PROM["Counter"](
+            _name("singleflight_coalesced_total"),
+            "Requests served by waiting on an identical in-flight call",
+            ["component"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "embedding_batch_size",
+        _PROM["Histogram"](
+            _name("embedding_batch_size"),
+            "Texts per embeddings.create call sent by the micro-batcher",
+            ["model"],
+            buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "event_loop_lag_ms",
+        _PROM["Histogram"](
+            _name("event_loop_lag_ms"),
+            "Event loop scheduling delay (time the loop was blocked)",
+            ["thread"],
+            buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000),
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "state_checkpoint_bytes",
+        _PROM["Histogram"](
+            _name("state_checkpoint_bytes"),
+            "Serialized graph state size at the end of a turn (bytes)",
+            ["agent"],
+            buckets=(1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "checkpoint_write_ms",
+        _PROM["Histogram"](
+            _name("checkpoint_write_ms"),
+            "Checkpointer write latency (put/put_writes) in milliseconds",
+            ["op", "mode"],
+            buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "checkpoint_write_bytes",
+        _PROM["Histogram"](
+            _name("checkpoint_write_bytes"),
+            "Bytes serialized by the checkpointer backend per write",
+            ["op", "mode"],
+            buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "checkpoint_write_failures_total",
+        _PROM["Counter"](
+            _name("checkpoint_write_failures_total"),
+            "Write-behind checkpointer writes that failed in the background worker",
+            ["op"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "speculation_total",
+        _PROM["Counter"](
+            _name("speculation_total"),
+            "Speculative routing fan-outs by winning agent and outcome",
+            ["winner", "outcome"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "budget_skips_total",
+        _PROM["Counter"](
+            _name("budget_skips_total"),
+            "Optional steps skipped because the request latency budget ran low",
+            ["step"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "stage_latency_ms",
+        _PROM["Histogram"](
+            _name("stage_latency_ms"),
+            "Request stage latency (StageRunner) by scope, stage and status",
+            ["scope", "stage", "status"],
+            buckets=(10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "retrieval_probe_reuse_total",
+        _PROM["Counter"](
+            _name("retrieval_probe_reuse_total"),
+            "knowledge.retrieve calls served from the route-time retrieval probe",
+            ["outcome"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "normalizer_prompt_tokens",
+        _PROM["Histogram"](
+            _name("normalizer_prompt_tokens"),
+            "Estimated analytics normalizer prompt tokens by row mode (full/compacted)",
+            ["mode"],
+            buckets=(500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "normalizer_llm_ms",
+        _PROM["Histogram"](
+            _name("normalizer_llm_ms"),
+            "Analytics normalizer LLM call latency by row mode (full/compacted)",
+            ["mode"],
+            buckets=(250, 500, 1000, 2500, 5000, 10000, 20000, 40000, 90000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "normalizer_fast_path_total",
+        _PROM["Counter"](
+            _name("normalizer_fast_path_total"),
+            "Analytics answers by renderer outcome (template hit / LLM miss) and shape",
+            ["outcome", "shape"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "normalizer_fast_path_saved_ms",
+        _PROM["Histogram"](
+            _name("normalizer_fast_path_saved_ms"),
+            "Estimated normalizer latency saved per template-rendered answer",
+            ["shape"],
+            buckets=(250, 500, 1000, 2500, 5000, 10000, 20000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "planner_plan_cache_total",
+        _PROM["Counter"](
+            _name("planner_plan_cache_total"),
+            "Analytics planner plan cache lookups by outcome (hit/template_hit/miss/invalidated)",
+            ["outcome"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "analytics_admission_total",
+        _PROM["Counter"](
+            _name("analytics_admission_total"),
+            "Analytics executor admission decisions (admit/limit/heavy/reject)",
+            ["action"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "analytics_explain_cache_total",
+        _PROM["Counter"](
+            _name("analytics_explain_cache_total"),
+            "Pre-flight EXPLAIN plan cache lookups by outcome (hit/miss)",
+            ["outcome"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "analytics_plan_cost",
+        _PROM["Histogram"](
+            _name("analytics_plan_cost"),
+            "Estimated PostgreSQL plan cost of analytics queries by admission action",
+            ["action"],
+            buckets=(100, 1000, 10000, 50000, 100000, 250000, 1000000, 5000000, 20000000),
+            registry=_REGISTRY,
+        ),
+    )
+    _GAUGES.setdefault(
+        "analytics_queue_depth",
+        _PROM["Gauge"](
+            _name("analytics_queue_depth"),
+            "Analytics statements waiting for a scheduler slot by lane",
+            ["lane"],
+            registry=_REGISTRY,
+        ),
+    )
+    _GAUGES.setdefault(
+        "analytics_queue_running",
+        _PROM["Gauge"](
+            _name("analytics_queue_running"),
+            "Analytics statements holding a scheduler slot by lane",
+            ["lane"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "analytics_queue_wait_ms",
+        _PROM["Histogram"](
+            _name("analytics_queue_wait_ms"),
+            "Time analytics statements waited for a scheduler slot",
+            ["lane"],
+            buckets=(0, 5, 25, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "analytics_queue_total",
+        _PROM["Counter"](
+            _name("analytics_queue_total"),
+            "Analytics scheduler outcomes by lane (admitted/timeout)",
+            ["lane", "outcome"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "analytics_breaker_total",
+        _PROM["Counter"](
+            _name("analytics_breaker_total"),
+            "Analytics circuit breaker events (opened/probe/closed/short_circuit/store_error)",
+            ["event"],
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "planner_rollup_total",
+        _PROM["Counter"](
+            _name("planner_rollup_total"),
+            "Analytics plans rewritten onto materialized rollups by outcome (hit/miss/unavailable)",
+            ["outcome", "rollup"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "analytics_query_ms",
+        _PROM["Histogram"](
+            _name("analytics_query_ms"),
+            "Analytics data query latency by target (rollup/base)",
+            ["target"],
+            buckets=(5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000),
+            registry=_REGISTRY,
+        ),
+    )
+    _COUNTERS.setdefault(
+        "checkpoint_retention_deleted_total",
+        _PROM["Counter"](
+            _name("checkpoint_retention_deleted_total"),
+            "Rows deleted by the checkpoint retention job",
+            ["table", "reason"],
+            registry=_REGISTRY,
+        ),
+    )
+    _HISTOGRAMS.setdefault(
+        "checkpoint_retention_duration_ms",
+        _PROM["Histogram"](
+            _name("checkpoint_retention_duration_ms"),
+            "Checkpoint retention step duration in milliseconds",
+            ["step"],
+            buckets=(10, 50, 100, 500, 1000, 5000, 15000, 60000, 300000),
+            registry=_REGISTRY,
+        ),
+    )
 
 
 def inc_counter(name: str, labels: Mapping[str, str] | None = None, amount: float = 1.0) -> None:
@@ -0,0 +1,249 @@
+"""
+Process-wide LLM rate limiting (RPM/TPM token buckets) and retry backoff.
+
+Overview
+  Proactively throttles LLM requests per model so bursts turn into short
+  queueing delays instead of provider 429s and retry storms. Also provides the
+  backoff policy used by `LLMClient` retries (exponential with full jitter,
+  honouring `Retry-After`).
+
+Design
+  - One `TokenBucket` per model for requests/minute and one for tokens/minute.
+    Reservations may drive a bucket negative; the caller then waits for the
+    deficit to refill, which keeps waiters FIFO-fair without a queue.
+  - Tokens are estimated up front from message text (~4 chars/token) plus the
+    requested completion budget.
+  - A provider `Retry-After` pauses the whole model, not only the failing
+    caller, so concurrent requests stop hammering the provider.
+  - Limits of 0 mean "unlimited"; unknown models use the defaults.
+
+Integration
+  - `get_rate_limiter()` returns the process-wide limiter configured from
+    `openai.rate_limits` / `openai.default_rpm` / `openai.default_tpm`.
+  - Wait times are observed in `llm_ratelimit_wait_ms{model}`.
+
+Usage
+  >>> from app.infra.rate_limit import ModelRateLimiter
+  >>> limiter = ModelRateLimiter({"gpt-4o-mini": {"rpm": 600, "tpm": 0}})
+  >>> limiter.reserve("gpt-4o-mini", 100)
+  0.0
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections.abc import Mapping, Sequence
+from threading import Lock
+from typing import Any
+
+try:  # Optional metrics
+    from app.infra.metrics import observe_histogram as _observe_hist
+except Exception:  # pragma: no cover - optional
+    def _observe_hist(_name: str, _value_ms: float, labels: Mapping[str, str] | None = None) -> None:
+        return
+
+
+__all__ = [
+    "TokenBucket",
+    "ModelRateLimiter",
+    "estimate_tokens",
+    "backoff_delay",
+    "retry_after_seconds",
+    "is_retryable",
+    "get_rate_limiter",
+]
+
+_CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD_TOKENS = 4
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `per_minute / 60` units per second.
+
+    Parameters
+    ----------
+    per_minute:
+        Sustained rate (units per minute); also the burst capacity.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take `amount` units and return the seconds to wait before using them.
+
+        Not thread-safe; `ModelRateLimiter` serializes access.
+        """
+        elapsed = max(0.0, now - self._updated)
+        self._level = min(self.capacity, self._level + elapsed * self.rate)
+        self._updated = max(self._updated, now)
+        self._level -= min(float(amount), self.capacity)
+        if self._level >= 0:
+            return 0.0
+        return -self._level / self.rate
+
+
+class _ModelBuckets:
+    def __init__(self, rpm: int, tpm: int) -> None:
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+
+
+class ModelRateLimiter:
+    """RPM/TPM limiter keyed by model name.
+
+    Parameters
+    ----------
+    limits:
+        Mapping ``model -> {"rpm": int, "tpm": int}``; 0/missing = unlimited.
+    default_rpm, default_tpm:
+        Limits for models not present in `limits` (0 = unlimited).
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, Mapping[str, int]] | None = None,
+        *,
+        default_rpm: int = 0,
+        default_tpm: int = 0,
+    ) -> None:
+        self._limits = {str(k): dict(v or {}) for k, v in (limits or {}).items()}
+        self._default_rpm = int(default_rpm)
+        self._default_tpm = int(default_tpm)
+        self._buckets: dict[str, _ModelBuckets] = {}
+        self._lock = Lock()
+
+    def _for(self, model: str) -> _ModelBuckets:
+        b = self._buckets.get(model)
+        if b is None:
+            cfg = self._limits.get(model, {})
+            b = _ModelBuckets(
+                int(cfg.get("rpm", self._default_rpm) or 0),
+                int(cfg.get("tpm", self._default_tpm) or 0),
+            )
+            self._buckets[model] = b
+        return b
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Reserve one request and `tokens` tokens; return the wait in seconds."""
+        now = time.monotonic()
+        with self._lock:
+            b = self._for(model)
+            wait = max(0.0, b.paused_until - now)
+            if b.requests is not None:
+                wait = max(wait, b.requests.reserve(1, now))
+            if b.tokens is not None:
+                wait = max(wait, b.tokens.reserve(max(0, tokens), now))
+        return wait
+
+    def pause(self, model: str, seconds: float) -> None:
+        """Block new reservations for `model` for `seconds` (e.g., Retry-After)."""
+        if seconds <= 0:
+            return
+        until = time.monotonic() + seconds
+        with self._lock:
+            b = self._for(model)
+            b.paused_until = max(b.paused_until, until)
+
+    def acquire(self, model: str, tokens: int) -> float:
+        """Blocking acquire; sleeps for the reserved wait and returns it."""
+        wait = self.reserve(model, tokens)
+        _observe_hist("llm_ratelimit_wait_ms", wait * 1000.0, labels={"model": model})
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, model: str, tokens: int) -> float:
+        """Async acquire; awaits the reserved wait and returns it."""
+        wait = self.reserve(model, tokens)
+        _observe_hist("llm_ratelimit_wait_ms", wait * 1000.0, labels={"model": model})
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def estimate_tokens(messages: Sequence[Mapping[str, Any]] | str, max_tokens: int | None = None) -> int:
+    """Cheap pre-send token estimate (prompt text + requested completion budget)."""
+    if isinstance(messages, str):
+        prompt = len(messages) // _CHARS_PER_TOKEN
+    else:
+        prompt = 0
+        for m in messages:
+            content = m.get("content", "") if isinstance(m, Mapping) else ""
+            prompt += len(str(content or "")) // _CHARS_PER_TOKEN + _MESSAGE_OVERHEAD_TOKENS
+    return prompt + int(max_tokens or 0)
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """Return the provider-requested delay from `retry-after(-ms)` headers, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        ms = headers.get("retry-after-ms")
+        if ms is not None:
+            return max(0.0, float(ms) / 1000.0)
+        value = headers.get("retry-after")
+        if value is not None:
+            return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed LLM call is worth retrying.
+
+    Errors without an HTTP status (connection resets, timeouts, malformed
+    responses) and 408/409/429/5xx are retried; other 4xx (auth, bad request,
+    not found) fail immediately.
+    """
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        return True
+    try:
+        code = int(status)
+    except (TypeError, ValueError):
+        return True
+    return code in _RETRYABLE_STATUS or code >= 500
+
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: float | None = None) -> float:
+    """Exponential backoff with full jitter; `Retry-After` acts as a floor."""
+    ceiling = min(cap, base * (2 ** max(0, attempt)))
+    delay = random.uniform(0.0, ceiling)
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+
+_RATE_LIMITER: ModelRateLimiter | None = None
+_RATE_LIMITER_LOCK = Lock()
+
+
+def get_rate_limiter() -> ModelRateLimiter:
+    """Return the process-wide limiter, configured from Settings on first use."""
+    global _RATE_LIMITER
+    if _RATE_LIMITER is None:
+        with _RATE_LIMITER_LOCK:
+            if _RATE_LIMITER is None:
+                try:
+                    from app.config.settings import get_settings
+
+                    oa = get_settings().openai
+                    _RATE_LIMITER = ModelRateLimiter(
+                        dict(getattr(oa, "rate_limits", {}) or {}),
+                        default_rpm=int(getattr(oa, "default_rpm", 0)),
+                        default_tpm=int(getattr(oa, "default_tpm", 0)),
+                    )
+                except Exception:
+                    _RATE_LIMITER = ModelRateLimiter()
+    return _RATE_LIMITER
@@ -36,6 +36,8 @@ from collections.abc import Iterable, Mapping, Sequence
 from pathlib import Path
 from typing import Any, Protocol, runtime_checkable
 
+from app.infra.deadline import allow_optional
+
 try:  # Optional: logging
     from app.infra.logging import get_logger
 except Exception:  # pragma: no cover - optional
@@ -288,6 +290,15 @@ class LLMClassifier:
                 self.log.warning("Routing cache unavailable", exc_info=exc)
                 self._cache = None
 
+        # Coalesce concurrent identical cache misses
+        self._flight = None
+        if self._cache is not None:
+            try:
+                from app.infra.cache import SingleFlight
+                self._flight = SingleFlight("router")
+            except Exception:
+                self._flight = None
+
     # Public API -------------------------------------------------------------
     def classify(
         self,
@@ -318,202 +329,270 @@ class LLMClassifier:
                     cached["thread_id"] = thread_id
                     return self._return_final(cached)
             
-            # Detect meta questions before LLM classification
-            meta_type = self._detect_meta_question(message)
-            if meta_type:
-                decision = {
-                    "agent": "triage",
-                    "confidence": 1.0,
-                    "reason": f"meta_question_{meta_type}",
-                    "tables": [],
-                    "columns": [],
-                    "signals": ["meta_question", meta_type],
-                    "thread_id": thread_id,
-                }
-                decision = self._apply_confidence_calibration(decision)
-                if self._cache:
-                    self._cache.set(message, allowlist or {}, decision)
-                return self._return_final(decision)
-            
-            # Detect out-of-scope topics before LLM routing.
-            # Prefer semantic LLM-based detection and fall back to conservative
-            # keyword signals only when necessary.
-            is_oos, oos_topic = self._semantic_out_of_scope(message)
-            if not is_oos:
-                oos_topic = self._detect_out_of_scope(message)
-                is_oos = bool(oos_topic)
-
-            if is_oos:
-                topic_label = oos_topic or "other"
-                decision = {
-                    "agent": "triage",
-                    "confidence": 1.0,
-                    "reason": f"out_of_scope_{topic_label}",
-                    "tables": [],
-                    "columns": [],
-                    "signals": ["out_of_scope", topic_label],
-                    "thread_id": thread_id,
-                }
-                decision = self._apply_confidence_calibration(decision)
-                try:
-                    _inc_counter("router_out_of_scope_total", {"topic": topic_label})
-                except Exception:
-                    pass
-                if self._cache:
-                    self._cache.set(message, allowlist or {}, decision)
-                return self._return_final(decision)
-            try:
-                system = self._load_system_prompt(
-                    allowlist or {},
+            # Concurrent identical misses wait on one in-flight classification
+            def _compute() -> dict[str, Any]:
+                return self._classify_uncached(
+                    message,
+                    allowlist,
+                    thread_id=thread_id,
+                    locale=locale,
                     rag_hits=rag_hits,
                     rag_min_score=rag_min_score,
                     has_attachment=has_attachment,
-                    relevant_context=relevant_context
+                    relevant_context=relevant_context,
+                )
+
+            if self._flight is not None and self._cache is not None:
+                key = self._flight_key(
+                    message,
+                    allowlist,
+                    rag_hits=rag_hits,
+                    has_attachment=has_attachment,
+                    relevant_context=relevant_context,
                 )
-                schema = _routerdecision_json_schema()
-                if self._backend is None:
-                    raise RuntimeError("no backend configured")
-
-                # -------------------------------------------------------------
-                # Ensemble routing (feature-flagged via env)
-                # -------------------------------------------------------------
-                import os as _os
-                ensemble_enabled = str(_os.getenv("ROUTER_ENSEMBLE_ENABLED", "true")).strip().lower() in {"1","true","yes","on"}
-                scorer_enabled = str(_os.getenv("ROUTER_SCORER_ENABLED", "true")).strip().lower() in {"1","true","yes","on"}
-
-                if ensemble_enabled:
-                    # Simplified ensemble: use evidence-based reasoning, not keyword filtering
-                    # Load minimal examples for diversity, but rely primarily on evidence
-                    ex_all = self._load_examples()
-                    # Use only 1-2 examples per variant to reduce keyword dependency
-                    minimal_neutral = ex_all[:2] if ex_all else []
-                    
-                    variants = [
-                        ("neutral", minimal_neutral),
-                        ("evidence_focused", minimal_neutral),  # Same examples, but system prompt emphasizes evidence
-                    ]
-                    votes: list[dict[str, Any]] = []
-                    for tag, exs in variants:
-                        messages = [*exs, {"role": "user", "content": message}]
+                decision = dict(self._flight.do(key, _compute))
+            else:
+                decision = _compute()
+            decision["thread_id"] = thread_id
+            return self._return_final(decision)
+
+    def _flight_key(
+        self,
+        message: str,
+        allowlist: Mapping[str, Iterable[str]] | None,
+        *,
+        rag_hits: int,
+        has_attachment: bool,
+        relevant_context: Mapping[str, Any] | None,
+    ) -> str:
+        """Single-flight key: the routing cache key plus the per-request evidence."""
+        ctx = relevant_context or {}
+        evidence = json.dumps(
+            [int(rag_hits), bool(has_attachment), bool(ctx.get("is_relevant")), str(ctx.get("context_summary", ""))],
+            ensure_ascii=False,
+        )
+        return f"{self._cache.key_for(message, allowlist or {})}:{evidence}"
+
+    def _classify_uncached(
+        self,
+        message: str,
+        allowlist: Mapping[str, Iterable[str]] | None,
+        *,
+        thread_id: str | None,
+        locale: str,
+        rag_hits: int,
+        rag_min_score: float | None,
+        has_attachment: bool,
+        relevant_context: Mapping[str, Any] | None,
+    ) -> dict[str, Any]:
+        """Classify without consulting the cache; returns the raw decision dict."""
+        # Detect meta questions before LLM classification
+        meta_type = self._detect_meta_question(message)
+        if meta_type:
+            decision = {
+                "agent": "triage",
+                "confidence": 1.0,
+                "reason": f"meta_question_{meta_type}",
+                "tables": [],
+                "columns": [],
+                "signals": ["meta_question", meta_type],
+                "thread_id": thread_id,
+            }
+            decision = self._apply_confidence_calibration(decision)
+            if self._cache:
+                self._cache.set(message, allowlist or {}, decision)
+            return decision
+        
+        # Detect out-of-scope topics before LLM routing.
+        # Prefer semantic LLM-based detection and fall back to conservative
+        # keyword signals only when necessary.
+        is_oos, oos_topic = self._semantic_out_of_scope(message)
+        if not is_oos:
+            oos_topic = self._detect_out_of_scope(message)
+            is_oos = bool(oos_topic)
+
+        if is_oos:
+            topic_label = oos_topic or "other"
+            decision = {
+                "agent": "triage",
+                "confidence": 1.0,
+                "reason": f"out_of_scope_{topic_label}",
+                "tables": [],
+                "columns": [],
+                "signals": ["out_of_scope", topic_label],
+                "thread_id": thread_id,
+            }
+            decision = self._apply_confidence_calibration(decision)
+            try:
+                _inc_counter("router_out_of_scope_total", {"topic": topic_label})
+            except Exception:
+                pass
+            if self._cache:
+                self._cache.set(message, allowlist or {}, decision)
+            return decision
+        try:
+            # Static instructions + allowlist form the cacheable prefix;
+            # per-request evidence goes last, right before the user turn.
+            system = self._load_system_prompt(allowlist or {})
+            evidence = self._build_evidence_message(
+                allowlist or {},
+                rag_hits=rag_hits,
+                rag_min_score=rag_min_score,
+                has_attachment=has_attachment,
+                relevant_context=relevant_context,
+            )
+            schema = _routerdecision_json_schema()
+            if self._backend is None:
+                raise RuntimeError("no backend configured")
+
+            # -------------------------------------------------------------
+            # Ensemble routing (feature-flagged via env)
+            # -------------------------------------------------------------
+            import os as _os
+            ensemble_enabled = str(_os.getenv("ROUTER_ENSEMBLE_ENABLED", "true")).strip().lower() in {"1","true","yes","on"}
+            scorer_enabled = str(_os.getenv("ROUTER_SCORER_ENABLED", "true")).strip().lower() in {"1","true","yes","on"}
+
+            if ensemble_enabled:
+                # Simplified ensemble: use evidence-based reasoning, not keyword filtering
+                # Load minimal examples for diversity, but rely primarily on evidence
+                ex_all = self._load_examples()
+                # Use only 1-2 examples per variant to reduce keyword dependency
+                minimal_neutral = ex_all[:2] if ex_all else []
+                
+                variants = [
+                    ("neutral", minimal_neutral),
+                    ("evidence_focused", minimal_neutral),  # Same examples, but system prompt emphasizes evidence
+                ]
+                votes: list[dict[str, Any]] = []
+                partial = False
+                for tag, exs in variants:
+                    # A single valid vote is accepted when the request budget is short
+                    if votes and not allow_optional("ensemble_vote"):
+                        partial = True
+                        break
+                    messages = [*exs, evidence, {"role": "user", "content": message}]
+                    try:
+                        raw = self._backend.generate_json(
+                            system=system,
+                            messages=messages,
+                            json_schema=schema,
+                            model=self.model,
+                            temperature=self.temperature,
+                            max_output_tokens=self.max_output_tokens,
+                        )
+                        dec = _normalize_router_decision(raw, thread_id=thread_id)
+                        if self._validate_decision(dec, message):
+                            votes.append({"tag": tag, "decision": dec})
+                        else:
+                            self.log.info("ensemble: invalid LLM decision", extra={"tag": tag, "decision": dec})
+                    except Exception as _e:
+                        self.log.info("ensemble: variant failed", extra={"tag": tag, "reason": str(_e)})
+
+                # Majority voting
+                if votes:
+                    from collections import Counter as _Counter
+                    agent_counts = _Counter(v["decision"]["agent"] for v in votes)
+                    top_agent, top_count = next(iter(agent_counts.most_common(1)))
+                    # If clear majority, take the first decision for that agent
+                    if top_count >= 2 or len(agent_counts) == 1:
+                        chosen = next(v for v in votes if v["decision"]["agent"] == top_agent)["decision"]
+                        # A budget-truncated ensemble is one unconfirmed vote:
+                        # label it as such and keep it out of the routing cache
+                        label = "ensemble_partial" if partial else "ensemble_majority"
+                        chosen["signals"] = list({*chosen.get("signals", []), label})
+                        # Apply optional confidence calibration
+                        chosen = self._apply_confidence_calibration(chosen)
+                        if self._cache and not partial:
+                            self._cache.set(message, allowlist or {}, chosen)
+                        return chosen
+
+                    # Tie-breaker using scorer
+                    if scorer_enabled:
                         try:
-                            raw = self._backend.generate_json(
-                                system=system,
-                                messages=messages,
-                                json_schema=schema,
-                                model=self.model,
-                                temperature=self.temperature,
-                                max_output_tokens=self.max_output_tokens,
-                            )
-                            dec = _normalize_router_decision(raw, thread_id=thread_id)
-                            if self._validate_decision(dec, message):
-                                votes.append({"tag": tag, "decision": dec})
-                            else:
-                                self.log.info("ensemble: invalid LLM decision", extra={"tag": tag, "decision": dec})
-                        except Exception as _e:
-                            self.log.info("ensemble: variant failed", extra={"tag": tag, "reason": str(_e)})
-
-                    # Majority voting
-                    if votes:
-                        from collections import Counter as _Counter
-                        agent_counts = _Counter(v["decision"]["agent"] for v in votes)
-                        top_agent, top_count = next(iter(agent_counts.most_common(1)))
-                        # If clear majority, take the first decision for that agent
-                        if top_count >= 2 or len(agent_counts) == 1:
-                            chosen = next(v for v in votes if v["decision"]["agent"] == top_agent)["decision"]
-                            chosen["signals"] = list({*chosen.get("signals", []), "ensemble_majority"})
-                            # Apply optional confidence calibration
-                            chosen = self._apply_confidence_calibration(chosen)
+                            scorer_dec = self._score_agents(message, candidates=[d["decision"] for d in votes])
+                            scorer_dec["signals"] = list({*scorer_dec.get("signals", []), "ensemble_scorer"})
+                            scorer_dec = self._apply_confidence_calibration(scorer_dec)
                             if self._cache:
-                                self._cache.set(message, allowlist or {}, chosen)
-                            return self._return_final(chosen)
-
-                        # Tie-breaker using scorer
-                        if scorer_enabled:
+                                self._cache.set(message, allowlist or {}, scorer_dec)
+                            return scorer_dec
+                        except Exception as _se:
+                            # Conservative fallback: if no majority and scorer failed,
+                            # drop to triage when confidence is low.
+                            self.log.info("scorer failed; evaluating conservative fallback", extra={"reason": str(_se)})
+                            # Read confidence_min from settings/env or use default
+                            conf_min = 0.65
                             try:
-                                scorer_dec = self._score_agents(message, candidates=[d["decision"] for d in votes])
-                                scorer_dec["signals"] = list({*scorer_dec.get("signals", []), "ensemble_scorer"})
-                                scorer_dec = self._apply_confidence_calibration(scorer_dec)
-                                if self._cache:
-                                    self._cache.set(message, allowlist or {}, scorer_dec)
-                                return self._return_final(scorer_dec)
-                            except Exception as _se:
-                                # Conservative fallback: if no majority and scorer failed,
-                                # drop to triage when confidence is low.
-                                self.log.info("scorer failed; evaluating conservative fallback", extra={"reason": str(_se)})
-                                # Read confidence_min from settings/env or use default
-                                conf_min = 0.65
-                                try:
-                                    from app.config.settings import get_settings as _get_settings  # local import
-                                    _cfg = _get_settings()
-                                    conf_min = float(getattr(getattr(_cfg, "routing"), "confidence_min", conf_min))
-                                except Exception:
-                                    pass
-                                # best observed confidence across votes (after calibration later as well)
-                                try:
-                                    best_conf = max(float(v["decision"].get("confidence", 0.0) or 0.0) for v in votes)
-                                except Exception:
-                                    best_conf = 0.0
-                                if best_conf < (conf_min + 0.05):
-                                    tri = {"agent": "triage", "confidence": max(best_conf, conf_min), "reason": "ensemble_tie_low_confidence", "tables": [], "columns": [], "signals": ["ensemble_tie", "low_confidence"], "thread_id": thread_id}
-                                    tri = self._apply_confidence_calibration(tri)
-                                    if self._cache:
-                                        self._cache.set(message, allowlist or {}, tri)
-                                    return self._return_final(tri)
-                                # otherwise, return first but mark tie
-                                first = dict(votes[0]["decision"])  # copy
-                                first.setdefault("signals", []).append("ensemble_tie")
-                                first = self._apply_confidence_calibration(first)
+                                from app.config.settings import get_settings as _get_settings  # local import
+                                _cfg = _get_settings()
+                                conf_min = float(getattr(getattr(_cfg, "routing"), "confidence_min", conf_min))
+                            except Exception:
+                                pass
+                            # best observed confidence across votes (after calibration later as well)
+                            try:
+                                best_conf = max(float(v["decision"].get("confidence", 0.0) or 0.0) for v in votes)
+                            except Exception:
+                                best_conf = 0.0
+                            if best_conf < (conf_min + 0.05):
+                                tri = {"agent": "triage", "confidence": max(best_conf, conf_min), "reason": "ensemble_tie_low_confidence", "tables": [], "columns": [], "signals": ["ensemble_tie", "low_confidence"], "thread_id": thread_id}
+                                tri = self._apply_confidence_calibration(tri)
                                 if self._cache:
-                                    self._cache.set(message, allowlist or {}, first)
-                                return self._return_final(first)
-
-                    # If ensemble produced nothing valid, fall back to single-shot below
-
-                # -------------------------------------------------------------
-                # Single-shot LLM route (fallback)
-                # Use minimal examples, focus on evidence-based reasoning
-                # -------------------------------------------------------------
-                # Load only 2-3 diverse examples for few-shot, not all
-                examples = self._load_examples()
-                # Use only 2 examples to avoid over-reliance on patterns
-                minimal_examples = examples[:2] if examples else []
-                messages = [*minimal_examples, {"role": "user", "content": message}]
-                try:
-                    raw = self._backend.generate_json(
-                        system=system,
-                        messages=messages,
-                        json_schema=schema,
-                        model=self.model,
-                        temperature=self.temperature,
-                        max_output_tokens=self.max_output_tokens,
-                    )
-                    decision = _normalize_router_decision(raw, thread_id=thread_id)
-                    if self._validate_decision(decision, message):
-                        decision = self._apply_confidence_calibration(decision)
-                        if self._cache:
-                            self._cache.set(message, allowlist or {}, decision)
-                        return self._return_final(decision)
-                    else:
-                        self.log.info("LLM decision invalid, using heuristic", extra={"llm_decision": decision})
-                        decision = self._heuristic_decide(message, allowlist or {}, thread_id=thread_id, locale=locale)
-                        decision = self._apply_confidence_calibration(decision)
-                        return self._return_final(decision)
-                except Exception as llm_exc:
-                    self.log.info("LLM failed, using heuristic", extra={"reason": str(llm_exc)})
-                    decision = self._heuristic_decide(message, allowlist or {}, thread_id=thread_id, locale=locale)
+                                    self._cache.set(message, allowlist or {}, tri)
+                                return tri
+                            # otherwise, return first but mark tie
+                            first = dict(votes[0]["decision"])  # copy
+                            first.setdefault("signals", []).append("ensemble_tie")
+                            first = self._apply_confidence_calibration(first)
+                            if self._cache:
+                                self._cache.set(message, allowlist or {}, first)
+                            return first
+
+                # If ensemble produced nothing valid, fall back to single-shot below
+
+            # -------------------------------------------------------------
+            # Single-shot LLM route (fallback)
+            # Use minimal examples, focus on evidence-based reasoning
+            # -------------------------------------------------------------
+            # Load only 2-3 diverse examples for few-shot, not all
+            examples = self._load_examples()
+            # Use only 2 examples to avoid over-reliance on patterns
+            minimal_examples = examples[:2] if examples else []
+            messages = [*minimal_examples, evidence, {"role": "user", "content": message}]
+            try:
+                raw = self._backend.generate_json(
+                    system=system,
+                    messages=messages,
+                    json_schema=schema,
+                    model=self.model,
+                    temperature=self.temperature,
+                    max_output_tokens=self.max_output_tokens,
+                )
+                decision = _normalize_router_decision(raw, thread_id=thread_id)
+                if self._validate_decision(decision, message):
                     decision = self._apply_confidence_calibration(decision)
                     if self._cache:
                         self._cache.set(message, allowlist or {}, decision)
-                    return self._return_final(decision)
-            except Exception as exc:
-                self.log.info("classifier fallback engaged", extra={"reason": str(exc)})
-                decision = self._heuristic_decide(
-                    message, allowlist or {}, thread_id=thread_id, locale=locale
-                )
-            decision = self._apply_confidence_calibration(decision)
-            if self._cache:
-                self._cache.set(message, allowlist or {}, decision)
-            return self._return_final(decision)
+                    return decision
+                else:
+                    self.log.info("LLM decision invalid, using heuristic", extra={"llm_decision": decision})
+                    decision = self._heuristic_decide(message, allowlist or {}, thread_id=thread_id, locale=locale)
+                    decision = self._apply_confidence_calibration(decision)
+                    return decision
+            except Exception as llm_exc:
+                self.log.info("LLM failed, using heuristic", extra={"reason": str(llm_exc)})
+                decision = self._heuristic_decide(message, allowlist or {}, thread_id=thread_id, locale=locale)
+                decision = self._apply_confidence_calibration(decision)
+                if self._cache:
+                    self._cache.set(message, allowlist or {}, decision)
+                return decision
+        except Exception as exc:
+            self.log.info("classifier fallback engaged", extra={"reason": str(exc)})
+            decision = self._heuristic_decide(
+                message, allowlist or {}, thread_id=thread_id, locale=locale
+            )
+        decision = self._apply_confidence_calibration(decision)
+        if self._cache:
+            self._cache.set(message, allowlist or {}, decision)
+        return decision
 
     # ---------------------------------------------------------------------
     # Scorer (tie-breaker)
@@ -873,14 +952,14 @@ class LLMClassifier:
         return True
 
     # Internals --------------------------------------------------------------
-    def _load_system_prompt(
-        self, 
-        allowlist: Mapping[str, Iterable[str]], 
-        rag_hits: int = 0,
-        rag_min_score: float | None = None,
-        has_attachment: bool = False,
-        relevant_context: Mapping[str, Any] | None = None
-    ) -> str:
+    def _load_system_prompt(self, allowlist: Mapping[str, Iterable[str]]) -> str:
+        """Return the static system prompt (instructions + allowlist).
+
+        The result only depends on the prompt file and the allowlist, so it is
+        byte-identical across requests and forms a cacheable prompt prefix.
+        Per-request evidence is built by `_build_evidence_message` and sent
+        after the few-shot examples.
+        """
         # Try to load from prompts file; fallback to embedded minimal prompt
         try:
             base_dir = self.base_dir.parent / "prompts" / "routing"
@@ -900,14 +979,27 @@ class LLMClassifier:
                 "Return ONLY a single JSON object with fields {\"agent\", \"confidence\", \"reason\", \"tables\", \"columns\", \"signals\", \"thread_id\"}."
             )
         
-        # Inject evidence-based context
-        allowlist_json = _allowlist_to_json(allowlist)
+        return content + "\nALLOWLIST_JSON=" + _allowlist_to_json(allowlist)
+
+    def _build_evidence_message(
+        self,
+        allowlist: Mapping[str, Iterable[str]],
+        rag_hits: int = 0,
+        rag_min_score: float | None = None,
+        has_attachment: bool = False,
+        relevant_context: Mapping[str, Any] | None = None,
+    ) -> dict[str, str]:
+        """Return the per-request evidence as a system message.
+
+        Placed right before the user message so that the static system prompt
+        and few-shot examples stay a stable prefix for provider prompt caching.
+        """
         has_allowlist = bool(allowlist and any(allowlist.values()))
         
         evidence_context = f"""
 ## CURRENT EVIDENCE (Use this to decide routing)
 
-ALLOWLIST: {allowlist_json}
+ALLOWLIST: see ALLOWLIST_JSON in the instructions above
 - Has allowlist: {has_allowlist}
 - Available tables: {len(allowlist) if allowlist else 0}
 
@@ -948,8 +1040,7 @@ relacionada ao histórico recente. Processe esta query isoladamente, sem
 considerar contexto anterior. Route baseado apenas na query atual.
 """
         
-        injected = content + "\nALLOWLIST_JSON=" + allowlist_json + evidence_context + context_section
-        return injected
+        return {"role": "system", "content": (evidence_context + context_section).strip()}
 
     def _load_examples(self) -> list[dict[str, str]]:
         # Load few-shot examples if available
@@ -13,8 +13,9 @@ Design
   - Integration with conversation history
 
 Integration
-  - Used by routing system before classification
-  - Integrates with conversation history searcher
+  - Synchronous helper for scripts and non-async callers; the graph's route
+    node uses `app.utils.context_resolution.resolve_context`, which merges
+    this step with follow-up/topic-shift detection in one async LLM call
   - Works with LLM client for resolution
 
 Usage
@@ -0,0 +1,214 @@
+"""
+Async context resolution: anaphora, follow-up and topic-shift in one LLM call.
+
+Overview
+  Resolves how the current query relates to the conversation before routing.
+  A single structured LLM call returns the self-contained (resolved) query, a
+  follow-up flag and a topic-shift verdict. This replaces the separate
+  `resolve_anaphora` completion and the searcher's follow-up completion, which
+  asked essentially the same question twice.
+
+Design
+  - Native async (`LLMClient.chat_completion_async`); nothing blocks the loop.
+  - Static system prompt first, conversation-specific content last, so the
+    provider prompt cache can reuse the prefix across requests.
+  - JSON response (`response_format=json_object`) parsed leniently; any
+    failure degrades to keyword heuristics. A `topic_shift` of None means
+    "undecided" and lets `ConversationHistorySearcher` decide with embeddings.
+
+Integration
+  - Awaited by `node_route` concurrently with the RAG probe; the verdicts are
+    passed to `ConversationHistorySearcher.get_relevant_context`.
+
+Usage
+  >>> import asyncio
+  >>> from app.utils.context_resolution import resolve_context
+  >>> res = asyncio.run(resolve_context("E por estado?", [], None))
+  >>> res.resolved_query
+  'E por estado?'
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    from app.infra.logging import get_logger
+except Exception:  # pragma: no cover - optional
+    import logging as _logging
+
+    def get_logger(component: str, **initial_values: Any) -> Any:
+        return _logging.getLogger(component)
+
+try:
+    from app.infra.llm_client import get_llm_client
+except Exception:  # pragma: no cover - optional
+    get_llm_client = None
+
+from app.infra.deadline import allow_optional
+
+__all__ = ["ContextResolution", "resolve_context"]
+
+_MODEL = "gpt-4o-mini"
+_HISTORY_WINDOW = 5
+
+_SYSTEM_PROMPT = """You analyze how the current user query relates to the previous conversation.
+
+Return a JSON object with exactly these keys:
+- "resolved_query": the query rewritten to be self-contained. If it is a follow-up or uses anaphoric references (pronouns, demonstratives like "this", "that", "it", "the same"), replace them with explicit content from the context; e.g. context about "orders" and query "And by state?" becomes "orders by state". Otherwise return the query unchanged. Keep the original language and a natural phrasing.
+- "is_followup": true if the query continues or depends on the previous conversation (references, connecting words such as "and", "what about", or is incomplete without context).
+- "topic_shift": true if the query starts a new, unrelated subject.
+
+Respond with the JSON object only."""
+
+_FOLLOWUP_PATTERNS = (
+    r"^(and|e|mas|but|também|also|what about|e sobre)\s+",
+    r"^(and|e|mas|but|também|also)\s+(by|por|about|sobre|for|para|of|de|how|quanto|qual)",
+    r"^(what about|e sobre|e quanto|and how many|and what)",
+)
+
+_NEW_TOPIC_PATTERNS = (
+    r"^(agora|e agora|outra|outro|diferente|mudando|mudar de assunto)",
+    r"^(vamos|vou|quero|preciso|gostaria)\s+(falar|perguntar|saber)\s+(sobre|de)",
+)
+
+
+@dataclass(frozen=True)
+class ContextResolution:
+    """Outcome of context resolution for one turn.
+
+    Attributes
+    ----------
+    resolved_query:
+        Self-contained query (the original query when nothing was resolved).
+    is_followup:
+        Whether the query continues the previous conversation.
+    topic_shift:
+        True/False when decided; None to defer to embedding similarity.
+    source:
+        "llm", "heuristic" or "none" (no conversation context).
+    """
+
+    resolved_query: str
+    is_followup: bool
+    topic_shift: bool | None
+    source: str
+
+
+def _context_lines(
+    conversation_history: Sequence[Mapping[str, Any]] | None,
+    last_answer: Mapping[str, Any] | None,
+) -> list[str]:
+    lines: list[str] = []
+    for msg in list(conversation_history or [])[-_HISTORY_WINDOW:]:
+        content = msg.get("content", "") or msg.get("text", "")
+        if content:
+            lines.append(f"{str(msg.get('role', 'user')).upper()}: {content}")
+    if not conversation_history and last_answer:
+        text = last_answer.get("text", "") if isinstance(last_answer, Mapping) else str(last_answer)
+        if text:
+            lines.append(f"ASSISTANT: {text}")
+    return lines
+
+
+def _heuristic(query: str) -> ContextResolution:
+    """Keyword fallback (language-specific; used only when the LLM is unavailable)."""
+    is_followup = any(re.search(p, query, re.IGNORECASE) for p in _FOLLOWUP_PATTERNS)
+    new_topic = any(re.search(p, query, re.IGNORECASE) for p in _NEW_TOPIC_PATTERNS)
+    return ContextResolution(
+        resolved_query=query,
+        is_followup=is_followup,
+        topic_shift=True if new_topic and not is_followup else None,
+        source="heuristic",
+    )
+
+
+def _as_bool(value: Any) -> bool | None:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in {"true", "false", "yes", "no"}:
+        return value.strip().lower() in {"true", "yes"}
+    return None
+
+
+async def resolve_context(
+    query: str,
+    conversation_history: Sequence[Mapping[str, Any]] | None,
+    last_answer: Mapping[str, Any] | None,
+    *,
+    llm_client: Any | None = None,
+) -> ContextResolution:
+    """Resolve the query against the conversation with one async LLM call.
+
+    Parameters
+    ----------
+    query:
+        Current user query.
+    conversation_history:
+        Previous messages (the last five are sent as context).
+    last_answer:
+        Last assistant answer; used as context when history is empty.
+    llm_client:
+        Client override (defaults to the shared `LLMClient`).
+
+    Returns
+    -------
+    ContextResolution
+        Resolved query plus follow-up/topic-shift verdicts.
+    """
+    q = (query or "").strip()
+    lines = _context_lines(conversation_history, last_answer)
+    if not q or not lines:
+        return ContextResolution(resolved_query=query, is_followup=False, topic_shift=False, source="none")
+
+    client = llm_client
+    if client is None and get_llm_client is not None:
+        try:
+            client = get_llm_client()
+        except Exception:
+            client = None
+    if client is None or not client.is_available() or not allow_optional("followup_llm"):
+        return _heuristic(q)
+
+    log = get_logger(__name__)
+    messages = [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": "CONVERSATION CONTEXT:\n" + "\n".join(lines) + f"\n\nCURRENT QUERY: {q}"},
+    ]
+    try:
+        response = await client.chat_completion_async(
+            messages,
+            model=_MODEL,
+            temperature=0.0,
+            max_tokens=250,
+            response_format={"type": "json_object"},
+        )
+        data: Any = None
+        if response is not None and response.text:
+            try:
+                data = json.loads(response.text)
+            except ValueError:
+                data = client.extract_json(response.text)
+        if not isinstance(data, Mapping):
+            return _heuristic(q)
+
+        resolved = str(data.get("resolved_query") or "").strip().strip("\"'")
+        # Guard against truncated or degenerate rewrites
+        if not resolved or len(resolved) < len(q) * 0.5:
+            resolved = q
+        is_followup = bool(_as_bool(data.get("is_followup")))
+        topic_shift = _as_bool(data.get("topic_shift"))
+        if is_followup:
+            topic_shift = False
+        if resolved != q:
+            log.debug("Context resolved via LLM", extra={"original": q[:50], "resolved": resolved[:50]})
+        return ContextResolution(
+            resolved_query=resolved, is_followup=is_followup, topic_shift=topic_shift, source="llm"
+        )
+    except Exception as exc:
+        log.debug("LLM context resolution failed, using fallback", extra={"error": str(exc)})
+        return _heuristic(q)
@@ -8,7 +8,13 @@ Overview
   validation to ensure context is appropriate for the current query.
 
 Design
-  - Uses embeddings for semantic similarity calculation
+  - Uses embeddings for semantic similarity calculation. History messages
+    are embedded once when the graph appends them (`embed_messages`); the
+    float32 vector goes to the content-addressed blob store and the message
+    keeps only its ``embedding_ref``, so checkpoints do not carry ~8 KB per
+    message. Scoring is one matrix-vector product over the stored vectors
+    (decoded once per process and memoized by ref), and only the query (plus
+    messages without a stored vector) is embedded per turn
   - Detects topic shifts to avoid using irrelevant context
   - Validates context relevance before returning
   - Supports finding referenced messages and relevant context
@@ -16,8 +22,11 @@ Design
 
 Integration
   - Used by routing system to inject relevant context
-  - Integrates with LLM client for embeddings
-  - Uses embedding cache when available
+  - `node_update_history` calls `embed_messages` before persisting history;
+    vectors live in `app.infra.blobs` (``state_blobs`` when Postgres is
+    configured) and expire with the checkpoint retention job
+  - Embeds through the shared micro-batcher (`app.infra.embeddings`) and
+    its process-wide embedding cache
 
 Usage
   >>> from app.utils.conversation_search import ConversationHistorySearcher
@@ -32,12 +41,18 @@ Usage
 
 from __future__ import annotations
 
-import hashlib
-import math
+import base64
 import re
+import sys
+import threading
+from array import array
+from collections import OrderedDict
 from collections.abc import Mapping, Sequence
 from typing import Any
 
+from app.infra.deadline import allow_optional
+from app.utils.vectors import cosine_similarities, cosine_similarity, hash_embedding
+
 try:
     from app.infra.logging import get_logger
 except Exception:
@@ -52,11 +67,149 @@ except Exception:
     get_llm_client = None
 
 try:
-    from app.infra.cache import EmbeddingCache
+    from app.infra.embeddings import get_embedder
+except Exception:
+    get_embedder = None
+
+try:
+    from app.infra.blobs import get_blob_store
 except Exception:
-    EmbeddingCache = None
+    get_blob_store = None
+
+__all__ = ["ConversationHistorySearcher", "embed_messages", "encode_embedding", "decode_embedding"]
+
+_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Decoded vectors by blob ref. Refs are content-addressed, so entries never go stale.
+_VECTOR_CACHE_SIZE = 4096
+_vectors: OrderedDict[str, array[float]] = OrderedDict()
+_vectors_lock = threading.Lock()
+
 
-__all__ = ["ConversationHistorySearcher"]
+def encode_embedding(vec: Sequence[float]) -> str:
+    """Pack a vector as base64 little-endian float32 (checkpoint-friendly)."""
+    arr = array("f", vec)
+    if sys.byteorder == "big":  # pragma: no cover - platform dependent
+        arr.byteswap()
+    return base64.b64encode(arr.tobytes()).decode("ascii")
+
+
+def decode_embedding(data: str) -> array[float] | None:
+    """Inverse of `encode_embedding` as a float32 `array` (None when malformed).
+
+    The buffer is handed to the similarity kernel without conversion.
+    """
+    try:
+        arr = array("f")
+        arr.frombytes(base64.b64decode(data))
+    except Exception:
+        return None
+    if sys.byteorder == "big":  # pragma: no cover - platform dependent
+        arr.byteswap()
+    return arr
+
+
+def _default_store() -> Any | None:
+    if get_blob_store is None:
+        return None
+    try:
+        return get_blob_store()
+    except Exception:
+        return None
+
+
+def _remember(ref: str, vec: array[float]) -> None:
+    with _vectors_lock:
+        _vectors[ref] = vec
+        _vectors.move_to_end(ref)
+        while len(_vectors) > _VECTOR_CACHE_SIZE:
+            _vectors.popitem(last=False)
+
+
+def _store_vector(store: Any, data: str, model: str) -> str | None:
+    """Put an encoded vector in `store`; its ref, or None when the write fails."""
+    try:
+        ref = store.put({"model": model, "embedding": data})
+    except Exception:
+        return None
+    vec = decode_embedding(data)
+    if vec:
+        _remember(ref, vec)
+    return ref
+
+
+def _load_vector(ref: str, store: Any | None, model: str = _EMBEDDING_MODEL) -> array[float] | None:
+    """Resolve an ``embedding_ref`` (None when missing, malformed or another model)."""
+    with _vectors_lock:
+        vec = _vectors.get(ref)
+        if vec is not None:
+            _vectors.move_to_end(ref)
+            return vec
+    if store is None:
+        return None
+    try:
+        payload = store.get(ref)
+    except Exception:
+        return None
+    if not isinstance(payload, Mapping) or payload.get("model") != model:
+        return None
+    data = payload.get("embedding")
+    vec = decode_embedding(data) if isinstance(data, str) else None
+    if vec:
+        _remember(ref, vec)
+    return vec
+
+
+def embed_messages(
+    messages: Sequence[dict[str, Any]],
+    *,
+    model: str = _EMBEDDING_MODEL,
+    store: Any | None = None,
+) -> list[dict[str, Any]]:
+    """Return `messages` with an ``embedding_ref`` attached to those missing one.
+
+    Vectors are written to `store` (the process blob store by default) and
+    messages keep only the reference; legacy inline ``embedding`` values are
+    moved out the same way. All missing vectors are requested in one batched
+    call. Messages whose vector could not be obtained or stored are returned
+    without one (the searcher falls back to embedding them on demand).
+    """
+    out = [dict(m) for m in messages]
+    if store is None:
+        store = _default_store()
+    if store is None:
+        return out
+    for m in out:
+        data = m.get("embedding")
+        if data is None:
+            continue
+        if m.get("embedding_model") == model and isinstance(data, str) and not m.get("embedding_ref"):
+            ref = _store_vector(store, data, model)
+            if ref is None:
+                continue
+            m["embedding_ref"] = ref
+        del m["embedding"]
+    pending = [
+        i
+        for i, m in enumerate(out)
+        if (m.get("content") or m.get("text")) and not (m.get("embedding_ref") and m.get("embedding_model") == model)
+    ]
+    if not pending or get_embedder is None:
+        return out
+    try:
+        vectors = get_embedder().embed_many(
+            [str(out[i].get("content") or out[i].get("text")) for i in pending], model=model
+        )
+    except Exception:
+        return out
+    for i, vec in zip(pending, vectors):
+        if vec is None:
+            continue
+        ref = _store_vector(store, encode_embedding(vec), model)
+        if ref is not None:
+            out[i]["embedding_ref"] = ref
+            out[i]["embedding_model"] = model
+    return out
 
 
 class ConversationHistorySearcher:
@@ -66,7 +219,11 @@ class ConversationHistorySearcher:
         """Initialize conversation history searcher."""
         self.log = get_logger(__name__)
         self._llm_client = None
+        self._embedder = None
         self._embedding_cache = None
+        self._store = _default_store()
+        # Vectors stored for history messages (content -> embedding)
+        self._stored: dict[str, Sequence[float]] = {}
 
         try:
             if get_llm_client:
@@ -75,8 +232,9 @@ class ConversationHistorySearcher:
             pass
 
         try:
-            if EmbeddingCache:
-                self._embedding_cache = EmbeddingCache(ttl_seconds=86400, max_size=5000)
+            if get_embedder:
+                self._embedder = get_embedder()
+                self._embedding_cache = self._embedder.cache
         except Exception:
             pass
 
@@ -108,17 +266,18 @@ class ConversationHistorySearcher:
         if not conversation_history:
             return []
 
-        query_embedding = self._get_embedding(current_query)
+        self._load_stored(conversation_history)
+        messages = [
+            (msg, msg.get("content", "") or msg.get("text", "")) for msg in conversation_history
+        ]
+        messages = [(msg, content) for msg, content in messages if content]
+        query_embedding, *msg_embeddings = self._get_embeddings(
+            [current_query] + [content for _, content in messages]
+        )
+        similarities = self._similarities(query_embedding, msg_embeddings)
 
         scored_messages = []
-        for msg in conversation_history:
-            content = msg.get("content", "") or msg.get("text", "")
-            if not content:
-                continue
-
-            msg_embedding = self._get_embedding(content)
-            similarity = self._cosine_similarity(query_embedding, msg_embedding)
-
+        for (msg, content), similarity in zip(messages, similarities):
             scored_messages.append(
                 {
                     "message": msg,
@@ -189,8 +348,9 @@ class ConversationHistorySearcher:
         if not has_explicit_reference:
             relevant = self.find_relevant_messages(current_query, conversation_history, max_messages=1)
             if relevant:
-                query_emb = self._get_embedding(current_query)
-                msg_emb = self._get_embedding(relevant[0].get("content", ""))
+                query_emb, msg_emb = self._get_embeddings(
+                    [current_query, relevant[0].get("content", "")]
+                )
                 similarity = self._cosine_similarity(query_emb, msg_emb)
                 if similarity > 0.5:
                     return relevant[0]
@@ -285,17 +445,11 @@ class ConversationHistorySearcher:
         if not recent_history:
             return False
 
-        query_embedding = self._get_embedding(current_query)
-
-        similarities = []
-        for msg in recent_history:
-            content = msg.get("content", "") or msg.get("text", "")
-            if not content:
-                continue
-
-            msg_embedding = self._get_embedding(content)
-            similarity = self._cosine_similarity(query_embedding, msg_embedding)
-            similarities.append(similarity)
+        self._load_stored(recent_history)
+        contents = [msg.get("content", "") or msg.get("text", "") for msg in recent_history]
+        contents = [c for c in contents if c]
+        query_embedding, *msg_embeddings = self._get_embeddings([current_query] + contents)
+        similarities = self._similarities(query_embedding, msg_embeddings)
 
         if not similarities:
             return False
@@ -335,17 +489,10 @@ class ConversationHistorySearcher:
         if not context_messages:
             return False
 
-        query_embedding = self._get_embedding(current_query)
-
-        relevances = []
-        for msg in context_messages:
-            content = msg.get("content", "")
-            if not content:
-                continue
-
-            msg_embedding = self._get_embedding(content)
-            similarity = self._cosine_similarity(query_embedding, msg_embedding)
-            relevances.append(similarity)
+        contents = [msg.get("content", "") for msg in context_messages]
+        contents = [c for c in contents if c]
+        query_embedding, *msg_embeddings = self._get_embeddings([current_query] + contents)
+        relevances = self._similarities(query_embedding, msg_embeddings)
 
         if not relevances:
             return False
@@ -362,6 +509,9 @@ class ConversationHistorySearcher:
         current_query: str,
         conversation_history: list[dict[str, Any]],
         last_answer: dict[str, Any] | None = None,
+        *,
+        is_followup: bool | None = None,
+        topic_shift: bool | None = None,
     ) -> dict[str, Any]:
         """Get relevant context for the current query with relevance validation.
 
@@ -377,26 +527,31 @@ class ConversationHistorySearcher:
             Complete conversation history.
         last_answer
             Last assistant answer if available.
+        is_followup
+            Follow-up verdict already computed upstream (e.g., by
+            `app.utils.context_resolution`); detected here when None.
+        topic_shift
+            Topic-shift verdict already computed upstream; detected from
+            embeddings when None.
 
         Returns
         -------
         dict[str, Any]
             Dictionary with relevant context or empty if not relevant.
         """
-        # Use LLM to detect if this is a follow-up (language-agnostic)
-        # Fallback to keyword patterns only if LLM unavailable
-        is_followup = self._detect_followup_llm(current_query, conversation_history, last_answer)
+        # Use LLM to detect if this is a follow-up (language-agnostic) unless
+        # the caller already resolved it; keyword fallback when LLM unavailable
+        if is_followup is None:
+            is_followup = self._detect_followup_llm(current_query, conversation_history, last_answer)
+        self._load_stored(conversation_history)
         
         # Only check topic shift if we have history
         # If LLM detected it's a follow-up, don't treat as topic shift
-        topic_shift = False
-        if conversation_history:
-            topic_shift = self.detect_topic_shift(current_query, conversation_history)
-            # If LLM confirmed it's a follow-up, override topic shift detection
-            if is_followup:
-                topic_shift = False
-        elif is_followup and last_answer:
-            # If it's a follow-up and we have last_answer, assume it's relevant
+        if topic_shift is None:
+            topic_shift = False
+            if conversation_history:
+                topic_shift = self.detect_topic_shift(current_query, conversation_history)
+        if is_followup:
             topic_shift = False
 
         if topic_shift:
@@ -533,7 +688,7 @@ class ConversationHistorySearcher:
             return False
         
         # Try LLM first (language-agnostic)
-        if self._llm_client and self._llm_client.is_available():
+        if self._llm_client and self._llm_client.is_available() and allow_optional("followup_llm"):
             try:
                 context_parts = []
                 if conversation_history:
@@ -600,62 +755,56 @@ Respond with ONLY "yes" or "no" (lowercase, no punctuation, no explanation).
 
     def _get_embedding(self, text: str) -> list[float]:
         """Generate embedding for text using LLM client or fallback."""
-        if not text or not text.strip():
-            return self._hash_embedding(text)
+        return self._get_embeddings([text])[0]
 
-        cached = None
-        if self._embedding_cache:
-            try:
-                cached = self._embedding_cache.get(text, "text-embedding-3-small")
-            except Exception:
-                pass
-
-        if cached is not None:
-            return cached
+    def _get_embeddings(self, texts: Sequence[str]) -> list[Sequence[float]]:
+        """Embed `texts` in one batched call; hash fallback per missing vector.
 
-        vec: list[float] | None = None
-        if self._llm_client and self._llm_client.is_available():
+        Vectors stored on history messages are used as-is and never re-embedded.
+        """
+        vectors: list[Sequence[float] | None] = [self._stored.get(t) for t in texts]
+        missing = [i for i, vec in enumerate(vectors) if vec is None]
+        if missing and self._embedder is not None:
             try:
-                vec_result = self._llm_client.get_embeddings(text=text, model="text-embedding-3-small")
-                if vec_result and isinstance(vec_result, list):
-                    vec = vec_result[0] if (len(vec_result) > 0 and isinstance(vec_result[0], list)) else vec_result  # type: ignore[assignment]
+                fetched = self._embedder.embed_many([texts[i] for i in missing], model=_EMBEDDING_MODEL)
+                for i, vec in zip(missing, fetched):
+                    vectors[i] = vec
             except Exception:
                 pass
+        return [vec if vec is not None else self._hash_embedding(text) for text, vec in zip(texts, vectors)]
 
-        if vec is not None:
-            if self._embedding_cache:
-                try:
-                    self._embedding_cache.set(text, "text-embedding-3-small", vec)
-                except Exception:
-                    pass
-            return vec
-
-        return self._hash_embedding(text)
+    def _load_stored(self, messages: Sequence[Mapping[str, Any]]) -> None:
+        """Index the stored embeddings of history messages by content.
 
-    def _cosine_similarity(self, vec1: list[float], vec2: list[float]) -> float:
+        Reads ``embedding_ref`` and, for history checkpointed before vectors
+        moved to the blob store, an inline ``embedding``.
+        """
+        for msg in messages:
+            content = msg.get("content", "") or msg.get("text", "")
+            if not content or content in self._stored:
+                continue
+            if msg.get("embedding_model") != _EMBEDDING_MODEL:
+                continue
+            ref, data = msg.get("embedding_ref"), msg.get("embedding")
+            vec = None
+            if isinstance(ref, str) and ref:
+                vec = _load_vector(ref, self._store)
+            elif isinstance(data, str) and data:
+                vec = decode_embedding(data)
+            if vec:
+                self._stored[content] = vec
+
+    def _similarities(self, query: Sequence[float], vectors: Sequence[Sequence[float]]) -> list[float]:
+        """Cosine similarity of `query` against each vector (one mat-vec with NumPy)."""
+        return cosine_similarities(query, vectors)
+
+    def _cosine_similarity(self, vec1: Sequence[float], vec2: Sequence[float]) -> float:
         """Calculate cosine similarity between two vectors."""
-        if not vec1 or not vec2 or len(vec1) != len(vec2):
-            return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(a * a for a in vec1))
-        magnitude2 = math.sqrt(sum(a * a for a in vec2))
-
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
-
-        return dot_product / (magnitude1 * magnitude2)
+        return cosine_similarity(vec1, vec2)
 
     def _hash_embedding(self, text: str) -> list[float]:
         """Fallback: hash-based embedding for when LLM is unavailable."""
-        dim = 1536
-        vec = [0.0] * dim
-        for word in text.lower().split():
-            h = hashlib.md5(word.encode()).hexdigest()
-            idx = int(h[:8], 16) % dim
-            vec[idx] += 1.0
-        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
-        return [v / norm for v in vec]
+        return hash_embedding(text.lower().split(), dim=1536, digest="md5")
 
     def _summarize_context(self, context_messages: list[dict[str, Any]]) -> str:
         """Generate context summary for prompt injection."""
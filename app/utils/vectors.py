@@ -0,0 +1,172 @@
+"""
+Vector kernels: batched cosine similarity, top-k and hash embeddings.
+
+Overview
+  Small numeric helpers shared by conversation search and the knowledge
+  retriever (and usable by any similarity-keyed cache). Scoring N stored
+  vectors against a query is one matrix-vector product with NumPy; without
+  NumPy the same API runs on a pure-Python path that computes the query norm
+  once and uses C-level `map`/`sum` instead of generator expressions.
+
+Design
+  - Optional NumPy (not a declared runtime dependency); results are plain
+    Python lists/floats on both paths so callers do not depend on NumPy types.
+  - Inputs may be lists or float32 buffers (`array('f')`, ndarray); buffers
+    are stacked without per-element conversion, which is where most of the
+    time goes for list inputs.
+  - Vectors whose dimension differs from the query score 0.0 (matches the
+    previous per-pair behaviour).
+  - `hash_embedding` is a sparse bag-of-tokens hash: only touched buckets are
+    counted and normalized, then scattered into the dense output.
+
+Integration
+  - `app.utils.conversation_search` (history relevance, topic shift).
+  - `app.agents.knowledge.retriever` (offline hash-embedding fallback).
+  - Micro-benchmark: `python -m scripts.bench_vectors`.
+
+Usage
+  >>> from app.utils.vectors import cosine_similarities, top_k
+  >>> cosine_similarities([1.0, 0.0], [[1.0, 0.0], [0.0, 2.0]])
+  [1.0, 0.0]
+  >>> top_k([1.0, 0.0], [[0.0, 1.0], [0.0, 3.0], [2.0, 0.0]], k=2)
+  [(2, 1.0), (0, 0.0)]
+"""
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import math
+import operator
+from collections.abc import Iterable, Sequence
+
+try:  # Optional: vectorized path
+    import numpy as _np
+except Exception:  # pragma: no cover - optional
+    _np = None
+
+__all__ = [
+    "numpy_available",
+    "cosine_similarity",
+    "cosine_similarities",
+    "top_k",
+    "hash_embedding",
+]
+
+# Below this many vectors the NumPy conversion overhead outweighs the gain
+_NUMPY_MIN_ROWS = 2
+
+
+def numpy_available() -> bool:
+    """Return True when the NumPy fast path is active."""
+    return _np is not None
+
+
+def _norm(vec: Sequence[float]) -> float:
+    return math.sqrt(sum(map(operator.mul, vec, vec)))
+
+
+def cosine_similarity(vec1: Sequence[float], vec2: Sequence[float]) -> float:
+    """Cosine similarity of two vectors (0.0 for empty/mismatched/zero vectors)."""
+    if not vec1 or not vec2 or len(vec1) != len(vec2):
+        return 0.0
+    n1, n2 = _norm(vec1), _norm(vec2)
+    if n1 == 0 or n2 == 0:
+        return 0.0
+    return sum(map(operator.mul, vec1, vec2)) / (n1 * n2)
+
+
+def cosine_similarities(query: Sequence[float], vectors: Sequence[Sequence[float]]) -> list[float]:
+    """Cosine similarity of `query` against every vector, in order.
+
+    Parameters
+    ----------
+    query:
+        Query vector.
+    vectors:
+        Candidate vectors (any sequence of float sequences).
+
+    Returns
+    -------
+    list[float]
+        One score per candidate; 0.0 for mismatched or zero vectors.
+    """
+    if not vectors:
+        return []
+    dim = len(query)
+    if dim == 0:
+        return [0.0] * len(vectors)
+    if _np is not None and len(vectors) >= _NUMPY_MIN_ROWS:
+        same = [i for i, v in enumerate(vectors) if len(v) == dim]
+        scores = [0.0] * len(vectors)
+        if not same:
+            return scores
+        # Per-row asarray is zero-copy for float32 buffers (array('f'), ndarray)
+        mat = _np.stack([_np.asarray(vectors[i], dtype=_np.float32) for i in same])
+        q = _np.asarray(query, dtype=_np.float32)
+        norms = _np.linalg.norm(mat, axis=1) * float(_np.linalg.norm(q))
+        dots = mat @ q
+        sims = _np.divide(dots, norms, out=_np.zeros_like(dots), where=norms > 0)
+        for i, s in zip(same, sims.tolist()):
+            scores[i] = float(s)
+        return scores
+
+    q_norm = _norm(query)
+    if q_norm == 0:
+        return [0.0] * len(vectors)
+    out: list[float] = []
+    for v in vectors:
+        if len(v) != dim:
+            out.append(0.0)
+            continue
+        v_norm = _norm(v)
+        out.append(sum(map(operator.mul, query, v)) / (q_norm * v_norm) if v_norm else 0.0)
+    return out
+
+
+def top_k(
+    query: Sequence[float],
+    vectors: Sequence[Sequence[float]],
+    k: int,
+    *,
+    min_score: float | None = None,
+) -> list[tuple[int, float]]:
+    """Return the `k` best ``(index, score)`` pairs by cosine similarity.
+
+    Ties keep the lower index first; `min_score` drops weaker candidates.
+    """
+    if k <= 0 or not vectors:
+        return []
+    scores = cosine_similarities(query, vectors)
+    candidates = (
+        (i, s) for i, s in enumerate(scores) if min_score is None or s >= min_score
+    )
+    return heapq.nsmallest(k, candidates, key=lambda t: (-t[1], t[0]))
+
+
+def hash_embedding(tokens: Iterable[str], *, dim: int = 1536, digest: str = "sha256") -> list[float]:
+    """L2-normalized bag-of-tokens hash embedding.
+
+    Each token increments bucket ``int(hash(token)[:4], big-endian) % dim``.
+
+    Parameters
+    ----------
+    tokens:
+        Tokens to hash (callers choose the tokenizer).
+    dim:
+        Output dimension.
+    digest:
+        `hashlib` algorithm name (e.g., "sha256", "md5").
+    """
+    counts: dict[int, float] = {}
+    for tok in tokens:
+        h = hashlib.new(digest, tok.encode("utf-8")).digest()
+        idx = int.from_bytes(h[:4], "big") % dim
+        counts[idx] = counts.get(idx, 0.0) + 1.0
+    vec = [0.0] * dim
+    if not counts:
+        return vec
+    norm = math.sqrt(sum(c * c for c in counts.values()))
+    for idx, c in counts.items():
+        vec[idx] = c / norm
+    return vec
@@ -34,9 +34,12 @@ import httpx
 from frontend.client import LangGraphClient
 from frontend.utils import format_answer, format_error, format_metadata
 from frontend.config import (
+    ATTACHMENT_BUDGET_SECONDS,
     LANGGRAPH_SERVER_URL,
+    POLLING_GRACE_SECONDS,
     POLLING_INTERVAL_SECONDS,
     POLLING_TIMEOUT_SECONDS,
+    REQUEST_BUDGET_SECONDS,
     UI_NAME,
 )
 
@@ -205,6 +208,11 @@ async def on_message(message: cl.Message) -> None:
         ).send()
         return
     
+    # One latency budget for the whole turn; the server clamps its own
+    # timeouts to it, so there is no point polling much longer
+    input_data["budget_s"] = ATTACHMENT_BUDGET_SECONDS if input_data.get("attachment") else REQUEST_BUDGET_SECONDS
+    polling_timeout = int(min(POLLING_TIMEOUT, input_data["budget_s"] + POLLING_GRACE_SECONDS))
+
     # Show processing indicator
     msg = cl.Message(content="Processando...", author="Assistant")
     await msg.send()
@@ -219,7 +227,7 @@ async def on_message(message: cl.Message) -> None:
             thread_id,
             run_id,
             polling_interval=POLLING_INTERVAL,
-            polling_timeout=POLLING_TIMEOUT,
+            polling_timeout=polling_timeout,
             progress_callback=None,  # No progress updates
         )
         
@@ -26,6 +26,12 @@ LANGGRAPH_SERVER_URL = os.getenv(
 POLLING_INTERVAL_SECONDS = float(os.getenv("POLLING_INTERVAL_SECONDS", "1.0"))
 POLLING_TIMEOUT_SECONDS = int(os.getenv("POLLING_TIMEOUT_SECONDS", "300"))
 
+# Request latency budget sent with each run (`budget_s`); the server derives
+# LLM/SQL/OCR timeouts from it, so polling only needs the budget plus a grace
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "90"))
+ATTACHMENT_BUDGET_SECONDS = float(os.getenv("ATTACHMENT_BUDGET_SECONDS", "240"))
+POLLING_GRACE_SECONDS = float(os.getenv("POLLING_GRACE_SECONDS", "15"))
+
 # UI Configuration
 UI_NAME = os.getenv("UI_NAME", "Assistente Apllos")
 UI_DESCRIPTION = os.getenv(
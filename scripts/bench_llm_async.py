@@ -0,0 +1,211 @@
+"""
+Load benchmark for the LLM client: native async vs. thread-offloaded calls.
+
+Overview
+Starts a local stub of the OpenAI chat completions endpoint (fixed latency,
+keep-alive HTTP/1.1) and drives N concurrent simulated graph runs against it.
+Each run issues the LLM calls of a typical analytics turn sequentially
+(route -> plan -> normalize). Reports throughput, latency percentiles and the
+peak number of live threads for both execution modes:
+
+- ``thread``: ``asyncio.to_thread(client.chat_completion, ...)`` (the previous
+  behaviour of ``chat_completion_async``);
+- ``async``: ``await client.chat_completion_async(...)`` on the shared
+  ``AsyncOpenAI`` keep-alive pool with per-model concurrency caps.
+
+Design
+- No external services: the stub server runs on its own event loop in a
+  background thread so its work does not skew the client-side loop.
+- Thread count is sampled every 10 ms while the load runs.
+
+Integration
+- Uses `app.infra.llm_client.LLMClient` directly with ``api_base`` pointing at
+  the stub server; no API key or network access is needed.
+
+Usage
+$ python -m scripts.bench_llm_async --runs 200 --latency-ms 150
+$ python -m scripts.bench_llm_async --runs 500 --mode async --model-concurrency 128
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from typing import Any
+
+from app.infra.llm_client import LLMClient
+from app.infra.rate_limit import ModelRateLimiter
+
+_CALLS_PER_RUN = 3
+_MODEL = "gpt-4o-mini"
+
+
+# ---------------------------------------------------------------------------
+# Stub server
+# ---------------------------------------------------------------------------
+def _completion_body(model: str) -> bytes:
+    payload = {
+        "id": "chatcmpl-stub",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": '{"ok": true}'},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 120, "completion_tokens": 8, "total_tokens": 128},
+    }
+    return json.dumps(payload).encode("utf-8")
+
+
+class StubServer:
+    """Minimal keep-alive HTTP/1.1 server answering chat completions."""
+
+    def __init__(self, latency_ms: float) -> None:
+        self.latency_s = max(0.0, latency_ms) / 1000.0
+        self.port = 0
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="llm-stub", daemon=True)
+
+    def start(self) -> str:
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5.0)
+
+    def _run(self) -> None:
+        loop = asyncio.new_event_loop()
+        self._loop = loop
+        server = loop.run_until_complete(asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024))
+        self.port = server.sockets[0].getsockname()[1]
+        self._ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            loop.close()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.decode("latin-1").split("\r\n"):
+                    if line.lower().startswith("content-length:"):
+                        length = int(line.split(":", 1)[1].strip())
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    model = str(json.loads(body or b"{}").get("model") or _MODEL)
+                except Exception:
+                    model = _MODEL
+                await asyncio.sleep(self.latency_s)
+                out = _completion_body(model)
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(out)}\r\n\r\n".encode("ascii")
+                    + out
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+# ---------------------------------------------------------------------------
+# Load driver
+# ---------------------------------------------------------------------------
+async def _graph_run(client: LLMClient, mode: str, idx: int) -> float:
+    t0 = time.perf_counter()
+    for step in range(_CALLS_PER_RUN):
+        messages = [
+            {"role": "system", "content": "You are a stub."},
+            {"role": "user", "content": f"run {idx} step {step}"},
+        ]
+        if mode == "async":
+            resp = await client.chat_completion_async(messages, model=_MODEL, max_retries=0)
+        else:
+            resp = await asyncio.to_thread(client.chat_completion, messages, _MODEL, max_retries=0)
+        if resp is None:
+            raise RuntimeError("stub call failed")
+    return (time.perf_counter() - t0) * 1000.0
+
+
+async def _drive(client: LLMClient, mode: str, runs: int) -> dict[str, Any]:
+    peak = threading.active_count()
+    done = asyncio.Event()
+
+    async def _sample() -> None:
+        nonlocal peak
+        while not done.is_set():
+            peak = max(peak, threading.active_count())
+            await asyncio.sleep(0.01)
+
+    sampler = asyncio.create_task(_sample())
+    t0 = time.perf_counter()
+    latencies = await asyncio.gather(*(_graph_run(client, mode, i) for i in range(runs)))
+    elapsed = time.perf_counter() - t0
+    done.set()
+    await sampler
+    if mode == "async":
+        await client.aclose()
+
+    lat = sorted(latencies)
+    return {
+        "mode": mode,
+        "runs": runs,
+        "calls": runs * _CALLS_PER_RUN,
+        "elapsed_s": round(elapsed, 3),
+        "runs_per_s": round(runs / elapsed, 1),
+        "calls_per_s": round(runs * _CALLS_PER_RUN / elapsed, 1),
+        "p50_ms": round(statistics.median(lat), 1),
+        "p95_ms": round(lat[min(len(lat) - 1, int(0.95 * len(lat)))], 1),
+        "peak_threads": peak,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="LLM client load benchmark against a local stub server")
+    parser.add_argument("--runs", type=int, default=200, help="Concurrent simulated graph runs")
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="Stub server latency per call")
+    parser.add_argument("--mode", choices=["both", "thread", "async"], default="both")
+    parser.add_argument("--model-concurrency", type=int, default=256, help="Per-model in-flight cap")
+    parser.add_argument("--max-connections", type=int, default=256, help="Shared HTTP pool size")
+    args = parser.parse_args(argv)
+
+    server = StubServer(args.latency_ms)
+    base_url = server.start()
+    try:
+        modes = ["thread", "async"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            client = LLMClient(
+                api_key="stub-key",
+                model=_MODEL,
+                timeout=30.0,
+                max_retries=0,
+                api_base=base_url,
+                max_connections=args.max_connections,
+                max_keepalive_connections=args.max_connections,
+                model_concurrency={_MODEL: args.model_concurrency},
+                rate_limiter=ModelRateLimiter(),  # unlimited: measure transport only
+            )
+            print(json.dumps(asyncio.run(_drive(client, mode, args.runs))))
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""
+Micro-benchmark for the normalizer's insight detectors and dataset profile.
+
+Overview
+Times `AnalyticsNormalizer._get_key_insights` plus
+`_detect_patterns_and_insights` on synthetic state/category result sets of
+100, 1k and 10k rows, comparing one shared `profile_rows` pass against a
+profile rebuilt by every detector (the previous re-scan-per-detector shape),
+on the NumPy path and on the pure-Python fallback.
+
+Design
+- Deterministic rows (seeded) shaped like analytics GROUP BY results: a state,
+  a category, two counts that match 1:1 and a skewed revenue column with a
+  few outliers; no network, database or LLM.
+- Each measurement is the median of `--repeat` runs.
+
+Integration
+- Exercises `app.agents.analytics.profile` and the normalizer detectors only;
+  safe to run anywhere.
+
+Usage
+$ python -m scripts.bench_normalize_profile
+$ python -m scripts.bench_normalize_profile --sizes 100 1000 10000 --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.agents.analytics import profile as profile_mod
+from app.agents.analytics.normalize import AnalyticsNormalizer
+from app.agents.analytics.profile import profile_rows
+
+_STATES = ("SP", "RJ", "MG", "RS", "PR", "SC", "BA", "GO", "DF", "ES", "PE", "CE")
+_CATEGORIES = ("beleza_saude", "moveis_decoracao", "esporte_lazer", "informatica", "brinquedos", "cama_mesa_banho")
+_DETECTORS = (
+    "_detect_one_to_one_ratio",
+    "_detect_dominance_pattern",
+    "_detect_geographic_concentration",
+    "_detect_temporal_patterns",
+    "_detect_category_concentration",
+    "_detect_anomalies",
+    "_detect_statistical_patterns",
+)
+
+
+def _rows(n: int, rng: random.Random) -> list[dict[str, Any]]:
+    rows = []
+    for i in range(n):
+        orders = rng.randint(1, 500)
+        revenue = rng.lognormvariate(6, 0.6) * (25 if rng.random() < 0.02 else 1)
+        rows.append(
+            {
+                "customer_state": _STATES[i % len(_STATES)],
+                "product_category": _CATEGORIES[i % len(_CATEGORIES)],
+                "revenue": round(revenue, 2),
+                "orders": orders,
+                "customers": orders,
+            }
+        )
+    return rows
+
+
+def _median_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def _per_detector(norm: AnalyticsNormalizer, rows: list[dict[str, Any]]) -> None:
+    norm._get_key_insights(rows)
+    for name in _DETECTORS:
+        getattr(norm, name)(rows)
+
+
+def _shared(norm: AnalyticsNormalizer, rows: list[dict[str, Any]]) -> None:
+    profile = profile_rows(rows)
+    norm._get_key_insights(rows, profile)
+    norm._detect_patterns_and_insights(rows, "", profile)
+
+
+def _bench(norm: AnalyticsNormalizer, n: int, repeat: int, rng: random.Random) -> dict[str, object]:
+    rows = _rows(n, rng)
+    out: dict[str, object] = {"rows": n}
+    numpy_mod = profile_mod._np
+    for label, np_value in (("numpy", numpy_mod), ("python", None)):
+        if label == "numpy" and numpy_mod is None:
+            continue
+        profile_mod._np = np_value
+        try:
+            out[f"profile_{label}_ms"] = round(_median_ms(lambda: profile_rows(rows), repeat), 3)
+            out[f"per_detector_{label}_ms"] = round(_median_ms(lambda: _per_detector(norm, rows), repeat), 3)
+            out[f"shared_{label}_ms"] = round(_median_ms(lambda: _shared(norm, rows), repeat), 3)
+        finally:
+            profile_mod._np = numpy_mod
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Normalizer dataset profile micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Row counts")
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per measurement")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    norm = AnalyticsNormalizer()
+    print(json.dumps({"numpy": profile_mod._np is not None}))
+    for n in args.sizes:
+        print(json.dumps(_bench(norm, n, args.repeat, rng)))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
@@ -0,0 +1,155 @@
+"""
+Prompt-size and latency benchmark for the analytics normalizer row budget.
+
+Overview
+Builds the normalizer LLM input for analytics results twice, once with every
+row (`prompt_rows_token_budget = 0`) and once with the configured budget,
+and reports the estimated prompt tokens, rows sent and build time of each.
+With `--llm` both prompts are also sent to the configured normalizer model
+and the completion latency is reported.
+
+Design
+- Inputs are saved executor outputs: a JSONL file with one
+  ``{"question": ..., "sql": ..., "rows": [...]}`` object per line (e.g.
+  captured from `/query` responses or `scripts/batch_query.py` runs).
+  Without `--results` a synthetic state x category penetration result
+  (27 states x 70 categories) and a daily series are used.
+- Results that would not show complete data are forced to, since that is
+  the path the budget applies to.
+- Token counts use `app.infra.rate_limit.estimate_tokens` (the limiter's
+  estimate), not a tokenizer.
+
+Integration
+- Uses `AnalyticsNormalizer._build_llm_input`, the same code path as
+  production; `--llm` requires `OPENAI_API_KEY`.
+
+Usage
+$ python -m scripts.bench_normalizer_prompt
+$ python -m scripts.bench_normalizer_prompt --results results.jsonl --budget 4000
+$ python -m scripts.bench_normalizer_prompt --results results.jsonl --llm
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any
+
+from app.agents.analytics.normalize import AnalyticsNormalizer, _PlanView, _ResultView
+from app.infra.rate_limit import estimate_tokens
+
+try:  # Optional config
+    from app.config.settings import get_settings
+except Exception:  # pragma: no cover - optional
+    def get_settings():
+        return None
+
+
+def _synthetic() -> list[dict[str, Any]]:
+    rng = random.Random(7)
+    states = [f"S{i:02d}" for i in range(27)]
+    categories = [f"categoria_{i:02d}" for i in range(70)]
+    penetration = [
+        {
+            "customer_state": s,
+            "product_category_name": c,
+            "customers": rng.randint(1, 5000),
+            "penetration_pct": Decimal(str(round(rng.uniform(0, 30), 2))),
+        }
+        for s in states
+        for c in categories
+    ]
+    start = date(2017, 1, 1)
+    daily = [
+        {"day": start + timedelta(days=i), "orders": rng.randint(50, 900), "revenue": Decimal(f"{rng.uniform(5e3, 9e4):.2f}")}
+        for i in range(730)
+    ]
+    return [
+        {
+            "question": "Qual a penetração de cada categoria por estado?",
+            "sql": "SELECT customer_state, product_category_name, customers, penetration_pct FROM ...",
+            "rows": penetration,
+        },
+        {"question": "Mostre todos os pedidos por dia", "sql": "SELECT day, orders, revenue FROM ...", "rows": daily},
+    ]
+
+
+def _load(path: Path | None) -> list[dict[str, Any]]:
+    if path is None:
+        return _synthetic()
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _messages(norm: AnalyticsNormalizer, input_data: dict[str, Any]) -> list[dict[str, str]]:
+    return [
+        {"role": "system", "content": norm._system_prompt},
+        {"role": "user", "content": json.dumps(input_data, ensure_ascii=False)},
+    ]
+
+
+def _llm_ms(messages: list[dict[str, str]], repeat: int) -> float | None:
+    from app.infra.llm_client import get_llm_client
+
+    client = get_llm_client()
+    if not client.is_available():
+        return None
+    cfg = get_settings()
+    model = cfg.models.analytics_normalizer.name if cfg is not None else "gpt-4o-mini"
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        client.chat_completion(messages=messages, model=model, response_format={"type": "json_object"}, max_retries=0)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def _measure(norm: AnalyticsNormalizer, item: dict[str, Any], budget: int, tail: int, args: argparse.Namespace) -> dict[str, Any]:
+    rows = item.get("rows") or []
+    plan = _PlanView(sql=str(item.get("sql") or ""), limit_applied=False)
+    result = _ResultView(rows=rows, row_count=len(rows), exec_ms=0.0, limit_applied=False)
+    question = str(item.get("question") or "Consulta de dados")
+    norm._should_show_complete_data = lambda *_a, **_k: True  # the budgeted path
+    out: dict[str, Any] = {"question": question[:60], "rows": len(rows)}
+    for label, row_budget in (("full", 0), ("budgeted", budget)):
+        t0 = time.perf_counter()
+        input_data, packed = norm._build_llm_input(question, plan, result, token_budget=row_budget, tail_rows=tail)
+        messages = _messages(norm, input_data)
+        build_ms = (time.perf_counter() - t0) * 1000.0
+        out[f"{label}_prompt_tokens"] = estimate_tokens(messages)
+        out[f"{label}_rows_sent"] = len(packed.rows)
+        out[f"{label}_build_ms"] = round(build_ms, 2)
+        if args.llm:
+            llm_ms = _llm_ms(messages, args.repeat)
+            out[f"{label}_llm_ms"] = round(llm_ms, 1) if llm_ms is not None else None
+    full = out["full_prompt_tokens"]
+    out["token_savings_pct"] = round((1 - out["budgeted_prompt_tokens"] / full) * 100, 1) if full else 0.0
+    return out
+
+
+def main(argv: list[str] | None = None) -> int:
+    cfg = get_settings()
+    default_budget = cfg.analytics.normalizer.prompt_rows_token_budget if cfg is not None else 6000
+    default_tail = cfg.analytics.normalizer.prompt_tail_rows if cfg is not None else 5
+    parser = argparse.ArgumentParser(description="Normalizer prompt row-budget benchmark")
+    parser.add_argument("--results", type=Path, default=None, help="JSONL of {question, sql, rows}")
+    parser.add_argument("--budget", type=int, default=default_budget, help="Row token budget")
+    parser.add_argument("--tail", type=int, default=default_tail, help="Tail rows kept when compacting")
+    parser.add_argument("--llm", action="store_true", help="Also time the LLM call for both prompts")
+    parser.add_argument("--repeat", type=int, default=3, help="LLM calls per prompt (median)")
+    args = parser.parse_args(argv)
+
+    norm = AnalyticsNormalizer()
+    for item in _load(args.results):
+        print(json.dumps(_measure(norm, item, args.budget, args.tail, args), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
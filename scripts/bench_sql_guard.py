@@ -0,0 +1,118 @@
+"""
+Per-query validation-time benchmark for the analytics SQL guardrails.
+
+Overview
+Times `app.agents.analytics.sql_guard` on a corpus of analytics SQL: the
+planner check (allowlist policy) and the executor check (function policy)
+of the same statement, once with a cold parse for each check (every pass
+re-scans the text) and once sharing the memoized parse as in production.
+
+Design
+- Corpus: the planner few-shot SQL (`app/prompts/analytics/examples.jsonl`)
+  by default, or a file with one SQL statement per line (`--sql-file`).
+- The allowlist is derived from the corpus itself (every table/column the
+  statements reference), so every statement passes both checks.
+- Each measurement is the median over `--repeat` runs, reported per query
+  in microseconds together with the statement length.
+
+Integration
+- Pure CPU; no database, network or LLM.
+
+Usage
+$ python -m scripts.bench_sql_guard
+$ python -m scripts.bench_sql_guard --sql-file queries.sql --repeat 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from app.agents.analytics.sql_guard import EXECUTOR_POLICY, GuardPolicy, check_sql, parse_sql
+
+_EXAMPLES = Path(__file__).resolve().parent.parent / "app" / "prompts" / "analytics" / "examples.jsonl"
+
+
+def _load(path: Path | None) -> list[str]:
+    if path is not None:
+        return [line.strip() for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+    out = []
+    with _EXAMPLES.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                out.append(json.loads(line)["output"]["sql"])
+    return out
+
+
+def _allowlist(corpus: list[str]) -> dict[str, set[str]]:
+    allow: dict[str, set[str]] = defaultdict(set)
+    for sql in corpus:
+        parsed = parse_sql(sql)
+        aliases = parsed.aliases()
+        for ref in parsed.tables:
+            if ref.name not in parsed.derived:
+                allow[ref.name.rsplit(".", 1)[-1]]
+        for qualifier, col in parsed.columns:
+            target = aliases.get(qualifier, qualifier)
+            if target not in parsed.derived:
+                allow[target.rsplit(".", 1)[-1]].add(col)
+    return allow
+
+
+def _median_us(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(samples)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="SQL guardrail validation benchmark")
+    parser.add_argument("--sql-file", type=Path, default=None, help="One SQL statement per line")
+    parser.add_argument("--repeat", type=int, default=100, help="Runs per measurement (median)")
+    args = parser.parse_args(argv)
+
+    corpus = _load(args.sql_file)
+    planner_policy = GuardPolicy.for_allowlist(_allowlist(corpus))
+
+    def _both(sql: str) -> None:
+        check_sql(sql, planner_policy)
+        check_sql(sql, EXECUTOR_POLICY)
+
+    def _separate(sql: str) -> None:  # each pass re-parses the text
+        parse_sql.cache_clear()
+        check_sql(sql, planner_policy)
+        parse_sql.cache_clear()
+        check_sql(sql, EXECUTOR_POLICY)
+
+    def _shared(sql: str) -> None:  # planner parses, executor reuses
+        parse_sql.cache_clear()
+        _both(sql)
+
+    totals = {"separate_us": [], "shared_us": [], "cached_us": []}
+    for idx, sql in enumerate(corpus):
+        _both(sql)  # fail fast on a statement the policies reject
+        row = {
+            "query": idx,
+            "chars": len(sql),
+            "separate_us": round(_median_us(lambda sql=sql: _separate(sql), args.repeat), 1),
+            "shared_us": round(_median_us(lambda sql=sql: _shared(sql), args.repeat), 1),
+            "cached_us": round(_median_us(lambda sql=sql: _both(sql), args.repeat), 1),
+        }
+        for key in totals:
+            totals[key].append(row[key])
+        sys.stdout.write(json.dumps(row) + "\n")
+    summary = {k: round(statistics.median(v), 1) for k, v in totals.items()}
+    sys.stdout.write(json.dumps({"queries": len(corpus), "median": summary}) + "\n")
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
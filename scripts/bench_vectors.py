@@ -0,0 +1,116 @@
+"""
+Micro-benchmark for the vector kernels used by conversation search.
+
+Overview
+Measures the per-turn cost of scoring a query against N history messages
+(1536-dim embeddings), comparing the previous per-pair pure-Python cosine
+loop with `app.utils.vectors.cosine_similarities` (NumPy mat-vec when
+available, pure-Python fallback otherwise) on both plain lists and the
+float32 vectors stored on history messages. Also times hash embeddings for
+the offline fallback path.
+
+Design
+- Deterministic random vectors (seeded); no network, database or LLM.
+- Each measurement is the median of `--repeat` runs.
+
+Integration
+- Exercises `app.utils.vectors` and the history embedding codec only; safe
+  to run anywhere.
+
+Usage
+$ python -m scripts.bench_vectors
+$ python -m scripts.bench_vectors --sizes 20 200 2000 --repeat 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import statistics
+import time
+from collections.abc import Callable
+
+from app.utils import vectors as vec_mod
+from app.utils.conversation_search import decode_embedding, encode_embedding
+from app.utils.vectors import cosine_similarities, hash_embedding, top_k
+
+_DIM = 1536
+
+
+def _legacy_cosine(vec1: list[float], vec2: list[float]) -> float:
+    """Previous `ConversationHistorySearcher._cosine_similarity`."""
+    if not vec1 or not vec2 or len(vec1) != len(vec2):
+        return 0.0
+    dot_product = sum(a * b for a, b in zip(vec1, vec2))
+    magnitude1 = math.sqrt(sum(a * a for a in vec1))
+    magnitude2 = math.sqrt(sum(a * a for a in vec2))
+    if magnitude1 == 0 or magnitude2 == 0:
+        return 0.0
+    return dot_product / (magnitude1 * magnitude2)
+
+
+def _legacy_hash(text: str) -> list[float]:
+    """Previous dense-list hash embedding (md5 variant)."""
+    import hashlib
+
+    vec = [0.0] * _DIM
+    for word in text.lower().split():
+        h = hashlib.md5(word.encode()).hexdigest()
+        vec[int(h[:8], 16) % _DIM] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _median_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    return statistics.median(samples)
+
+
+def _bench(n: int, repeat: int, rng: random.Random) -> dict[str, object]:
+    query = [rng.uniform(-1, 1) for _ in range(_DIM)]
+    history = [[rng.uniform(-1, 1) for _ in range(_DIM)] for _ in range(n)]
+    texts = [f"mensagem {i} sobre vendas por estado e categoria de produto" for i in range(n)]
+
+    stored = [decode_embedding(encode_embedding(h)) for h in history]
+
+    legacy_ms = _median_ms(lambda: [_legacy_cosine(query, h) for h in history], repeat)
+    kernel_list_ms = _median_ms(lambda: cosine_similarities(query, history), repeat)
+    kernel_ms = _median_ms(lambda: cosine_similarities(query, stored), repeat)
+    topk_ms = _median_ms(lambda: top_k(query, stored, 5), repeat)
+    hash_legacy_ms = _median_ms(lambda: [_legacy_hash(t) for t in texts], repeat)
+    hash_ms = _median_ms(
+        lambda: [hash_embedding(t.lower().split(), dim=_DIM, digest="md5") for t in texts], repeat
+    )
+    return {
+        "messages": n,
+        "score_legacy_ms": round(legacy_ms, 3),
+        "score_kernel_lists_ms": round(kernel_list_ms, 3),
+        "score_kernel_ms": round(kernel_ms, 3),
+        "score_speedup": round(legacy_ms / kernel_ms, 1) if kernel_ms else None,
+        "top5_ms": round(topk_ms, 3),
+        "hash_legacy_ms": round(hash_legacy_ms, 3),
+        "hash_kernel_ms": round(hash_ms, 3),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Vector kernel micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20, 200], help="History sizes")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    print(json.dumps({"numpy": vec_mod.numpy_available(), "dim": _DIM}))
+    for n in args.sizes:
+        print(json.dumps(_bench(n, args.repeat, rng)))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
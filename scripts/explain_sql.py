@@ -10,7 +10,8 @@ returns the plan in JSON or text. The script is conservative: it only allows
 Design
 - Optional dependency on our infra (`app.infra.db.get_engine`) with fallback to
   `DATABASE_URL` using SQLAlchemy.
-- Minimal SQL validation (read‑only, no multi‑statement, optional basic allowlist).
+- SQL validation shared with the analytics agent (`sql_guard`: read‑only,
+  single statement, no system catalogs).
 - Robust CLI with JSON/text output and optional file write.
 
 Integration
@@ -31,12 +32,13 @@ from __future__ import annotations
 import argparse
 import json
 import os
-import re
 from collections.abc import Mapping
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Final
 
+from app.agents.analytics.sql_guard import GuardPolicy, SQLGuardError, check_sql
+
 # ---------------------------------------------------------------------------
 # Optional infra: logging & tracing with safe fallbacks
 # ---------------------------------------------------------------------------
@@ -89,6 +91,8 @@ except Exception:  # pragma: no cover - optional
 # Constants & dataclasses
 # ---------------------------------------------------------------------------
 _TRUE_SET: Final[set[str]] = {"1", "true", "yes", "on"}
+# Any function may be explained; statement, catalog and keyword checks still apply
+_EXPLAIN_POLICY = GuardPolicy(functions=None, allow_trailing_semicolon=True)
 
 
 @dataclass(slots=True)
@@ -125,28 +129,18 @@ def _read_file(path: Path) -> str:
     return path.read_text(encoding="utf-8")
 
 
-_SELECT_RE = re.compile(r"^\s*(select|with)\b", re.IGNORECASE | re.DOTALL)
-_SEMI_RE = re.compile(r";+")
-
-
 def is_safe_select(sql: str) -> tuple[bool, str | None]:
-    """Heuristic checks to ensure read-only, single-statement select/cte."""
-    s = (sql or "").strip()
-    if not s:
+    """Check that `sql` is a read-only, single-statement SELECT/WITH.
+
+    Uses the analytics guardrail parse (`app.agents.analytics.sql_guard`);
+    one trailing semicolon is accepted.
+    """
+    if not (sql or "").strip():
         return False, "empty SQL"
-    if not _SELECT_RE.match(s):
-        return False, "only SELECT/WITH statements are allowed"
-    # Refuse multiple statements; allow a single trailing semicolon only
-    semis = _SEMI_RE.findall(s)
-    if len(semis) > 1 or (len(semis) == 1 and not s.endswith(";")):
-        return False, "multiple statements are not allowed"
-    # Very naive DML keywords defense-in-depth
-    lowered = s.lower()
-    if any(
-        kw in lowered
-        for kw in (" insert ", " update ", " delete ", " alter ", " drop ", " create ")
-    ):
-        return False, "detected non-read-only keywords"
+    try:
+        check_sql(sql, _EXPLAIN_POLICY)
+    except SQLGuardError as exc:
+        return False, str(exc)
     return True, None
 
 
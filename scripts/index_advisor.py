@@ -0,0 +1,446 @@
+"""
+Workload-driven index advisor for the analytics schema.
+
+Overview
+Replays a workload of analytics SQL, reads each statement's EXPLAIN plan and
+proposes the secondary indexes the plans are missing: a column filtered by a
+sequential scan on a large table, or a join key without an index. With
+`--apply` it creates them (CONCURRENTLY) and replays the workload again, so
+the report shows p50/p95 latency before and after.
+
+Design
+- Workload sources (first given wins): JSON log lines with a ``sql`` field
+  (`--log`; the planner logs every plan it returns), one statement per line
+  (`--sql-file`), questions planned by `AnalyticsPlanner` (`--questions`, e.g.
+  `tests/batch/analytics_questions.txt` or a `tests/batch/*.yaml`), else the
+  planner few-shot SQL. Statements are de-duplicated and checked with the
+  shared `sql_guard` rules; anything else is skipped.
+- Catalog: columns with types, `pg_stats` (n_distinct, correlation), row
+  estimates and the leading column of every existing index.
+- Rules, per plan node:
+  * ``Seq Scan`` with a ``Filter`` on a table of at least `--min-rows` rows:
+    each filtered column without an index. Timestamps/dates whose physical
+    order follows the value (|correlation| >= `--brin-correlation`) get BRIN,
+    other columns btree; columns with fewer than `--min-distinct` values
+    are skipped (an index would not be selective).
+  * ``Hash Cond`` / ``Merge Cond`` / ``Join Filter``: join keys on large
+    tables without an index get btree.
+- Candidates are ranked by the summed plan cost of the statements they
+  appear in. Latency is the median of `--repeat` runs per statement
+  (read-only transaction, `--timeout-ms`); p50/p95 are over statements.
+
+Integration
+- Needs PostgreSQL (`app.infra.db.get_engine` or `DATABASE_URL`).
+- Complements `scripts/explain_sql.py` (one plan) and the rollups built by
+  `scripts/ingest_analytics.py` (plans rewritten onto them scan small views,
+  below `--min-rows`).
+
+Usage
+$ python -m scripts.index_advisor                                   # propose only
+$ python -m scripts.index_advisor --log logs/app.jsonl --apply      # create + before/after
+$ python -m scripts.index_advisor --questions tests/batch/analytics_questions.txt --repeat 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import time
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from app.agents.analytics.rollups import ROLLUPS
+from app.agents.analytics.sql_guard import GuardPolicy, SQLGuardError, check_sql
+
+try:
+    from app.infra.db import get_engine as _get_engine
+except Exception:  # pragma: no cover - optional
+    _get_engine = None  # type: ignore[assignment]
+
+_EXAMPLES = Path(__file__).resolve().parent.parent / "app" / "prompts" / "analytics" / "examples.jsonl"
+# Any function may be replayed; statement, catalog and keyword checks still apply
+_REPLAY_POLICY = GuardPolicy(functions=None, allow_trailing_semicolon=True)
+_TIME_TYPES = ("timestamp", "date")
+_COND_KEYS = ("Hash Cond", "Merge Cond", "Join Filter")
+
+
+@dataclass(frozen=True, slots=True)
+class ColumnStats:
+    data_type: str
+    n_distinct: float | None = None  # pg_stats convention: < 0 is a fraction of rows
+    correlation: float | None = None
+
+
+@dataclass(slots=True)
+class TableStats:
+    rows: float
+    columns: dict[str, ColumnStats] = field(default_factory=dict)
+    indexed: set[str] = field(default_factory=set)  # leading index columns
+
+
+@dataclass(slots=True)
+class IndexCandidate:
+    table: str
+    column: str
+    method: str  # "btree" | "brin"
+    reason: str  # "filter" | "join"
+    statements: set[int] = field(default_factory=set)
+    plan_cost: float = 0.0
+
+    @property
+    def name(self) -> str:
+        suffix = "_brin" if self.method == "brin" else ""
+        return f"idx_{self.table}_{self.column}{suffix}"
+
+    def ddl(self, schema: str) -> str:
+        using = " USING brin" if self.method == "brin" else ""
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {schema}.{self.table}{using} ({self.column})"
+
+
+# ---------------------------------------------------------------------------
+# Plan analysis (pure)
+# ---------------------------------------------------------------------------
+
+
+def _iter_nodes(node: Mapping[str, Any]) -> Iterator[Mapping[str, Any]]:
+    yield node
+    for child in node.get("Plans") or ():
+        yield from _iter_nodes(child)
+
+
+def _words(expr: str) -> set[str]:
+    return set(re.findall(r"\b[a-z_][a-z0-9_]*\b", re.sub(r"'(?:[^']|'')*'", "", expr.lower())))
+
+
+def analyze_plan(
+    plan: Mapping[str, Any],
+    catalog: Mapping[str, TableStats],
+    *,
+    min_rows: float = 10_000,
+    min_distinct: float = 10,
+    brin_correlation: float = 0.9,
+) -> list[tuple[str, str, str, str]]:
+    """Return ``(table, column, method, reason)`` for indexes `plan` is missing.
+
+    >>> cat = {"orders": TableStats(99_441, {"order_purchase_timestamp": ColumnStats("timestamp without time zone",
+    ...        -0.99, 0.98), "order_status": ColumnStats("text", 8, 0.7)})}
+    >>> analyze_plan({"Node Type": "Seq Scan", "Relation Name": "orders", "Alias": "o",
+    ...               "Filter": "((order_purchase_timestamp >= '2018-01-01'::timestamp) AND (order_status = 'delivered'))"}, cat)
+    [('orders', 'order_purchase_timestamp', 'brin', 'filter')]
+    """
+    aliases: dict[str, str] = {}
+    for node in _iter_nodes(plan):
+        rel = node.get("Relation Name")
+        if rel:
+            aliases[str(node.get("Alias") or rel)] = str(rel)
+            aliases.setdefault(str(rel), str(rel))
+
+    out: list[tuple[str, str, str, str]] = []
+
+    def _add(table: str, column: str, reason: str) -> None:
+        stats = catalog.get(table)
+        if stats is None or stats.rows < min_rows or column in stats.indexed:
+            return
+        col = stats.columns.get(column)
+        if col is None:
+            return
+        if col.data_type.startswith(_TIME_TYPES) and abs(col.correlation or 0.0) >= brin_correlation:
+            method = "brin"
+        elif reason == "filter" and col.n_distinct is not None and 0 <= col.n_distinct < min_distinct:
+            return
+        else:
+            method = "btree"
+        item = (table, column, method, reason)
+        if item not in out:
+            out.append(item)
+
+    for node in _iter_nodes(plan):
+        rel = node.get("Relation Name")
+        if node.get("Node Type") == "Seq Scan" and rel and node.get("Filter"):
+            stats = catalog.get(str(rel))
+            for word in sorted(_words(str(node["Filter"]))):
+                if stats is not None and word in stats.columns:
+                    _add(str(rel), word, "filter")
+        for key in _COND_KEYS:
+            for qualifier, column in re.findall(r"\b([a-z_]\w*)\.([a-z_]\w*)\b", str(node.get(key) or "")):
+                table = aliases.get(qualifier)
+                if table is not None:
+                    _add(table, column, "join")
+    return out
+
+
+def advise(
+    plans: Iterable[tuple[int, Mapping[str, Any]]], catalog: Mapping[str, TableStats], **rules: Any
+) -> list[IndexCandidate]:
+    """Aggregate `analyze_plan` over the workload, costliest first."""
+    found: dict[tuple[str, str], IndexCandidate] = {}
+    for idx, plan in plans:
+        cost = float(plan.get("Total Cost") or 0.0)
+        for table, column, method, reason in analyze_plan(plan, catalog, **rules):
+            cand = found.setdefault((table, column), IndexCandidate(table, column, method, reason))
+            if idx not in cand.statements:
+                cand.statements.add(idx)
+                cand.plan_cost += cost
+    return sorted(found.values(), key=lambda c: (-c.plan_cost, c.name))
+
+
+def percentiles(samples: list[float]) -> dict[str, float] | None:
+    """p50/p95 in milliseconds (None for an empty sample)."""
+    if not samples:
+        return None
+    if len(samples) == 1:
+        return {"p50_ms": round(samples[0], 1), "p95_ms": round(samples[0], 1)}
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50_ms": round(q[49], 1), "p95_ms": round(q[94], 1)}
+
+
+# ---------------------------------------------------------------------------
+# Workload
+# ---------------------------------------------------------------------------
+
+
+def _from_log(path: Path) -> list[str]:
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            sql = json.loads(line).get("sql")
+        except (ValueError, AttributeError):
+            continue
+        if isinstance(sql, str) and sql.strip():
+            out.append(sql)
+    return out
+
+
+def _from_questions(path: Path, allowlist: Mapping[str, Iterable[str]]) -> list[str]:
+    if path.suffix in (".yaml", ".yml"):
+        import yaml
+
+        questions = [str(q.get("query", "")) for q in (yaml.safe_load(path.read_text(encoding="utf-8")) or {}).get("queries", [])]
+    else:
+        questions = [ln.strip() for ln in path.read_text(encoding="utf-8").splitlines()]
+    from app.agents.analytics.planner import AnalyticsPlanner
+
+    planner = AnalyticsPlanner()
+    out = []
+    for question in questions:
+        if question and not question.startswith("#"):
+            try:
+                out.append(planner.plan(question, allowlist).sql)
+            except Exception:
+                continue
+    return out
+
+
+def _from_examples() -> list[str]:
+    with _EXAMPLES.open("r", encoding="utf-8") as f:
+        return [json.loads(line)["output"]["sql"] for line in f if line.strip()]
+
+
+def load_workload(statements: Iterable[str]) -> tuple[list[str], int]:
+    """De-duplicate and keep statements the replay guard accepts; returns (kept, skipped)."""
+    kept: list[str] = []
+    seen: set[str] = set()
+    skipped = 0
+    for sql in statements:
+        key = " ".join(sql.split()).rstrip(";")
+        if key in seen:
+            continue
+        seen.add(key)
+        try:
+            check_sql(sql, _REPLAY_POLICY)
+        except SQLGuardError:
+            skipped += 1
+            continue
+        kept.append(sql.strip().rstrip(";"))
+    return kept, skipped
+
+
+# ---------------------------------------------------------------------------
+# Database
+# ---------------------------------------------------------------------------
+
+
+def _resolve_engine() -> Any:
+    if _get_engine is not None:
+        return _get_engine()
+    from sqlalchemy import create_engine
+
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        raise RuntimeError("DATABASE_URL is not set and infra.get_engine is unavailable")
+    return create_engine(url, pool_pre_ping=True, future=True)
+
+
+def load_catalog(engine: Any, schema: str) -> dict[str, TableStats]:
+    import sqlalchemy as sa
+
+    params = {"s": schema}
+    with engine.connect() as conn:
+        catalog = {
+            str(name): TableStats(rows=float(rows))
+            for name, rows in conn.execute(
+                sa.text(
+                    "SELECT c.relname, GREATEST(c.reltuples, 0) FROM pg_class c"
+                    " JOIN pg_namespace n ON n.oid = c.relnamespace"
+                    " WHERE n.nspname = :s AND c.relkind IN ('r', 'm')"
+                ),
+                params,
+            )
+        }
+        stats = {
+            (str(t), str(c)): (n, corr)
+            for t, c, n, corr in conn.execute(
+                sa.text("SELECT tablename, attname, n_distinct, correlation FROM pg_stats WHERE schemaname = :s"),
+                params,
+            )
+        }
+        for table, column, dtype in conn.execute(
+            sa.text("SELECT table_name, column_name, data_type FROM information_schema.columns WHERE table_schema = :s"),
+            params,
+        ):
+            if table in catalog:
+                n, corr = stats.get((str(table), str(column)), (None, None))
+                catalog[table].columns[str(column)] = ColumnStats(
+                    str(dtype), None if n is None else float(n), None if corr is None else float(corr)
+                )
+        for table, column in conn.execute(
+            sa.text(
+                "SELECT t.relname, a.attname FROM pg_index i"
+                " JOIN pg_class t ON t.oid = i.indrelid"
+                " JOIN pg_namespace n ON n.oid = t.relnamespace"
+                " JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = i.indkey[0]"
+                " WHERE n.nspname = :s AND i.indisvalid"
+            ),
+            params,
+        ):
+            if table in catalog:
+                catalog[table].indexed.add(str(column))
+    return catalog
+
+
+def explain(engine: Any, sql: str, *, timeout_ms: int) -> dict[str, Any] | None:
+    import sqlalchemy as sa
+
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql("SET LOCAL default_transaction_read_only = on")
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+            raw = conn.execute(sa.text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+    except Exception:
+        return None
+    doc = json.loads(raw) if isinstance(raw, str | bytes | bytearray) else raw
+    return doc[0]["Plan"] if doc else None
+
+
+def replay(engine: Any, statements: list[str], *, repeat: int, timeout_ms: int, row_cap: int) -> list[float]:
+    """Median latency (ms) per statement that ran; failures and timeouts are left out."""
+    import sqlalchemy as sa
+
+    out = []
+    for sql in statements:
+        samples = []
+        for run in range(repeat + 1):  # first run warms the cache
+            t0 = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql("SET LOCAL default_transaction_read_only = on")
+                    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+                    conn.execute(sa.text(sql)).fetchmany(row_cap)
+            except Exception:
+                samples = []
+                break
+            if run:
+                samples.append((time.perf_counter() - t0) * 1000.0)
+        if samples:
+            out.append(statistics.median(samples))
+    return out
+
+
+def create_indexes(engine: Any, candidates: list[IndexCandidate], schema: str) -> list[str]:
+    """CREATE INDEX CONCURRENTLY (autocommit) and ANALYZE; returns created index names."""
+    created = []
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        for cand in candidates:
+            conn.exec_driver_sql(cand.ddl(schema))
+            created.append(cand.name)
+        for table in sorted({c.table for c in candidates}):
+            conn.exec_driver_sql(f"ANALYZE {schema}.{table}")
+    return created
+
+
+# ---------------------------------------------------------------------------
+# CLI
+# ---------------------------------------------------------------------------
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Workload-driven index advisor (analytics schema)")
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--log", type=Path, default=None, help="JSON log lines with a 'sql' field")
+    src.add_argument("--sql-file", type=Path, default=None, help="One SQL statement per line")
+    src.add_argument("--questions", type=Path, default=None, help="Questions to plan (.txt lines or batch .yaml)")
+    parser.add_argument("--schema", default="analytics")
+    parser.add_argument("--apply", action="store_true", help="Create the proposed indexes and replay again")
+    parser.add_argument("--no-replay", dest="replay", action="store_false", help="Propose from plans only")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per statement (median)")
+    parser.add_argument("--timeout-ms", type=int, default=30_000)
+    parser.add_argument("--row-cap", type=int, default=5000, help="Rows fetched per run (as the executor caps)")
+    parser.add_argument("--min-rows", type=float, default=10_000, help="Ignore smaller tables")
+    parser.add_argument("--min-distinct", type=float, default=10, help="Skip filter columns with fewer values")
+    parser.add_argument("--brin-correlation", type=float, default=0.9, help="|correlation| for BRIN on timestamps")
+    args = parser.parse_args(argv)
+
+    engine = _resolve_engine()
+    catalog = load_catalog(engine, args.schema)
+    if args.log is not None:
+        raw = _from_log(args.log)
+    elif args.sql_file is not None:
+        raw = [ln for ln in args.sql_file.read_text(encoding="utf-8").splitlines() if ln.strip()]
+    elif args.questions is not None:
+        rollups = {r.name for r in ROLLUPS}
+        allowlist = {f"{args.schema}.{t}": sorted(s.columns) for t, s in catalog.items() if t not in rollups}
+        raw = _from_questions(args.questions, allowlist)
+    else:
+        raw = _from_examples()
+    workload, skipped = load_workload(raw)
+
+    plans = [(i, p) for i, sql in enumerate(workload) if (p := explain(engine, sql, timeout_ms=args.timeout_ms))]
+    candidates = advise(
+        plans, catalog, min_rows=args.min_rows, min_distinct=args.min_distinct, brin_correlation=args.brin_correlation
+    )
+    for cand in candidates:
+        print(json.dumps({
+            "index": cand.name,
+            "table": cand.table,
+            "column": cand.column,
+            "method": cand.method,
+            "reason": cand.reason,
+            "statements": len(cand.statements),
+            "plan_cost": round(cand.plan_cost, 1),
+            "ddl": cand.ddl(args.schema),
+        }))
+
+    timing = {"repeat": args.repeat, "timeout_ms": args.timeout_ms, "row_cap": args.row_cap}
+    before = replay(engine, workload, **timing) if args.replay else []
+    created = create_indexes(engine, candidates, args.schema) if args.apply and candidates else []
+    after = replay(engine, workload, **timing) if args.replay and created else []
+    print(json.dumps({
+        "statements": len(workload),
+        "skipped": skipped,
+        "explained": len(plans),
+        "candidates": len(candidates),
+        "created": created,
+        "before": percentiles(before),
+        "after": percentiles(after),
+    }))
+    return 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""
+Prune LangGraph checkpoint tables (one-shot or scheduled).
+
+Overview
+Runs the batched checkpoint retention job (`app.infra.checkpoint_retention`):
+expired checkpoints and writes, per-thread trimming to the newest N
+checkpoints, orphaned channel blobs and expired state blobs. Prints one JSON
+report per run.
+
+Design
+- Limits default to `checkpointer.retention_*` settings; flags override.
+- Bounded delete batches with short lock/statement timeouts and a pause
+  between batches; safe to run while the assistant is serving traffic.
+- `--loop` keeps running every `checkpointer.cleanup_interval_hours` (or
+  `--interval-hours`) as an asyncio background task; SIGINT/SIGTERM stop it
+  after the current pass.
+
+Integration
+- Connects to the checkpointer's database (`APLLOS_DATABASE_URL`, else
+  `DATABASE_URL`) and needs write access to the checkpoint tables.
+- Run `--ensure-indexes` once per database: it adds the `checkpoint_id`
+  indexes used by the age predicates (``CREATE INDEX CONCURRENTLY``).
+- Cron/Kubernetes CronJob: run without `--loop`; sidecar: run with `--loop`.
+
+Usage
+$ python -m scripts.prune_checkpoints --ensure-indexes
+$ python -m scripts.prune_checkpoints --max-age-hours 72 --keep-last 10
+$ python -m scripts.prune_checkpoints --loop --interval-hours 6
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+from dataclasses import replace
+from typing import Any
+
+from app.infra.checkpoint_retention import (
+    RetentionPolicy,
+    ensure_indexes,
+    get_policy,
+    get_retention_engine,
+    retention_loop,
+    run_retention,
+)
+
+
+def _build_policy(args: argparse.Namespace) -> RetentionPolicy:
+    policy = get_policy()
+    overrides: dict[str, Any] = {}
+    if args.max_age_hours is not None:
+        overrides["max_age_hours"] = args.max_age_hours
+    if args.keep_last is not None:
+        overrides["keep_last"] = args.keep_last
+    if args.batch_size is not None:
+        overrides["batch_size"] = args.batch_size
+    if args.pause_ms is not None:
+        overrides["pause_s"] = args.pause_ms / 1000.0
+    return replace(policy, **overrides) if overrides else policy
+
+
+def _interval_hours(args: argparse.Namespace) -> float:
+    if args.interval_hours is not None:
+        return float(args.interval_hours)
+    try:
+        from app.config.settings import get_settings
+
+        return float(get_settings().checkpointer.cleanup_interval_hours)
+    except Exception:
+        return 24.0
+
+
+async def _run_loop(engine: Any, policy: RetentionPolicy, interval_s: float) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):  # pragma: no cover - non-POSIX
+            pass
+    await retention_loop(engine, policy, interval_s=interval_s, stop=stop)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Prune LangGraph checkpoint tables")
+    parser.add_argument("--max-age-hours", type=int, default=None, help="Delete checkpoints older than this")
+    parser.add_argument("--keep-last", type=int, default=None, help="Newest checkpoints kept per thread (0=off)")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per delete transaction")
+    parser.add_argument("--pause-ms", type=float, default=None, help="Pause between delete batches")
+    parser.add_argument("--ensure-indexes", action="store_true", help="Create supporting indexes first")
+    parser.add_argument("--loop", action="store_true", help="Run periodically until interrupted")
+    parser.add_argument("--interval-hours", type=float, default=None, help="Loop interval (hours)")
+    args = parser.parse_args(argv)
+
+    try:
+        engine = get_retention_engine()
+    except Exception as exc:
+        print(json.dumps({"error": f"database unavailable: {exc}"}), file=sys.stderr)
+        return 2
+
+    policy = _build_policy(args)
+    if args.ensure_indexes:
+        ensure_indexes(engine, policy)
+
+    if args.loop:
+        asyncio.run(_run_loop(engine, policy, _interval_hours(args) * 3600.0))
+        return 0
+
+    report = run_retention(engine, policy)
+    print(json.dumps(report.to_dict(), ensure_ascii=False))
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":  # pragma: no cover - CLI entry
+    raise SystemExit(main())
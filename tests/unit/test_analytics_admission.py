@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+
+from app.agents.analytics import executor as executor_mod
+from app.agents.analytics.admission import AdmissionBudget, apply_limit, decide, summarize_explain
+from app.agents.analytics.breaker import CircuitBreaker, MemoryBreakerStore
+
+
+def _plan(cost, rows, node="Seq Scan", relation="orders", children=()):
+    plan = {"Node Type": node, "Total Cost": cost, "Plan Rows": rows, "Plans": list(children)}
+    if relation:
+        plan["Relation Name"] = relation
+    return [{"Plan": plan}]
+
+
+class _FakeResult:
+    def __init__(self, rows=None, explain=None):
+        self._rows = rows or []
+        self._explain = explain
+
+    def first(self):
+        return (self._explain,)
+
+    def mappings(self):
+        return iter(self._rows)
+
+
+class _FakeConn:
+    def __init__(self, engine):
+        self.engine = engine
+
+    def exec_driver_sql(self, _sql):
+        return None
+
+    def execution_options(self, **_kw):
+        return self
+
+    def execute(self, stmt, _params):
+        text = str(stmt)
+        self.engine.statements.append(text)
+        if text.startswith("EXPLAIN"):
+            return _FakeResult(explain=self.engine.explain)
+        return _FakeResult(rows=[{"x": i} for i in range(5)])
+
+
+class _FakeEngine:
+    def __init__(self, explain):
+        self.explain = explain
+        self.statements: list[str] = []
+
+    @contextmanager
+    def begin(self):
+        yield _FakeConn(self)
+
+
+def _executor(monkeypatch, explain):
+    engine = _FakeEngine(explain)
+    monkeypatch.setattr(executor_mod, "_get_engine", lambda: engine)
+    monkeypatch.delenv("APP_EXPLAIN_ANALYZE", raising=False)
+    return executor_mod.AnalyticsExecutor(), engine
+
+
+def test_summarize_collects_seq_scans_across_the_tree():
+    scan = _plan(900_000.0, 1_000_000, relation="geolocation")[0]["Plan"]
+    est = summarize_explain(_plan(120_000.0, 27, node="Aggregate", relation=None, children=[scan]))
+    assert (est.root, est.total_cost, est.plan_rows) == ("Aggregate", 120_000.0, 27)
+    assert est.seq_scans == (("geolocation", 1_000_000),)
+    assert summarize_explain({"error": "ProgrammingError"}) is None
+
+
+def test_decide_budgets():
+    budget = AdmissionBudget()
+    sql = "SELECT * FROM analytics.orders o CROSS JOIN analytics.order_items i"
+    assert decide(sql, summarize_explain(_plan(9e9, 10**10)), budget, row_cap=2000).action == "reject"
+    assert decide(sql, summarize_explain(_plan(300_000.0, 50)), budget, row_cap=2000).action == "heavy"
+    small = decide(sql, summarize_explain(_plan(20_000.0, 10, relation="geolocation")), budget, row_cap=2000)
+    assert small.action == "admit"  # estimated scan is small
+    assert decide(sql, summarize_explain(_plan(2_400.0, 99_441)), budget, row_cap=2000).action == "limit"
+    assert decide(sql, None, budget, row_cap=2000).action == "admit"
+
+
+def test_apply_limit_only_tightens():
+    assert apply_limit("SELECT a FROM t LIMIT 5 OFFSET 10", 100) == "SELECT a FROM t LIMIT 5 OFFSET 10"
+    assert apply_limit("SELECT a FROM t LIMIT 500 OFFSET 10", 100) == "SELECT a FROM t LIMIT 100 OFFSET 10"
+    assert apply_limit("SELECT a FROM (SELECT a FROM t LIMIT 500) s", 100).endswith("s\nLIMIT 100")
+
+
+def test_executor_explains_first_and_caches_the_plan(monkeypatch):
+    exe, engine = _executor(monkeypatch, _plan(2_400.0, 99_441))
+    plan = {"sql": "SELECT order_id FROM analytics.orders", "params": {}}
+
+    res = exe.execute(plan, max_rows=100, include_explain=True)
+    assert engine.statements[0].startswith("EXPLAIN (FORMAT JSON) SELECT order_id")
+    assert engine.statements[1].endswith("LIMIT 100")
+    assert "admission_limit" in res.warnings
+    assert res.meta["admission"]["action"] == "limit"
+    assert res.meta["explain"] == engine.explain  # pre-flight plan reused
+
+    res = exe.execute(plan, max_rows=100, include_explain=True)
+    assert len(engine.statements) == 3  # no second EXPLAIN
+    assert res.meta["admission"]["explain_cached"] is True
+
+
+def test_executor_rejects_before_running(monkeypatch):
+    exe, engine = _executor(monkeypatch, _plan(9e9, 10**10))
+    with pytest.raises(RuntimeError, match="admission_rejected"):
+        exe.execute({"sql": "SELECT 1 FROM analytics.orders, analytics.order_items", "params": {}})
+    assert all(s.startswith("EXPLAIN") for s in engine.statements)
+
+
+def test_rejection_does_not_strand_a_half_open_probe(monkeypatch):
+    exe, _engine = _executor(monkeypatch, _plan(9e9, 10**10))
+    exe._breaker = CircuitBreaker(MemoryBreakerStore(), threshold=1, reset_after_s=0.0)
+    sql = "SELECT 1 FROM analytics.orders, analytics.order_items"
+    key = executor_mod._sql_key(sql)
+    exe._breaker.failure(key)  # open and already due for a probe
+
+    with pytest.raises(RuntimeError, match="admission_rejected"):
+        exe.execute({"sql": sql, "params": {}})
+    assert exe._breaker.before(key) == "probe"  # lease was never claimed
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+
+import pytest
+
+from app.agents.analytics import breaker as breaker_mod
+from app.agents.analytics.breaker import (
+    CircuitBreaker,
+    CircuitOpen,
+    MemoryBreakerStore,
+    PostgresBreakerStore,
+)
+
+
+def test_memory_store_is_lru_bounded():
+    store = MemoryBreakerStore(max_keys=2)
+    for key in ("a", "b", "c"):
+        store.record_failure(key, threshold=3, reset_after_s=60, now=0.0)
+    assert len(store) == 2
+    assert store.get("a") is None and store.get("c").failures == 1
+
+
+def test_shared_store_trips_once_for_all_workers():
+    shared = MemoryBreakerStore()
+    worker_a = CircuitBreaker(shared, threshold=3, reset_after_s=60)
+    worker_b = CircuitBreaker(shared, threshold=3, reset_after_s=60)
+    worker_a.failure("k")
+    worker_b.failure("k")
+    assert worker_a.before("k") == "counting"
+    worker_a.failure("k")
+    with pytest.raises(CircuitOpen, match="circuit_open"):
+        worker_b.before("k")
+
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(breaker_mod.time, "time", lambda: clock[0])
+    cb = CircuitBreaker(MemoryBreakerStore(), threshold=1, reset_after_s=10)
+    cb.failure("k")
+    clock[0] += 11
+    assert cb.before("k", lease_s=30) == "probe"
+    with pytest.raises(CircuitOpen, match="probe already running"):
+        cb.before("k")
+
+    cb.failure("k")  # failed probe re-opens
+    with pytest.raises(CircuitOpen):
+        cb.before("k")
+    clock[0] += 11
+    state = cb.before("k")
+    cb.success("k", state)
+    assert cb.before("k") == "closed"
+
+
+def test_store_errors_fall_back_to_process_state():
+    class _Down:
+        def __getattr__(self, _name):
+            def _fail(*_a, **_kw):
+                raise ConnectionError("db down")
+
+            return _fail
+
+    cb = CircuitBreaker(_Down(), threshold=1, reset_after_s=60)
+    assert cb.before("k") == "closed"
+    cb.failure("k")
+    with pytest.raises(CircuitOpen):
+        cb.before("k")
+
+
+class _Result:
+    def first(self):
+        return None
+
+
+class _Conn:
+    def __init__(self, engine, mode):
+        self.engine, self.mode = engine, mode
+
+    def exec_driver_sql(self, sql):
+        self.engine.log.append((self.mode, sql.split(" (")[0]))
+        if sql.startswith("CREATE") and self.engine.ddl_fails:
+            raise PermissionError("permission denied for schema public")
+        return _Result()
+
+    def execute(self, stmt, _params=None):
+        self.engine.log.append((self.mode, str(stmt).split(" FROM")[0]))
+        return _Result()
+
+
+class _Engine:
+    def __init__(self, ddl_fails=False):
+        self.ddl_fails = ddl_fails
+        self.log = []
+
+    @contextmanager
+    def begin(self):
+        yield _Conn(self, "begin")
+
+    @contextmanager
+    def connect(self):
+        yield _Conn(self, "connect")
+
+
+def test_postgres_store_reads_are_read_only_and_ddl_runs_once():
+    pytest.importorskip("sqlalchemy")
+    engine = _Engine()
+    store = PostgresBreakerStore(engine)
+    assert store.get("a") is None and store.get("b") is None
+    assert engine.log == [
+        ("begin", "CREATE TABLE IF NOT EXISTS analytics_circuit_breaker"),
+        ("connect", "SET TRANSACTION READ ONLY"),
+        ("connect", "SELECT failures, open_until, probe_until"),
+        ("connect", "SET TRANSACTION READ ONLY"),
+        ("connect", "SELECT failures, open_until, probe_until"),
+    ]
+
+
+def test_failed_table_setup_switches_breaker_to_memory_for_good():
+    engine = _Engine(ddl_fails=True)
+    cb = CircuitBreaker(PostgresBreakerStore(engine), threshold=1, reset_after_s=60)
+    assert cb.before("k") == "closed"
+    cb.failure("k")
+    with pytest.raises(CircuitOpen):
+        cb.before("k")
+    assert isinstance(cb.store, MemoryBreakerStore)
+    assert engine.log == [("begin", "CREATE TABLE IF NOT EXISTS analytics_circuit_breaker")]
@@ -0,0 +1,69 @@
+from app.agents.analytics.plan_cache import PlanCache
+from app.agents.analytics.planner import AnalyticsPlanner, PlannerPlan
+
+ALLOW = {"orders": ["order_id", "order_purchase_timestamp"], "customers": ["customer_id", "customer_state"]}
+
+
+def _plan(sql, reason="plan"):
+    return PlannerPlan(sql=sql, params={}, reason=reason, limit_applied=False, warnings=[])
+
+
+def test_questions_differing_in_year_and_state_share_a_template():
+    cache = PlanCache()
+    sql = (
+        "SELECT COUNT(1) AS qty FROM analytics.orders o JOIN analytics.customers c USING (customer_id) "
+        "WHERE c.customer_state = 'SP' AND o.order_purchase_timestamp >= '2017-01-01' "
+        "AND o.order_purchase_timestamp < '2018-01-01'"
+    )
+    cache.put("Pedidos em SP em 2017?", ALLOW, _plan(sql, "orders in SP during 2017"))
+
+    hit = cache.get("pedidos em RJ em 2019", ALLOW)
+    assert hit.sql == sql.replace("'SP'", "'RJ'").replace("2018", "2020").replace("2017", "2019")
+    assert hit.reason == "orders in RJ during 2019"
+    assert cache.get("pedidos em 2019", ALLOW) is None  # different shape
+    assert cache.stats()["templates"] == 1
+
+
+def test_previous_year_follows_the_binding_and_unmapped_literals_stay_exact():
+    cache = PlanCache()
+    sql = "SELECT COUNT(1) AS qty FROM analytics.orders WHERE EXTRACT(YEAR FROM order_purchase_timestamp) IN (2016, 2017)"
+    cache.put("Pedidos em 2017 vs ano anterior", ALLOW, _plan(sql))
+    assert cache.get("pedidos em 2018 vs ano anterior", ALLOW).sql.endswith("IN (2017, 2018)")
+
+    sql = "SELECT COUNT(1) AS qty FROM analytics.orders WHERE EXTRACT(YEAR FROM order_purchase_timestamp) = 2015"
+    cache.put("Pedidos em 2017 e 2015", ALLOW, _plan(sql))  # 2017 not in the SQL
+    assert cache.get("pedidos em 2018 e 2015", ALLOW) is None
+    assert cache.get("pedidos em 2017 e 2015", ALLOW).sql == sql
+    assert cache.stats()["templates"] == 1
+
+
+def test_allowlist_change_invalidates_entries():
+    cache = PlanCache()
+    cache.put("quantos pedidos", ALLOW, _plan("SELECT COUNT(1) AS qty FROM analytics.orders"))
+    assert cache.get("Quantos   pedidos?", ALLOW) is not None
+
+    changed = {"orders": ["order_id"]}
+    assert cache.get("quantos pedidos", changed) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_planner_skips_llm_for_cached_plan_shapes(monkeypatch):
+    planner = AnalyticsPlanner()
+    planner._llm_backend = object()
+    planner._plan_cache = PlanCache()
+    calls = []
+
+    def fake_llm(query, allowlist, logger, default_limit=None):
+        calls.append(query)
+        return _plan(
+            "SELECT COUNT(1) AS qty FROM analytics.orders WHERE order_purchase_timestamp >= '2017-01-01' "
+            "AND order_purchase_timestamp < '2018-01-01'"
+        )
+
+    monkeypatch.setattr(planner, "_plan_with_llm", fake_llm)
+    first = planner.plan("Pedidos em 2017", ALLOW)
+    second = planner.plan("Pedidos em 2018", ALLOW)
+
+    assert calls == ["Pedidos em 2017"]
+    assert "'2018-01-01'" in second.sql and "'2019-01-01'" in second.sql
+    assert first.sql != second.sql
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import pytest
+
+from app.agents.analytics.planner import PlannerPlan
+from app.agents.analytics.rollups import RollupCatalog, rewrite_plan, rewrite_sql
+
+_ALLOWLIST = {
+    "analytics.orders": ["order_id", "customer_id", "order_status", "order_purchase_timestamp"],
+    "analytics.order_items": ["order_id", "order_item_id", "product_id", "seller_id", "price", "freight_value"],
+    "analytics.customers": ["customer_id", "customer_city", "customer_state"],
+    "analytics.products": ["product_id", "product_category_name"],
+    "analytics.order_payments": ["order_id", "payment_type", "payment_installments", "payment_value"],
+}
+
+
+def test_heuristic_time_series_moves_to_orders_rollup():
+    sql = (
+        "SELECT date_trunc('month', analytics.orders.order_purchase_timestamp) AS period, COUNT(1) AS qty\n"
+        "FROM analytics.orders\n"
+        "WHERE analytics.orders.order_purchase_timestamp >= '2017-01-01' AND "
+        "analytics.orders.order_purchase_timestamp < '2018-01-01'\n"
+        "GROUP BY period\nORDER BY period"
+    )
+    name, new_sql = rewrite_sql(sql, _ALLOWLIST)
+    assert name == "mv_orders_monthly"
+    assert "FROM analytics.mv_orders_monthly" in new_sql
+    assert "purchase_month >= '2017-01-01'" in new_sql and "order_purchase_timestamp" not in new_sql
+
+
+def test_joined_revenue_by_state_uses_sales_rollup():
+    sql = (
+        "SELECT c.customer_state, SUM(oi.price + oi.freight_value) AS revenue, AVG(oi.price) AS ticket "
+        "FROM analytics.order_items oi JOIN analytics.orders o ON o.order_id = oi.order_id "
+        "JOIN analytics.customers c ON c.customer_id = o.customer_id "
+        "WHERE EXTRACT(YEAR FROM o.order_purchase_timestamp) = 2018 "
+        "GROUP BY c.customer_state ORDER BY revenue DESC LIMIT 10"
+    )
+    assert rewrite_sql(sql, _ALLOWLIST) == (
+        "mv_sales_monthly",
+        "SELECT customer_state, SUM(revenue) AS revenue, SUM(price) / NULLIF(SUM(price_n), 0) AS ticket "
+        "FROM analytics.mv_sales_monthly WHERE EXTRACT(YEAR FROM purchase_month) = 2018 "
+        "GROUP BY customer_state ORDER BY revenue DESC LIMIT 10",
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        # bound not aligned to a month
+        "SELECT COUNT(*) FROM analytics.orders o WHERE o.order_purchase_timestamp >= '2017-01-15'",
+        # column that is not a rollup dimension
+        "SELECT c.customer_city, COUNT(*) FROM analytics.orders o "
+        "JOIN analytics.customers c ON c.customer_id = o.customer_id GROUP BY 1",
+        # not additive
+        "SELECT COUNT(DISTINCT o.customer_id) FROM analytics.orders o",
+        "SELECT MAX(oi.price) FROM analytics.order_items oi",
+        # join that is not a foreign key, outer join, subquery
+        "SELECT COUNT(*) FROM analytics.orders o JOIN analytics.order_items oi ON oi.seller_id = o.order_id",
+        "SELECT COUNT(*) FROM analytics.orders o LEFT JOIN analytics.customers c ON c.customer_id = o.customer_id",
+        "SELECT COUNT(*) FROM analytics.orders WHERE order_id IN (SELECT order_id FROM analytics.order_items)",
+        # row-level preview
+        "SELECT o.order_id, o.order_status FROM analytics.orders o LIMIT 10",
+    ],
+)
+def test_non_equivalent_queries_stay_on_base_tables(sql):
+    assert rewrite_sql(sql, _ALLOWLIST) is None
+
+
+def test_rewrite_plan_requires_a_populated_view():
+    class _Catalog(RollupCatalog):
+        def __init__(self, names):
+            super().__init__(lambda: None)
+            self.names = frozenset(names)
+
+        def available(self):
+            return self.names
+
+    plan = PlannerPlan(
+        sql="SELECT op.payment_type, SUM(op.payment_value) AS total FROM analytics.order_payments op GROUP BY 1",
+        params={},
+        reason="payments by type",
+        limit_applied=False,
+        warnings=[],
+    )
+    assert rewrite_plan(plan, _ALLOWLIST, _Catalog(())) is plan
+
+    moved = rewrite_plan(plan, _ALLOWLIST, _Catalog({"mv_payments_monthly"}))
+    assert moved.rollup == "mv_payments_monthly"
+    assert moved.warnings == ["rollup:mv_payments_monthly"]
+    assert moved.sql.endswith("FROM analytics.mv_payments_monthly GROUP BY 1")
+    assert plan.rollup is None and plan.warnings == []
+
+
+def test_catalog_without_database_reports_nothing():
+    def _no_db():
+        raise RuntimeError("database url missing")
+
+    assert RollupCatalog(_no_db).available() == frozenset()
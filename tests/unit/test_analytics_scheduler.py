@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from app.agents.analytics.admission import AdmissionDecision, PlanEstimate
+from app.agents.analytics.scheduler import QueryScheduler, QueueTimeout, classify_lane
+
+
+def test_heavy_lane_never_takes_the_last_slot():
+    sched = QueryScheduler(max_concurrency=3, heavy_slots=5, light_timeout_s=0.05, heavy_timeout_s=0.05)
+    assert sched.heavy_slots == 2
+    sched.acquire("heavy")
+    sched.acquire("heavy")
+    with pytest.raises(QueueTimeout, match="queue_timeout"):
+        sched.acquire("heavy")
+    sched.acquire("light")  # reserved slot
+    with pytest.raises(QueueTimeout):
+        sched.acquire("light")
+    assert sched.stats()["timed_out"] == {"light": 1, "heavy": 1}
+
+
+def test_waiting_light_query_goes_before_waiting_heavy():
+    sched = QueryScheduler(max_concurrency=2, heavy_slots=1, light_timeout_s=2.0, heavy_timeout_s=2.0)
+    sched.acquire("light")
+    sched.acquire("light")
+    order: list[str] = []
+
+    def run(lane: str) -> None:
+        sched.acquire(lane)
+        order.append(lane)
+
+    heavy = threading.Thread(target=run, args=("heavy",))
+    heavy.start()
+    time.sleep(0.05)
+    light = threading.Thread(target=run, args=("light",))
+    light.start()
+    time.sleep(0.05)
+    assert sched.stats()["waiting"] == {"light": 1, "heavy": 1}
+
+    sched.release("light")
+    light.join(1)
+    assert order == ["light"]  # heavy yields while light is queued
+    sched.release("light")
+    heavy.join(1)
+    assert order == ["light", "heavy"]
+
+
+def test_classify_prefers_explain_estimate_over_planner_hint():
+    est = PlanEstimate(total_cost=400_000.0, plan_rows=10, root="Aggregate", seq_scans=())
+    assert classify_lane("light", AdmissionDecision("heavy", "SELECT 1", "cost", est)) == "heavy"
+    assert classify_lane("heavy", AdmissionDecision("admit", "SELECT 1", "no_plan")) == "heavy"
+    assert classify_lane(None, None) == "light"
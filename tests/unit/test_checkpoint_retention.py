@@ -0,0 +1,149 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.infra.checkpoint_retention as ret
+
+
+class _Result:
+    def __init__(self, n):
+        self.rowcount = n
+
+    def fetchall(self):
+        return [("thread", "")] * self.rowcount
+
+
+class _Engine:
+    def __init__(self, counts):
+        self.counts = list(counts)
+        self.driver_sql = []
+        self.transactions = 0
+
+    @contextmanager
+    def begin(self):
+        self.transactions += 1
+        yield self
+
+    def exec_driver_sql(self, sql):
+        self.driver_sql.append(sql)
+
+    def execute(self, _stmt, params):
+        assert params["batch"] == 5
+        return _Result(self.counts.pop(0))
+
+
+def test_checkpoint_id_cutoff_orders_like_langgraph_ids():
+    id_mod = pytest.importorskip("langgraph.checkpoint.base.id")
+    now = datetime.now(timezone.utc)
+    generated = str(id_mod.uuid6(clock_seq=-2))
+
+    assert ret.checkpoint_id_at(now - timedelta(seconds=1)) < generated < ret.checkpoint_id_at(now + timedelta(seconds=1))
+
+
+def test_deletes_run_in_short_batches_until_a_short_batch():
+    engine = _Engine([5, 5, 2])
+    report = ret.RetentionReport()
+    policy = ret.RetentionPolicy(batch_size=5, pause_s=0)
+
+    keys = ret._delete_in_batches(
+        engine, "DELETE ...", {}, policy, report, table="checkpoints", reason="expired", returning=True
+    )
+
+    assert engine.transactions == 3
+    assert report.deleted == {"checkpoints:expired": 12}
+    assert keys == {("thread", "")}
+    assert sum("lock_timeout" in s for s in engine.driver_sql) == 3
+
+
+def test_failing_step_is_reported_not_raised():
+    class _Down:
+        def begin(self):
+            raise RuntimeError("db down")
+
+        connect = begin
+
+    report = ret.run_retention(_Down(), ret.RetentionPolicy(), now=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    assert report.deleted == {}
+    assert [e.split(":")[0] for e in report.errors] == ["expire", "keep_last", "blobs", "state_blobs"]
+
+
+def test_policy_rejects_unsafe_table_names():
+    with pytest.raises(ValueError):
+        ret.RetentionPolicy(checkpoints_table="checkpoints; DROP TABLE x")
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+        self.rowcount = len(rows)
+
+    def fetchall(self):
+        return self.rows
+
+    def scalar(self):
+        return self.rows[0][0] if self.rows else None
+
+
+class _ScriptedEngine:
+    """Answers each statement with the rows of the first matching SQL fragment."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.sql = []
+
+    @contextmanager
+    def begin(self):
+        yield self
+
+    connect = begin
+
+    def exec_driver_sql(self, sql):
+        self.sql.append(sql)
+
+    def execute(self, stmt, params=None):
+        self.sql.append(str(stmt))
+        for fragment, answer in self.answers:
+            if fragment in str(stmt):
+                return _Rows(answer(params) if callable(answer) else answer)
+        raise AssertionError(str(stmt))
+
+
+def test_thread_scan_runs_under_timeouts():
+    engine = _ScriptedEngine([("GROUP BY", [])])
+
+    ret._trim_threads(engine, ret.RetentionPolicy(), ret.RetentionReport())
+
+    assert [s.split(" =")[0] for s in engine.sql[:2]] == ["SET LOCAL lock_timeout", "SET LOCAL statement_timeout"]
+    assert "GROUP BY" in engine.sql[2]
+
+
+def test_blob_sweep_covers_idle_threads_not_touched_this_run():
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    old = ret.checkpoint_id_at(now - timedelta(hours=1))
+    latest = {"idle": old, "busy": ret.checkpoint_id_at(now), "new": None}
+    engine = _ScriptedEngine([
+        ("SELECT DISTINCT", [("busy", ""), ("idle", ""), ("new", "")]),
+        ("max(checkpoint_id)", lambda p: [(latest[p["t"]],)]),
+        ("DELETE FROM checkpoint_blobs", [("x",)] * 2),
+    ])
+    report = ret.RetentionReport()
+
+    ret._sweep_blobs(engine, ret.RetentionPolicy(batch_size=5, pause_s=0), report, set(),
+                     ret.checkpoint_id_at(now - timedelta(minutes=15)))
+
+    assert report.deleted == {"checkpoint_blobs:orphaned": 2}
+    assert report.threads_swept == 1  # busy is inside the grace window, new has no checkpoint yet
+
+
+def test_retention_engine_uses_the_checkpointer_url(monkeypatch):
+    import app.infra.db as db
+
+    seen = {}
+    monkeypatch.setenv("APLLOS_DATABASE_URL", "postgresql://app/checkpoints")
+    monkeypatch.setenv("DATABASE_URL", "postgresql://other/db")
+    monkeypatch.setattr(db, "get_engine", lambda **kw: seen.update(kw) or "engine")
+
+    assert ret.get_retention_engine() == "engine"
+    assert seen == {"url": "postgresql://app/checkpoints"}
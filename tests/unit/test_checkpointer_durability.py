@@ -0,0 +1,184 @@
+import asyncio
+import threading
+import time
+from typing import TypedDict
+
+import pytest
+
+pytest.importorskip("langgraph")
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+import app.infra.checkpointer as cp
+from app.graph.build import _with_default_durability
+
+
+class _SlowSaver(InMemorySaver):
+    def __init__(self, delay_s=0.0, gate=None):
+        super().__init__()
+        self.delay_s = delay_s
+        self.gate = gate
+        self.puts = 0
+
+    def put(self, *args, **kwargs):
+        if self.gate is not None:
+            self.gate.wait(2)
+        time.sleep(self.delay_s)
+        self.puts += 1
+        return super().put(*args, **kwargs)
+
+
+class _S(TypedDict, total=False):
+    n: int
+
+
+def _graph(saver):
+    sg = StateGraph(_S)
+    sg.add_node("a", lambda s: {"n": s.get("n", 0) + 1})
+    sg.add_node("b", lambda s: {"n": s["n"] + 1})
+    sg.add_node("c", lambda s: {"n": s["n"] + 1})
+    sg.add_edge(START, "a")
+    sg.add_edge("a", "b")
+    sg.add_edge("b", "c")
+    sg.add_edge("c", END)
+    return sg.compile(checkpointer=saver)
+
+
+def test_per_node_records_write_latency_and_bytes(monkeypatch):
+    seen = []
+    monkeypatch.setattr(cp, "_observe_hist", lambda name, v, labels=None: seen.append((name, labels["op"], v)))
+    inner = _SlowSaver()
+    saver = cp.InstrumentedSaver(inner, mode="per_node")
+
+    _graph(saver).invoke({"n": 0}, {"configurable": {"thread_id": "t"}})
+
+    assert inner.puts == 5  # input, START, then one per node
+    assert {(n, op) for n, op, _ in seen} >= {("checkpoint_write_ms", "put"), ("checkpoint_write_bytes", "put")}
+    assert any(n == "checkpoint_write_bytes" and v > 0 for n, _, v in seen)
+
+
+def test_write_behind_returns_before_write_and_reads_flush():
+    gate = threading.Event()
+    inner = _SlowSaver(gate=gate)
+    saver = cp.InstrumentedSaver(inner, mode="write_behind", queue_size=8)
+    graph = _graph(saver)
+    cfg = {"configurable": {"thread_id": "t"}}
+
+    out = graph.invoke({"n": 0}, cfg, durability="sync")
+
+    assert out["n"] == 3
+    assert inner.puts == 0  # all writes still queued behind the gate
+    gate.set()
+    assert graph.get_state(cfg).values["n"] == 3
+    assert inner.puts == 5
+
+
+def test_write_behind_async_path_preserves_state():
+    inner = _SlowSaver(delay_s=0.005)
+    saver = cp.InstrumentedSaver(inner, mode="write_behind", queue_size=2)
+    graph = _graph(saver)
+    cfg = {"configurable": {"thread_id": "t"}}
+
+    async def run():
+        await graph.ainvoke({"n": 0}, cfg)
+        return await graph.ainvoke({"n": 10}, cfg)
+
+    assert asyncio.run(run())["n"] == 13
+    saver.flush()
+    assert graph.get_state(cfg).values["n"] == 13
+    assert inner.puts == 10
+
+
+def test_exit_mode_persists_once_per_run():
+    inner = _SlowSaver()
+    graph = _with_default_durability(_graph(cp.InstrumentedSaver(inner, mode="exit")), cp.graph_durability("exit"))
+    cfg = {"configurable": {"thread_id": "t"}}
+
+    graph.invoke({"n": 0}, cfg)
+
+    assert inner.puts == 1
+    assert graph.get_state(cfg).values["n"] == 3
+    graph.invoke({"n": 0}, cfg, durability="sync")  # explicit override still wins
+    assert inner.puts == 6
+
+
+def test_unknown_mode_falls_back_to_per_node():
+    assert cp.graph_durability("per-node") == "async"
+    assert cp.graph_durability("bogus") == "async"
+    assert cp.InstrumentedSaver(InMemorySaver(), mode="bogus").mode == "per_node"
+
+
+def test_write_bytes_come_from_the_backend_serializer(monkeypatch):
+    seen = []
+    monkeypatch.setattr(cp, "_observe_hist", lambda name, v, labels=None: seen.append((name, labels["op"], v)))
+    inner = InMemorySaver()
+    saver = cp.InstrumentedSaver(inner, mode="per_node")
+    dumped = []
+    real = inner.serde.inner.dumps_typed
+    monkeypatch.setattr(inner.serde.inner, "dumps_typed", lambda obj: dumped.append(real(obj)) or dumped[-1])
+
+    _graph(saver).invoke({"n": 0}, {"configurable": {"thread_id": "t"}})
+
+    written = sum(v for n, _, v in seen if n == "checkpoint_write_bytes")
+    assert written > 0 and written == sum(len(b) for _, b in dumped)  # nothing serialized twice
+
+
+def test_write_behind_failures_are_counted_and_raised_on_flush(monkeypatch):
+    failures = []
+    monkeypatch.setattr(cp, "_inc_counter", lambda name, labels=None, amount=1.0: failures.append((name, labels)))
+    inner = _SlowSaver()
+    monkeypatch.setattr(inner, "put", lambda *a, **kw: (_ for _ in ()).throw(ConnectionError("db down")))
+    saver = cp.InstrumentedSaver(inner, mode="write_behind", queue_size=8)
+
+    _graph(saver).invoke({"n": 0}, {"configurable": {"thread_id": "t"}}, durability="sync")
+
+    with pytest.raises(RuntimeError, match="write-behind checkpoint write failed") as err:
+        saver.flush()
+    assert isinstance(err.value.__cause__, ConnectionError)
+    assert ("checkpoint_write_failures_total", {"op": "put"}) in failures
+    saver.flush()  # reported once
+
+
+def test_write_behind_read_waits_only_for_its_own_thread():
+    gate = threading.Event()
+    inner = _SlowSaver(gate=gate)
+    saver = cp.InstrumentedSaver(inner, mode="write_behind", queue_size=16)
+    graph = _graph(saver)
+    ready = {"configurable": {"thread_id": "ready"}}
+    graph.invoke({"n": 0}, ready, durability="sync")
+    gate.set()
+    saver.flush("ready")
+    gate.clear()
+
+    graph.invoke({"n": 0}, {"configurable": {"thread_id": "busy"}}, durability="sync")
+    started = time.perf_counter()
+    assert graph.get_state(ready).values["n"] == 3
+    assert time.perf_counter() - started < 1.0  # not stuck behind "busy"'s gated writes
+    assert saver._queue.pending("busy") > 0
+    gate.set()
+    saver.flush()
+
+
+def test_write_behind_failure_is_raised_only_for_its_thread(monkeypatch):
+    monkeypatch.setattr(cp, "_inc_counter", lambda *a, **kw: None)
+    inner = _SlowSaver()
+    real_put = inner.put
+
+    def put(config, *args, **kwargs):
+        if config["configurable"]["thread_id"] == "bad":
+            raise ConnectionError("db down")
+        return real_put(config, *args, **kwargs)
+
+    monkeypatch.setattr(inner, "put", put)
+    saver = cp.InstrumentedSaver(inner, mode="write_behind", queue_size=8)
+    graph = _graph(saver)
+
+    graph.invoke({"n": 0}, {"configurable": {"thread_id": "bad"}}, durability="sync")
+    graph.invoke({"n": 0}, {"configurable": {"thread_id": "good"}}, durability="sync")
+
+    saver.flush("good")  # another conversation's failure is not reported here
+    with pytest.raises(RuntimeError) as err:
+        saver.flush("bad")
+    assert isinstance(err.value.__cause__, ConnectionError)
+    saver.flush()
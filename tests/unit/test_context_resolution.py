@@ -0,0 +1,70 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+
+from app.infra.loop_monitor import measure_loop_lag
+from app.utils.context_resolution import resolve_context
+
+
+class _FakeClient:
+    def __init__(self, payload):
+        self.payload = payload
+        self.calls = []
+
+    def is_available(self):
+        return True
+
+    async def chat_completion_async(self, messages, **kwargs):
+        self.calls.append((messages, kwargs))
+        await asyncio.sleep(0)
+        return SimpleNamespace(text=json.dumps(self.payload))
+
+    def extract_json(self, text):
+        return None
+
+
+_HISTORY = [
+    {"role": "user", "content": "Quantos pedidos por mês?"},
+    {"role": "assistant", "content": "Em janeiro foram 120 pedidos."},
+]
+
+
+def test_single_call_returns_all_verdicts():
+    client = _FakeClient({"resolved_query": "Quantos pedidos por estado?", "is_followup": True, "topic_shift": True})
+
+    res = asyncio.run(resolve_context("E por estado?", _HISTORY, None, llm_client=client))
+
+    assert len(client.calls) == 1
+    messages, kwargs = client.calls[0]
+    assert messages[0]["role"] == "system" and "E por estado?" not in messages[0]["content"]
+    assert kwargs["response_format"] == {"type": "json_object"}
+    assert res.resolved_query == "Quantos pedidos por estado?"
+    assert res.is_followup is True
+    assert res.topic_shift is False  # a follow-up is never a topic shift
+    assert res.source == "llm"
+
+
+def test_without_context_no_llm_call():
+    client = _FakeClient({})
+    res = asyncio.run(resolve_context("Quantos pedidos?", [], None, llm_client=client))
+    assert client.calls == []
+    assert res.resolved_query == "Quantos pedidos?" and res.source == "none"
+
+
+def test_unavailable_client_uses_heuristics():
+    client = SimpleNamespace(is_available=lambda: False)
+    res = asyncio.run(resolve_context("e por estado?", _HISTORY, None, llm_client=client))
+    assert res.source == "heuristic"
+    assert res.is_followup is True
+    assert res.topic_shift is None
+
+
+def test_loop_lag_detects_blocking_call():
+    async def _main():
+        monitor = asyncio.create_task(measure_loop_lag(interval_s=0.01, samples=3))
+        await asyncio.sleep(0)
+        time.sleep(0.15)  # blocks the loop
+        return await monitor
+
+    assert asyncio.run(_main()) >= 100.0
@@ -0,0 +1,126 @@
+import threading
+
+from app.infra.cache import EmbeddingCache
+from app.infra.embeddings import EmbeddingBatcher
+from app.utils.conversation_search import ConversationHistorySearcher
+
+
+class _FakeClient:
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        return True
+
+    def get_embeddings_many(self, *, texts, model):
+        with self._lock:
+            self.batches.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+def _batcher(client, wait_ms):
+    return EmbeddingBatcher(client, max_wait_ms=wait_ms, cache=EmbeddingCache(ttl_seconds=60, max_size=100))
+
+
+def test_concurrent_callers_share_one_batch():
+    client = _FakeClient()
+    batcher = _batcher(client, wait_ms=200)
+    n = 6
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def _worker(i):
+        barrier.wait()
+        results[i] = batcher.embed(f"texto {i}", model="m")
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    assert len(client.batches) == 1
+    assert sorted(client.batches[0]) == sorted(f"texto {i}" for i in range(n))
+    assert results == [[7.0, 1.0]] * n
+
+
+def test_cached_items_skip_provider_and_duplicates_are_sent_once():
+    client = _FakeClient()
+    batcher = _batcher(client, wait_ms=0)
+
+    first = batcher.embed_many(["a", "bb", "a", "  "], model="m")
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], None]
+    assert client.batches == [["a", "bb"]]
+
+    second = batcher.embed_many(["bb", "ccc"], model="m")
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+    assert client.batches[-1] == ["ccc"]
+
+
+def test_history_search_embeds_in_one_call():
+    client = _FakeClient()
+    searcher = ConversationHistorySearcher()
+    searcher._embedder = _batcher(client, wait_ms=0)
+
+    history = [
+        {"role": "user", "content": "vendas por estado"},
+        {"role": "assistant", "content": "SP lidera as vendas"},
+        {"role": "user", "content": "e por categoria?"},
+    ]
+    searcher.find_relevant_messages("vendas em SP", history)
+
+    assert len(client.batches) == 1
+    assert len(client.batches[0]) == 4
+
+
+def test_stored_history_embeddings_are_not_recomputed(monkeypatch):
+    import app.utils.conversation_search as cs
+    from app.infra.blobs import MemoryBlobStore
+
+    client = _FakeClient()
+    batcher = _batcher(client, wait_ms=0)
+    store = MemoryBlobStore()
+    monkeypatch.setattr(cs, "get_embedder", lambda: batcher)
+    monkeypatch.setattr(cs, "get_blob_store", lambda: store)
+    monkeypatch.setattr(cs, "_vectors", type(cs._vectors)())
+
+    history = cs.embed_messages(
+        [
+            {"role": "user", "content": "vendas por estado"},
+            {"role": "assistant", "content": "SP lidera as vendas"},
+        ]
+    )
+    assert all("embedding" not in m and m["embedding_ref"].startswith("blob:sha256:") for m in history)
+    assert list(cs.decode_embedding(store.get(history[0]["embedding_ref"])["embedding"])) == [17.0, 1.0]
+    assert len(client.batches) == 1
+
+    # A fresh process (empty vector memo) resolves refs from the store and only embeds the query
+    cs._vectors.clear()
+    searcher = cs.ConversationHistorySearcher()
+    searcher._embedder = _batcher(client, wait_ms=0)
+    searcher.find_relevant_messages("vendas em SP", history)
+    assert client.batches[-1] == ["vendas em SP"]
+
+    # Already-embedded messages are left untouched
+    assert cs.embed_messages(history) == history
+    assert len(client.batches) == 2
+
+
+def test_inline_history_embeddings_move_to_the_blob_store(monkeypatch):
+    import app.utils.conversation_search as cs
+    from app.graph.compaction import state_bytes
+    from app.infra.blobs import MemoryBlobStore
+
+    monkeypatch.setattr(cs, "get_embedder", lambda: None)
+    store = MemoryBlobStore()
+    legacy = [
+        {"role": "user", "content": f"pergunta {i}", "embedding": cs.encode_embedding([0.5] * 1536),
+         "embedding_model": cs._EMBEDDING_MODEL}
+        for i in range(10)
+    ]
+
+    history = cs.embed_messages(legacy, store=store)
+
+    assert all("embedding" not in m and m["embedding_ref"] for m in history)
+    assert state_bytes({"conversation_history": history}) < state_bytes({"conversation_history": legacy}) / 20
@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+from scripts.index_advisor import (
+    ColumnStats,
+    TableStats,
+    advise,
+    analyze_plan,
+    load_workload,
+    percentiles,
+)
+
+_CATALOG = {
+    "orders": TableStats(
+        99_441,
+        {
+            "order_id": ColumnStats("text", -1.0),
+            "customer_id": ColumnStats("text", -1.0),
+            "order_purchase_timestamp": ColumnStats("timestamp without time zone", -0.98, 0.12),
+        },
+        indexed={"order_id", "customer_id"},
+    ),
+    "customers": TableStats(
+        99_441,
+        {"customer_id": ColumnStats("text", -1.0), "customer_state": ColumnStats("text", 27, 0.05)},
+        indexed={"customer_id"},
+    ),
+    "order_items": TableStats(
+        112_650,
+        {"order_id": ColumnStats("text", -0.8), "seller_id": ColumnStats("text", 3095)},
+        indexed={"order_id"},
+    ),
+    "sellers": TableStats(3_095, {"seller_id": ColumnStats("text", -1.0), "seller_state": ColumnStats("text", 23)}),
+}
+
+
+def _plan(cost: float) -> dict:
+    return {
+        "Node Type": "Hash Join",
+        "Total Cost": cost,
+        "Hash Cond": "(oi.seller_id = s.seller_id)",
+        "Plans": [
+            {
+                "Node Type": "Hash Join",
+                "Hash Cond": "(o.customer_id = c.customer_id)",
+                "Plans": [
+                    {
+                        "Node Type": "Seq Scan",
+                        "Relation Name": "orders",
+                        "Alias": "o",
+                        "Filter": "(order_purchase_timestamp >= '2018-01-01 00:00:00'::timestamp without time zone)",
+                    },
+                    {"Node Type": "Seq Scan", "Relation Name": "customers", "Alias": "c",
+                     "Filter": "(customer_state = 'SP'::text)"},
+                ],
+            },
+            {"Node Type": "Seq Scan", "Relation Name": "order_items", "Alias": "oi"},
+            {"Node Type": "Seq Scan", "Relation Name": "sellers", "Alias": "s", "Filter": "(seller_state = 'SP')"},
+        ],
+    }
+
+
+def test_plan_yields_filter_and_join_candidates_only_where_missing():
+    assert analyze_plan(_plan(1000.0), _CATALOG) == [
+        ("order_items", "seller_id", "btree", "join"),  # sellers side is a small table
+        ("orders", "order_purchase_timestamp", "btree", "filter"),  # uncorrelated: BRIN would not prune
+        ("customers", "customer_state", "btree", "filter"),
+    ]
+
+
+def test_advise_ranks_by_workload_cost_and_reports_percentiles():
+    cands = advise([(0, _plan(1000.0)), (1, _plan(500.0)), (1, _plan(500.0))], _CATALOG)
+    assert [c.name for c in cands][:1] == ["idx_customers_customer_state"]
+    assert all(c.statements == {0, 1} and c.plan_cost == 1500.0 for c in cands)
+    brin = advise([(0, _plan(1.0))], {**_CATALOG, "orders": TableStats(99_441, {
+        "order_purchase_timestamp": ColumnStats("timestamp without time zone", -0.98, 0.99)})})
+    ddl = {c.name: c.ddl("analytics") for c in brin}
+    assert ddl["idx_orders_order_purchase_timestamp_brin"].endswith(
+        "ON analytics.orders USING brin (order_purchase_timestamp)"
+    )
+
+    assert percentiles([]) is None
+    assert percentiles([float(i) for i in range(101)]) == {"p50_ms": 50.0, "p95_ms": 95.0}
+
+
+def test_workload_is_deduplicated_and_guarded():
+    kept, skipped = load_workload(["SELECT 1", "SELECT  1;", "DELETE FROM analytics.orders", "SELECT 2;"])
+    assert kept == ["SELECT 1", "SELECT 2"] and skipped == 1
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from app.infra.llm_client import LLMClient, _AsyncState
+
+
+class _FakeCompletions:
+    """Async stand-in for `AsyncOpenAI().chat.completions` tracking concurrency."""
+
+    def __init__(self):
+        self.inflight = 0
+        self.peak = 0
+
+    async def create(self, **kwargs):
+        self.inflight += 1
+        self.peak = max(self.peak, self.inflight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.inflight -= 1
+        message = SimpleNamespace(content='{"ok": true}', tool_calls=None)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=message, finish_reason="stop")],
+            usage={"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12},
+        )
+
+
+def _client_with_fake(monkeypatch, limit):
+    client = LLMClient(api_key="test-key", model_concurrency={"m": limit}, max_retries=0)
+    completions = _FakeCompletions()
+    state = _AsyncState(SimpleNamespace(chat=SimpleNamespace(completions=completions)))
+    monkeypatch.setattr(client, "_get_async_state", lambda: state)
+    return client, completions
+
+
+def test_async_completion_respects_model_concurrency(monkeypatch):
+    client, completions = _client_with_fake(monkeypatch, limit=3)
+    threads_before = threading.active_count()
+
+    async def _run():
+        msgs = [{"role": "user", "content": "hi"}]
+        return await asyncio.gather(*(client.chat_completion_async(msgs, model="m") for _ in range(20)))
+
+    results = asyncio.run(_run())
+
+    assert all(r is not None and r.text == '{"ok": true}' for r in results)
+    assert completions.peak == 3
+    # Native async path: no worker thread per in-flight request
+    assert threading.active_count() <= threads_before + 1
+
+
+def test_unlisted_model_uses_default_limit():
+    client = LLMClient(api_key="test-key", default_model_concurrency=7)
+    assert client._model_limit("other-model") == 7
+
+
+def test_sdk_clients_disable_builtin_retries(monkeypatch):
+    import app.infra.llm_client as mod
+
+    seen = []
+
+    def _fake(**kwargs):
+        seen.append(kwargs)
+        return SimpleNamespace()
+
+    monkeypatch.setattr(mod, "_OpenAI", _fake)
+    monkeypatch.setattr(mod, "_AsyncOpenAI", _fake)
+    client = LLMClient(api_key="test-key")
+
+    async def _run():
+        return client._get_async_state()
+
+    assert asyncio.run(_run()) is not None
+    assert [kw["max_retries"] for kw in seen] == [0, 0]
@@ -0,0 +1,62 @@
+import pytest
+
+from app.agents.analytics import profile as profile_mod
+from app.agents.analytics.normalize import AnalyticsNormalizer
+from app.agents.analytics.profile import profile_rows
+
+_PATHS = ["numpy", "python"] if profile_mod._np is not None else ["python"]
+
+
+@pytest.fixture(params=_PATHS)
+def path(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(profile_mod, "_np", None)
+    else:
+        monkeypatch.setattr(profile_mod, "_NUMPY_MIN_ROWS", 1)
+    return request.param
+
+
+def _state_rows():
+    values = [("SP", 5000), ("RJ", 120), ("MG", 110), ("RS", 100), ("PR", 90), ("SC", 80), ("BA", 100), ("GO", 95)]
+    return [{"customer_state": s, "revenue": v, "orders": v // 10, "customers": v // 10} for s, v in values]
+
+
+def test_profile_statistics_match_on_both_paths(path):
+    rows = _state_rows() + [{"customer_state": "DF", "revenue": None, "orders": 1, "customers": 1}]
+    p = profile_rows(rows)
+    col = p.column("revenue")
+
+    nums = sorted(r["revenue"] for r in rows if r["revenue"] is not None)
+    assert (p.metric, p.positive_metric, p.state_column) == ("revenue", "revenue", "customer_state")
+    assert col.count == len(nums) and col.total == sum(nums)
+    assert (col.q1, col.q3) == (nums[len(nums) // 4], nums[3 * len(nums) // 4])
+    assert (col.minimum, col.maximum) == (min(nums), max(nums))
+    assert [rows[i]["customer_state"] for i in col.top] == ["SP", "RJ", "MG"]
+    # Ties keep row order (RS before BA)
+    tail = rows[3:]
+    assert [tail[i]["customer_state"] for i in profile_rows(tail).column("revenue").top] == ["RS", "BA", "GO"]
+    assert col.outliers() == [0]
+    assert p.has_one_to_one()
+
+
+def test_detectors_read_the_shared_profile(path):
+    norm = AnalyticsNormalizer()
+    rows = _state_rows()
+    out = norm._detect_patterns_and_insights(rows, "receita por estado")
+
+    assert "Cada cliente fez exatamente uma compra" in out
+    assert "SP domina com 87.8% do total" in out
+    assert "Alta concentração geográfica: SP, RJ, MG" in out
+    assert "Anomalias detectadas: SP (5,000)" in out
+    assert "coeficiente de variação" in out
+    assert norm._get_key_insights(rows).splitlines()[-1] == "  Mínimo: 80"
+
+
+def test_temporal_halves_follow_period_order(path):
+    norm = AnalyticsNormalizer()
+    rows = [{"period": f"2018-{m:02d}", "qty": q} for m, q in [(4, 40), (1, 10), (3, 30), (2, 20)]]
+    temporal = profile_rows(rows).temporal
+
+    assert (temporal.column, temporal.metric) == ("period", "qty")
+    assert (temporal.first_half, temporal.second_half) == (30.0, 70.0)
+    assert norm._detect_temporal_patterns(rows) == "Tendência de crescimento ao longo do período analisado"
@@ -0,0 +1,49 @@
+from datetime import date
+from decimal import Decimal
+
+from app.agents.analytics.compaction import compact_rows, estimate_json_tokens
+from app.agents.analytics.normalize import AnalyticsNormalizer, _PlanView, _ResultView
+
+
+def _rows(n):
+    return [{"customer_state": f"S{i:04d}", "revenue": Decimal("10.50"), "day": date(2018, 1, 1)} for i in range(n)]
+
+
+def test_rows_under_budget_are_sent_unchanged():
+    out = compact_rows(_rows(3), token_budget=1000)
+
+    assert not out.compacted and out.omitted == 0
+    assert out.rows[0] == {"customer_state": "S0000", "revenue": 10.5, "day": "2018-01-01"}
+
+
+def test_over_budget_sends_digest_head_and_tail_within_budget():
+    rows = _rows(2000)
+    out = compact_rows(rows, token_budget=800, tail_rows=3)
+
+    assert out.compacted
+    assert out.rows[0]["customer_state"] == "S0000"
+    assert [r["customer_state"] for r in out.rows[-3:]] == ["S1997", "S1998", "S1999"]
+    assert out.omitted == 2000 - len(out.rows)
+    assert out.tokens <= 800 < out.full_tokens
+    assert out.tokens == estimate_json_tokens(out.digest) + sum(estimate_json_tokens(r) for r in out.rows)
+    revenue = out.digest["columns"]["revenue"]
+    assert out.digest["row_count"] == 2000
+    assert (revenue["type"], revenue["sum"], revenue["max"]) == ("number", 21000.0, 10.5)
+    assert out.digest["columns"]["customer_state"]["distinct"] == 2000
+
+
+def test_normalizer_input_carries_digest_for_compacted_complete_data(monkeypatch):
+    norm = AnalyticsNormalizer()
+    monkeypatch.setattr(norm, "_should_show_complete_data", lambda *_a, **_k: True)
+    rows = _rows(1500)
+    result = _ResultView(rows=rows, row_count=len(rows), exec_ms=1.0, limit_applied=False)
+    plan = _PlanView(sql="SELECT 1", limit_applied=False)
+
+    payload, packed = norm._build_llm_input("todos", plan, result, token_budget=600, tail_rows=2)
+    assert payload["has_more_data"] is True and payload["show_complete_data"] is True
+    assert payload["rows_omitted"] == packed.omitted > 0
+    assert payload["rows_digest"]["row_count"] == 1500
+
+    payload, packed = norm._build_llm_input("todos", plan, result, token_budget=0, tail_rows=2)
+    assert len(payload["rows"]) == 1500 and "rows_digest" not in payload
+    assert payload["has_more_data"] is False
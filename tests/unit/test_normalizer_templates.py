@@ -0,0 +1,71 @@
+from datetime import date
+from decimal import Decimal
+
+from app.agents.analytics.normalize import AnalyticsNormalizer, _PlanView, _ResultView
+from app.agents.analytics.templates import render_template
+
+
+def _meta(answer):
+    return answer["meta"] if isinstance(answer, dict) else answer.meta
+
+
+def test_scalar_and_state_distribution():
+    assert render_template("Quantos pedidos temos?", [{"total_orders": 99441}]).text == "Existem 99.441 pedidos."
+
+    rows = [{"customer_state": "SP", "revenue": Decimal("1000.50")}, {"customer_state": "RJ", "revenue": Decimal("500")}]
+    out = render_template("Receita por estado", rows)
+    assert out.shape == "state_distribution"
+    assert "SP: R$ 1.000,50" in out.text and out.text.endswith("Total: R$ 1.500,50")
+
+
+def test_top_n_ranking_and_monthly_series():
+    rows = [{"product_category_name": f"cat_{i}", "total_orders": 100 - i} for i in range(5)]
+    out = render_template("Top 5 categorias por pedidos", rows, limit_applied=True)
+    assert out.shape == "ranking" and out.text.splitlines()[1].strip().startswith("1.")
+    assert render_template("Pedidos por categoria", rows, limit_applied=True) is None
+
+    series = [{"month": date(2018, m, 1), "orders": 10 * m} for m in range(1, 4)]
+    out = render_template("Pedidos por mês em 2018", series)
+    assert out.shape == "time_series" and "3 meses" in out.text
+
+
+def test_unknown_columns_and_analysis_questions_go_to_the_llm():
+    assert render_template("Pedidos por estado", [{"customer_state": "SP", "weird_score": 3}]) is None
+    assert render_template("Analise os padrões de receita por estado", [{"customer_state": "SP", "revenue": 1.0}]) is None
+
+
+def test_normalize_uses_fast_path_and_counts_hits():
+    norm = AnalyticsNormalizer()
+    plan = _PlanView(sql="SELECT COUNT(*) AS total_orders FROM orders", limit_applied=False)
+    hit = _ResultView(rows=[{"total_orders": 5}], row_count=1, exec_ms=1.0, limit_applied=False)
+    miss = _ResultView(rows=[{"weird_score": 5}], row_count=1, exec_ms=1.0, limit_applied=False)
+
+    answer = norm.normalize(plan=plan, result=hit, question="Quantos pedidos?")
+    assert _meta(answer)["renderer"] == "template" and _meta(answer)["template_shape"] == "scalar"
+    norm.normalize(plan=plan, result=miss, question="Quantos pedidos?")
+
+    stats = norm.fast_path_stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    assert stats["saved_ms"] > 0
+
+
+def test_time_series_unit_comes_from_sql_or_column_name():
+    quarters = [{"period": date(2018, m, 1), "revenue": 100.0} for m in (1, 4, 7)]
+    sql = "SELECT date_trunc('quarter', o.order_purchase_timestamp) AS period, SUM(p.payment_value) AS revenue"
+    out = render_template("Receita por trimestre", quarters, sql=sql)
+    assert out.text.splitlines()[:2] == ["Evolução trimestral da receita:", "  1º trimestre: R$ 100,00"]
+    assert out.text.endswith("em 3 trimestres analisados.")
+
+    weeks = [{"week": date(2018, 1, d), "orders": d} for d in (1, 8, 15)]
+    out = render_template("Pedidos por semana", weeks)
+    assert out.text.startswith("Evolução semanal de pedidos:\n  Semana de 01/01/2018: 1 pedidos")
+    assert out.text.endswith("em 3 semanas analisadas.")
+
+    # Unit not stated anywhere: dates alone are not enough to label the series
+    assert render_template("Receita por período", quarters) is None
+
+
+def test_averages_are_named_once():
+    assert render_template("Preço médio?", [{"avg_price": 120.5}]).text == "Preço médio: R$ 120,50."
+    series = [{"month": date(2018, m, 1), "avg_price": 100.0} for m in (1, 2)]
+    assert "(média)" not in render_template("Preço médio por mês", series).text
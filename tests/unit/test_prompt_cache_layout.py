@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+
+class _RecordingBackend:
+    """Stub backend that records every (system, messages) pair it receives."""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate_json(self, *, system, messages, json_schema, model=None, temperature=0.0, max_output_tokens=None):  # noqa: D401 - test stub
+        self.calls.append((system, list(messages)))
+        return {
+            "agent": "analytics",
+            "confidence": 0.8,
+            "reason": "data query",
+            "tables": [],
+            "columns": [],
+            "signals": [],
+            "thread_id": None,
+        }
+
+
+def test_classifier_system_prompt_is_stable_across_evidence():
+    from app.routing.llm_classifier import LLMClassifier
+
+    backend = _RecordingBackend()
+    clf = LLMClassifier(backend=backend, model="test-router", temperature=0.0, enable_cache=False)
+    allowlist = {"orders": ["order_id", "order_status"]}
+
+    clf.classify("quantos pedidos?", allowlist=allowlist, rag_hits=0)
+    clf.classify("quantos pedidos?", allowlist=allowlist, rag_hits=5, rag_min_score=0.9)
+
+    assert len(backend.calls) >= 2
+    (sys_a, msgs_a), (sys_b, msgs_b) = backend.calls[0], backend.calls[-1]
+    # Static prefix is byte-identical; evidence travels right before the user turn
+    assert sys_a == sys_b
+    assert "RAG hits" not in sys_a
+    assert msgs_a[-1]["role"] == "user"
+    assert "RAG hits: 0" in msgs_a[-2]["content"]
+    assert "RAG hits: 5" in msgs_b[-2]["content"]
+    assert msgs_a[:-2] == msgs_b[:-2]
+
+
+def test_normalize_usage_reports_cached_tokens():
+    from app.infra.llm_client import _normalize_usage
+
+    raw = SimpleNamespace(
+        prompt_tokens=1200,
+        completion_tokens=50,
+        total_tokens=1250,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+    )
+    usage = _normalize_usage(raw)
+    assert usage == {
+        "prompt_tokens": 1200,
+        "completion_tokens": 50,
+        "total_tokens": 1250,
+        "cached_tokens": 1024,
+    }
+
+    assert _normalize_usage({"prompt_tokens": 10, "completion_tokens": 2})["cached_tokens"] == 0
+    assert _normalize_usage(None)["total_tokens"] == 0
@@ -0,0 +1,92 @@
+from types import SimpleNamespace
+
+from app.infra import llm_client as llm_mod
+from app.infra.rate_limit import ModelRateLimiter, backoff_delay, is_retryable, retry_after_seconds
+
+
+class _APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_bucket_queues_requests_beyond_rpm():
+    limiter = ModelRateLimiter({"m": {"rpm": 60, "tpm": 0}})
+    waits = [limiter.reserve("m", 0) for _ in range(62)]
+    assert waits[:60] == [0.0] * 60
+    # 1 request/second refill: the 61st and 62nd queue ~1s and ~2s behind
+    assert 0.9 < waits[60] <= 1.0
+    assert 1.9 < waits[61] <= 2.0
+    # Unlisted models without defaults are unlimited
+    assert limiter.reserve("other", 10**9) == 0.0
+
+
+def test_bucket_limits_tokens_per_minute():
+    limiter = ModelRateLimiter({"m": {"rpm": 0, "tpm": 600}})
+    assert limiter.reserve("m", 600) == 0.0
+    assert 2.9 < limiter.reserve("m", 30) <= 3.0
+
+
+def test_retry_policy_helpers():
+    assert is_retryable(_APIError(429))
+    assert is_retryable(_APIError(503))
+    assert is_retryable(ConnectionError("reset"))
+    assert not is_retryable(_APIError(401))
+    assert not is_retryable(_APIError(400))
+
+    assert retry_after_seconds(_APIError(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(_APIError(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(_APIError(429)) is None
+
+    for attempt in range(6):
+        assert 0.0 <= backoff_delay(attempt, 0.5, 4.0) <= 4.0
+    assert backoff_delay(0, 0.5, 10.0, retry_after=3.0) >= 3.0
+
+
+def _ok_response():
+    message = SimpleNamespace(content="ok", tool_calls=None)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+
+
+def test_chat_completion_backs_off_and_honours_retry_after(monkeypatch):
+    errors = [_APIError(429, {"retry-after": "1.5"}), _APIError(500)]
+    calls = []
+
+    def _create(**kwargs):
+        calls.append(kwargs)
+        if errors:
+            raise errors.pop(0)
+        return _ok_response()
+
+    sleeps = []
+    monkeypatch.setattr(llm_mod, "time", SimpleNamespace(sleep=sleeps.append))
+    limiter = ModelRateLimiter()
+    monkeypatch.setattr(limiter, "acquire", lambda model, tokens: 0.0)
+    client = llm_mod.LLMClient(api_key="test-key", max_retries=3, retry_delay=0.1, rate_limiter=limiter)
+    client._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+    resp = client.chat_completion([{"role": "user", "content": "hi"}], model="m")
+
+    assert resp is not None and resp.text == "ok"
+    assert len(calls) == 3
+    assert len(sleeps) == 2
+    assert sleeps[0] >= 1.5  # Retry-After is a floor
+    assert sleeps[1] <= 0.2  # base * 2**1
+    # Retry-After paused the model for other callers too
+    assert limiter.reserve("m", 0) > 0.0
+
+
+def test_chat_completion_does_not_retry_auth_errors(monkeypatch):
+    calls = []
+
+    def _create(**kwargs):
+        calls.append(kwargs)
+        raise _APIError(401)
+
+    monkeypatch.setattr(llm_mod, "time", SimpleNamespace(sleep=lambda s: None))
+    client = llm_mod.LLMClient(api_key="test-key", max_retries=3, rate_limiter=ModelRateLimiter())
+    client._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create)))
+
+    assert client.chat_completion([{"role": "user", "content": "hi"}], model="m") is None
+    assert len(calls) == 1
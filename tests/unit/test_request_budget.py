@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from app.infra.deadline import (
+    allow_optional,
+    bounded_timeout,
+    budget_scope,
+    current_budget,
+    remaining_s,
+)
+
+
+def test_timeouts_are_clamped_only_under_a_budget():
+    assert bounded_timeout(90.0) == 90.0
+    assert remaining_s() is None
+    with budget_scope(time.time() + 10.0):
+        assert 9.0 < bounded_timeout(90.0) <= 10.0
+        assert bounded_timeout(3.0) == 3.0
+    with budget_scope(time.time() - 1.0):
+        # Spent budget still leaves one short attempt
+        assert bounded_timeout(90.0, floor_s=2.0) == 2.0
+
+
+def test_optional_steps_are_skipped_and_recorded_when_budget_is_low():
+    assert allow_optional("llm_reranker")
+    with budget_scope(time.time() + 300.0) as budget:
+        assert allow_optional("llm_reranker")
+        assert budget.skips == []
+    with budget_scope(time.time() + 1.0) as budget:
+        assert not allow_optional("llm_reranker")
+        assert allow_optional("unknown_step")
+        assert budget.skips == ["llm_reranker"]
+
+
+def test_budget_follows_work_into_worker_threads():
+    def worker():
+        allow_optional("normalizer_llm")
+        return current_budget()
+
+    async def main():
+        with budget_scope(time.time() + 1.0) as budget:
+            seen = await asyncio.to_thread(worker)
+        return budget, seen
+
+    budget, seen = asyncio.run(main())
+    assert seen is budget
+    assert budget.skips == ["normalizer_llm"]
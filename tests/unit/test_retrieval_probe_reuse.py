@@ -0,0 +1,57 @@
+import app.agents.knowledge.retriever as rmod
+
+
+def _rows(n):
+    return [
+        {"doc_id": f"d{i}", "chunk_id": "c0", "title": None, "content": f"t{i}", "source": None,
+         "metadata": {}, "score": 0.9 - i * 0.05}
+        for i in range(n)
+    ]
+
+
+def _retriever(monkeypatch, rows):
+    calls = {"embed": 0, "sql": []}
+
+    def _embed(text, *, model):
+        calls["embed"] += 1
+        return [0.5, 0.5]
+
+    def _execute(_engine, _sql, params, **_kw):
+        calls["sql"].append(params)
+        return rows[: params["limit"]]
+
+    monkeypatch.setattr(rmod, "_embed_query", _embed)
+    monkeypatch.setattr(rmod, "_execute", _execute)
+    monkeypatch.setattr(rmod, "_get_engine", lambda: None)
+    return rmod.KnowledgeRetriever(table="doc_chunks", model="m"), calls
+
+
+def test_probe_pool_answers_same_query_without_db(monkeypatch):
+    retr, calls = _retriever(monkeypatch, _rows(30))
+    probe = retr.retrieve("frete", top_k=6, min_score=0.65)
+    assert [h.doc_id for h in probe.select(top_k=5, min_score=0.65)] == ["d0", "d1", "d2", "d3", "d4"]
+
+    out = retr.retrieve("frete", top_k=6, min_score=0.01, probe=probe.to_probe("frete"))
+
+    assert calls == {"embed": 1, "sql": [calls["sql"][0]]}
+    assert [h.doc_id for h in out.hits] == [f"d{i}" for i in range(6)]
+
+
+def test_probe_embedding_reused_when_pool_too_small(monkeypatch):
+    retr, calls = _retriever(monkeypatch, _rows(30))
+    payload = retr.retrieve("frete", top_k=2, min_score=0.65).to_probe("frete")
+
+    out = retr.retrieve("frete", top_k=6, min_score=0.01, probe=payload)
+
+    assert calls["embed"] == 1 and len(calls["sql"]) == 2
+    assert calls["sql"][1]["qvec"] == [0.5, 0.5]
+    assert len(out.hits) == 6
+
+
+def test_changed_query_ignores_probe(monkeypatch):
+    retr, calls = _retriever(monkeypatch, _rows(3))
+    payload = retr.retrieve("frete", top_k=6).to_probe("frete")
+
+    retr.retrieve("prazo de entrega", top_k=6, probe=payload)
+
+    assert calls["embed"] == 2 and len(calls["sql"]) == 2
@@ -112,3 +112,17 @@ def test_ensemble_tie_uses_scorer(monkeypatch):
     assert "ensemble_scorer" in sigs
 
 
+
+
+def test_budget_truncated_ensemble_is_partial_and_not_cached(monkeypatch):
+    os.environ["ROUTER_ENSEMBLE_ENABLED"] = "true"
+    from app.routing import llm_classifier as clf_mod
+
+    clf = _make_classifier(monkeypatch)
+    if clf._cache is None:
+        pytest.skip("routing cache unavailable")
+    monkeypatch.setattr(clf_mod, "allow_optional", lambda _step: False)
+
+    dec = clf.classify("Preciso de um relatório simples")
+    assert "ensemble_partial" in dec.signals and "ensemble_majority" not in dec.signals
+    assert clf._cache.get("Preciso de um relatório simples", {}) is None
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from app.infra.cache import SingleFlight
+
+
+def _run_concurrently(n, target):
+    barrier = threading.Barrier(n)
+    results = [None] * n
+    errors = [None] * n
+
+    def _worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as exc:  # noqa: BLE001 - collected for assertions
+            errors[i] = exc
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+    return results, errors
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    calls = []
+
+    def _slow():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": 42}
+
+    results, errors = _run_concurrently(8, lambda: flight.do("k", _slow))
+
+    assert errors == [None] * 8
+    assert len(calls) == 1
+    assert all(r == {"value": 42} for r in results)
+    assert flight.inflight() == 0
+    # Nothing is retained once the flight lands
+    flight.do("k", _slow)
+    assert len(calls) == 2
+
+
+def test_followers_receive_leader_exception():
+    flight = SingleFlight("test")
+
+    def _boom():
+        time.sleep(0.1)
+        raise RuntimeError("provider down")
+
+    _, errors = _run_concurrently(4, lambda: flight.do("k", _boom))
+    assert all(isinstance(e, RuntimeError) for e in errors)
+
+
+class _SlowBackend:
+    def __init__(self):
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_json(self, *, system, messages, json_schema, model=None, temperature=0.0, max_output_tokens=None):  # noqa: D401 - test stub
+        with self._lock:
+            self.calls += 1
+        time.sleep(0.05)
+        return {
+            "agent": "analytics",
+            "confidence": 0.9,
+            "reason": "data query",
+            "tables": [],
+            "columns": [],
+            "signals": [],
+            "thread_id": None,
+        }
+
+
+def test_classifier_coalesces_identical_concurrent_requests(monkeypatch):
+    from app.routing.llm_classifier import LLMClassifier
+
+    monkeypatch.setenv("ROUTER_ENSEMBLE_ENABLED", "false")
+    backend = _SlowBackend()
+    clf = LLMClassifier(backend=backend, model="test-router")
+    monkeypatch.setattr(clf, "_semantic_out_of_scope", lambda message: (False, None))
+
+    threads_ids = iter(range(100))
+    lock = threading.Lock()
+
+    def _classify():
+        with lock:
+            tid = f"t{next(threads_ids)}"
+        dec = clf.classify("quantos pedidos por estado?", allowlist={"orders": ["order_id"]}, thread_id=tid)
+        return tid, dec
+
+    results, errors = _run_concurrently(6, _classify)
+
+    assert errors == [None] * 6
+    assert backend.calls == 1
+    for tid, dec in results:
+        get = dec.get if isinstance(dec, dict) else (lambda k, _d=dec: getattr(_d, k))
+        assert get("agent") == "analytics"
+        assert get("thread_id") == tid
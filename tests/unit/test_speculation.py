@@ -0,0 +1,109 @@
+import asyncio
+
+from app.graph.speculation import (
+    PLAN_ONLY_EVIDENCE,
+    branch_evidence,
+    race_branches,
+    speculation_candidates,
+)
+
+
+def _dec(agent, confidence=0.9, signals=()):
+    return {"agent": agent, "confidence": confidence, "signals": list(signals)}
+
+
+def test_candidates_only_for_borderline_analytics_knowledge_pairs():
+    kw = {"confidence_min": 0.55, "margin": 0.1}
+    # Confident, no competing hint: commit to one agent
+    assert speculation_candidates(_dec("analytics"), _dec("analytics"), **kw) is None
+    # Supervisor fallback between the two pipelines
+    assert speculation_candidates(_dec("knowledge"), _dec("analytics"), **kw) == ("analytics", "knowledge")
+    # Ensemble tie needs a second candidate to be useful
+    assert speculation_candidates(_dec("triage", signals=["ensemble_tie"]), _dec("triage"), **kw) is None
+    # Commerce documents are never speculated
+    assert speculation_candidates(
+        _dec("analytics", signals=["commerce_doc", "secondary:knowledge"]), _dec("analytics"), **kw
+    ) is None
+
+
+def test_evidence_prefers_rows_and_penalizes_no_context():
+    plan = {"sql": "SELECT 1"}
+    assert branch_evidence("analytics", {"analytics_plan": plan, "_executed": True, "_row_count": 3}) == 0.9
+    assert branch_evidence("analytics", {"analytics_plan": plan, "_executed": True, "_row_count": 0}) == 0.3
+    assert branch_evidence("analytics", {"analytics_plan": plan}) == 0.6
+    assert branch_evidence("knowledge", {"answer": {"text": "x", "no_context": True}}) == 0.0
+    assert branch_evidence("knowledge", {"answer": {"text": "x"}, "_ranked": [{"score": 0.82}]}) == 0.82
+
+
+def _branch(evidence, delay, log, name):
+    async def run():
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            log.append(f"{name}:cancelled")
+            raise
+        return evidence, {"answer": {"text": name}}
+
+    return run
+
+
+def test_strong_first_result_wins_and_cancels_the_loser():
+    log = []
+    out = asyncio.run(
+        race_branches(
+            {"analytics": _branch(0.9, 0.01, log, "analytics"), "knowledge": _branch(0.95, 1.0, log, "knowledge")},
+            primary="knowledge",
+            deadline_s=5,
+            strong_evidence=0.8,
+        )
+    )
+    assert (out.winner, out.outcome) == ("analytics", "strong_first")
+    assert log == ["knowledge:cancelled"]
+    assert out.delta["answer"]["text"] == "analytics"
+
+
+def test_weak_first_result_waits_and_compares_evidence():
+    out = asyncio.run(
+        race_branches(
+            {"analytics": _branch(0.3, 0.01, [], "analytics"), "knowledge": _branch(0.7, 0.05, [], "knowledge")},
+            primary="analytics",
+            deadline_s=5,
+            strong_evidence=0.8,
+        )
+    )
+    assert (out.winner, out.outcome) == ("knowledge", "evidence")
+
+
+def test_branch_deadline_is_enforced():
+    out = asyncio.run(
+        race_branches(
+            {"analytics": _branch(0.9, 1.0, [], "analytics"), "knowledge": _branch(0.5, 0.01, [], "knowledge")},
+            primary="analytics",
+            deadline_s=0.1,
+            strong_evidence=0.8,
+        )
+    )
+    assert out.winner == "knowledge"
+    assert out.branches["analytics"].status == "timeout"
+
+
+def test_plan_only_evidence_is_configurable_and_ties_go_to_the_primary():
+    plan_only = {"analytics_plan": {"sql": "SELECT 1"}}
+    assert branch_evidence("analytics", plan_only, plan_only_evidence=0.75) == 0.75
+
+    knowledge = branch_evidence("knowledge", {"answer": {"text": "x"}, "_ranked": [{"score": 0.6}]})
+    analytics = branch_evidence("analytics", plan_only)
+    assert analytics == knowledge == PLAN_ONLY_EVIDENCE
+
+    def race(primary):
+        return asyncio.run(
+            race_branches(
+                {"analytics": _branch(analytics, 0.01, [], "analytics"), "knowledge": _branch(knowledge, 0.02, [], "knowledge")},
+                primary=primary,
+                deadline_s=5,
+                strong_evidence=0.8,
+            )
+        )
+
+    assert (race("knowledge").winner, race("knowledge").outcome) == ("knowledge", "primary_default")
+    assert race("analytics").winner == "analytics"
@@ -0,0 +1,78 @@
+import pytest
+
+from app.agents.analytics.executor import _assert_safe_select
+from app.agents.analytics.planner import _validate_identifiers
+from app.agents.analytics.sql_guard import (
+    EXECUTOR_POLICY,
+    GuardPolicy,
+    SQLGuardError,
+    check_sql,
+    parse_sql,
+)
+
+ALLOW = {
+    "orders": ["order_id", "customer_id", "order_purchase_timestamp"],
+    "customers": ["customer_id", "customer_state"],
+}
+
+
+def test_literals_and_comments_do_not_trip_keyword_or_function_checks():
+    sql = (
+        "SELECT CASE WHEN COUNT(1) > 10 THEN 'Alto (delete; drop)' ELSE 'Baixo (x)' END AS nivel "
+        "-- update me\nFROM analytics.orders"
+    )
+    parsed = check_sql(sql, EXECUTOR_POLICY)
+    assert parsed.functions == ("count",) and parsed.semicolons == 0
+    assert check_sql("SELECT E'it\\'s; drop' AS x, 'c:\\' AS p", EXECUTOR_POLICY).functions == ()
+
+
+@pytest.mark.parametrize(
+    ("sql", "code"),
+    [
+        ("SELECT 1; DROP TABLE analytics.orders", "multiple_statements"),
+        ("SELECT order_id INTO tmp FROM analytics.orders", "blocked_keyword"),
+        ("SELECT x::timestamp with time zone, pg_sleep(5) FROM analytics.orders", "function"),
+        ("SELECT pg_catalog.now()", "system_catalog"),
+        ("SELECT 'unterminated", "syntax"),
+        # backslash escapes in E'' strings must not hide what follows the quote
+        ("SELECT E'\\'' , pg_sleep(10) --'", "function"),
+        ("SELECT E'\\'' , (SELECT rolpassword FROM pg_authid) x --'", "system_catalog"),
+        # TABLE name is a relation too
+        ("SELECT * FROM (TABLE pg_catalog.pg_authid) x", "system_catalog"),
+        ("SELECT * FROM (TABLE information_schema.tables) x", "system_catalog"),
+        ("SELECT * FROM analytics.orders o JOIN (TABLE pg_catalog.pg_roles) r ON true", "system_catalog"),
+        ("WITH t AS (TABLE pg_authid) SELECT * FROM t", "system_catalog"),
+        # schema names outside strings/comments are rejected wherever they appear
+        ('SELECT 1 AS "information_schema"', "system_catalog"),
+    ],
+)
+def test_executor_policy_rejections(sql, code):
+    with pytest.raises(SQLGuardError) as exc:
+        check_sql(sql, EXECUTOR_POLICY)
+    assert exc.value.code == code
+
+
+def test_allowlist_policy_resolves_aliases_ctes_and_parenthesized_joins():
+    policy = GuardPolicy.for_allowlist(ALLOW)
+    check_sql(
+        "WITH per_state AS (SELECT c.customer_state, COUNT(1) AS n FROM analytics.orders o "
+        "JOIN analytics.customers AS c ON c.customer_id = o.customer_id "
+        "WHERE EXTRACT(YEAR FROM o.order_purchase_timestamp) = 2018 GROUP BY 1) "
+        "SELECT p.customer_state, p.n FROM per_state p ORDER BY p.n DESC",
+        policy,
+    )
+    with pytest.raises(SQLGuardError, match="identifier not allowed: o.price"):
+        check_sql("SELECT o.price FROM analytics.orders o", policy)
+    with pytest.raises(SQLGuardError, match="table not allowed: other.secret"):
+        check_sql("SELECT 1 FROM (other.secret s JOIN analytics.orders o ON true)", policy)
+    with pytest.raises(SQLGuardError, match="table not allowed: other.secret"):
+        check_sql("SELECT * FROM (TABLE other.secret) s", policy)
+
+
+def test_planner_and_executor_share_one_parse():
+    sql = "SELECT analytics.orders.order_id FROM analytics.orders LIMIT 5"
+    parse_sql.cache_clear()
+    _validate_identifiers(sql, {"analytics.orders": ALLOW["orders"]})
+    _assert_safe_select(sql)
+    info = parse_sql.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.graph.stages import StageRunner, StageTimeout, current_stage
+
+
+def test_late_stage_returns_default_and_is_cancelled():
+    seen = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            seen.append("cancelled")
+            raise
+
+    async def main():
+        runner = StageRunner("t", deadlines={"slow": 0.02})
+        out = await runner.run("slow", slow, default="fallback")
+        await asyncio.sleep(0)
+        return out, runner.breakdown()
+
+    out, breakdown = asyncio.run(main())
+    assert out == "fallback"
+    assert seen == ["cancelled"]
+    assert breakdown["slow"]["status"] == "timeout"
+    assert breakdown["slow"]["budget_ms"] == 20.0
+
+
+def test_timeout_without_default_raises():
+    async def main():
+        await StageRunner("t").run("slow", asyncio.sleep, 1, deadline_s=0.01)
+
+    with pytest.raises(StageTimeout):
+        asyncio.run(main())
+
+
+def test_sync_stage_sees_token_and_cancellation():
+    release = threading.Event()
+    tokens = []
+
+    def blocking():
+        token = current_stage()
+        tokens.append(token)
+        release.wait(1)
+        return token.cancelled
+
+    async def main():
+        runner = StageRunner("t", deadlines={"probe": 0.05})
+        handle = runner.start("probe", blocking)
+        out = await runner.result(handle, default=None)
+        release.set()
+        return out
+
+    assert asyncio.run(main()) is None
+    assert tokens[0].name == "probe" and tokens[0].cancelled
+
+
+def test_concurrency_cap_holds_slot_until_thread_returns():
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return True
+
+    async def main():
+        runner = StageRunner("t", caps={"work": 2})
+        return await asyncio.gather(*(runner.run("work", work) for _ in range(5)))
+
+    assert asyncio.run(main()) == [True] * 5
+    assert peak[0] == 2
+
+
+def test_aclose_cancels_uncollected_stages():
+    async def main():
+        runner = StageRunner("t")
+        handle = runner.start("bg", asyncio.sleep, 1)
+        await runner.aclose()
+        await asyncio.sleep(0)
+        return handle, runner.breakdown()
+
+    handle, breakdown = asyncio.run(main())
+    assert handle.task.cancelled()
+    assert breakdown["bg"]["status"] == "cancelled"
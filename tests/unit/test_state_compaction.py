@@ -0,0 +1,115 @@
+from app.graph.compaction import (
+    compact_answer,
+    compact_history,
+    is_blob_ref,
+    release_channels,
+    state_bytes,
+)
+from app.infra.blobs import MemoryBlobStore
+
+
+def _msg(role, n, ch="x"):
+    return {"role": role, "content": ch * n}
+
+
+def test_history_is_capped_by_token_budget_newest_first():
+    store = MemoryBlobStore()
+    history = [_msg("user", 400, "a"), _msg("assistant", 400, "b"), _msg("user", 40, "c")]
+
+    kept = compact_history(history, token_budget=120, message_max_tokens=500, store=store)
+
+    assert [m["content"][0] for m in kept] == ["b", "c"]
+
+
+def test_oversized_message_is_truncated_and_offloaded():
+    store = MemoryBlobStore()
+    long_text = "linha da tabela " * 200
+
+    (kept,) = compact_history([_msg("assistant", 0) | {"content": long_text}], token_budget=1000,
+                              message_max_tokens=50, store=store)
+
+    assert len(kept["content"]) <= 200
+    assert store.get(kept["content_ref"]) == {"content": long_text}
+
+
+def test_answer_keeps_text_and_meta_and_offloads_bulk():
+    store = MemoryBlobStore()
+    rows = [{"estado": f"S{i}", "total": i} for i in range(500)]
+    answer = {
+        "text": "SP lidera.",
+        "data": rows,
+        "columns": ["estado", "total"],
+        "meta": {"agent": "analytics", "row_count": 500, "plan": {"big": True}},
+    }
+
+    compact = compact_answer(answer, store=store, message_max_tokens=100, blob_min_bytes=1024)
+
+    assert compact["text"] == "SP lidera."
+    assert compact["meta"] == {"agent": "analytics", "row_count": 500}
+    assert "data" not in compact
+    assert store.get(compact["payload_ref"])["data"] == rows
+    assert state_bytes({"last_answer": compact}) < state_bytes({"last_answer": answer}) / 10
+
+
+def test_release_channels_keeps_rows_as_reference_and_clears_hits():
+    store = MemoryBlobStore()
+    state = {"analytics_rows": {"rows": [{"qty": 1}], "row_count": 1}, "hits": [{"id": 1}], "ranked": None}
+
+    updates = release_channels(state, ("analytics_rows", "hits", "ranked"), store)
+
+    assert is_blob_ref(updates["analytics_rows"]) and updates["analytics_rows"]["row_count"] == 1
+    assert updates["hits"] is None
+    assert "ranked" not in updates  # already empty
+    assert store.get(updates["analytics_rows"]["$blob"]) == state["analytics_rows"]
+    # Identical payloads map to the same content address
+    assert store.put(state["analytics_rows"]) == updates["analytics_rows"]["$blob"]
+
+
+def test_answer_keeps_bulk_inline_when_offload_fails():
+    class _DownStore:
+        def put(self, _payload):
+            raise ConnectionError("blob store down")
+
+    rows = [{"estado": f"S{i}", "total": i} for i in range(500)]
+    answer = {"text": "SP lidera.", "data": rows, "columns": ["estado", "total"]}
+
+    compact = compact_answer(answer, store=_DownStore(), message_max_tokens=100, blob_min_bytes=1024)
+
+    assert "payload_ref" not in compact
+    assert compact["data"] == rows and compact["columns"] == ["estado", "total"]
+
+
+def test_history_budget_counts_and_offloads_vectors():
+    import base64
+
+    store = MemoryBlobStore()
+    vector = base64.b64encode(b"\0" * 6144).decode("ascii")  # 1536 float32 dims
+    history = [
+        {"role": "user", "content": f"pergunta {i}", "embedding": vector, "embedding_model": "m",
+         "sources": [{"id": j, "snippet": "trecho " * 20} for j in range(40)]}
+        for i in range(50)
+    ]
+
+    kept = compact_history(history, token_budget=3000, message_max_tokens=800, store=store,
+                           max_messages=50, blob_min_bytes=1024)
+
+    assert len(kept) == 50
+    assert all("embedding" not in m and "sources" not in m for m in kept)
+    assert store.get(kept[0]["embedding_ref"]) == {"model": "m", "embedding": vector}
+    assert store.get(kept[0]["extra_ref"])["sources"] == history[0]["sources"]
+    assert state_bytes({"conversation_history": kept}) < 20_000
+
+
+def test_history_budget_counts_bulk_kept_inline_when_offload_fails():
+    class _DownStore:
+        def put(self, _payload):
+            raise ConnectionError("blob store down")
+
+    sources = [{"id": j, "snippet": "trecho " * 20} for j in range(40)]
+    history = [{"role": "user", "content": f"pergunta {i}", "sources": sources} for i in range(50)]
+
+    kept = compact_history(history, token_budget=3000, message_max_tokens=800, store=_DownStore(),
+                           blob_min_bytes=1024)
+
+    assert 1 <= len(kept) < 50  # inline payload is charged against the budget
+    assert state_bytes({"conversation_history": kept}) <= 3000 * 4 + 4096
@@ -0,0 +1,44 @@
+import math
+from array import array
+
+import pytest
+
+from app.utils import vectors
+
+
+@pytest.fixture(params=["numpy", "python"])
+def kernel(request, monkeypatch):
+    if request.param == "python":
+        monkeypatch.setattr(vectors, "_np", None)
+    elif not vectors.numpy_available():
+        pytest.skip("numpy not installed")
+    return vectors
+
+
+def test_cosine_similarities_matches_pairwise(kernel):
+    query = [1.0, 2.0, 3.0]
+    rows = [[1.0, 2.0, 3.0], array("f", [3.0, 2.0, 1.0]), [0.0, 0.0, 0.0], [1.0, 2.0]]
+
+    scores = kernel.cosine_similarities(query, rows)
+
+    expected = [kernel.cosine_similarity(query, list(r)) for r in rows]
+    assert scores == pytest.approx(expected, abs=1e-6)
+    assert scores[2] == 0.0 and scores[3] == 0.0
+
+
+def test_top_k_orders_by_score_and_applies_floor(kernel):
+    query = [1.0, 0.0]
+    rows = [[0.0, 1.0], [1.0, 1.0], [2.0, 0.0], [-1.0, 0.0]]
+
+    assert [i for i, _ in kernel.top_k(query, rows, 2)] == [2, 1]
+    assert [i for i, _ in kernel.top_k(query, rows, 10, min_score=0.5)] == [2, 1]
+    assert kernel.top_k(query, rows, 0) == []
+
+
+def test_hash_embedding_is_normalized_and_deterministic():
+    a = vectors.hash_embedding(["vendas", "por", "estado", "vendas"], dim=64)
+    b = vectors.hash_embedding(["vendas", "por", "estado", "vendas"], dim=64)
+
+    assert a == b
+    assert math.isclose(math.sqrt(sum(v * v for v in a)), 1.0)
+    assert vectors.hash_embedding([], dim=8) == [0.0] * 8